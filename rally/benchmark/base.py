@@ -13,20 +13,184 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-import itertools
+import functools
+import json
+import os
 import random
+import sys
+import threading
 import time
 
+from oslo.config import cfg
+
 from rally import exceptions
+from rally.openstack.common.gettextutils import _
+from rally.openstack.common import log as logging
 from rally import utils
 
 
+LOG = logging.getLogger(__name__)
+
+
+base_opts = [
+    cfg.IntOpt('lookup_cache_ttl',
+               default=60,
+               help='Number of seconds the catalog data (networks, flavors, '
+                    'images etc.) listed by the scenarios is reused for by '
+                    'the iterations of a worker; 0 disables the cache'),
+    cfg.StrOpt('scenario_manifest',
+               default='~/.rally/scenario_manifest.json',
+               help='File the names of the benchmark scenarios and of their '
+                    'modules are cached in, so that only the modules of the '
+                    'scenarios used get imported; it is rebuilt when the '
+                    'scenario modules change. If empty, the names are only '
+                    'kept in memory'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(base_opts, group='benchmark')
+
+SCENARIOS_PACKAGE = "rally.benchmark.scenarios"
+
+# NOTE(hughsaunders): The scenario classes defined so far by module-qualified
+#                     name (<module>.<Class>), and the <Class>.<method>
+#                     names of the scenarios of each. Classes of the same
+#                     name in different modules do not replace each other.
+_classes = {}
+_scenario_names = {}
+
+# NOTE(hughsaunders): Bumped when the format of the manifest changes, so that
+#                     the manifests written before get rebuilt.
+MANIFEST_VERSION = 2
+
+_manifest = None
+_manifest_lock = threading.Lock()
+
+
+class ScenarioMeta(type):
+    """Registers the subclasses of Scenario as they are defined.
+
+    A class that sets _register to False in its body is left out, e.g. the
+    copies of a scenario class the green threads of a run work with.
+    """
+
+    def __init__(cls, name, bases, namespace):
+        super(ScenarioMeta, cls).__init__(name, bases, namespace)
+        if not namespace.get("_register", True):
+            return
+        if any(isinstance(base, ScenarioMeta) for base in bases):
+            qualified_name = _qualified_name(cls)
+            _classes[qualified_name] = cls
+            _scenario_names[qualified_name] = ["%s.%s" % (name, method)
+                                               for method in dir(cls)
+                                               if not method.startswith("_")]
+
+
+def _qualified_name(cls):
+    return "%s.%s" % (cls.__module__, cls.__name__)
+
+
+def _bare_name(qualified_name):
+    return qualified_name.rsplit(".", 1)[-1]
+
+
+def _find_classes(name, classes):
+    """Returns the module-qualified names of classes that name stands for.
+
+    :param name: Bare (<Class>) or module-qualified name of a class
+    :param classes: Module-qualified names of the classes to look among
+    """
+    if name in classes:
+        return [name]
+    return sorted(qualified_name for qualified_name in classes
+                  if _bare_name(qualified_name) == name)
+
+
+def _read_manifest(path):
+    try:
+        with open(path) as manifest_file:
+            return json.load(manifest_file)
+    except (IOError, ValueError):
+        return None
+
+
+def _write_manifest(path, manifest):
+    # NOTE(hughsaunders): Written aside and renamed, so that concurrent
+    #                     readers never see a partial manifest.
+    temp_path = "%s.%d" % (path, os.getpid())
+    try:
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(temp_path, "w") as manifest_file:
+            json.dump(manifest, manifest_file)
+        os.rename(temp_path, path)
+    except (IOError, OSError) as e:
+        LOG.debug(_("Unable to write the scenario manifest: %s") % e)
+
+
+def _build_manifest(modules, signature):
+    """Imports all the scenario modules and lists what they define.
+
+    The manifest is made from the registry of the classes, so a class is
+    listed under the module it is defined in.
+    """
+    for module_name in sorted(modules):
+        utils.try_append_module(module_name, sys.modules)
+    classes = dict((qualified_name, cls.__module__)
+                   for qualified_name, cls in _classes.items()
+                   if cls.__module__ in modules)
+    return {"version": MANIFEST_VERSION, "signature": signature,
+            "classes": classes,
+            "scenarios": sorted(set(scenario for name in classes
+                                    for scenario in _scenario_names[name]))}
+
+
+def get_manifest():
+    """Returns the names of the scenarios of the scenarios package.
+
+    The manifest is read from the scenario_manifest file; it is rebuilt,
+    by importing all the scenario modules, if a scenario module has been
+    added, removed or modified since it was written.
+
+    :returns: Dict with the "classes" dict, that maps the module-qualified
+              names of the scenario classes to the names of their modules,
+              and the "scenarios" list of the <Class>.<method> names
+    """
+    global _manifest
+    with _manifest_lock:
+        if _manifest is None:
+            modules = utils.find_modules_in_package(SCENARIOS_PACKAGE)
+            signature = dict((name, os.path.getmtime(path))
+                             for name, path in modules.items())
+            path = CONF.benchmark.scenario_manifest
+            path = os.path.expanduser(path) if path else None
+            manifest = _read_manifest(path) if path else None
+            if (manifest is None or
+                    manifest.get("version") != MANIFEST_VERSION or
+                    manifest.get("signature") != signature):
+                manifest = _build_manifest(modules, signature)
+                if path:
+                    _write_manifest(path, manifest)
+            _manifest = manifest
+        return _manifest
+
+
 class Scenario(object):
     """This is base class for any benchmark scenario.
        You should create subclass of this class. And you test scnerios will
        be autodiscoverd and you will be able to specify it in test config.
     """
+    __metaclass__ = ScenarioMeta
+
     registred = False
+    idle_time = 0
+    # NOTE(hughsaunders): The runner sets it to a new list for every
+    #                     iteration, so that AtomicAction has somewhere to
+    #                     record the actions to.
+    _atomic_actions = None
+    # NOTE(hughsaunders): Shared by all the scenarios, emptied by the runner
+    #                     when a worker loads a new run.
+    _lookup_cache = {}
 
     @staticmethod
     def register():
@@ -36,11 +200,29 @@ class Scenario(object):
 
     @staticmethod
     def get_by_name(name):
-        """Returns Scenario class by name."""
-        for scenario in utils.itersubclasses(Scenario):
-            if name == scenario.__name__:
-                return scenario
-        raise exceptions.NoSuchScenario(name=name)
+        """Returns Scenario class by name.
+
+        Only the modules of the scenarios package that define a class of
+        that name get imported, if they are not yet.
+
+        :param name: Name of the class, or its module-qualified name if
+                     classes of that name are defined in several modules
+        :raises: :class:`rally.exceptions.NoSuchScenario` if there is no
+                 such class, :class:`rally.exceptions.AmbiguousScenario` if
+                 there are several
+        """
+        manifest_classes = get_manifest()["classes"]
+        for qualified_name in _find_classes(name, manifest_classes):
+            module_name = manifest_classes[qualified_name]
+            if module_name not in sys.modules:
+                utils.try_append_module(module_name, sys.modules)
+        found = _find_classes(name, _classes)
+        if not found:
+            raise exceptions.NoSuchScenario(name=name)
+        if len(found) > 1:
+            raise exceptions.AmbiguousScenario(name=name,
+                                               classes=", ".join(found))
+        return _classes[found[0]]
 
     @staticmethod
     def list_benchmark_scenarios():
@@ -49,17 +231,16 @@ class Scenario(object):
         Returns the method names in format <Class name>.<Method name>, which
         is used in the test config.
 
+        The scenarios are listed from the manifest (see get_manifest()),
+        along with those of the classes defined elsewhere, e.g. in plugins
+        imported already; no scenario module gets imported.
+
         :returns: List of strings
         """
-        utils.import_modules_from_package("rally.benchmark.scenarios")
-        benchmark_scenarios = [
-            ["%s.%s" % (scenario.__name__, method)
-             for method in dir(scenario) if not method.startswith("_")]
-            for scenario in utils.itersubclasses(Scenario)
-        ]
-        benchmark_scenarios_flattened = list(itertools.chain.from_iterable(
-                                                        benchmark_scenarios))
-        return benchmark_scenarios_flattened
+        scenarios = set(get_manifest()["scenarios"])
+        for names in _scenario_names.values():
+            scenarios.update(names)
+        return sorted(scenarios)
 
     @classmethod
     def init(cls, config):
@@ -107,6 +288,37 @@ class Scenario(object):
         """
         return cls._admin_clients[client_type]
 
+    @staticmethod
+    def reset_lookup_cache():
+        Scenario._lookup_cache.clear()
+
+    @classmethod
+    def cached_list(cls, client_type, manager, **kwargs):
+        """Lists resources that rarely change, e.g. networks or flavors.
+
+        The list is made once per lookup_cache_ttl seconds for every user
+        of the run, and shared by the iterations of the worker in between.
+        It must not be used for the resources the benchmarks create.
+
+        :param client_type: Client type ("nova"/"glance" etc.)
+        :param manager: Name of the manager of the resources in the client
+        :param kwargs: Arguments of the list call
+
+        :returns: List of the resources
+        """
+        client = cls.clients(client_type)
+        # NOTE(hughsaunders): The client is kept in the cache entry, so its
+        #                     id cannot be reused by another one.
+        key = (id(client), manager, tuple(sorted(kwargs.items())))
+        now = time.time()
+        cached = Scenario._lookup_cache.get(key)
+        ttl = CONF.benchmark.lookup_cache_ttl
+        if cached is not None and now - cached[0] < ttl:
+            return cached[1]
+        resources = getattr(client, manager).list(**kwargs)
+        Scenario._lookup_cache[key] = (now, resources, client)
+        return resources
+
     @classmethod
     def sleep_between(cls, min_sleep, max_sleep):
         """Performs a time.sleep() call for a random amount of seconds.
@@ -125,3 +337,61 @@ class Scenario(object):
         sleep_time = random.uniform(min_sleep, max_sleep)
         time.sleep(sleep_time)
         cls.idle_time += sleep_time
+
+    @classmethod
+    def atomic_actions(cls):
+        """Returns the atomic actions of the current iteration.
+
+        :returns: List of {"action": <name>, "duration": <seconds>} dicts,
+                  in the order the actions have finished
+        """
+        return cls._atomic_actions or []
+
+
+class AtomicAction(object):
+    """Context manager that times a named part of a scenario iteration.
+
+    The duration of the action (less the idle time of the scenario spent
+    during it) is recorded only if the action succeeds.
+    """
+
+    def __init__(self, scenario_cls, name):
+        """AtomicAction constructor.
+
+        :param scenario_cls: The scenario class the action is a part of
+        :param name: Name of the action, e.g. "nova.boot_server"
+        """
+        self.scenario_cls = scenario_cls
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.time()
+        self.idle_time = self.scenario_cls.idle_time
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        duration = (time.time() - self.start -
+                    (self.scenario_cls.idle_time - self.idle_time))
+        if exc_type is None and self.scenario_cls._atomic_actions is not None:
+            self.scenario_cls._atomic_actions.append({"action": self.name,
+                                                      "duration": duration})
+
+
+def atomic_action_timer(name):
+    """Decorator that times a scenario class method as an atomic action.
+
+    Use it under @classmethod:
+
+        @classmethod
+        @base.atomic_action_timer("nova.boot_server")
+        def _boot_server(cls, ...):
+
+    :param name: Name of the action
+    """
+    def wrap(func):
+        @functools.wraps(func)
+        def func_atomic_action(cls, *args, **kwargs):
+            with AtomicAction(cls, name):
+                return func(cls, *args, **kwargs)
+        return func_atomic_action
+    return wrap
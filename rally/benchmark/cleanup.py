@@ -0,0 +1,249 @@
+# Copyright 2013: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from multiprocessing import pool as multiprocessing_pool
+import sys
+import time
+
+from oslo.config import cfg
+
+from rally.openstack.common.gettextutils import _
+from rally.openstack.common import log as logging
+
+
+LOG = logging.getLogger(__name__)
+
+
+cleanup_opts = [
+    cfg.IntOpt('cleanup_concurrency',
+               default=10,
+               help='Number of calls sent to one service at the same time '
+                    'while cleaning up after a benchmark'),
+    cfg.IntOpt('cleanup_timeout',
+               default=600,
+               help='Number of seconds to wait for the resources of one '
+                    'cleanup phase to be deleted'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(cleanup_opts, group='benchmark')
+
+
+class ResourceType(object):
+    """A kind of resources of one service that the cleanup deletes."""
+
+    def __init__(self, service, manager, list_kwargs=None, keep=None,
+                 gone_statuses=None):
+        """ResourceType constructor.
+
+        :param service: Client type ("nova"/"glance" etc.)
+        :param manager: Name of the manager of the resources in the client
+        :param list_kwargs: Function that takes the clients of a user and
+                            returns the filters passed to the list call
+        :param keep: Predicate for the resources that are never deleted
+        :param gone_statuses: Statuses of the resources that are deleted
+                              but still listed
+        """
+        self.service = service
+        self.manager = manager
+        self.name = "%s.%s" % (service, manager)
+        self.list_kwargs = list_kwargs or (lambda clients: {})
+        self.keep = keep or (lambda resource: False)
+        self.gone_statuses = gone_statuses or []
+
+    def list(self, clients):
+        """Returns the resources of the user that are to be deleted."""
+        manager = getattr(clients[self.service], self.manager)
+        return [resource for resource in
+                manager.list(**self.list_kwargs(clients))
+                if not self.keep(resource) and not self._is_gone(resource)]
+
+    def remaining(self, clients, ids):
+        """Returns the IDs among the given ones that are still there."""
+        return ids & set(resource.id for resource in self.list(clients))
+
+    def delete(self, resource):
+        resource.delete()
+
+    def _is_gone(self, resource):
+        return (bool(self.gone_statuses) and
+                resource.status.upper() in self.gone_statuses)
+
+
+# NOTE(hughsaunders): Resources of one phase are deleted at the same time,
+#                     and a phase starts when the previous one has drained:
+#                     e.g. volumes cannot go while servers or snapshots use
+#                     them.
+PHASES = [
+    [
+        ResourceType("nova", "servers",
+                     list_kwargs=lambda clients: {"detailed": False}),
+        ResourceType("nova", "keypairs"),
+        ResourceType("glance", "images",
+                     list_kwargs=lambda clients: {
+                         "owner": clients["keystone"].project_id},
+                     gone_statuses=["DELETED"]),
+        ResourceType("cinder", "transfers"),
+        ResourceType("cinder", "volume_snapshots"),
+        ResourceType("cinder", "backups"),
+    ],
+    [
+        ResourceType("nova", "security_groups",
+                     keep=lambda group: group.name == "default"),
+        ResourceType("nova", "networks"),
+        ResourceType("cinder", "volumes"),
+    ],
+    [
+        ResourceType("cinder", "volume_types"),
+    ],
+]
+
+
+# NOTE(hughsaunders): Names of the resources that give a user ssh access to
+#                     its instances, see utils._prepare_for_instance_ssh().
+SSH_ACCESS_RESOURCES = {
+    "nova.keypairs": "rally_ssh_key",
+    "nova.security_groups": "rally_open",
+}
+
+
+def _call(func, *args):
+    try:
+        return func(*args)
+    except Exception as e:
+        LOG.debug(_("Cleanup call failed."), exc_info=sys.exc_info())
+        LOG.warning(_("Unable to fully cleanup the cloud: %s") % e)
+
+
+class CleanupEngine(object):
+    """Deletes the resources that the benchmarks left to their users.
+
+    Every service has its own pool of threads, so the calls to different
+    services do not wait for each other and no service gets more than
+    cleanup_concurrency calls at the same time. After the deletes of a
+    phase are sent, all the deleted resources are waited for at once, with
+    one list call per user and resource type per check.
+    """
+
+    def __init__(self, clients, concurrency=None, timeout=None,
+                 check_interval=1, keep_ssh_access=False):
+        """CleanupEngine constructor.
+
+        :param clients: List of the clients of the users to clean up after
+        :param concurrency: Number of calls sent to one service at the same
+                            time, cleanup_concurrency by default
+        :param timeout: Seconds to wait for one phase to drain,
+                        cleanup_timeout by default
+        :param check_interval: Seconds between two checks of a phase
+        :param keep_ssh_access: If True, the SSH_ACCESS_RESOURCES of the
+                                users are not deleted, e.g. because they
+                                belong to a user pool
+        """
+        self.clients = clients
+        self.concurrency = concurrency or CONF.benchmark.cleanup_concurrency
+        self.timeout = timeout or CONF.benchmark.cleanup_timeout
+        self.check_interval = check_interval
+        self.keep_ssh_access = keep_ssh_access
+        self.durations = {}
+
+    def run(self):
+        """Deletes the resources phase by phase.
+
+        :returns: Dict that maps the names of the resource types that had
+                  resources to delete to the number of seconds their phase
+                  took to drain them (None if they did not drain in time)
+        """
+        services = set(rtype.service for phase in PHASES for rtype in phase)
+        pools = dict((service,
+                      multiprocessing_pool.ThreadPool(self.concurrency))
+                     for service in services)
+        try:
+            for phase in PHASES:
+                self._run_phase(phase, pools)
+        finally:
+            for pool in pools.values():
+                pool.close()
+                pool.join()
+        return self.durations
+
+    def _map(self, pools, calls):
+        """Makes the (service, func, args) calls in the pools of services.
+
+        :returns: List of the results of the calls, None for the failed ones
+        """
+        async_results = [pools[service].apply_async(_call, (func,) + args)
+                         for service, func, args in calls]
+        return [async_result.get() for async_result in async_results]
+
+    def _run_phase(self, phase, pools):
+        start = time.time()
+        targets = [(rtype, clients) for rtype in phase
+                   for clients in self.clients]
+        listed = self._map(pools, [(rtype.service, self._list,
+                                    (rtype, clients))
+                                   for rtype, clients in targets])
+
+        deletes = []
+        pending = []
+        for (rtype, clients), resources in zip(targets, listed):
+            if resources:
+                deletes.extend((rtype.service, rtype.delete, (resource,))
+                               for resource in resources)
+                pending.append((rtype, clients,
+                                set(resource.id for resource in resources)))
+        if not pending:
+            return
+        self._map(pools, deletes)
+        self._wait(pending, pools, start)
+
+    def _list(self, rtype, clients):
+        resources = rtype.list(clients)
+        if self.keep_ssh_access and rtype.name in SSH_ACCESS_RESOURCES:
+            resources = [resource for resource in resources
+                         if resource.name != SSH_ACCESS_RESOURCES[rtype.name]]
+        return resources
+
+    def _wait(self, pending, pools, start):
+        while True:
+            remaining = self._map(pools, [(rtype.service, rtype.remaining,
+                                           (clients, ids))
+                                          for rtype, clients, ids in pending])
+            now = time.time()
+            left = []
+            for (rtype, clients, ids), ids_left in zip(pending, remaining):
+                # NOTE(hughsaunders): Failed to list, so check them again.
+                if ids_left is None:
+                    ids_left = ids
+                if ids_left:
+                    left.append((rtype, clients, ids_left))
+
+            names_left = set(rtype.name for rtype, clients, ids in left)
+            for rtype, clients, ids in pending:
+                if rtype.name not in names_left:
+                    self.durations[rtype.name] = now - start
+            pending = left
+
+            if not pending:
+                return
+            if now - start > self.timeout:
+                for name in names_left:
+                    self.durations[name] = None
+                LOG.warning(_("Unable to fully cleanup the cloud: "
+                              "%(types)s were not deleted in %(timeout)d "
+                              "seconds") %
+                            {"types": ", ".join(sorted(names_left)),
+                             "timeout": self.timeout})
+                return
+            time.sleep(self.check_interval)
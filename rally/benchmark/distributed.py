@@ -0,0 +1,317 @@
+# Copyright 2013: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Runs the iterations of one benchmark on several load generator agents.
+
+The agents (see rally.cmd.agent) are processes started on this host or over
+ssh on other ones. The controller talks to every agent through its stdin
+and stdout, one JSON message per line:
+
+    {"command": "clock"}            -> {"time": <agent clock>}
+    {"command": "prepare", ...}     -> {"ready": true}
+    {"command": "start",
+     "start_at": <agent clock>}     -> {"results": [...]} ...
+                                       {"done": <summary>, "info": <info>}
+                                       or {"error": ...}
+    {"command": "abort"}            -> (the start above ends early)
+"""
+
+import functools
+import json
+import Queue
+import subprocess
+import sys
+import threading
+import time
+
+from oslo.config import cfg
+
+from rally import exceptions
+from rally.openstack.common.gettextutils import _
+from rally.openstack.common import log as logging
+
+
+LOG = logging.getLogger(__name__)
+
+
+distributed_opts = [
+    cfg.ListOpt('agents',
+                default=['local'],
+                help='Hosts of the load generator agents of the benchmarks '
+                     'that set "agents"; "local" starts an agent process on '
+                     'this host, anything else is an ssh destination '
+                     '(user@host); the list is cycled through if there are '
+                     'more agents than hosts'),
+    cfg.StrOpt('agent_command',
+               default='openstack-rally-agent',
+               help='Command that starts an agent on the remote hosts'),
+    cfg.IntOpt('clock_samples',
+               default=5,
+               help='Number of round trips used to estimate the clock '
+                    'offset of an agent'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(distributed_opts, group='benchmark')
+
+# NOTE(hughsaunders): Time given to the start messages to reach the agents,
+#                     so that all of them can start on schedule.
+START_DELAY = 0.5
+
+
+def _share(total, parts, index):
+    return total // parts + (1 if index < total % parts else 0)
+
+
+def split_config(execution, config, agents):
+    """Splits the config of a benchmark run between agents.
+
+    The iterations (or the arrival rate) and the active users are divided
+    as evenly as possible; the duration and the timeout stay the same.
+
+    :param execution: Execution type of the run, "continuous" or "rps"
+    :param config: Config of the run, including "agents"
+    :param agents: Number of agents to split the run between
+
+    :returns: List of the configs of the agents that have something to do;
+              it is shorter than agents if there are fewer iterations or
+              active users than agents
+    """
+    config = dict(config)
+    config.pop("agents", None)
+
+    if execution == "continuous":
+        if "duration" not in config:
+            config.setdefault("times", 1)
+        agents = min(agents, config.get("active_users", 1),
+                     config.get("times", agents))
+        split = ["times", "active_users"]
+        atleast_one = []
+    elif execution == "rps":
+        if "duration" not in config:
+            config.setdefault("times", 1)
+            agents = min(agents, config["times"])
+        split = ["times"]
+        atleast_one = ["active_users", "max_in_flight"]
+    else:
+        raise exceptions.InvalidConfigException(
+                message=_("Only continuous and rps test runs can be "
+                          "distributed between agents."))
+
+    configs = []
+    for i in range(agents):
+        agent_config = dict(config)
+        for key in split:
+            if key in config:
+                agent_config[key] = _share(config[key], agents, i)
+        for key in atleast_one:
+            if key in config:
+                agent_config[key] = max(1, _share(config[key], agents, i))
+        if execution == "rps":
+            agent_config["rps"] = float(config["rps"]) / agents
+        configs.append(agent_config)
+    return configs
+
+
+class Agent(object):
+    """A load generator agent process."""
+
+    def __init__(self, host):
+        """Agent constructor, starts the agent process.
+
+        :param host: "local" or the ssh destination of the agent's host
+        """
+        self.host = host
+        self.offset = 0
+        if host == "local":
+            command = [sys.executable, "-m", "rally.cmd.agent"]
+            # NOTE(hughsaunders): Local agents run with the same config.
+            try:
+                for config_file in CONF.config_file or []:
+                    command.extend(["--config-file", config_file])
+            except cfg.NoSuchOptError:
+                pass
+        else:
+            command = ["ssh", "-o", "BatchMode=yes", host,
+                       CONF.benchmark.agent_command]
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE)
+
+    def send(self, message):
+        self.process.stdin.write(json.dumps(message) + "\n")
+        self.process.stdin.flush()
+
+    def receive(self):
+        line = self.process.stdout.readline()
+        if not line:
+            raise exceptions.AgentFailure(host=self.host,
+                                          message=_("the agent has exited"))
+        message = json.loads(line)
+        if "error" in message:
+            raise exceptions.AgentFailure(host=self.host,
+                                          message=message["error"][1])
+        return message
+
+    def measure_offset(self, samples=None):
+        """Estimates how far the agent's clock is ahead of ours.
+
+        The agent reads its clock about halfway through a round trip; the
+        round trip with the least delay bounds the error of the estimate
+        best, so it is the one used.
+
+        :returns: The offset in seconds, also stored in self.offset
+        """
+        best_rtt = None
+        for i in range(samples or CONF.benchmark.clock_samples):
+            sent = time.time()
+            self.send({"command": "clock"})
+            agent_time = self.receive()["time"]
+            received = time.time()
+            if best_rtt is None or received - sent < best_rtt:
+                best_rtt = received - sent
+                self.offset = agent_time - (sent + received) / 2.0
+        return self.offset
+
+    def abort(self):
+        """Tells the agent to stop starting iterations, if it still runs."""
+        try:
+            self.send({"command": "abort"})
+        except (IOError, ValueError):
+            # NOTE(hughsaunders): The agent is gone or has been closed.
+            pass
+
+    def close(self, kill=False):
+        if kill and self.process.poll() is None:
+            self.process.kill()
+        try:
+            self.process.stdin.close()
+        except IOError:
+            pass
+        self.process.wait()
+
+
+def _collect(agents, sink):
+    """Merges the results streamed by the agents into the sink.
+
+    The timestamps of the results are brought to the clock of the
+    controller, and every result gets an "agent" key with the index of
+    the agent that produced it.
+    """
+    messages = Queue.Queue()
+
+    def _read(index, agent):
+        while True:
+            try:
+                message = agent.receive()
+            except Exception as e:
+                messages.put((index, {"error": e}))
+                return
+            messages.put((index, message))
+            if "done" in message:
+                return
+
+    for index, agent in enumerate(agents):
+        reader = threading.Thread(target=_read, args=(index, agent))
+        reader.daemon = True
+        reader.start()
+
+    errors = []
+    rates = []
+    running = len(agents)
+    while running:
+        index, message = messages.get()
+        if "results" in message:
+            for result in message["results"]:
+                if result.get("timestamp") is not None:
+                    result["timestamp"] -= agents[index].offset
+                result["agent"] = index
+                sink.append(result)
+        else:
+            running -= 1
+            if "error" in message:
+                LOG.error(_("Agent %(index)d on %(host)s failed: %(err)s") %
+                          {"index": index, "host": agents[index].host,
+                           "err": message["error"]})
+                errors.append(message["error"])
+            else:
+                rates.append(message.get("info", {}).get(
+                                                    "iterations_per_second"))
+    if errors:
+        raise errors[0]
+    if rates and None not in rates:
+        sink.set_info(iterations_per_second=sum(rates))
+
+
+def _abort(agents):
+    for agent in agents:
+        agent.abort()
+
+
+def run(admin_endpoint, name, kwargs, run_env, sink, on_abort=None):
+    """Runs the iterations of a benchmark on agents and merges the results.
+
+    The users, the context and the cleanup of the run are those of the
+    caller, the agents only run the iterations. The agents start at the
+    same time; for rps runs their starts are staggered so that together
+    they keep to the requested arrival rate.
+
+    :param admin_endpoint: Admin endpoint of the cloud
+    :param name: Benchmark scenario name in format <Class>.<method>
+    :param kwargs: Benchmark configuration from the task config, its
+                   config sets the number of "agents"
+    :param run_env: Run environment of the caller's ScenarioRunner
+    :param sink: ResultSink that receives the results of all the agents
+    :param on_abort: Function that registers a hook to call when the run
+                     gets aborted (see ScenarioRunner._on_abort); the hook
+                     passes the abort on to the agents, which stop starting
+                     iterations and finish as usual
+
+    :returns: The sink
+    """
+    execution = kwargs.get("execution", "continuous")
+    config = kwargs.get("config", {})
+    configs = split_config(execution, config, config["agents"])
+    hosts = CONF.benchmark.agents
+
+    agents = []
+    failed = True
+    try:
+        for i, agent_config in enumerate(configs):
+            agent = Agent(hosts[i % len(hosts)])
+            agents.append(agent)
+            agent.measure_offset()
+            agent.send({"command": "prepare", "admin": admin_endpoint,
+                        "name": name, "kwargs": dict(kwargs,
+                                                     config=agent_config),
+                        "env": run_env})
+        for agent in agents:
+            agent.receive()
+
+        start = time.time() + START_DELAY
+        for i, agent in enumerate(agents):
+            stagger = float(i) / config["rps"] if execution == "rps" else 0
+            agent.send({"command": "start",
+                        "start_at": start + stagger + agent.offset})
+        if on_abort is not None:
+            on_abort(functools.partial(_abort, agents))
+        _collect(agents, sink)
+        failed = False
+    finally:
+        for agent in agents:
+            agent.close(kill=failed)
+        sink.set_info(agents=[{"host": agent.host,
+                               "clock_offset": agent.offset}
+                              for agent in agents])
+    return sink
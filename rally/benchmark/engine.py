@@ -15,9 +15,12 @@
 
 import json
 import jsonschema
+import threading
 
 from rally.benchmark import base
 from rally.benchmark import runner
+from rally.benchmark import sinks
+from rally.benchmark import workers
 from rally import consts
 from rally import exceptions
 from rally.openstack.common.gettextutils import _
@@ -39,7 +42,8 @@ CONFIG_SCHEMA = {
                 "properties": {
                     "args": {"type": "object"},
                     "init": {"type": "object"},
-                    "execution": {"enum": ["continuous", "periodic"]},
+                    "execution": {"enum": ["continuous", "periodic", "rps",
+                                           "steps"]},
                     "config": {
                         "type": "object",
                         "properties": {
@@ -47,9 +51,20 @@ CONFIG_SCHEMA = {
                             "duration": {"type": "number"},
                             "active_users": {"type": "integer"},
                             "period": {"type": "number"},
+                            "rps": {"type": "number", "minimum": 0,
+                                    "exclusiveMinimum": True},
+                            "max_in_flight": {"type": "integer",
+                                              "minimum": 1},
+                            "start_users": {"type": "integer", "minimum": 1},
+                            "step_users": {"type": "integer", "minimum": 1},
+                            "step_duration": {"type": "number"},
                             "tenants": {"type": "integer"},
                             "users_per_tenant": {"type": "integer"},
-                            "timeout": {"type": "number"}
+                            "users_per_worker": {"type": "integer",
+                                                 "minimum": 1},
+                            "timeout": {"type": "number"},
+                            "agents": {"type": "integer", "minimum": 1},
+                            "backend": {"enum": ["processes", "green"]}
                         },
                         "additionalProperties": False
                     }
@@ -61,6 +76,23 @@ CONFIG_SCHEMA = {
 }
 
 
+GROUPS_SCHEMA = {
+    "type": "object",
+    "$schema": "http://json-schema.org/draft-03/schema",
+    "patternProperties": {
+        ".*": {
+            "type": "array",
+            "items": {"type": "string"},
+            "uniqueItems": True
+        }
+    }
+}
+
+# NOTE(hughsaunders): The group of the benchmarks that are not listed in
+#                     the parallel_groups of the task.
+DEFAULT_GROUP = "default"
+
+
 class TestEngine(object):
     """The test engine class, an instance of which is initialized by the
     Orchestrator with the benchmarks configuration and then is used to execute
@@ -76,13 +108,22 @@ class TestEngine(object):
                 tester.run()
     """
 
-    def __init__(self, config, task):
+    def __init__(self, config, task, users=None):
         """TestEngine constructor.
-        :param config: The configuration with specified benchmark scenarios
+        :param config: The configuration with specified benchmark scenarios;
+                       its optional "parallel_groups" key maps group names
+                       to lists of scenario names, the benchmarks of
+                       different groups are then run at the same time
         :param task: The current task which is being performed
+        :param users: Endpoints of pre-provisioned users (see UserPool) to
+                      run the benchmarks as; if None, temporary tenants and
+                      users are created for every benchmark
         """
-        self.config = config
+        self.config = dict(config)
+        self.parallel_groups = self.config.pop("parallel_groups", None)
         self.task = task
+        self.users = users
+        self.aborted = False
         self._validate_config()
 
     @rutils.log_task_wrapper(LOG.info, _("Benchmark configs validation."))
@@ -95,6 +136,9 @@ class TestEngine(object):
             LOG.exception(_('Task %s: Error: %s') % (task_uuid, e.message))
             raise exceptions.InvalidConfigException(message=e.message)
 
+        if self.parallel_groups is not None:
+            self._validate_parallel_groups()
+
         # Check for benchmark scenario names
         available_scenarios = set(base.Scenario.list_benchmark_scenarios())
         for scenario in self.config:
@@ -112,31 +156,185 @@ class TestEngine(object):
                     LOG.exception(_('Task %s: Error: %s') % (task_uuid,
                                                              message))
                     raise exceptions.InvalidConfigException(message=message)
-                if ((run.get('execution', 'continuous') == 'periodic' and
-                     'active_users' in run['config'])):
+                execution = run.get('execution', 'continuous')
+                if execution == 'periodic' and 'active_users' in run['config']:
                     message = _("'active_users' parameter cannot be set "
                                 "for periodic test runs.")
                     LOG.exception(_('Task %s: Error: %s') % (task_uuid,
                                                              message))
                     raise exceptions.InvalidConfigException(message=message)
+                missing = set(['active_users', 'step_duration']) - \
+                    set(run['config'])
+                if execution == 'steps' and missing:
+                    message = _("'active_users' and 'step_duration' "
+                                "parameters should be set for steps test "
+                                "runs.")
+                    LOG.exception(_('Task %s: Error: %s') % (task_uuid,
+                                                             message))
+                    raise exceptions.InvalidConfigException(message=message)
+                if (execution == 'rps') != ('rps' in run['config']):
+                    message = _("'rps' parameter should be set for and "
+                                "only for rps test runs.")
+                    LOG.exception(_('Task %s: Error: %s') % (task_uuid,
+                                                             message))
+                    raise exceptions.InvalidConfigException(message=message)
+                if ('agents' in run['config'] and
+                        execution not in ('continuous', 'rps')):
+                    message = _("'agents' parameter can be set only for "
+                                "continuous and rps test runs.")
+                    LOG.exception(_('Task %s: Error: %s') % (task_uuid,
+                                                             message))
+                    raise exceptions.InvalidConfigException(message=message)
+                if (run['config'].get('backend') == 'green' and
+                        execution != 'continuous'):
+                    message = _("'green' backend can be used only for "
+                                "continuous test runs.")
+                    LOG.exception(_('Task %s: Error: %s') % (task_uuid,
+                                                             message))
+                    raise exceptions.InvalidConfigException(message=message)
+
+    def _validate_parallel_groups(self):
+        task_uuid = self.task['uuid']
+        try:
+            jsonschema.validate(self.parallel_groups, GROUPS_SCHEMA)
+        except jsonschema.ValidationError as e:
+            LOG.exception(_('Task %s: Error: %s') % (task_uuid, e.message))
+            raise exceptions.InvalidConfigException(message=e.message)
+
+        grouped = set()
+        for group, names in self.parallel_groups.iteritems():
+            for name in names:
+                if name not in self.config or name in grouped:
+                    message = (_("Scenario '%(name)s' of the parallel group "
+                                 "'%(group)s' is not in the task or is in "
+                                 "another group too.") %
+                               {"name": name, "group": group})
+                    LOG.exception(_('Task %s: Error: %s') % (task_uuid,
+                                                             message))
+                    raise exceptions.InvalidConfigException(message=message)
+                grouped.add(name)
+
+    def _get_groups(self):
+        """Returns the names of the benchmarks of every parallel group."""
+        groups = dict((group, list(names)) for group, names
+                      in self.parallel_groups.iteritems() if names)
+        grouped = set(name for names in groups.values() for name in names)
+        ungrouped = [name for name in self.config if name not in grouped]
+        if ungrouped:
+            groups.setdefault(DEFAULT_GROUP, []).extend(ungrouped)
+        return groups
+
+    def _split_users(self, groups):
+        """Gives the tenants of the user pool to the groups in turn."""
+        if self.users is None:
+            return dict((group, None) for group in groups)
+        tenant_names = []
+        for endpoint in self.users:
+            if endpoint["tenant_name"] not in tenant_names:
+                tenant_names.append(endpoint["tenant_name"])
+        return dict((group, [endpoint for endpoint in self.users
+                             if tenant_names.index(endpoint["tenant_name"]) %
+                             len(groups) == i])
+                    for i, group in enumerate(groups))
+
+    def _run_benchmarks(self, names, results, users=None, group=None,
+                        runs=None):
+        """Runs the benchmarks of the given scenarios one after another.
+
+        :param results: Dict to put the summaries of the benchmarks into
+        :param users: Endpoints of the pre-provisioned users to use
+        :param group: Name of the parallel group the benchmarks are in
+        :param runs: If set, the (sink, key, timer) of every benchmark is
+                     appended to it
+        """
+        with workers.WorkerPool() as pool:
+            scenario_runner = runner.ScenarioRunner(
+                                    self.task, self.endpoints, pool,
+                                    users=users,
+                                    keystone_cleanup=group is None)
+            for name in names:
+                for n, kwargs in enumerate(self.config[name]):
+                    if self.aborted:
+                        return
+                    key = {'name': name, 'pos': n, 'kw': kwargs}
+                    if group is not None:
+                        key['group'] = group
+                    sink = sinks.TaskResultSink(self.task, key)
+                    with rutils.Timer() as timer:
+                        scenario_runner.run(name, kwargs, sink=sink)
+                    results[json.dumps(key)] = sink.summary()
+                    if runs is not None:
+                        runs.append((sink, key, timer))
+                    if scenario_runner.aborted.is_set():
+                        self.aborted = True
+
+    def _run_groups(self, results):
+        """Runs the parallel groups at the same time.
+
+        Every group has its own worker pool and, if there is a user pool,
+        its own tenants of it. Each benchmark records which benchmarks of
+        the other groups it overlapped with, and for how long.
+        """
+        groups = self._get_groups()
+        users = self._split_users(sorted(groups))
+        runs = []
+        errors = []
+
+        def _run_group(group):
+            try:
+                self._run_benchmarks(groups[group], results,
+                                     users=users[group], group=group,
+                                     runs=runs)
+            except Exception as e:
+                LOG.exception(_("Parallel group %s failed.") % group)
+                errors.append(e)
+
+        threads = [threading.Thread(target=_run_group, args=(group,))
+                   for group in sorted(groups)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        runner.cleanup_keystone_resources()
+        self._record_overlaps(runs)
+        if errors:
+            raise errors[0]
+
+    def _record_overlaps(self, runs):
+        for sink, key, timer in runs:
+            overlaps = []
+            for other_sink, other_key, other_timer in runs:
+                overlap = (min(timer.finish, other_timer.finish) -
+                           max(timer.start, other_timer.start))
+                if other_sink is not sink and overlap > 0:
+                    overlaps.append({'name': other_key['name'],
+                                     'pos': other_key['pos'],
+                                     'group': other_key['group'],
+                                     'duration': overlap})
+            sink.set_info(overlaps=overlaps)
 
     def run(self):
         """Runs the benchmarks according to the test configuration
         the test engine was initialized with.
 
-        :returns: List of dicts, each dict containing the results of all the
-                  corresponding benchmark test launches
+        Iteration results are streamed into the task results while the
+        benchmarks are running. The benchmarks of a group share one pool of
+        worker processes, which is grown to the largest concurrency needed.
+        Without parallel groups, all the benchmarks are in one group.
+
+        If the task gets aborted, the benchmark that is running is cut short
+        (see ScenarioRunner.run()) and the next ones are not run.
+
+        :returns: Dict with a summary (number of iterations and errors) of
+                  every benchmark launch
         """
         self.task.update_status(consts.TaskStatus.TEST_TOOL_BENCHMARKING)
-        scenario_runner = runner.ScenarioRunner(self.task, self.endpoints)
-
         results = {}
-        for name in self.config:
-            for n, kwargs in enumerate(self.config[name]):
-                key = {'name': name, 'pos': n, 'kw': kwargs}
-                result = scenario_runner.run(name, kwargs)
-                self.task.append_results(key, {"raw": result})
-                results[json.dumps(key)] = result
+        if self.parallel_groups is None:
+            self._run_benchmarks(self.config, results, users=self.users)
+        else:
+            self._run_groups(results)
         return results
 
     def bind(self, endpoints):
@@ -150,7 +348,9 @@ class TestEngine(object):
         pass
 
     def __exit__(self, exc_type, exc_value, exc_traceback):
-        if exc_type is not None:
+        if self.aborted:
+            self.task.update_status(consts.TaskStatus.ABORTED)
+        elif exc_type is not None:
             self.task.update_status(consts.TaskStatus.FAILED)
         else:
             self.task.update_status(consts.TaskStatus.FINISHED)
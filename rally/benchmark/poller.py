@@ -0,0 +1,242 @@
+# Copyright 2013: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import calendar
+import threading
+import time
+import weakref
+
+from rally import exceptions
+from rally.openstack.common import log as logging
+from rally.openstack.common import timeutils
+
+
+LOG = logging.getLogger(__name__)
+
+TASK_STATE = "OS-EXT-STS:task_state"
+
+_pollers = weakref.WeakKeyDictionary()
+_pollers_lock = threading.Lock()
+
+
+def _attr(resource, name):
+    # NOTE(hughsaunders): Client resources lazy-load missing attributes
+    #                     with an extra GET, which is what we try to avoid.
+    return vars(resource).get(name)
+
+
+def _updated_at(resource):
+    """Returns the time of the last update of the resource, if reported."""
+    try:
+        updated = timeutils.normalize_time(
+                        timeutils.parse_isotime(_attr(resource, "updated")))
+    except ValueError:
+        return None
+    return calendar.timegm(updated.timetuple()) + updated.microsecond / 1e6
+
+
+class StatusPoller(object):
+    """Waits for several resources of one manager to get ready at once.
+
+    Every check refreshes all the resources being waited for with a single
+    detailed list call instead of a GET per resource. The interval between
+    the checks starts short and grows while nothing changes, so quick
+    transitions are noticed quickly and long ones do not flood the API.
+
+    One poller may be shared by concurrent waits (see get_poller): the
+    resources of every wait are registered with it and a single list call
+    refreshes all of them, whichever wait issues it.
+    """
+
+    def __init__(self, manager, min_interval=0.5, max_interval=5.0,
+                 backoff=1.5, error_statuses=None):
+        """StatusPoller constructor.
+
+        :param manager: Client manager of the resources, e.g. nova.servers
+        :param min_interval: Interval in seconds after a check that saw
+                             some resource change its state
+        :param max_interval: Upper bound of the interval between the checks
+        :param backoff: Factor the interval grows by after a check that saw
+                        no change
+        :param error_statuses: Statuses that make the waiting fail
+        """
+        self.manager = manager
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.error_statuses = [status.upper() for status in
+                               error_statuses or ["ERROR"]]
+        # NOTE(hughsaunders): The times are kept per thread (per green
+        #                     thread once eventlet patches threading), so
+        #                     concurrent waits do not overwrite each other.
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._registered = {}
+        self._listed = {}
+        self._listed_at = None
+        self._listing = 0
+
+    @property
+    def ready_at(self):
+        return getattr(self._local, "ready_at", None)
+
+    @property
+    def detected_at(self):
+        return getattr(self._local, "detected_at", None)
+
+    @property
+    def detection_delay(self):
+        """Seconds between the last resource got ready and the check
+        that noticed it.
+        """
+        return max(0, self.detected_at - self.ready_at)
+
+    @property
+    def registered(self):
+        """Number of the resources being waited for by all the waits."""
+        return sum(self._registered.values())
+
+    def _register(self, resource_ids, count=1):
+        with self._lock:
+            for resource_id in resource_ids:
+                total = self._registered.get(resource_id, 0) + count
+                if total > 0:
+                    self._registered[resource_id] = total
+                else:
+                    self._registered.pop(resource_id, None)
+
+    def _list(self, since, seen):
+        """Returns the latest listing of the resources and its number.
+
+        A new list call is made unless the latest one was issued not before
+        since and is newer than the one seen. The lock is held during the
+        call, so the waits that need a check at the same time wait for the
+        one call in progress and reuse it.
+        """
+        with self._lock:
+            if (self._listed_at is None or self._listed_at < since or
+                    self._listing == seen):
+                listed_at = time.time()
+                self._listed = dict((resource.id, resource) for resource in
+                                    self.manager.list(detailed=True))
+                self._listed_at = listed_at
+                self._listing += 1
+            return self._listing, self._listed
+
+    @staticmethod
+    def _state(resource):
+        if resource is None:
+            return None
+        return ((_attr(resource, "status") or "").upper(),
+                _attr(resource, TASK_STATE))
+
+    @staticmethod
+    def _changed_at(resource, since, until):
+        """Estimates when the resource got ready between two checks.
+
+        The update time reported by the cloud is used if it falls between
+        the checks, otherwise (the resource is gone or the clocks differ)
+        the middle of the interval is.
+        """
+        updated = _updated_at(resource) if resource is not None else None
+        if updated is not None and since <= updated <= until:
+            return updated
+        return (since + until) / 2.0
+
+    def wait(self, resources, is_ready, timeout=600):
+        """Waits until all the resources are ready.
+
+        A resource missing from the list is passed to is_ready as None,
+        since it has been deleted. A resource with a task in progress is
+        never ready, so there is no need to sleep before the first check
+        for the task to start.
+
+        Sets ready_at to the estimated time the last resource got ready and
+        detected_at to the time the waiting ended.
+
+        :param resources: Resources of the manager to wait for
+        :param is_ready: A predicate that takes an updated resource (or
+                         None) and returns True iff it is ready
+        :param timeout: Timeout in seconds after which a TimeoutException
+                        will be raised
+        :raises: :class:`rally.exceptions.GetResourceFailure` if a resource
+                 gets into one of the error statuses
+        :returns: List of the updated resources, in the order given
+        """
+        states = dict((resource.id, self._state(resource))
+                      for resource in resources)
+        self._register(states)
+        try:
+            return self._wait(resources, states, is_ready, timeout)
+        finally:
+            self._register(states, count=-1)
+
+    def _wait(self, resources, states, is_ready, timeout):
+        start = time.time()
+        self._local.ready_at = self._local.detected_at = start
+        pending = set(states)
+        listing = None
+        updated = {}
+        checked_at = start
+        interval = self.min_interval
+        while pending:
+            listing, listed = self._list(start, listing)
+            now = time.time()
+            changed = False
+            for resource_id in list(pending):
+                resource = listed.get(resource_id)
+                state = self._state(resource)
+                if state != states[resource_id]:
+                    changed = True
+                    states[resource_id] = state
+                if state is not None and state[0] in self.error_statuses:
+                    raise exceptions.GetResourceFailure(status=state[0])
+                if (state is None or state[1] is None) and is_ready(resource):
+                    pending.remove(resource_id)
+                    updated[resource_id] = resource
+                    self._local.ready_at = max(self.ready_at,
+                                               self._changed_at(resource,
+                                                                checked_at,
+                                                                now))
+            self._local.detected_at = now
+            if not pending:
+                break
+            if now - start > timeout:
+                raise exceptions.TimeoutException()
+            if changed:
+                interval = self.min_interval
+            else:
+                interval = min(interval * self.backoff, self.max_interval)
+            LOG.debug("Waiting for %(pending)d of %(registered)d resources, "
+                      "next check in %(interval).1f s"
+                      % {"pending": len(pending),
+                         "registered": self.registered,
+                         "interval": interval})
+            checked_at = now
+            time.sleep(interval)
+        return [updated[resource.id] for resource in resources]
+
+
+def get_poller(manager):
+    """Returns the status poller shared by the waits for the manager.
+
+    There is one poller per manager in a process, so the waits of all the
+    iterations that run in it (e.g. green threads) are batched together.
+    """
+    with _pollers_lock:
+        status_poller = _pollers.get(manager)
+        if status_poller is None:
+            status_poller = _pollers[manager] = StatusPoller(manager)
+        return status_poller
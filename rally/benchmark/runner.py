@@ -13,16 +13,29 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-import collections
+import contextlib
+import functools
 import multiprocessing
-from multiprocessing import pool as multiprocessing_pool
+import Queue
 import random
+import signal
 import sys
+import threading
 import time
 import uuid
 
+import eventlet
+import eventlet.queue
+from oslo.config import cfg
+
 from rally.benchmark import base
+from rally.benchmark import cleanup
+from rally.benchmark import distributed
+from rally.benchmark import sinks
 from rally.benchmark import utils
+from rally.benchmark import workers
+from rally import consts
+from rally import exceptions
 from rally.openstack.common.gettextutils import _
 from rally.openstack.common import log as logging
 from rally import utils as rutils
@@ -31,213 +44,869 @@ from rally import utils as rutils
 LOG = logging.getLogger(__name__)
 
 
+runner_opts = [
+    cfg.IntOpt('provisioning_concurrency',
+               default=10,
+               help='Number of temporary tenants and users that are created '
+                    'or deleted at the same time'),
+    cfg.IntOpt('green_processes',
+               default=None,
+               help='Maximum number of worker processes that run the '
+                    'green threads of a benchmark with the "green" '
+                    'backend, the number of CPUs if not set'),
+    cfg.IntOpt('abort_poll_interval',
+               default=2,
+               help='Number of seconds between two checks of whether the '
+                    'task of a running benchmark is being aborted'),
+    cfg.IntOpt('abort_timeout',
+               default=30,
+               help='Number of seconds the running iterations of an aborted '
+                    'benchmark are given to finish before their workers '
+                    'are killed'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(runner_opts, group='benchmark')
+
+
+ADMIN_KEYS = ["admin_username", "admin_password", "admin_tenant_name", "uri"]
+USER_KEYS = ["username", "password", "tenant_name", "uri"]
+
+
 # NOTE(msdubov): These objects are shared between multiple scenario processes.
 __openstack_clients__ = []
 __admin_clients__ = {}
 __scenario_context__ = {}
 
+# NOTE(hughsaunders): The worker processes outlive the benchmark runs, so
+#                     every run sends them its environment. The clients of
+#                     the temporary users are created in the workers, only
+#                     for the users they act as and only when they need them.
+__run_id__ = None
+__admin_endpoint__ = None
+__users_endpoints__ = []
+__assigned_users__ = []
+__ssh_key_pair__ = None
+# NOTE(hughsaunders): Maps the users of the user pools that the process has
+#                     given ssh access to their instances to the public key
+#                     it imported; the cleanup leaves those resources to the
+#                     pool users, so they are not provisioned for every run.
+__ssh_ready_users__ = {}
+__iteration_timeout__ = None
+# NOTE(hughsaunders): Set in the dedicated workers of the green runs only.
+__green_results__ = None
 
-def _run_scenario_loop(args):
-    i, cls, method_name, kwargs = args
+# NOTE(hughsaunders): Clients get recreated when their token expires in
+#                     less than that many seconds.
+TOKEN_STALE_DURATION = 300
 
-    LOG.info("ITER: %s" % i)
+# NOTE(hughsaunders): The workers stop the iterations that exceed their
+#                     timeout themselves; the runner only gives up on an
+#                     iteration once it is that much later (at most the
+#                     timeout itself) and records a TimeoutError instead.
+TIMEOUT_GRACE = 5
 
-    # NOTE(msdubov): Each scenario run uses a random openstack client
-    #                from a predefined set to act from different users.
-    cls._clients = random.choice(__openstack_clients__)
-    cls._admin_clients = __admin_clients__
-    cls._context = __scenario_context__
+# NOTE(hughsaunders): Shortest wait of an rps run for its next result while
+#                     none of its iterations is running, so that it does
+#                     not spin until the scheduler records the dispatch.
+DISPATCH_POLL_INTERVAL = 0.01
+
+
+def _token_expires_soon(clients):
+    auth_ref = clients["keystone"].auth_ref
+    return (auth_ref is not None and
+            auth_ref.will_expire_soon(TOKEN_STALE_DURATION))
+
+
+def _get_admin_clients():
+    """Returns the admin clients, authenticating again if needed."""
+    global __admin_clients__
+    if __admin_endpoint__ is not None and (
+            not __admin_clients__ or _token_expires_soon(__admin_clients__)):
+        __admin_clients__ = utils.create_openstack_client(__admin_endpoint__,
+                                                          ADMIN_KEYS)
+    return __admin_clients__
+
+
+def _prepare_user_for_ssh(endpoint, clients):
+    """Gives the user ssh access to its instances.
+
+    The users of a user pool have a key pair of their own, the other users
+    get the one of the run. The resources of the former are only
+    provisioned once per process.
+    """
+    key_pair = endpoint.get("ssh_key_pair")
+    if key_pair is None:
+        utils._prepare_for_instance_ssh([clients], __ssh_key_pair__)
+        return
+    user = (endpoint["uri"], endpoint["tenant_name"], endpoint["username"])
+    if __ssh_ready_users__.get(user) == key_pair["public"]:
+        clients["ssh_key_pair"] = key_pair
+        return
+    utils._prepare_for_instance_ssh([clients], key_pair)
+    __ssh_ready_users__[user] = key_pair["public"]
+
+
+def _get_user_clients(index, prepare_ssh=True):
+    """Returns the clients of the index-th temporary user of the run.
+
+    The user gets authenticated the first time the process acts as it and
+    once again every time its token is about to expire.
+    """
+    clients = __openstack_clients__[index]
+    if __users_endpoints__ and (clients is None or
+                                _token_expires_soon(clients)):
+        endpoint = __users_endpoints__[index]
+        clients = utils.create_openstack_client(endpoint, USER_KEYS)
+        if prepare_ssh:
+            _prepare_user_for_ssh(endpoint, clients)
+        __openstack_clients__[index] = clients
+    return clients
+
+
+def _load_run_environment(env):
+    """Makes the process ready to run iterations of the given run.
+
+    Nothing is done if the process has already loaded this run or if there
+    is no run environment at all. No user is authenticated here; a worker
+    only acts as env["users_per_worker"] random users if it is set, and as
+    any of them otherwise. The admin clients are kept between the runs.
+    """
+    global __run_id__, __openstack_clients__, __admin_clients__
+    global __scenario_context__, __admin_endpoint__, __users_endpoints__
+    global __assigned_users__, __ssh_key_pair__, __iteration_timeout__
+
+    if env is None or env["run_id"] == __run_id__:
+        return
+
+    if env["admin"] != __admin_endpoint__:
+        __admin_clients__ = {}
+        __admin_endpoint__ = env["admin"]
+
+    __users_endpoints__ = env["users"]
+    __openstack_clients__ = [None] * len(__users_endpoints__)
+    users_per_worker = env.get("users_per_worker")
+    if users_per_worker and users_per_worker < len(__users_endpoints__):
+        __assigned_users__ = random.sample(range(len(__users_endpoints__)),
+                                           users_per_worker)
+    else:
+        __assigned_users__ = []
+    __ssh_key_pair__ = env["ssh_key_pair"]
+    __iteration_timeout__ = env.get("timeout")
+    __scenario_context__ = env["context"]
+    __run_id__ = env["run_id"]
+    base.Scenario.reset_lookup_cache()
+
+
+def _wait_timeout(timeout):
+    """Returns how long the runner waits for an iteration."""
+    return timeout + min(timeout, TIMEOUT_GRACE)
+
+
+@contextlib.contextmanager
+def _iteration_timeout(timeout):
+    """Raises IterationTimeout in the block once it has run for timeout
+    seconds, interrupting a blocking call if needed.
+
+    It uses SIGALRM, so it does nothing out of the main thread of the
+    process or if timeout is not set.
+    """
+    def _alarm(signum, frame):
+        raise exceptions.IterationTimeout(timeout=timeout)
+
+    installed = False
+    if timeout:
+        try:
+            previous = signal.signal(signal.SIGALRM, _alarm)
+            installed = True
+        except ValueError:
+            pass
+    if not installed:
+        yield
+        return
+
+    signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous or signal.SIG_DFL)
+
+
+def _run_scenario_loop(args, enforce_timeout=True):
+    """Runs one iteration of a scenario in a worker.
+
+    :param enforce_timeout: If True, the iteration is stopped once it has
+                            run for the timeout of the run
+    """
+    i, cls, method_name, kwargs, env = args
+
+    _load_run_environment(env)
+
+    LOG.info("ITER: %s" % i)
 
     cls.idle_time = 0
+    cls._atomic_actions = []
+
+    # NOTE(hughsaunders): The users get authenticated here, so a failure to
+    #                     do so is the error of the iteration; it must not
+    #                     escape the worker, or its result would be lost.
+    try:
+        # NOTE(msdubov): Each scenario run uses a random openstack client
+        #                from a predefined set to act from different users.
+        index = random.choice(__assigned_users__ or
+                              xrange(len(__openstack_clients__)))
+        cls._clients = _get_user_clients(index)
+        cls._admin_clients = _get_admin_clients()
+    except Exception as e:
+        return {"time": 0, "idle_time": 0, "error": utils.format_exc(e),
+                "scenario_output": None, "atomic_actions": [],
+                "timestamp": time.time()}
+    cls._context = __scenario_context__
 
     try:
         scenario_output = None
         with rutils.Timer() as timer:
-            scenario_output = getattr(cls, method_name)(**kwargs)
+            with _iteration_timeout(enforce_timeout and
+                                    __iteration_timeout__):
+                scenario_output = getattr(cls, method_name)(**kwargs)
         error = None
     except Exception as e:
         error = utils.format_exc(e)
     finally:
         return {"time": timer.duration() - cls.idle_time,
                 "idle_time": cls.idle_time, "error": error,
-                "scenario_output": scenario_output}
+                "scenario_output": scenario_output,
+                "atomic_actions": cls.atomic_actions(),
+                "timestamp": timer.start}
+
+
+def _init_green_worker(results, lock):
+    """Makes a dedicated worker ready to run green threads.
+
+    Only the workers of the green runs get patched by eventlet: they are
+    not shared with the other runs, so those keep unpatched processes.
+
+    :param results: Sending end of the pipe the iteration results are sent
+                    back through as they are produced
+    :param lock: multiprocessing.Lock that keeps the workers from sending
+                 through the pipe at the same time
+    """
+    global __green_results__
+    __green_results__ = (results, lock)
+    eventlet.monkey_patch()
+
+
+def _send_green_result(result):
+    # NOTE(hughsaunders): Sent right away rather than by the feeder thread
+    #                     of a multiprocessing.Queue, which is a green
+    #                     thread in a patched worker and would not run once
+    #                     the worker waits for its next task.
+    results, lock = __green_results__
+    with lock:
+        results.send(result)
+
+
+def _green_scenario_classes(cls, concurrent):
+    # NOTE(hughsaunders): The scenario keeps the clients and the idle time
+    #                     of the iteration in class attributes, so every
+    #                     green thread needs a class of its own. They are
+    #                     built once per run and reused by the iterations.
+    return [type(cls.__name__, (cls,), {"_register": False})
+            for i in xrange(concurrent)]
+
+
+def _run_green_iteration(free_classes, i, method_name, kwargs, env,
+                         timeout):
+    scenario_cls = free_classes.get()
+    # NOTE(hughsaunders): Whatever happens, a result is sent: the runner
+    #                     counts them to know when the run is over.
+    try:
+        with eventlet.Timeout(timeout,
+                              exceptions.IterationTimeout(timeout=timeout)):
+            result = _run_scenario_loop((i, scenario_cls, method_name,
+                                         kwargs, env),
+                                        enforce_timeout=False)
+    except Exception as e:
+        result = {"time": 0, "idle_time": 0, "error": utils.format_exc(e)}
+    finally:
+        free_classes.put(scenario_cls)
+    _send_green_result(result)
+
+
+def _run_scenario_green(args):
+    """Runs a share of the iterations of a run as green threads.
+
+    Runs in a worker set up by _init_green_worker: concurrent green threads
+    run the scenario continuously, times iterations in total or for
+    duration minutes. Every result is sent back as soon as its iteration
+    is over.
+
+    :returns: Number of the iterations run
+    """
+    cls, method_name, kwargs, env, times, duration, concurrent, timeout = args
+
+    free_classes = eventlet.queue.LightQueue()
+    for scenario_cls in _green_scenario_classes(cls, concurrent):
+        free_classes.put(scenario_cls)
+    green_pool = eventlet.GreenPool(concurrent)
+    if duration is not None:
+        deadline = time.time() + duration * 60
+    i = 0
+    while ((times is None or i < times) and
+           (duration is None or time.time() < deadline)):
+        # NOTE(hughsaunders): Waits for a free green thread.
+        green_pool.spawn_n(_run_green_iteration, free_classes, i,
+                           method_name, kwargs, env, timeout)
+        i += 1
+    green_pool.waitall()
+    return i
+
+
+def _cleanup_users_resources(endpoints, keep_ssh_access=False):
+    clients, errors = utils.run_concurrently(
+                functools.partial(utils.create_openstack_client,
+                                  keys=USER_KEYS),
+                endpoints, _("Authenticating users"),
+                CONF.benchmark.provisioning_concurrency)
+    return cleanup.CleanupEngine(clients,
+                                 keep_ssh_access=keep_ssh_access).run()
+
+
+def cleanup_keystone_resources():
+    """Deletes the keystone resources created by the benchmarks."""
+    try:
+        kclient = _get_admin_clients()["keystone"]
+        for resource in ["users", "tenants", "services", "roles"]:
+            utils.delete_keystone_resources(kclient, resource)
+    except Exception as e:
+        LOG.debug(_("Not all resources were cleaned."),
+                  exc_info=sys.exc_info())
+        LOG.warning(_('Unable to fully cleanup keystone service: %s') %
+                    (e.message))
+
+
+def cleanup_leftovers(admin_endpoint, leftovers):
+    """Deletes what a benchmark run has left in the cloud.
+
+    :param admin_endpoint: Admin endpoint of the cloud
+    :param leftovers: Dict with the "endpoints" of the users the benchmark
+                      was run as, the IDs of its temporary "tenants" and
+                      "users" and whether to "keep_ssh_access" of the users,
+                      as recorded by ScenarioRunner.run()
+
+    :returns: Drain durations of the resource types, see CleanupEngine.run()
+    """
+    durations = _cleanup_users_resources(
+                            leftovers["endpoints"],
+                            leftovers.get("keep_ssh_access", False))
+    if leftovers["tenants"] or leftovers["users"]:
+        admin_clients = utils.create_openstack_client(admin_endpoint,
+                                                      ADMIN_KEYS)
+        utils.delete_tenants_and_users(admin_clients["keystone"],
+                                       leftovers["tenants"],
+                                       leftovers["users"],
+                                       CONF.benchmark.provisioning_concurrency)
+    return durations
 
 
 class ScenarioRunner(object):
     """Tool that gets and runs one Scenario."""
-    def __init__(self, task, cloud_config):
+    def __init__(self, task, cloud_config, pool=None, users=None,
+                 keystone_cleanup=True):
+        """ScenarioRunner constructor.
+
+        :param task: The current task which is being performed
+        :param cloud_config: Admin endpoint of the cloud
+        :param pool: WorkerPool to run the iterations in; it is shared by
+                     all the runs of the task, so its owner is responsible
+                     for closing it. If None, the runner creates its own.
+        :param users: Endpoints of pre-provisioned users grouped by tenant;
+                      if None, temporary tenants and users are created for
+                      every run
+        :param keystone_cleanup: If False, the keystone resources created by
+                                 the benchmarks are not deleted after every
+                                 run; cleanup_keystone_resources() is left
+                                 to the caller, e.g. because other runs that
+                                 create them are still going on
+        """
         self.task = task
         self.endpoints = cloud_config
+        self.pool_users = users
+        self.keystone_cleanup = keystone_cleanup
+        self.tenants = []
+        self.users = []
+        self.pool = pool if pool is not None else workers.WorkerPool()
+        self.run_env = None
+        self.aborted = threading.Event()
+        self._abort_lock = threading.Lock()
+        self._abort_hooks = []
 
-        global __admin_clients__
-        keys = ["admin_username", "admin_password", "admin_tenant_name", "uri"]
+        global __admin_clients__, __admin_endpoint__
         __admin_clients__ = utils.create_openstack_clients([self.endpoints],
-                                                           keys)[0]
-        base.Scenario.register()
+                                                           ADMIN_KEYS)[0]
+        __admin_endpoint__ = self.endpoints
 
     def _create_temp_tenants_and_users(self, tenants, users_per_tenant):
-        run_id = str(uuid.uuid4())
-        self.tenants = [__admin_clients__["keystone"].tenants.create(
-                            "temp_%(rid)s_tenant_%(iter)i" % {"rid": run_id,
-                                                              "iter": i})
-                        for i in range(tenants)]
-        self.users = []
-        temporary_endpoints = []
-        for tenant in self.tenants:
-            for uid in range(users_per_tenant):
-                username = "%(tname)s_user_%(uid)d" % {"tname": tenant.name,
-                                                       "uid": uid}
-                password = "password"
-                user = __admin_clients__["keystone"].users.create(username,
-                                                                  password,
-                                                                  "%s@test.com"
-                                                                  % username,
-                                                                  tenant.id)
-                self.users.append(user)
-                user_credentials = {"username": username, "password": password,
-                                    "tenant_name": tenant.name,
-                                    "uri": self.endpoints["uri"]}
-                temporary_endpoints.append(user_credentials)
-        return temporary_endpoints
-
-    @classmethod
-    def _delete_nova_resources(cls, nova):
-        utils.delete_servers(nova)
-        utils.delete_keypairs(nova)
-        utils.delete_security_groups(nova)
-        utils.delete_networks(nova)
-
-    @classmethod
-    def _delete_cinder_resources(cls, cinder):
-        utils.delete_volume_transfers(cinder)
-        utils.delete_volumes(cinder)
-        utils.delete_volume_types(cinder)
-        utils.delete_volume_snapshots(cinder)
-        utils.delete_volume_backups(cinder)
-
-    @classmethod
-    def _delete_glance_resources(cls, glance, project_uuid):
-        utils.delete_images(glance, project_uuid)
-
-    def _delete_keystone_resources(self):
-        kclient = __admin_clients__["keystone"]
-        for resource in ["users", "tenants", "services", "roles"]:
-            utils.delete_keystone_resources(kclient, resource)
+        self.tenants, self.users, endpoints = utils.create_tenants_and_users(
+                        _get_admin_clients()["keystone"],
+                        "temp_%s" % uuid.uuid4(), tenants, users_per_tenant,
+                        self.endpoints["uri"],
+                        CONF.benchmark.provisioning_concurrency)
+        return endpoints
 
-    @classmethod
-    def _cleanup_with_clients(cls, indexes):
-        for index in indexes:
-            clients = __openstack_clients__[index]
-            try:
-                cls._delete_nova_resources(clients["nova"])
-                cls._delete_glance_resources(clients["glance"],
-                                             clients["keystone"].project_id)
-                cls._delete_cinder_resources(clients["cinder"])
-            except Exception as e:
-                LOG.info(_('Unable to fully cleanup the cloud: %s') %
-                        (e.message))
-
-    def _cleanup_scenario(self, concurrent):
-        indexes = range(0, len(__openstack_clients__))
-        chunked_indexes = [indexes[i:i + concurrent]
-                           for i in range(0, len(indexes), concurrent)]
-        pool = multiprocessing.Pool(concurrent)
-        for client_indicies in chunked_indexes:
-            pool.apply_async(utils.async_cleanup, args=(ScenarioRunner,
-                                                        client_indicies,))
-        try:
-            self._delete_keystone_resources()
-        except Exception as e:
-            LOG.debug(_("Not all resources were cleaned."),
-                      exc_info=sys.exc_info())
-            LOG.warning(_('Unable to fully cleanup keystone service: %s') %
-                        (e.message))
+    def _cleanup_scenario(self):
+        durations = _cleanup_users_resources(
+                            self.run_env["users"],
+                            keep_ssh_access=self._keep_ssh_access())
+        if self.keystone_cleanup:
+            cleanup_keystone_resources()
+        return durations
+
+    def _keep_ssh_access(self):
+        # NOTE(hughsaunders): The users of a user pool keep their key pair
+        #                     and security group for the next benchmarks,
+        #                     unless the pool has no key pair of its own.
+        return (self.pool_users is not None and
+                all("ssh_key_pair" in endpoint
+                    for endpoint in self.pool_users))
 
-        pool.close()
-        pool.join()
+    def _select_users(self, tenants, users_per_tenant):
+        """Picks the users of a run among the pre-provisioned ones."""
+        tenant_names = []
+        for endpoint in self.pool_users:
+            if endpoint["tenant_name"] not in tenant_names:
+                tenant_names.append(endpoint["tenant_name"])
+
+        selected = []
+        for tenant_name in tenant_names[:tenants]:
+            selected.extend([endpoint for endpoint in self.pool_users
+                             if endpoint["tenant_name"] == tenant_name]
+                            [:users_per_tenant])
+        if len(selected) < tenants * users_per_tenant:
+            raise exceptions.BenchmarkSetupFailure(
+                    message=_("%(tenants)d tenants with %(users)d users each "
+                              "are required, but the user pool is smaller") %
+                    {"tenants": tenants, "users": users_per_tenant})
+        return selected
 
     def _delete_temp_tenants_and_users(self):
-        for user in self.users:
-            user.delete()
-        for tenant in self.tenants:
-            tenant.delete()
+        utils.delete_tenants_and_users(_get_admin_clients()["keystone"],
+                                       self.tenants, self.users,
+                                       CONF.benchmark.provisioning_concurrency)
 
-    def _run_scenario_continuously_for_times(self, cls, method, args,
-                                             times, concurrent, timeout):
-        test_args = [(i, cls, method, args) for i in xrange(times)]
+    def _stop_iterations(self, iter_result, timeout, sink):
+        if self.aborted.is_set():
+            # NOTE(hughsaunders): The results of the iterations that finish
+            #                     in time are kept.
+            timeout = CONF.benchmark.abort_timeout
+            results, finished = iter_result.drain(timeout)
+            for result in results:
+                sink.append(result)
+        else:
+            finished = iter_result.stop(timeout)
+        if not finished:
+            LOG.warning(_("Some of the scenario iterations are still running "
+                          "after %s seconds, restarting the workers.") %
+                        timeout)
+            self.pool.restart()
 
-        pool = multiprocessing.Pool(concurrent)
-        iter_result = pool.imap(_run_scenario_loop, test_args)
+    def _on_abort(self, hook):
+        """Calls hook (from another thread) when the run gets aborted."""
+        with self._abort_lock:
+            self._abort_hooks.append(hook)
+            if not self.aborted.is_set():
+                return
+        hook()
 
-        results = []
+    def abort(self):
+        """Aborts the run, as if its task was being aborted.
+
+        May be called from another thread, e.g. by the agents of a
+        distributed run, whose runners have no task to watch.
+        """
+        if self.task is not None:
+            LOG.warning(_("Task %s is being aborted, no more iterations are "
+                          "started.") % self.task['uuid'])
+        with self._abort_lock:
+            self.aborted.set()
+            hooks = list(self._abort_hooks)
+        for hook in hooks:
+            hook()
+
+    def _watch_abort(self, done):
+        """Aborts the run once the status of the task is ABORTING.
+
+        :param done: Event that is set when the run is over
+        """
+        while True:
+            try:
+                if self.task.get_status() == consts.TaskStatus.ABORTING:
+                    self.abort()
+                    return
+            except Exception:
+                LOG.exception(_("Failed to check the status of the task."))
+            if done.wait(CONF.benchmark.abort_poll_interval):
+                return
+
+    def _run_scenario_continuously_for_times(self, cls, method, args,
+                                             times, concurrent, timeout,
+                                             sink):
+        test_args = [(i, cls, method, args, self.run_env)
+                     for i in xrange(times)]
+
+        iter_result = self.pool.imap(_run_scenario_loop, test_args,
+                                     concurrent)
+        self._on_abort(iter_result.cancel)
 
         for i in range(len(test_args)):
             try:
-                result = iter_result.next(timeout)
+                result = iter_result.next(_wait_timeout(timeout))
             except multiprocessing.TimeoutError as e:
                 result = {"time": timeout, "idle_time": cls.idle_time,
                           "error": utils.format_exc(e)}
-            results.append(result)
+            except exceptions.WorkerFailure as e:
+                result = {"time": 0, "idle_time": 0,
+                          "error": e.kwargs["error"]}
+            except exceptions.RunAborted:
+                break
+            sink.append(result)
 
-        pool.close()
-        pool.join()
+        self._stop_iterations(iter_result, timeout, sink)
 
-        return results
+        return sink
 
     def _run_scenario_continuously_for_duration(self, cls, method, args,
-                                                duration, concurrent, timeout):
-        pool = multiprocessing.Pool(concurrent)
-        run_args = utils.infinite_run_args((cls, method, args))
-        iter_result = pool.imap(_run_scenario_loop, run_args)
+                                                duration, concurrent, timeout,
+                                                sink):
+        run_args = utils.infinite_run_args((cls, method, args, self.run_env))
+        iter_result = self.pool.imap(_run_scenario_loop, run_args,
+                                     concurrent)
+        self._on_abort(iter_result.cancel)
 
         start = time.time()
-
-        results_queue = collections.deque([], maxlen=concurrent)
+        count = 0
 
         while True:
 
-            if time.time() - start > duration * 60:
+            elapsed = time.time() - start
+            if elapsed >= duration * 60:
                 break
 
             try:
-                result = iter_result.next(timeout)
+                result = iter_result.next(_wait_timeout(timeout))
             except multiprocessing.TimeoutError as e:
                 result = {"time": timeout, "idle_time": cls.idle_time,
                           "error": utils.format_exc(e)}
-            results_queue.append(result)
+            except exceptions.WorkerFailure as e:
+                result = {"time": 0, "idle_time": 0,
+                          "error": e.kwargs["error"]}
+            except exceptions.RunAborted:
+                break
+            sink.append(result)
+            count += 1
+
+        self._stop_iterations(iter_result, timeout, sink)
+
+        # NOTE(hughsaunders): The iterations still running when the time is
+        #                     up are not counted, nor is the time spent
+        #                     waiting for them.
+        if elapsed > 0:
+            sink.set_info(iterations_per_second=count / elapsed)
+
+        return sink
+
+    def _run_scenario_in_green_threads(self, cls, method, args, times,
+                                       duration, concurrent, timeout, sink):
+        """Runs a scenario continuously as green threads of a few workers.
+
+        The active users are spread over at most green_processes workers,
+        every one of which runs its share of them as green threads, so that
+        thousands of users do not need thousands of processes. The workers
+        are dedicated to the run, since eventlet patches them, and send the
+        results back as the iterations finish.
+
+        The workers cannot be told to stop: if the run gets aborted, those
+        that are not done after abort_timeout seconds are killed and the
+        results of their running iterations are lost. They are killed as
+        well if no iteration has finished for longer than an iteration may
+        take; the iterations left of times are then recorded as timed out.
+        """
+        processes = min(CONF.benchmark.green_processes or
+                        multiprocessing.cpu_count(), concurrent)
+        if times is not None:
+            processes = min(processes, times)
+        results, sender = multiprocessing.Pipe(duplex=False)
+        green_pool = workers.WorkerPool(processes, _init_green_worker,
+                                        (sender, multiprocessing.Lock()))
+
+        def _share(total, i):
+            return total // processes + (1 if i < total % processes else 0)
 
-        results = list(results_queue)
+        async_results = [
+            green_pool.apply_async(
+                        _run_scenario_green,
+                        ((cls, method, args, self.run_env,
+                          _share(times, i) if times is not None else None,
+                          duration, _share(concurrent, i), timeout),))
+            for i in xrange(processes)]
 
-        pool.terminate()
-        pool.join()
+        count = 0
+        expected = None
+        deadline = None
+        stalled = False
+        last_result = time.time()
+        try:
+            while expected is None or count < expected:
+                if expected is None and all(async_result.ready() for
+                                            async_result in async_results):
+                    expected = sum(async_result.get()
+                                   for async_result in async_results)
+                    continue
+                wait = CONF.benchmark.abort_poll_interval
+                # NOTE(hughsaunders): The workers stop every iteration
+                #                     after timeout seconds, so nothing
+                #                     coming for longer means they hang.
+                stalled_at = last_result + _wait_timeout(timeout)
+                if time.time() >= stalled_at:
+                    LOG.warning(_("No green iteration has finished for %s "
+                                  "seconds, killing the workers.") %
+                                _wait_timeout(timeout))
+                    stalled = True
+                    break
+                wait = min(wait, stalled_at - time.time())
+                if self.aborted.is_set():
+                    if deadline is None:
+                        deadline = (time.time() +
+                                    CONF.benchmark.abort_timeout)
+                    wait = min(wait, deadline - time.time())
+                    if wait <= 0:
+                        LOG.warning(_("Some of the green workers are still "
+                                      "running after %s seconds, killing "
+                                      "them.") %
+                                    CONF.benchmark.abort_timeout)
+                        break
+                if not results.poll(max(0, wait)):
+                    continue
+                sink.append(results.recv())
+                count += 1
+                last_result = time.time()
+        finally:
+            if expected is None or count < expected:
+                green_pool.terminate()
+            else:
+                green_pool.close()
+            results.close()
+            sender.close()
+
+        if stalled and times is not None:
+            error = utils.format_exc(multiprocessing.TimeoutError())
+            for i in xrange(times - count):
+                sink.append({"time": timeout, "idle_time": 0,
+                             "error": error})
+
+        if duration:
+            sink.set_info(iterations_per_second=count / (duration * 60.0))
 
-        return results
+        return sink
 
     def _run_scenario_periodically(self, cls, method, args,
-                                   times, period, timeout):
+                                   times, period, timeout, sink):
         async_results = []
 
         for i in xrange(times):
-            thread = multiprocessing_pool.ThreadPool(processes=1)
-            async_result = thread.apply_async(_run_scenario_loop,
-                                              ((i, cls, method, args),))
+            # NOTE(hughsaunders): Launches must not wait for each other, so
+            #                     make sure there is an idle worker.
+            running = len([r for r in async_results if not r.ready()])
+            self.pool.resize(running + 1)
+            async_result = self.pool.apply_async(
+                                _run_scenario_loop,
+                                ((i, cls, method, args, self.run_env),))
             async_results.append(async_result)
 
-            if i != times - 1:
-                time.sleep(period * 60)
+            if i != times - 1 and self.aborted.wait(period * 60):
+                break
 
-        results = []
+        deadline = None
         for async_result in async_results:
+            wait = _wait_timeout(timeout)
+            # NOTE(hughsaunders): The launches of an aborted run are given
+            #                     abort_timeout seconds all together.
+            if self.aborted.is_set():
+                if deadline is None:
+                    deadline = time.time() + CONF.benchmark.abort_timeout
+                wait = max(0, min(timeout, deadline - time.time()))
             try:
-                result = async_result.get()
+                result = async_result.get(wait)
             except multiprocessing.TimeoutError as e:
                 result = {"time": timeout, "idle_time": cls.idle_time,
                           "error": utils.format_exc(e)}
-            results.append(result)
+            sink.append(result)
+
+        if deadline is not None and not all(async_result.ready()
+                                            for async_result in async_results):
+            self.pool.restart()
+
+        return sink
+
+    def _run_scenario_at_rate(self, cls, method, args, rps, times,
+                              concurrent, max_in_flight, timeout, sink):
+        """Starts iterations at a fixed arrival rate (open-loop).
+
+        A scheduler thread dispatches the i-th iteration at start + i / rps
+        regardless of how long the previous iterations take; only the
+        max_in_flight cap on unfinished iterations can hold it back. Every
+        result gets a "start_lag" key: the delay between the moment the
+        iteration was scheduled for and the moment it actually started.
+        """
+        self.pool.resize(concurrent)
+        in_flight = threading.BoundedSemaphore(max_in_flight)
+        finished = Queue.Queue()
+        stopped = threading.Event()
+        dispatched = []
+        # NOTE(hughsaunders): Maps the iterations that hold a slot to the
+        #                     moments they were scheduled for and actually
+        #                     dispatched at. The slot of an iteration whose
+        #                     worker died is released when the runner gives
+        #                     up waiting for it.
+        running = {}
+        running_lock = threading.Lock()
+        start = time.time()
 
-        return results
+        def _release(i):
+            with running_lock:
+                if i not in running:
+                    return None
+                scheduled, dispatched_at = running.pop(i)
+            in_flight.release()
+            return scheduled
 
-    def _run_scenario(self, cls, method, args, execution_type, config):
+        def _expires_at():
+            """Returns when the oldest running iteration times out."""
+            with running_lock:
+                if not running:
+                    return None
+                return (min(dispatched_at for scheduled, dispatched_at
+                            in running.values()) + _wait_timeout(timeout))
+
+        def _release_expired():
+            """Releases the slot of the oldest running iteration if it has
+            timed out, returns False if none has.
+            """
+            now = time.time()
+            with running_lock:
+                expired = [(dispatched_at, i) for i, (scheduled, dispatched_at)
+                           in running.items()
+                           if dispatched_at + _wait_timeout(timeout) <= now]
+            if not expired:
+                return False
+            _release(min(expired)[1])
+            return True
+
+        def _on_finish(i, result):
+            scheduled = _release(i)
+            if scheduled is not None:
+                finished.put((scheduled, result))
+
+        def _dispatch():
+            for i in xrange(times):
+                scheduled = start + float(i) / rps
+                delay = scheduled - time.time()
+                if delay > 0:
+                    self.aborted.wait(delay)
+                in_flight.acquire()
+                if stopped.is_set() or self.aborted.is_set():
+                    break
+                dispatched.append(i)
+                with running_lock:
+                    running[i] = (scheduled, time.time())
+                self.pool.apply_async(_run_scenario_loop,
+                                      ((i, cls, method, args, self.run_env),),
+                                      callback=functools.partial(_on_finish,
+                                                                 i))
+
+        scheduler = threading.Thread(target=_dispatch)
+        scheduler.daemon = True
+        scheduler.start()
+        # NOTE(hughsaunders): Wakes up the wait for the next result.
+        self._on_abort(lambda: finished.put(None))
+
+        timed_out = False
+        received = 0
+        deadline = None
+        while received < times:
+            # NOTE(hughsaunders): The timeout only runs from the moment an
+            #                     iteration is dispatched. With nothing
+            #                     running, the wait lasts until the next
+            #                     dispatch at most, so that a slow rate
+            #                     does not time out iterations that have
+            #                     not been started yet.
+            expires_at = _expires_at()
+            if expires_at is None:
+                wait = max(start + float(len(dispatched)) / rps - time.time(),
+                           DISPATCH_POLL_INTERVAL)
+            else:
+                wait = max(0, expires_at - time.time())
+            if self.aborted.is_set():
+                # NOTE(hughsaunders): Only the dispatched iterations are
+                #                     waited for, abort_timeout seconds
+                #                     all together.
+                if deadline is None:
+                    deadline = time.time() + CONF.benchmark.abort_timeout
+                if received >= len(dispatched):
+                    break
+                wait = max(0, min(wait, deadline - time.time()))
+            try:
+                item = finished.get(timeout=wait)
+            except Queue.Empty:
+                if deadline is not None and time.time() >= deadline:
+                    timed_out = True
+                    break
+                if not _release_expired():
+                    continue
+                timed_out = True
+                error = utils.format_exc(multiprocessing.TimeoutError())
+                item = None, {"time": timeout, "idle_time": cls.idle_time,
+                              "error": error}
+            if item is None:
+                continue
+            received += 1
+            scheduled, result = item
+            if scheduled is not None:
+                result["start_lag"] = max(0, result["timestamp"] - scheduled)
+            sink.append(result)
+
+        stopped.set()
+        # NOTE(hughsaunders): Lets the scheduler see that the run is over
+        #                     if it waits for a slot.
+        try:
+            in_flight.release()
+        except ValueError:
+            pass
+        if timed_out:
+            self.pool.restart()
+        else:
+            scheduler.join()
+
+        return sink
+
+    def _run_scenario_stepwise(self, cls, method, args, levels,
+                               step_duration, timeout, sink):
+        """Runs a scenario continuously at growing levels of concurrency.
+
+        Every level is held for step_duration minutes, and every iteration
+        result gets a "concurrency" key with the level it was run at.
+        """
+        for concurrent in levels:
+            LOG.info(_("Running %(cls)s.%(method)s with %(users)d active "
+                       "users") % {"cls": cls.__name__, "method": method,
+                                   "users": concurrent})
+            self._run_scenario_continuously_for_duration(
+                    cls, method, args, step_duration, concurrent, timeout,
+                    sinks.TaggedSink(sink, concurrency=concurrent))
+        return sink
+
+    def _run_scenario(self, cls, method, args, execution_type, config, sink):
 
         timeout = config.get("timeout", 10000)
 
@@ -249,19 +918,28 @@ class ScenarioRunner(object):
             if "duration" not in config and "times" not in config:
                 config["times"] = 1
 
+            # Run the active users as green threads of a few processes.
+            if config.get("backend") == "green":
+                return self._run_scenario_in_green_threads(
+                            cls, method, args, config.get("times"),
+                            config.get("duration"), concurrent, timeout,
+                            sink)
+
             # Continiously run a benchmark scenario the specified
             # amount of times.
             if "times" in config:
                 times = config["times"]
                 return self._run_scenario_continuously_for_times(
-                                cls, method, args, times, concurrent, timeout)
+                                cls, method, args, times, concurrent, timeout,
+                                sink)
 
             # Continiously run a scenario as many times as needed
             # to fill up the given period of time.
             elif "duration" in config:
                 duration = config["duration"]
                 return self._run_scenario_continuously_for_duration(
-                            cls, method, args, duration, concurrent, timeout)
+                            cls, method, args, duration, concurrent, timeout,
+                            sink)
 
         elif execution_type == "periodic":
 
@@ -271,9 +949,71 @@ class ScenarioRunner(object):
             # Run a benchmark scenario the specified amount of times
             # with a specified period between two consecutive launches.
             return self._run_scenario_periodically(cls, method, args,
-                                                   times, period, timeout)
+                                                   times, period, timeout,
+                                                   sink)
+
+        elif execution_type == "steps":
+
+            start = config.get("start_users", 1)
+            stop = config["active_users"]
+            step = config.get("step_users", 1)
+            levels = range(start, stop, step) + [stop]
+
+            # Grow the number of active users stepwise, running the
+            # scenario continuously for step_duration minutes at each level.
+            return self._run_scenario_stepwise(cls, method, args, levels,
+                                               config["step_duration"],
+                                               timeout, sink)
+
+        elif execution_type == "rps":
+
+            rps = config["rps"]
+            concurrent = config.get("active_users", 1)
+            max_in_flight = config.get("max_in_flight", concurrent)
+
+            if "duration" in config:
+                times = int(rps * config["duration"] * 60)
+            else:
+                times = config.get("times", 1)
+
+            # Start a benchmark scenario rps times per second, no matter
+            # how long the previous launches take.
+            return self._run_scenario_at_rate(cls, method, args, rps, times,
+                                              concurrent, max_in_flight,
+                                              timeout, sink)
+
+    def run(self, name, kwargs, sink=None):
+        """Runs one benchmark scenario.
+
+        While the benchmark is running, the status of the task is checked
+        every abort_poll_interval seconds. Once it is ABORTING, no more
+        iterations are started, the running ones are given abort_timeout
+        seconds to finish and the benchmark is cleaned up as usual; the
+        aborted attribute of the runner is then set.
+
+        :param name: Benchmark scenario name in format <Class>.<method>
+        :param kwargs: Benchmark configuration from the task config
+        :param sink: ResultSink that receives the iteration results as they
+                     are produced; if None, the results are kept in memory
+
+        :returns: The sink with the results
+        """
+        if sink is None:
+            sink = sinks.ListSink()
+
+        done = threading.Event()
+        watcher = threading.Thread(target=self._watch_abort, args=(done,))
+        watcher.daemon = True
+        watcher.start()
+        try:
+            return self._run(name, kwargs, sink)
+        finally:
+            done.set()
+            watcher.join()
+            with self._abort_lock:
+                self._abort_hooks = []
 
-    def run(self, name, kwargs):
+    def _run(self, name, kwargs, sink):
         cls_name, method_name = name.split(".")
         cls = base.Scenario.get_by_name(cls_name)
 
@@ -284,24 +1024,86 @@ class ScenarioRunner(object):
         tenants = config.get('tenants', 1)
         users_per_tenant = config.get('users_per_tenant', 1)
 
-        temp_users = self._create_temp_tenants_and_users(tenants,
-                                                         users_per_tenant)
-
-        global __openstack_clients__, __scenario_context__
+        if self.pool_users is None:
+            with rutils.Timer() as timer:
+                temp_users = self._create_temp_tenants_and_users(
+                                                tenants, users_per_tenant)
+            sink.set_info(setup_duration=timer.duration())
+            temp_ids = {"tenants": [tenant.id for tenant in self.tenants],
+                        "users": [user.id for user in self.users]}
+        else:
+            temp_users = self._select_users(tenants, users_per_tenant)
+            temp_ids = {"tenants": [], "users": []}
+        # NOTE(hughsaunders): Kept until the cleanup is over, so that
+        #                     cleanup_leftovers() can finish it if the run
+        #                     is interrupted.
+        sink.set_info(leftovers=dict(
+                            temp_ids, endpoints=temp_users,
+                            keep_ssh_access=self._keep_ssh_access()))
 
         # NOTE(msdubov): Call init() with admin openstack clients
-        cls._clients = __admin_clients__
-        __scenario_context__ = cls.init(init_args)
+        cls._clients = _get_admin_clients()
+        context = cls.init(init_args)
 
         # NOTE(msdubov): Launch scenarios with non-admin openstack clients
-        keys = ["username", "password", "tenant_name", "uri"]
-        __openstack_clients__ = utils.create_openstack_clients(temp_users,
-                                                               keys)
+        # NOTE(hughsaunders): The workers authenticate the users themselves,
+        #                     all of them get the same ssh key pair.
+        self.run_env = {
+            "run_id": str(uuid.uuid4()),
+            "admin": self.endpoints,
+            "users": temp_users,
+            "users_per_worker": config.get("users_per_worker"),
+            "ssh_key_pair": utils.generate_ssh_key_pair(),
+            "timeout": config.get("timeout"),
+            "context": context
+        }
+        _load_run_environment(self.run_env)
+
+        with sink:
+            # NOTE(hughsaunders): The task may have been aborted while the
+            #                     users were being set up.
+            if not self.aborted.is_set():
+                if "agents" in config:
+                    distributed.run(self.endpoints, name, kwargs,
+                                    self.run_env, sink,
+                                    on_abort=self._on_abort)
+                else:
+                    self._run_scenario(cls, method_name, args,
+                                       execution_type, config, sink)
+            if self.aborted.is_set():
+                sink.set_info(aborted=True)
+
+        with rutils.Timer() as timer:
+            cleanup_durations = self._cleanup_scenario()
+            if self.pool_users is None:
+                self._delete_temp_tenants_and_users()
+        sink.set_info(teardown_duration=timer.duration(),
+                      cleanup_durations=cleanup_durations, leftovers=None)
+
+        return sink
 
-        results = self._run_scenario(cls, method_name, args,
-                                     execution_type, config)
+    def run_iterations(self, name, kwargs, run_env, sink):
+        """Runs the iterations of a benchmark run set up by another runner.
 
-        self._cleanup_scenario(config.get("active_users", 1))
-        self._delete_temp_tenants_and_users()
+        This is how the agents of a distributed run take their share of it:
+        the users, the context and the cleanup belong to the controller's
+        run, which run_env describes.
+
+        :param name: Benchmark scenario name in format <Class>.<method>
+        :param kwargs: Benchmark configuration with the agent's share of
+                       the iterations
+        :param run_env: Run environment of the controller's runner
+        :param sink: ResultSink that receives the iteration results
+
+        :returns: The sink with the results
+        """
+        cls_name, method_name = name.split(".")
+        cls = base.Scenario.get_by_name(cls_name)
+        self.run_env = run_env
+        _load_run_environment(self.run_env)
 
-        return results
+        with sink:
+            self._run_scenario(cls, method_name, kwargs.get('args', {}),
+                               kwargs.get('execution', 'continuous'),
+                               kwargs.get('config', {}), sink)
+        return sink
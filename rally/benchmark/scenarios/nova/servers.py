@@ -157,7 +157,7 @@ class NovaServers(utils.NovaScenario):
         """Test VM boot - assumed clean-up is done elsewhere."""
         server_name = cls._generate_random_name(16)
         if 'nics' not in kwargs:
-            nets = cls.clients("nova").networks.list()
+            nets = cls.cached_list("nova", "networks")
             if nets:
                 random_nic = random.choice(nets)
                 kwargs['nics'] = [{'net-id': random_nic.id}]
@@ -15,9 +15,9 @@
 
 import random
 import string
-import time
 
 from rally.benchmark import base
+from rally.benchmark import poller
 from rally.benchmark import utils as bench_utils
 from rally import utils
 
@@ -25,6 +25,30 @@ from rally import utils
 class NovaScenario(base.Scenario):
 
     @classmethod
+    def _wait_for_servers(cls, servers, is_ready):
+        """Waits for the given servers with the shared status poller.
+
+        The poller is shared by all the waits for the same nova client in
+        the process, so concurrent iterations are refreshed together.
+
+        The time between the moment the last of the servers got ready and
+        the moment it was noticed is not spent by the cloud, so it is
+        counted as idle time of the scenario.
+
+        :param servers: List of server objects
+        :param is_ready: A predicate that takes an updated server (None if
+                         the server is deleted) and returns True iff it is
+                         ready
+
+        :returns: List of the updated server objects
+        """
+        status_poller = poller.get_poller(cls.clients("nova").servers)
+        servers = status_poller.wait(servers, is_ready, timeout=600)
+        cls.idle_time += status_poller.detection_delay
+        return servers
+
+    @classmethod
+    @base.atomic_action_timer('nova.boot_server')
     def _boot_server(cls, server_name, image_id, flavor_id, **kwargs):
         """Boots one server.
 
@@ -47,16 +71,11 @@ class NovaScenario(base.Scenario):
 
         server = cls.clients("nova").servers.create(
             server_name, image_id, flavor_id, **kwargs)
-        # NOTE(msdubov): It is reasonable to wait 5 secs before starting to
-        #                check whether the server is ready => less API calls.
-        time.sleep(5)
-        server = utils.wait_for(server,
-                                is_ready=bench_utils.resource_is("ACTIVE"),
-                                update_resource=bench_utils.get_from_manager(),
-                                timeout=600, check_interval=3)
-        return server
+        return cls._wait_for_servers([server],
+                                     bench_utils.resource_is("ACTIVE"))[0]
 
     @classmethod
+    @base.atomic_action_timer('nova.reboot_server')
     def _reboot_server(cls, server, soft=True):
         """Reboots the given server using hard or soft reboot.
 
@@ -68,12 +87,10 @@ class NovaScenario(base.Scenario):
         soft reboot is done (default).
         """
         server.reboot(reboot_type=("SOFT" if soft else "HARD"))
-        time.sleep(5)
-        utils.wait_for(server, is_ready=bench_utils.resource_is("ACTIVE"),
-                       update_resource=bench_utils.get_from_manager(),
-                       timeout=600, check_interval=3)
+        cls._wait_for_servers([server], bench_utils.resource_is("ACTIVE"))
 
     @classmethod
+    @base.atomic_action_timer('nova.start_server')
     def _start_server(cls, server):
         """Starts the given server.
 
@@ -83,11 +100,10 @@ class NovaScenario(base.Scenario):
         :param server: The server to start and wait to become ACTIVE.
         """
         server.start()
-        utils.wait_for(server, is_ready=bench_utils.resource_is("ACTIVE"),
-                       update_resource=bench_utils.get_from_manager(),
-                       timeout=600, check_interval=2)
+        cls._wait_for_servers([server], bench_utils.resource_is("ACTIVE"))
 
     @classmethod
+    @base.atomic_action_timer('nova.stop_server')
     def _stop_server(cls, server):
         """Stop the given server.
 
@@ -97,11 +113,10 @@ class NovaScenario(base.Scenario):
         :param server: The server to stop.
         """
         server.stop()
-        utils.wait_for(server, is_ready=bench_utils.resource_is("SHUTOFF"),
-                       update_resource=bench_utils.get_from_manager(),
-                       timeout=600, check_interval=2)
+        cls._wait_for_servers([server], bench_utils.resource_is("SHUTOFF"))
 
     @classmethod
+    @base.atomic_action_timer('nova.rescue_server')
     def _rescue_server(cls, server):
         """Rescue the given server.
 
@@ -111,12 +126,10 @@ class NovaScenario(base.Scenario):
         :param server: Server object
         """
         server.rescue()
-        time.sleep(2)
-        utils.wait_for(server, is_ready=bench_utils.resource_is("RESCUE"),
-                       update_resource=bench_utils.get_from_manager(),
-                       timeout=600, check_interval=3)
+        cls._wait_for_servers([server], bench_utils.resource_is("RESCUE"))
 
     @classmethod
+    @base.atomic_action_timer('nova.unrescue_server')
     def _unrescue_server(cls, server):
         """Unrescue the given server.
 
@@ -125,12 +138,10 @@ class NovaScenario(base.Scenario):
         :param server: Server object
         """
         server.unrescue()
-        time.sleep(2)
-        utils.wait_for(server, is_ready=bench_utils.resource_is("ACTIVE"),
-                       update_resource=bench_utils.get_from_manager(),
-                       timeout=600, check_interval=3)
+        cls._wait_for_servers([server], bench_utils.resource_is("ACTIVE"))
 
     @classmethod
+    @base.atomic_action_timer('nova.suspend_server')
     def _suspend_server(cls, server):
         """Suspends the given server.
 
@@ -140,12 +151,10 @@ class NovaScenario(base.Scenario):
         :param server: Server object
         """
         server.suspend()
-        time.sleep(2)
-        utils.wait_for(server, is_ready=bench_utils.resource_is("SUSPENDED"),
-                       update_resource=bench_utils.get_from_manager(),
-                       timeout=600, check_interval=3)
+        cls._wait_for_servers([server], bench_utils.resource_is("SUSPENDED"))
 
     @classmethod
+    @base.atomic_action_timer('nova.delete_server')
     def _delete_server(cls, server):
         """Deletes the given server.
 
@@ -154,18 +163,19 @@ class NovaScenario(base.Scenario):
         :param server: Server object
         """
         server.delete()
-        utils.wait_for(server, is_ready=bench_utils.is_none,
-                       update_resource=bench_utils.get_from_manager(),
-                       timeout=600, check_interval=3)
+        cls._wait_for_servers([server], bench_utils.is_none)
 
     @classmethod
+    @base.atomic_action_timer('nova.delete_all_servers')
     def _delete_all_servers(cls):
         """Deletes all servers in current tenant."""
         servers = cls.clients("nova").servers.list()
         for server in servers:
-            cls._delete_server(server)
+            server.delete()
+        cls._wait_for_servers(servers, bench_utils.is_none)
 
     @classmethod
+    @base.atomic_action_timer('nova.delete_image')
     def _delete_image(cls, image):
         """Deletes the given image.
 
@@ -179,6 +189,7 @@ class NovaScenario(base.Scenario):
                        timeout=600, check_interval=3)
 
     @classmethod
+    @base.atomic_action_timer('nova.create_image')
     def _create_image(cls, server):
         """Creates an image of the given server
 
@@ -199,6 +210,7 @@ class NovaScenario(base.Scenario):
         return image
 
     @classmethod
+    @base.atomic_action_timer('nova.boot_servers')
     def _boot_servers(cls, name_prefix, image_id, flavor_id,
                       requests, instances_per_request=1, **kwargs):
         """Boots multiple servers.
@@ -227,14 +239,8 @@ class NovaScenario(base.Scenario):
         #                created servers manyally.
         servers = filter(lambda server: server.name.startswith(name_prefix),
                          cls.clients("nova").servers.list())
-        time.sleep(5)
-        servers = [utils.wait_for(server,
-                                  is_ready=bench_utils.resource_is("ACTIVE"),
-                                  update_resource=bench_utils.
-                                  get_from_manager(),
-                                  timeout=600, check_interval=3)
-                   for server in servers]
-        return servers
+        return cls._wait_for_servers(servers,
+                                     bench_utils.resource_is("ACTIVE"))
 
     @classmethod
     def _generate_random_name(cls, length):
@@ -0,0 +1,287 @@
+# Copyright 2013: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Benchmarks of the overhead of Rally itself.
+
+Every benchmark returns a dict of metrics; the names of the metrics that
+are better when lower end with one of LOWER_IS_BETTER.
+"""
+
+import os
+import subprocess
+import sys
+import time
+import uuid
+
+from rally.benchmark import runner
+from rally.benchmark import workers
+from rally import consts
+from rally import db
+from rally import deploy
+from rally import objects
+from rally.openstack.common.gettextutils import _
+from rally.openstack.common import log as logging
+from rally import utils
+
+
+LOG = logging.getLogger(__name__)
+
+
+LOWER_IS_BETTER = ("seconds", "error_rate")
+
+# NOTE(hughsaunders): The periodic runs are shorter than the others, since
+#                     every launch waits for its period, but need enough
+#                     iterations for their rate to mean anything.
+MIN_PERIODIC_ITERATIONS = 20
+
+
+# NOTE(hughsaunders): The no-op scenario shows the cost of the framework
+#                     alone, the fake cloud one adds the clients, the
+#                     status polling and the atomic actions of a real one.
+SCENARIOS = [
+    ("Dummy.dummy", {}),
+    ("NovaServers.boot_and_delete_server", {"image_id": "fake",
+                                            "flavor_id": "fake"}),
+]
+
+
+def _modes(iterations, active_users, duration, rps):
+    """Returns the (name, execution type, config) of every run mode."""
+    return [
+        ("continuous", "continuous", {"times": iterations,
+                                      "active_users": active_users}),
+        ("duration", "continuous", {"duration": duration / 60.0,
+                                    "active_users": active_users}),
+        ("green", "continuous", {"times": iterations,
+                                 "active_users": active_users,
+                                 "backend": "green"}),
+        ("periodic", "periodic",
+         {"times": min(iterations,
+                       max(MIN_PERIODIC_ITERATIONS, iterations // 10)),
+          "period": 1.0 / rps / 60}),
+        ("rps", "rps", {"times": iterations, "rps": rps,
+                        "active_users": active_users}),
+    ]
+
+
+def _rate(execution, config):
+    if execution == "rps":
+        return config["rps"]
+    if execution == "periodic":
+        return 1.0 / (config["period"] * 60)
+    return None
+
+
+def run_metrics(results, execution, config):
+    """Computes the overhead metrics of a benchmark run.
+
+    :param results: Iteration results of the run
+    :param execution: Execution type of the run
+    :param config: Config of the run
+
+    :returns: Dict with the "iterations_per_second" that succeeded, the
+              "error_rate" of the iterations and the "overhead_seconds" of
+              an iteration: for the runs that start the iterations at a
+              rate, how late they start on average; for the others, the
+              time an active user spends on an iteration besides running
+              the scenario
+    """
+    if not results:
+        return {"iterations_per_second": 0.0, "error_rate": None,
+                "overhead_seconds": None}
+    # NOTE(hughsaunders): The iterations that did not even start, e.g.
+    #                     timed out ones, have no timestamp.
+    started = [result for result in results if "timestamp" in result]
+    errors = len([result for result in results if result.get("error")])
+    if errors:
+        LOG.warning(_("%(errors)d of the %(count)d iterations failed, they "
+                      "are not counted in the iterations per second.") %
+                    {"errors": errors, "count": len(results)})
+    metrics = {"error_rate": float(errors) / len(results),
+               "iterations_per_second": 0.0, "overhead_seconds": None}
+    if not started:
+        return metrics
+    results = started
+    starts = sorted(result["timestamp"] for result in results)
+    span = max(result["timestamp"] + result["time"] + result["idle_time"]
+               for result in results) - starts[0]
+    count = float(len(results))
+    succeeded = len([result for result in results if not result["error"]])
+    rate = _rate(execution, config)
+    if rate is not None:
+        overhead = sum(start - (starts[0] + float(i) / rate)
+                       for i, start in enumerate(starts)) / count
+    else:
+        busy = sum(result["time"] + result["idle_time"]
+                   for result in results) / count
+        overhead = span * config.get("active_users", 1) / count - busy
+    metrics.update(iterations_per_second=(succeeded / span if span > 0
+                                          else None),
+                   overhead_seconds=max(0.0, overhead))
+    return metrics
+
+
+class SelfBenchmark(object):
+    """Runs the benchmarks of Rally against a fake cloud.
+
+    A FakeCloud deployment and a task are created in the database Rally is
+    configured with, and deleted when the benchmarks are over.
+    """
+
+    def __init__(self, iterations=1000, active_users=10, duration=10,
+                 rps=200, cloud_config=None):
+        """SelfBenchmark constructor.
+
+        :param iterations: Number of iterations of a benchmark run
+        :param active_users: Number of active users of a benchmark run
+        :param duration: Seconds a duration run lasts
+        :param rps: Rate of the rps runs; the periodic ones start
+                    iterations at that rate too
+        :param cloud_config: Config of the fake cloud, see
+                             rally.deploy.engines.fake_cloud
+        """
+        self.iterations = iterations
+        self.active_users = active_users
+        self.duration = duration
+        self.rps = rps
+        self.cloud_config = dict(cloud_config or {}, name="FakeCloud")
+        self.deployment = None
+        self.task = None
+
+    def __enter__(self):
+        self.deployment = objects.Deployment(name="rally-selfbench",
+                                             config=self.cloud_config)
+        deployer = deploy.EngineFactory.get_engine("FakeCloud",
+                                                   self.deployment)
+        with deployer:
+            self.deployment.update_endpoint(deployer.make_deploy())
+        self.task = objects.Task(deployment_uuid=self.deployment['uuid'])
+        self.task.update_status(consts.TaskStatus.TEST_TOOL_BENCHMARKING)
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.task.delete()
+        self.deployment.delete()
+
+    def run_modes(self):
+        """Runs every scenario in every run mode of the ScenarioRunner."""
+        metrics = {}
+        endpoint = self.deployment['endpoint']['identity']
+        with workers.WorkerPool() as pool:
+            srunner = runner.ScenarioRunner(self.task, endpoint, pool=pool)
+            for name, args in SCENARIOS:
+                for mode, execution, config in _modes(
+                        self.iterations, self.active_users, self.duration,
+                        self.rps):
+                    LOG.info(_("Benchmarking %(name)s in %(mode)s mode") %
+                             {"name": name, "mode": mode})
+                    sink = srunner.run(name, {"args": args,
+                                              "execution": execution,
+                                              "config": dict(config)})
+                    for key, value in run_metrics(sink.results, execution,
+                                                  config).items():
+                        metrics["runner.%s.%s.%s" % (mode, name, key)] = value
+        return metrics
+
+    def db_writes(self, writes=200, iterations=100):
+        """Measures how fast task_result_create() stores results.
+
+        :param writes: Number of results stored
+        :param iterations: Number of iterations in the raw data of a result
+        """
+        data = {"raw": [{"time": 1.0, "idle_time": 0.0, "error": None,
+                         "scenario_output": None, "atomic_actions": [],
+                         "timestamp": time.time()}] * iterations}
+        with utils.Timer() as timer:
+            for i in range(writes):
+                db.task_result_create(self.task['uuid'], {"write": i}, data)
+        return {"db.task_result_create.writes_per_second":
+                writes / timer.duration()}
+
+    def db_reads(self, iterations=10000, reads=5):
+        """Measures how long task_get_detailed() takes to decode a task.
+
+        :param iterations: Number of iterations in the raw data of the result
+                           of the task
+        :param reads: Number of reads to average
+        """
+        task = objects.Task(deployment_uuid=self.deployment['uuid'])
+        try:
+            task.append_results({"read": str(uuid.uuid4())},
+                                {"raw": [{"time": 1.0, "idle_time": 0.0,
+                                          "error": None,
+                                          "scenario_output": None,
+                                          "atomic_actions": [],
+                                          "timestamp": time.time()}] *
+                                 iterations})
+            with utils.Timer() as timer:
+                for i in range(reads):
+                    db.task_get_detailed(task['uuid'])
+        finally:
+            task.delete()
+        return {"db.task_get_detailed.seconds": timer.duration() / reads}
+
+    @staticmethod
+    def cli_startup(runs=5):
+        """Measures how long the rally command takes to print its version,
+        the best of a few runs.
+        """
+        durations = []
+        with open(os.devnull, "w") as devnull:
+            for i in range(runs):
+                with utils.Timer() as timer:
+                    subprocess.check_call([sys.executable, "-m",
+                                           "rally.cmd.main", "version"],
+                                          stdout=devnull)
+                durations.append(timer.duration())
+        return {"cli.startup.seconds": min(durations)}
+
+    def run(self):
+        """Runs all the benchmarks.
+
+        :returns: Dict that maps the names of the metrics to their values
+        """
+        metrics = {}
+        metrics.update(self.run_modes())
+        metrics.update(self.db_writes())
+        metrics.update(self.db_reads(iterations=self.iterations * 10))
+        metrics.update(self.cli_startup())
+        return metrics
+
+
+def compare(old, new):
+    """Compares the metrics of two self benchmarks.
+
+    :returns: List of (name, old value, new value, relative change,
+              regressed) tuples sorted by name; the relative change is None
+              if it cannot be computed, regressed tells whether the change
+              makes the metric worse
+    """
+    rows = []
+    for name in sorted(set(old) | set(new)):
+        before, after = old.get(name), new.get(name)
+        change = None
+        regressed = False
+        if before and after is not None:
+            change = float(after - before) / before
+            if name.endswith(LOWER_IS_BETTER):
+                regressed = change > 0
+            else:
+                regressed = change < 0
+        elif before == 0 and after:
+            # NOTE(hughsaunders): E.g. iterations that start failing.
+            regressed = name.endswith(LOWER_IS_BETTER)
+        rows.append((name, before, after, change, regressed))
+    return rows
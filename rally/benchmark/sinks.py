@@ -0,0 +1,294 @@
+# Copyright 2013: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+import os
+import random
+import sys
+import time
+
+from oslo.config import cfg
+
+from rally.openstack.common.gettextutils import _
+from rally.openstack.common import log as logging
+from rally import stats
+
+
+LOG = logging.getLogger(__name__)
+
+
+benchmark_opts = [
+    cfg.IntOpt('results_batch_size',
+               default=100,
+               help='Number of iteration results buffered by the benchmark '
+                    'runner before they are flushed to the database'),
+    cfg.StrOpt('results_dir',
+               default=None,
+               help='If set, iteration results are also appended to '
+                    '<results_dir>/<task uuid>.jsonl as they are flushed'),
+    cfg.IntOpt('raw_samples',
+               default=10000,
+               help='Maximum number of iteration results of a benchmark '
+                    'kept in its raw data as a uniform random sample; the '
+                    'statistics still cover all the iterations. 0 keeps '
+                    'all of them'),
+    cfg.IntOpt('progress_interval',
+               default=10,
+               help='Number of seconds between two reports of the progress '
+                    'of a running benchmark, 0 disables them'),
+    cfg.IntOpt('progress_window',
+               default=60,
+               help='Number of seconds of the latest iterations that the '
+                    'progress reports describe'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(benchmark_opts, group='benchmark')
+
+
+def format_progress(progress):
+    """Returns a one-line description of a progress report."""
+    line = (_("%(total)d iterations, %(errors)d failed; last %(window)d s: "
+              "%(iterations)d iterations") % {
+                  "total": progress["iterations_total"],
+                  "errors": progress["errors_total"],
+                  "window": progress["window"],
+                  "iterations": progress["iterations"]})
+    if progress["throughput"] is not None:
+        line += _(", %.2f per sec") % progress["throughput"]
+    if progress["error_rate"] is not None:
+        line += _(", %.1f%% failed") % (progress["error_rate"] * 100)
+    if progress["times"]:
+        line += (_(", p50 %(p50).3f s, p90 %(p90).3f s, p99 %(p99).3f s") %
+                 progress["times"])
+    return line
+
+
+class ResultSink(object):
+    """Buffers iteration results and flushes them in batches.
+
+    The scenario runner appends every iteration result to a sink as soon as
+    it comes out of the worker pool, so a benchmark never has to keep all of
+    its results in memory. Subclasses decide where a flushed batch goes by
+    implementing _write().
+    """
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or CONF.benchmark.results_batch_size
+        self.count = 0
+        self.errors = 0
+        self.info = {}
+        # NOTE(hughsaunders): Times of the successful iterations so far.
+        self.histogram = stats.Histogram()
+        self._batch = []
+
+    def append(self, result):
+        self._batch.append(result)
+        self.count += 1
+        if result.get("error"):
+            self.errors += 1
+        elif result.get("time") is not None:
+            self.histogram.add(result["time"])
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._batch:
+            batch, self._batch = self._batch, []
+            self._write(batch)
+
+    def close(self):
+        self.flush()
+
+    def summary(self):
+        return {"iterations": self.count, "errors": self.errors}
+
+    def stats(self):
+        """Returns the statistics of the successful iteration times so far,
+        see rally.stats.Histogram.stats().
+        """
+        return self.histogram.stats()
+
+    def set_info(self, **info):
+        """Stores data about the benchmark run as a whole (not buffered)."""
+        self.info.update(info)
+        self._write_info(info)
+
+    def _write(self, results):
+        raise NotImplementedError()
+
+    def _write_info(self, info):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        # Flush even if the benchmark has failed, so that everything
+        # measured so far is kept.
+        self.close()
+
+
+class ListSink(ResultSink):
+    """Keeps all the results in memory (useful for tests and ad hoc runs)."""
+
+    def __init__(self, batch_size=None):
+        super(ListSink, self).__init__(batch_size=batch_size)
+        self.results = []
+
+    def _write(self, results):
+        self.results.extend(results)
+
+
+class CallbackSink(ResultSink):
+    """Passes every flushed batch of results to a function."""
+
+    def __init__(self, callback, batch_size=None):
+        super(CallbackSink, self).__init__(batch_size=batch_size)
+        self.callback = callback
+
+    def _write(self, results):
+        self.callback(results)
+
+
+class TaskResultSink(ResultSink):
+    """Streams the results of one benchmark into the task results.
+
+    The task result record is created as soon as the sink is, so partial
+    results of the benchmark survive a crash of the Rally process.
+    """
+
+    def __init__(self, task, key, batch_size=None, results_dir=None):
+        super(TaskResultSink, self).__init__(batch_size=batch_size)
+        self.task = task
+        self.key = key
+        self.result = task.append_results(key, {})
+        results_dir = results_dir or CONF.benchmark.results_dir
+        self.jsonl_path = None
+        if results_dir:
+            self.jsonl_path = os.path.join(results_dir,
+                                           "%s.jsonl" % task["uuid"])
+        self.progress_interval = CONF.benchmark.progress_interval
+        self.window = stats.RollingWindow(CONF.benchmark.progress_window)
+        self._reported_at = time.time()
+        self.raw_samples = CONF.benchmark.raw_samples
+        self.sample = []
+
+    def append(self, result):
+        super(TaskResultSink, self).append(result)
+        if self.progress_interval:
+            now = time.time()
+            self.window.add(result.get("time"), bool(result.get("error")),
+                            now)
+            if now - self._reported_at >= self.progress_interval:
+                self._report_progress(now)
+
+    def _report_progress(self, now, echo=True):
+        """Stores the rolling metrics in the result and prints them.
+
+        The reports are made as the results come, so a benchmark whose
+        iterations do not finish gets no new reports; "updated_at" tells
+        how old the last one is.
+        """
+        self._reported_at = now
+        progress = dict(self.window.snapshot(now), updated_at=now,
+                        iterations_total=self.count,
+                        errors_total=self.errors)
+        self.info["progress"] = progress
+        self.task.update_result_progress(self.result["id"], progress)
+        if echo:
+            sys.stdout.write("%s [%s]: %s\n" % (self.key["name"],
+                                                self.key["pos"],
+                                                format_progress(progress)))
+            sys.stdout.flush()
+
+    def _write(self, results):
+        first_iteration = self.count - len(results)
+        sampled = set()
+        unsampled = []
+        if self.raw_samples:
+            # NOTE(hughsaunders): Reservoir sampling: every iteration has
+            #                     the same chance to be in the sample. Only
+            #                     the indexes of the sampled iterations are
+            #                     kept here, their results are in the DB.
+            for i in range(first_iteration, self.count):
+                if i < self.raw_samples:
+                    self.sample.append(i)
+                    sampled.add(i)
+                    continue
+                j = random.randint(0, i)
+                if j < self.raw_samples:
+                    dropped = self.sample[j]
+                    if dropped in sampled:
+                        sampled.discard(dropped)
+                    else:
+                        unsampled.append(dropped)
+                    self.sample[j] = i
+                    sampled.add(i)
+        if self.raw_samples and self.count > self.raw_samples:
+            self.task.extend_results(self.result["id"], results,
+                                     first_iteration=first_iteration,
+                                     sampled=sampled, unsampled=unsampled)
+        else:
+            self.task.extend_results(self.result["id"], results,
+                                     first_iteration=first_iteration)
+        if self.jsonl_path:
+            self._write_jsonl(results)
+
+    def _write_info(self, info):
+        self.task.update_result_data(self.result["id"], info)
+
+    def close(self):
+        super(TaskResultSink, self).close()
+        if self.progress_interval and self.count:
+            self._report_progress(time.time(), echo=False)
+        if self.histogram.count:
+            self.set_info(histogram=self.histogram.to_dict())
+
+    def _write_jsonl(self, results):
+        try:
+            with open(self.jsonl_path, "a") as f:
+                for result in results:
+                    f.write(json.dumps({"name": self.key["name"],
+                                        "pos": self.key["pos"],
+                                        "result": result}))
+                    f.write("\n")
+        except IOError as e:
+            LOG.warning(_("Unable to write results to %(path)s: %(err)s") %
+                        {"path": self.jsonl_path, "err": e})
+
+
+class TaggedSink(object):
+    """Adds the same set of keys to every result passed to another sink."""
+
+    def __init__(self, sink, **tags):
+        self.sink = sink
+        self.tags = tags
+
+    def append(self, result):
+        result.update(self.tags)
+        self.sink.append(result)
+
+    def set_info(self, **info):
+        """Stores the info in the other sink under the values of the tags,
+        e.g. iterations_per_second as {4: ...} under
+        iterations_per_second_by_concurrency.
+        """
+        for key, value in info.items():
+            for tag, tag_value in self.tags.items():
+                name = "%s_by_%s" % (key, tag)
+                values = dict(self.sink.info.get(name, {}))
+                values[tag_value] = value
+                self.sink.set_info(**{name: values})
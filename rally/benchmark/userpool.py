@@ -0,0 +1,172 @@
+# Copyright 2013: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from oslo.config import cfg
+
+from rally.benchmark import utils
+from rally import exceptions
+from rally.openstack.common.gettextutils import _
+from rally.openstack.common import log as logging
+from rally import osclients
+
+
+LOG = logging.getLogger(__name__)
+
+CONF = cfg.CONF
+CONF.import_opt('provisioning_concurrency', 'rally.benchmark.runner',
+                group='benchmark')
+
+
+PROVIDER_NAME = "UserPool"
+
+
+def _get_keystone_client(endpoint, keys):
+    return osclients.Clients(*[endpoint[k] for k in keys]).\
+                get_keystone_client()
+
+
+class UserPool(object):
+    """Tenants and users created once for a deployment and reused by tasks.
+
+    The pool is stored as a resource of the deployment, so the deployment
+    cannot be destroyed while it has a pool. A task leases the whole pool
+    while it runs, so that two tasks never act as the same users.
+
+    The users share an ssh key pair of the pool. Their nova key pair and
+    security group are created the first time they run a benchmark and are
+    kept by the cleanup of the benchmarks.
+
+    .. note::
+
+        Typical usage:
+            pool = UserPool.create(deployment, tenants=10,
+                                   users_per_tenant=5)
+            ...
+            pool = UserPool.get(deployment)
+            pool.lease(task['uuid'])
+            # Run the benchmarks with pool.endpoints...
+            pool.release(task['uuid'])
+    """
+
+    def __init__(self, deployment, resource):
+        self.deployment = deployment
+        self.resource = resource
+
+    @classmethod
+    def create(cls, deployment, tenants, users_per_tenant):
+        """Creates the tenants and users of the pool of the deployment."""
+        if deployment.get_resources(provider_name=PROVIDER_NAME):
+            raise exceptions.UserPoolExists(uuid=deployment['uuid'])
+        identity = deployment['endpoint']['identity']
+        tenants, users, endpoints = utils.create_tenants_and_users(
+                    cls._get_admin_keystone(deployment),
+                    "rally_pool_%s" % deployment['uuid'], tenants,
+                    users_per_tenant, identity['uri'],
+                    CONF.benchmark.provisioning_concurrency)
+        resource = deployment.add_resource(PROVIDER_NAME, type="users", info={
+            "tenants": [tenant.id for tenant in tenants],
+            "users": [user.id for user in users],
+            "endpoints": endpoints,
+            "ssh_key_pair": utils.generate_ssh_key_pair(),
+        })
+        return cls(deployment, resource)
+
+    @classmethod
+    def get(cls, deployment):
+        resources = deployment.get_resources(provider_name=PROVIDER_NAME)
+        if not resources:
+            raise exceptions.UserPoolNotFound(uuid=deployment['uuid'])
+        return cls(deployment, resources[0])
+
+    @staticmethod
+    def _get_admin_keystone(deployment):
+        return _get_keystone_client(deployment['endpoint']['identity'],
+                                    ["admin_username", "admin_password",
+                                     "admin_tenant_name", "uri"])
+
+    @property
+    def endpoints(self):
+        """Credentials of the users, grouped by tenant.
+
+        They come with the "ssh_key_pair" of the pool, if it has one.
+        """
+        endpoints = self.resource['info']['endpoints']
+        key_pair = self.resource['info'].get('ssh_key_pair')
+        if key_pair is None:
+            return endpoints
+        return [dict(endpoint, ssh_key_pair=key_pair)
+                for endpoint in endpoints]
+
+    @property
+    def leased_by(self):
+        return self.resource['leased_by']
+
+    def check(self):
+        """Authenticates all the users of the pool.
+
+        :returns: List of the names of the users that failed to
+                  authenticate
+        """
+        def _check(endpoint):
+            try:
+                _get_keystone_client(endpoint, ["username", "password",
+                                                "tenant_name", "uri"])
+            except Exception as e:
+                LOG.warning(_("User %(user)s of the pool cannot authenticate: "
+                              "%(error)s") % {"user": endpoint["username"],
+                                              "error": e})
+                return endpoint["username"]
+
+        results, errors = utils.run_concurrently(
+                                _check, self.endpoints,
+                                _("Checking the users of the pool"),
+                                CONF.benchmark.provisioning_concurrency)
+        return [username for username in results if username]
+
+    def lease(self, task_uuid):
+        """Reserves the pool for the task.
+
+        :raises: :class:`rally.exceptions.UserPoolIsBusy` if another task
+                 has leased the pool
+        """
+        try:
+            self.resource = self.deployment.lease_resource(
+                                            self.resource['id'], task_uuid)
+        except exceptions.ResourceIsLeased as e:
+            raise exceptions.UserPoolIsBusy(uuid=self.deployment['uuid'],
+                                            task=e.kwargs['lessee'])
+
+    def release(self, task_uuid=None):
+        """Releases the pool.
+
+        :param task_uuid: If given, the pool is released only if that task
+                          has leased it; otherwise the lease is released
+                          whoever holds it, e.g. the stale lease of a task
+                          that died
+        """
+        self.deployment.release_resource(self.resource['id'],
+                                         lessee=task_uuid)
+
+    def delete(self):
+        """Deletes the tenants and users of the pool, and the pool itself."""
+        if self.leased_by is not None:
+            raise exceptions.UserPoolIsBusy(uuid=self.deployment['uuid'],
+                                            task=self.leased_by)
+        utils.delete_tenants_and_users(
+                    self._get_admin_keystone(self.deployment),
+                    self.resource['info']['tenants'],
+                    self.resource['info']['users'],
+                    CONF.benchmark.provisioning_concurrency)
+        self.deployment.delete_resource(self.resource['id'])
@@ -13,14 +13,22 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from multiprocessing import pool as multiprocessing_pool
+import StringIO
+import sys
 import traceback
 
 from novaclient import exceptions as nova_exceptions
+import paramiko
 
 from rally.benchmark.scenarios.keystone import utils as kutils
 from rally import exceptions as rally_exceptions
+from rally.openstack.common.gettextutils import _
+from rally.openstack.common import log as logging
 from rally import osclients
-from rally import utils
+
+
+LOG = logging.getLogger(__name__)
 
 
 def resource_is(status):
@@ -49,45 +57,10 @@ def get_from_manager(error_statuses=None):
     return _get_from_manager
 
 
-def manager_list_size(sizes):
-    def _list(mgr):
-        return len(mgr.list()) in sizes
-    return _list
-
-
-def _wait_for_list_statuses(mgr, statuses, list_query=None,
-                            timeout=10, check_interval=1):
-    list_query = list_query or {}
-
-    def _list_statuses(mgr):
-        for resource in mgr.list(**list_query):
-            if resource.status not in statuses:
-                return False
-        return True
-
-    utils.wait_for(mgr, is_ready=_list_statuses, update_resource=None,
-                   timeout=timeout, check_interval=check_interval)
-
-
-def _wait_for_empty_list(mgr, timeout=10, check_interval=1):
-    _wait_for_list_size(mgr, sizes=[0], timeout=timeout,
-                        check_interval=check_interval)
-
-
-def _wait_for_list_size(mgr, sizes=[0], timeout=10, check_interval=1):
-    utils.wait_for(mgr, is_ready=manager_list_size(sizes),
-                   update_resource=None, timeout=timeout,
-                   check_interval=check_interval)
-
-
 def false(resource):
     return False
 
 
-def async_cleanup(cls, indicies):
-    cls._cleanup_with_clients(indicies)
-
-
 def format_exc(exc):
     return [str(type(exc)), str(exc), traceback.format_exc()]
 
@@ -99,26 +72,145 @@ def infinite_run_args(args):
         i += 1
 
 
+def run_concurrently(func, args, action, concurrency):
+    """Calls func for every item of args in a bounded pool of threads.
+
+    The progress is logged every time another tenth of the calls is done.
+
+    :param action: Description of the calls for the log messages
+    :param concurrency: Maximum number of calls made at the same time
+    :returns: Tuple of the list of the results of the successful calls
+              (in the order of args) and the list of the exceptions raised
+              by the failed ones
+    """
+    if not args:
+        return [], []
+
+    def _call(arg):
+        try:
+            return True, func(arg)
+        except Exception as e:
+            LOG.debug(_("%s failed.") % action, exc_info=sys.exc_info())
+            return False, e
+
+    results = []
+    errors = []
+    step = max(1, len(args) / 10)
+    pool = multiprocessing_pool.ThreadPool(min(concurrency, len(args)))
+    try:
+        for done, (ok, value) in enumerate(pool.imap(_call, args), 1):
+            (results if ok else errors).append(value)
+            if done % step == 0 or done == len(args):
+                LOG.info(_("%(action)s: %(done)d of %(total)d done, "
+                           "%(errors)d failed.") %
+                         {"action": action, "done": done,
+                          "total": len(args), "errors": len(errors)})
+    finally:
+        pool.close()
+        pool.join()
+    return results, errors
+
+
+def create_tenants_and_users(keystone, name_prefix, tenants,
+                             users_per_tenant, uri, concurrency):
+    """Creates tenants and users concurrently.
+
+    If some of them cannot be created, the ones created so far are deleted.
+
+    :param keystone: Admin keystone client
+    :param name_prefix: Prefix of the names of the tenants
+    :param uri: Keystone URI to put into the endpoints of the users
+    :param concurrency: Maximum number of keystone calls at the same time
+    :raises: :class:`rally.exceptions.BenchmarkSetupFailure`
+    :returns: Tuple of the lists of the tenants, the users and the
+              endpoints (credentials) of the users
+    """
+    def _create_tenant(i):
+        return keystone.tenants.create("%(prefix)s_tenant_%(iter)i" %
+                                       {"prefix": name_prefix, "iter": i})
+
+    def _create_user(args):
+        tenant, uid = args
+        username = "%(tname)s_user_%(uid)d" % {"tname": tenant.name,
+                                               "uid": uid}
+        password = "password"
+        user = keystone.users.create(username, password,
+                                     "%s@test.com" % username, tenant.id)
+        return user, {"username": username, "password": password,
+                      "tenant_name": tenant.name, "uri": uri}
+
+    created_tenants, errors = run_concurrently(_create_tenant, range(tenants),
+                                               _("Creating tenants"),
+                                               concurrency)
+    created_users = []
+    if not errors:
+        user_args = [(tenant, uid) for tenant in created_tenants
+                     for uid in range(users_per_tenant)]
+        created_users, errors = run_concurrently(_create_user, user_args,
+                                                 _("Creating users"),
+                                                 concurrency)
+    users = [user for user, endpoint in created_users]
+
+    if errors:
+        delete_tenants_and_users(keystone, created_tenants, users,
+                                 concurrency)
+        raise rally_exceptions.BenchmarkSetupFailure(
+                message=_("%(count)d tenants or users were not created, the "
+                          "first error was: %(error)s") %
+                {"count": len(errors), "error": errors[0]})
+
+    return (created_tenants, users,
+            [endpoint for user, endpoint in created_users])
+
+
+def delete_tenants_and_users(keystone, tenants, users, concurrency):
+    """Deletes users and then tenants concurrently, logging the failures.
+
+    :param tenants: Tenants or their IDs
+    :param users: Users or their IDs
+    """
+    for manager, resources, action in [
+            (keystone.users, users, _("Deleting users")),
+            (keystone.tenants, tenants, _("Deleting tenants"))]:
+        deleted, errors = run_concurrently(manager.delete, resources, action,
+                                           concurrency)
+        if errors:
+            LOG.warning(_("%(action)s: %(count)d failed, the first error "
+                          "was: %(error)s") %
+                        {"action": action, "count": len(errors),
+                         "error": errors[0]})
+
+
+def create_openstack_client(credentials, keys):
+    cl = osclients.Clients(*[credentials[k] for k in keys])
+    return {
+        "nova": cl.get_nova_client(),
+        "keystone": cl.get_keystone_client(),
+        "glance": cl.get_glance_client(),
+        "cinder": cl.get_cinder_client()
+    }
+
+
 def create_openstack_clients(users_endpoints, keys):
     # NOTE(msdubov): Creating here separate openstack clients for each of
     #                the temporary users involved in benchmarking.
-    client_managers = [osclients.Clients(*[credentials[k] for k in keys])
-                       for credentials in users_endpoints]
-
-    clients = [
-        dict((
-            ("nova", cl.get_nova_client()),
-            ("keystone", cl.get_keystone_client()),
-            ("glance", cl.get_glance_client()),
-            ("cinder", cl.get_cinder_client())
-        )) for cl in client_managers
-    ]
+    clients = [create_openstack_client(credentials, keys)
+               for credentials in users_endpoints]
 
     _prepare_for_instance_ssh(clients)
     return clients
 
 
-def _prepare_for_instance_ssh(clients):
+def generate_ssh_key_pair():
+    """Generate an RSA key pair in the format used by nova key pairs."""
+    key = paramiko.RSAKey.generate(2048)
+    private_key = StringIO.StringIO()
+    key.write_private_key(private_key)
+    return dict(private=private_key.getvalue(),
+                public="%s %s" % (key.get_name(), key.get_base64()))
+
+
+def _prepare_for_instance_ssh(clients, key_pair=None):
     """Generate and store SSH keys, allow access to port 22.
 
     In order to run tests on instances it is necessary to have SSH access.
@@ -126,24 +218,44 @@ def _prepare_for_instance_ssh(clients):
     clients dictionary. The public key is also submitted to nova via the
     novaclient.
 
+    If key_pair is given, its public key is imported instead, so that the
+    same key pair can be stored by several processes acting as the user.
+    Resources that another such process has just created are reused.
+
     A security group rule is created to allow access to instances on port 22.
     """
 
     for client_dict in clients:
         nova_client = client_dict['nova']
 
+        if key_pair is not None:
+            client_dict['ssh_key_pair'] = key_pair
+
         if ('rally_ssh_key' not in
                 [k.name for k in nova_client.keypairs.list()]):
-            keypair = nova_client.keypairs.create('rally_ssh_key')
-            client_dict['ssh_key_pair'] = dict(private=keypair.private_key,
-                                               public=keypair.public_key)
+            if key_pair is None:
+                keypair = nova_client.keypairs.create('rally_ssh_key')
+                client_dict['ssh_key_pair'] = dict(
+                                                private=keypair.private_key,
+                                                public=keypair.public_key)
+            else:
+                try:
+                    nova_client.keypairs.create('rally_ssh_key',
+                                                public_key=key_pair['public'])
+                except nova_exceptions.Conflict:
+                    pass
 
         if 'rally_open' not in [sg.name for sg in
                                 nova_client.security_groups.list()]:
-            rally_open = nova_client.security_groups.create(
-                'rally_open',
-                'Allow all access to VMs for benchmarking'
-            )
+            try:
+                nova_client.security_groups.create(
+                    'rally_open',
+                    'Allow all access to VMs for benchmarking'
+                )
+            except nova_exceptions.ClientException:
+                # NOTE(hughsaunders): Created in the meantime, or find()
+                #                     below raises the real problem.
+                pass
         rally_open = nova_client.security_groups.find(name='rally_open')
 
         rules_to_add = [dict(ip_protocol='tcp',
@@ -167,82 +279,19 @@ def _prepare_for_instance_ssh(clients):
         for new_rule in rules_to_add:
             if not any(rule_match(new_rule, existing_rule) for existing_rule
                        in rally_open.rules):
-                nova_client.security_group_rules.create(
-                            rally_open.id,
-                            from_port=new_rule['from_port'],
-                            to_port=new_rule['to_port'],
-                            ip_protocol=new_rule['ip_protocol'],
-                            cidr=new_rule['ip_range']['cidr'])
+                try:
+                    nova_client.security_group_rules.create(
+                                rally_open.id,
+                                from_port=new_rule['from_port'],
+                                to_port=new_rule['to_port'],
+                                ip_protocol=new_rule['ip_protocol'],
+                                cidr=new_rule['ip_range']['cidr'])
+                except nova_exceptions.BadRequest:
+                    # NOTE(hughsaunders): The rule has just been added.
+                    pass
     return clients
 
 
-def delete_servers(nova):
-    for server in nova.servers.list():
-        server.delete()
-    _wait_for_empty_list(nova.servers, timeout=600, check_interval=3)
-
-
-def delete_keypairs(nova):
-    for keypair in nova.keypairs.list():
-        keypair.delete()
-    _wait_for_empty_list(nova.keypairs)
-
-
-def delete_security_groups(nova):
-    for group in nova.security_groups.list():
-        try:
-            group.delete()
-        except nova_exceptions.BadRequest as br:
-            #TODO(boden): find a way to determine default security group
-            if not br.message.startswith('Unable to delete system group'):
-                raise br
-    _wait_for_list_size(nova.security_groups, sizes=[0, 1])
-
-
-def delete_images(glance, project_uuid):
-    for image in glance.images.list(owner=project_uuid):
-        image.delete()
-    _wait_for_list_statuses(glance.images, statuses=["DELETED"],
-                            list_query={'owner': project_uuid},
-                            timeout=600, check_interval=3)
-
-
-def delete_networks(nova):
-    for network in nova.networks.list():
-        network.delete()
-    _wait_for_empty_list(nova.networks)
-
-
-def delete_volumes(cinder):
-    for vol in cinder.volumes.list():
-        vol.delete()
-    _wait_for_empty_list(cinder.volumes, timeout=120)
-
-
-def delete_volume_types(cinder):
-    for vol_type in cinder.volume_types.list():
-        vol_type.delete()
-    _wait_for_empty_list(cinder.volume_types)
-
-
-def delete_volume_transfers(cinder):
-    for transfer in cinder.transfers.list():
-        transfer.delete()
-    _wait_for_empty_list(cinder.transfers)
-
-
-def delete_volume_snapshots(cinder):
-    for snapshot in cinder.volume_snapshots.list():
-        snapshot.delete()
-    _wait_for_empty_list(cinder.volume_snapshots, timeout=240)
-
-
-def delete_volume_backups(cinder):
-    for backup in cinder.backups.list():
-        backup.delete()
-    _wait_for_empty_list(cinder.backups, timeout=240)
-
-
 def delete_keystone_resources(keystone, resource_name):
     for resource in getattr(keystone, resource_name).list():
         if kutils.is_temporary(resource):
@@ -0,0 +1,243 @@
+# Copyright 2013: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import multiprocessing
+import Queue
+import threading
+import time
+import traceback
+
+from rally import exceptions
+
+
+# NOTE(hughsaunders): Put in the results queue of a BoundedIMapIterator to
+#                     wake up the next() call waiting for a result.
+_CANCELLED = object()
+
+
+def _call(func, args):
+    """Calls func(args) in a worker.
+
+    The errors are returned rather than raised: the callback of a failed
+    multiprocessing call is never called.
+
+    :returns: Tuple of the result and of None, or of None and of the error
+              as [type, message, traceback] strings
+    """
+    try:
+        return func(args), None
+    except Exception as e:
+        return None, [str(type(e)), str(e), traceback.format_exc()]
+
+
+class WorkerPool(object):
+    """A resizable pool of worker processes shared by benchmark runs.
+
+    Workers are forked (and import the client libraries) once per task
+    rather than once per benchmark run, and keep the OpenStack clients they
+    have authenticated between the runs. No process is started until the
+    pool is first resized to a non-zero size.
+    """
+
+    def __init__(self, processes=0, initializer=None, initargs=()):
+        """WorkerPool constructor.
+
+        :param processes: Number of workers to start right away
+        :param initializer: Function every worker calls with initargs when
+                            it starts, as for multiprocessing.Pool
+        """
+        self.processes = 0
+        self.initializer = initializer
+        self.initargs = initargs
+        self._pool = None
+        self._retired = []
+        self.resize(processes)
+
+    def resize(self, processes):
+        """Makes sure that the pool has at least the given number of workers.
+
+        A multiprocessing pool cannot grow, so it gets replaced by a bigger
+        one; the old pool is closed and finishes its pending tasks in the
+        background.
+        """
+        if processes <= self.processes:
+            return
+        if self._pool is not None:
+            self._pool.close()
+            self._retired.append(self._pool)
+        self._pool = self._new_pool(processes)
+        self.processes = processes
+
+    def _new_pool(self, processes):
+        return multiprocessing.Pool(processes, self.initializer,
+                                    self.initargs)
+
+    def restart(self):
+        """Kills all the workers, e.g. to get rid of hanging iterations."""
+        if self._pool is None:
+            return
+        processes = self.processes
+        self.terminate()
+        self._pool = self._new_pool(processes)
+        self.processes = processes
+
+    def terminate(self):
+        """Kills all the workers without waiting for their tasks."""
+        pools = self._retired
+        if self._pool is not None:
+            pools.append(self._pool)
+        for pool in pools:
+            pool.terminate()
+            pool.join()
+        self._pool = None
+        self._retired = []
+        self.processes = 0
+
+    def apply_async(self, func, args=(), callback=None):
+        self.resize(1)
+        return self._pool.apply_async(func, args, callback=callback)
+
+    def imap(self, func, iterable, concurrent):
+        """Like Pool.imap(), but with at most concurrent calls in flight.
+
+        The pool is grown to at least concurrent workers first. Unlike
+        Pool.imap(), the results come in the order they are ready.
+        """
+        self.resize(concurrent)
+        return BoundedIMapIterator(self, func, iterable, concurrent)
+
+    def close(self):
+        pools = self._retired
+        if self._pool is not None:
+            pools.append(self._pool)
+        for pool in pools:
+            pool.close()
+            pool.join()
+        self._pool = None
+        self._retired = []
+        self.processes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.close()
+
+
+class BoundedIMapIterator(object):
+    """Iterator over the results of a WorkerPool.imap() call.
+
+    A new call is submitted to the pool every time a previous one finishes,
+    so that exactly concurrent calls are in flight while there are
+    arguments left.
+    """
+
+    def __init__(self, pool, func, iterable, concurrent):
+        self._pool = pool
+        self._func = func
+        self._args = iter(iterable)
+        self._results = Queue.Queue()
+        self._lock = threading.Lock()
+        self._stopped = False
+        self.in_flight = 0
+        for i in range(concurrent):
+            self._submit()
+
+    def _submit(self):
+        with self._lock:
+            if self._stopped:
+                return
+            try:
+                args = next(self._args)
+            except StopIteration:
+                return
+            self.in_flight += 1
+        self._pool.apply_async(_call, (self._func, args),
+                               callback=self._on_result)
+
+    def _on_result(self, outcome):
+        with self._lock:
+            self.in_flight -= 1
+            self._results.put(outcome)
+        self._submit()
+
+    def next(self, timeout=None):
+        """Returns the next result.
+
+        :raises: multiprocessing.TimeoutError if there is none in timeout
+                 seconds, RunAborted if cancel() was called, WorkerFailure
+                 if the call raised an exception; its "error" keyword
+                 argument is the [type, message, traceback] of the latter
+        """
+        try:
+            outcome = self._results.get(timeout=timeout)
+        except Queue.Empty:
+            raise multiprocessing.TimeoutError()
+        if outcome is _CANCELLED:
+            raise exceptions.RunAborted()
+        result, error = outcome
+        if error is not None:
+            raise exceptions.WorkerFailure(func=self._func.__name__,
+                                           message=error[1], error=error)
+        return result
+
+    def cancel(self):
+        """Stops submitting new calls, the running ones go on.
+
+        May be called from another thread: the next() call that is waiting
+        for a result, or the next one to come, raises RunAborted.
+        """
+        with self._lock:
+            self._stopped = True
+        self._results.put(_CANCELLED)
+
+    def drain(self, timeout):
+        """Stops submitting new calls and collects the running ones.
+
+        :param timeout: How long to wait for all the running calls
+        :returns: Tuple of the list of the results that were not returned by
+                  next() yet, but those of the failed calls, and of False if
+                  some of the calls did not finish in time, True otherwise
+        """
+        with self._lock:
+            self._stopped = True
+        deadline = time.time() + timeout
+        results = []
+        while True:
+            with self._lock:
+                if not self.in_flight and self._results.empty():
+                    return results, True
+            try:
+                outcome = self._results.get(
+                                timeout=max(0, deadline - time.time()))
+            except Queue.Empty:
+                return results, False
+            if outcome is not _CANCELLED and outcome[1] is None:
+                results.append(outcome[0])
+
+    def stop(self, timeout=None):
+        """Stops submitting new calls and waits for the running ones.
+
+        :param timeout: How long to wait for each of the running calls
+        :returns: False if some of the calls did not finish in time
+        """
+        with self._lock:
+            self._stopped = True
+        try:
+            while self.in_flight:
+                self._results.get(timeout=timeout)
+        except Queue.Empty:
+            return False
+        return True
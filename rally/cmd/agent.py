@@ -0,0 +1,110 @@
+# Copyright 2013: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+""" Load generator agent of the distributed benchmark runs. """
+
+import json
+import os
+import sys
+import threading
+import time
+
+from oslo.config import cfg
+
+from rally.benchmark import runner
+from rally.benchmark import sinks
+from rally.benchmark import utils
+from rally.benchmark import workers
+from rally.openstack.common.gettextutils import _
+from rally.openstack.common import log as logging
+from rally import version
+
+
+LOG = logging.getLogger(__name__)
+
+
+def serve(infile, outfile):
+    """Runs the commands of the controller (see rally.benchmark.distributed)
+    read from infile, writing the replies to outfile.
+
+    The iterations run in a thread of their own, so that an abort command
+    can be read while they are running.
+    """
+    lock = threading.Lock()
+
+    def _send(message):
+        with lock:
+            outfile.write(json.dumps(message) + "\n")
+            outfile.flush()
+
+    def _start(benchmark, start_at):
+        srunner = benchmark["runner"]
+        try:
+            delay = start_at - time.time()
+            if delay > 0:
+                srunner.aborted.wait(delay)
+            sink = sinks.CallbackSink(
+                        lambda results: _send({"results": results}))
+            srunner.run_iterations(benchmark["name"], benchmark["kwargs"],
+                                   benchmark["env"], sink)
+            _send({"done": sink.summary(), "info": sink.info})
+        except Exception as e:
+            LOG.exception(_("Agent command start failed"))
+            _send({"error": utils.format_exc(e)})
+
+    benchmark = None
+    running = None
+    with workers.WorkerPool() as pool:
+        for line in iter(infile.readline, ""):
+            request = json.loads(line)
+            try:
+                if request["command"] == "clock":
+                    _send({"time": time.time()})
+                elif request["command"] == "prepare":
+                    benchmark = request
+                    benchmark["runner"] = runner.ScenarioRunner(
+                                            None, request["admin"], pool=pool)
+                    _send({"ready": True})
+                elif request["command"] == "start":
+                    running = threading.Thread(
+                                    target=_start,
+                                    args=(benchmark, request["start_at"]))
+                    running.start()
+                elif request["command"] == "abort":
+                    if benchmark is not None:
+                        benchmark["runner"].abort()
+            except Exception as e:
+                LOG.exception(_("Agent command %s failed") %
+                              request["command"])
+                _send({"error": utils.format_exc(e)})
+        if running is not None:
+            running.join()
+
+
+def main():
+    # NOTE(hughsaunders): Stdout carries the replies to the controller, so
+    #                     anything else printed (by this process or the
+    #                     workers) goes to stderr.
+    outfile = os.fdopen(os.dup(sys.stdout.fileno()), "w")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+
+    cfg.CONF(sys.argv[1:], project='rally',
+             version=version.version_string())
+    logging.setup('rally')
+    serve(sys.stdin, outfile)
+
+
+if __name__ == '__main__':
+    main()
@@ -21,13 +21,17 @@ import sys
 from oslo.config import cfg
 
 from rally.openstack.common.apiclient import exceptions
-from rally.openstack.common import cliutils
 from rally.openstack.common.gettextutils import _
 from rally.openstack.common import log as logging
+from rally import utils
 from rally import version
 
 CONF = cfg.CONF
 
+# NOTE(hughsaunders): The common cliutils import prettytable, which only the
+#                     commands printing tables need.
+cliutils = utils.LazyModule("rally.openstack.common.cliutils")
+
 
 def args(*args, **kwargs):
     def _decorator(func):
@@ -20,14 +20,34 @@ from __future__ import print_function
 import json
 import pprint
 import sys
-
-import prettytable
+import time
 
 from rally.cmd import cliutils
 from rally import db
 from rally.openstack.common.gettextutils import _
-from rally.orchestrator import api
-from rally import processing
+from rally import utils
+
+
+# NOTE(hughsaunders): The orchestrator API pulls in the benchmark engine and
+#                     every client library, processing matplotlib and stats
+#                     numpy: they are imported by the commands that use them
+#                     only, so that e.g. `rally task list` starts fast.
+api = utils.LazyModule("rally.orchestrator.api")
+processing = utils.LazyModule("rally.processing")
+rstats = utils.LazyModule("rally.stats")
+sinks = utils.LazyModule("rally.benchmark.sinks")
+prettytable = utils.LazyModule("prettytable")
+
+# The keys of processing.PLOTS, listed here not to import it
+PLOT_TYPES = ["aggregated", "concurrency"]
+
+
+def _get_raw(result):
+    """Returns the iteration results kept for a task result."""
+    # NOTE(hughsaunders): They are stored with the iteration records,
+    #                     results made in one go have them in their data.
+    return (result["data"].get("raw") or
+            db.task_iteration_get_raw(result["id"]))
 
 
 class DeploymentCommands(object):
@@ -109,19 +129,34 @@ class TaskCommands(object):
                    help='UUID of the deployment')
     @cliutils.args('--task',
                    help='Path to the file with full configuration of task')
-    def start(self, deploy_id, task):
+    @cliutils.args('--user-pool', dest='user_pool', action='store_true',
+                   help='Run the benchmarks as the users of the user pool '
+                        'of the deployment')
+    @cliutils.args('--queue', dest='queue', action='store_true',
+                   help='Queue the task for a worker instead of running it '
+                        'here, and print its UUID')
+    def start(self, deploy_id, task, user_pool=False, queue=False):
         """Run a benchmark task.
 
         :param deploy_id: an UUID of a deployment
         :param config: a file with json configration
+        :param user_pool: if True, use the user pool of the deployment
+        :param queue: if True, the task is run by a worker (see
+                      openstack-rally-worker)
         """
         with open(task) as task_file:
             config_dict = json.load(task_file)
-            api.start_task(deploy_id, config_dict)
+            if queue:
+                task_uuid = api.queue_task(deploy_id, config_dict,
+                                           use_user_pool=bool(user_pool))
+                print(_("Task %s is queued.") % task_uuid)
+            else:
+                api.start_task(deploy_id, config_dict,
+                               use_user_pool=bool(user_pool))
 
     @cliutils.args('--task-id', type=str, dest='task_id', help='UUID of task')
     def abort(self, task_id):
-        """Force abort task
+        """Abort a running or queued task
 
         :param task_uuid: Task uuid
         """
@@ -138,6 +173,16 @@ class TaskCommands(object):
         print(_("Task %(task_id)s is %(status)s.")
               % {'task_id': task_id, 'status': task['status']})
 
+        for result in db.task_result_get_all_by_uuid(task_id,
+                                                     load_data=False):
+            progress = result["progress"]
+            if progress:
+                print(_("%(name)s [%(pos)s] (%(age)d s ago): %(progress)s")
+                      % {'name': result["key"]["name"],
+                         'pos': result["key"]["pos"],
+                         'age': time.time() - progress["updated_at"],
+                         'progress': sinks.format_progress(progress)})
+
     @cliutils.args(
         '--task-id', type=str, dest='task_id',
         help=('uuid of task, if --task-id is "last" results of most '
@@ -159,27 +204,115 @@ class TaskCommands(object):
         print(_("Task %(task_id)s is %(status)s.")
               % {'task_id': task_id, 'status': task['status']})
 
+        stats = db.task_iteration_stats(task_id)
+
         for result in task["results"]:
             key = result["key"]
             print("-" * 80)
             print()
             print("test scenario %s" % key["name"])
             print("args position %s" % key["pos"])
+            if "group" in key:
+                print("parallel group %s" % key["group"])
             print("args values:")
             pprint.pprint(key["kw"])
 
-            raw = result["data"]["raw"]
-            times = map(lambda x: x['time'],
-                        filter(lambda r: not r['error'], raw))
+            raw = _get_raw(result)
+            result_stats = stats.get(result["id"],
+                                     {"iterations": 0, "errors": 0})
+            succeeded = result_stats["iterations"] - result_stats["errors"]
 
             table = prettytable.PrettyTable(["max", "avg", "min", "ratio"])
-            if times:
-                table.add_row([max(times), sum(times) / len(times), min(times),
-                               float(len(times)) / len(raw)])
+            if succeeded:
+                table.add_row([result_stats["max"], result_stats["avg"],
+                               result_stats["min"],
+                               float(succeeded) / result_stats["iterations"]])
             else:
                 table.add_row(['n/a', 'n/a', 'n/a', 0])
             print(table)
 
+            # NOTE(hughsaunders): The raw data may be a sample of the
+            #                     iterations, the histogram covers all, so
+            #                     both the percentiles and the bins come
+            #                     from the latter if there is one.
+            if "histogram" in result["data"]:
+                times_hist = rstats.Histogram.from_dict(
+                                        result["data"]["histogram"])
+                times_stats = times_hist.stats()
+                buckets = times_hist.bins()
+            else:
+                times = [r["time"] for r in raw if not r.get("error")]
+                times_stats = rstats.compute(times)
+                buckets = rstats.histogram(times) if times else None
+            if times_stats:
+                keys = [rstats.percentile_key(p) for p in rstats.PERCENTILES]
+                percentiles_table = prettytable.PrettyTable(["stddev"] + keys)
+                percentiles_table.add_row([times_stats["stddev"]] +
+                                          [times_stats[key] for key in keys])
+                print(_("Percentiles (sec):"))
+                print(percentiles_table)
+                print(_("Histogram (sec):"))
+                widest = max(bucket["count"] for bucket in buckets)
+                for bucket in buckets:
+                    print("  %9.3f - %9.3f | %6d %s"
+                          % (bucket["from"], bucket["to"], bucket["count"],
+                             "#" * (40 * bucket["count"] // widest)))
+
+            if "iterations_per_second" in result["data"]:
+                print(_("Iterations per second: %s")
+                      % result["data"]["iterations_per_second"])
+            by_concurrency = result["data"].get(
+                                    "iterations_per_second_by_concurrency")
+            if by_concurrency:
+                print(_("Iterations per second by active users:"))
+                for users, rate in sorted(by_concurrency.items(),
+                                          key=lambda item: int(item[0])):
+                    print("  %s: %s" % (users, rate))
+
+            if "setup_duration" in result["data"]:
+                print(_("Setup of temporary tenants and users (sec): "
+                        "%(setup)s, teardown (sec): %(teardown)s")
+                      % {'setup': result["data"]["setup_duration"],
+                         'teardown': result["data"].get("teardown_duration",
+                                                        'n/a')})
+
+            cleanup_durations = result["data"].get("cleanup_durations")
+            if cleanup_durations:
+                print(_("Cleanup of the resources (sec):"))
+                for name, duration in sorted(cleanup_durations.items()):
+                    print("  %s: %s" % (name, duration if duration is not None
+                                        else _("not drained")))
+
+            overlaps = result["data"].get("overlaps")
+            if overlaps:
+                print(_("Ran at the same time as (sec of overlap):"))
+                for overlap in overlaps:
+                    print("  %(group)s: %(name)s, args position %(pos)s: "
+                          "%(duration).2f" % overlap)
+
+            actions_stats = processing.atomic_actions_stats(raw)
+            if actions_stats:
+                actions_table = prettytable.PrettyTable(
+                    ["action", "count", "max", "avg", "min", "90 percentile",
+                     "95 percentile"])
+                for name, action_stats in actions_stats:
+                    actions_table.add_row([name, action_stats["count"],
+                                           action_stats["max"],
+                                           action_stats["avg"],
+                                           action_stats["min"],
+                                           action_stats["p90"],
+                                           action_stats["p95"]])
+                print(_("Atomic actions (sec):"))
+                print(actions_table)
+
+            # Only open-loop (rps) runs record start lags
+            lags = [r['start_lag'] for r in raw if 'start_lag' in r]
+            if lags:
+                print(_("Start lag (sec): max %(max)s, avg %(avg)s, "
+                        "min %(min)s") % {'max': max(lags),
+                                          'avg': sum(lags) / len(lags),
+                                          'min': min(lags)})
+
             #NOTE(hughsaunders): ssrs=scenario specific results
             ssrs = []
             for result in raw:
@@ -218,7 +351,7 @@ class TaskCommands(object):
     @cliutils.args('--pretty', type=str, help='uuid of task')
     def results(self, task_id, pretty=False):
         """Print raw results of task."""
-        results = map(lambda x: {"key": x["key"], 'result': x['data']['raw']},
+        results = map(lambda x: {"key": x["key"], 'result': _get_raw(x)},
                       db.task_result_get_all_by_uuid(task_id))
         if not pretty or pretty == 'json':
             print(json.dumps(results))
@@ -247,8 +380,18 @@ class TaskCommands(object):
         """Delete a specific task and related results."""
         api.delete_task(task_id, force=force)
 
-    @cliutils.args('--plot-type', type=str, help='plot type; available types: '
-                   ', '.join(processing.PLOTS.keys()))
+    @cliutils.args('--task-id', type=str, dest='task_id', required=True,
+                   help='UUID of task')
+    def cleanup(self, task_id):
+        """Delete the resources left in the cloud by a task.
+
+        :param task_id: Task uuid
+        """
+        api.cleanup_task(task_id)
+
+    @cliutils.args('--plot-type', type=str,
+                   help='plot type; available types: %s'
+                        % ', '.join(PLOT_TYPES))
     @cliutils.args('--field-name', type=str, help='field from the task config '
                    'to aggregate the data on: concurrent/times/...')
     @cliutils.args('--task-id', type=str, help='uuid of task')
@@ -259,10 +402,65 @@ class TaskCommands(object):
             print("Plot type '%s' not supported." % plot_type)
 
 
+class UserPoolCommands(object):
+
+    @cliutils.args('--deploy-id', dest='deploy_id', type=str, required=True,
+                   help='UUID of a deployment.')
+    @cliutils.args('--tenants', type=int, default=1,
+                   help='Number of tenants to create.')
+    @cliutils.args('--users-per-tenant', dest='users_per_tenant', type=int,
+                   default=1, help='Number of users to create per tenant.')
+    def create(self, deploy_id, tenants=1, users_per_tenant=1):
+        """Create tenants and users to be reused by the tasks.
+
+        :param deploy_id: a UUID of the deployment
+        :param tenants: number of tenants
+        :param users_per_tenant: number of users per tenant
+        """
+        api.create_user_pool(deploy_id, tenants, users_per_tenant)
+
+    @cliutils.args('--deploy-id', dest='deploy_id', type=str, required=True,
+                   help='UUID of a deployment.')
+    def check(self, deploy_id):
+        """Check that all the users of the user pool can authenticate."""
+        failed = api.check_user_pool(deploy_id)
+        if failed:
+            print(_("Users that cannot authenticate: %s") % ", ".join(failed))
+            return 1
+        print(_("All the users of the pool are OK."))
+
+    @cliutils.args('--deploy-id', dest='deploy_id', type=str, required=True,
+                   help='UUID of a deployment.')
+    def show(self, deploy_id):
+        """Print the users of the user pool of the deployment."""
+        table = prettytable.PrettyTable(['tenant_name', 'username'])
+        for resource in db.resource_get_all(deploy_id,
+                                            provider_name='UserPool'):
+            for endpoint in resource['info']['endpoints']:
+                table.add_row([endpoint['tenant_name'],
+                               endpoint['username']])
+            if resource['leased_by']:
+                print(_("Leased by the task %s") % resource['leased_by'])
+        print(table)
+
+    @cliutils.args('--deploy-id', dest='deploy_id', type=str, required=True,
+                   help='UUID of a deployment.')
+    def release(self, deploy_id):
+        """Release the user pool, e.g. if the task that leased it died."""
+        api.release_user_pool(deploy_id)
+
+    @cliutils.args('--deploy-id', dest='deploy_id', type=str, required=True,
+                   help='UUID of a deployment.')
+    def delete(self, deploy_id):
+        """Delete the tenants and users of the user pool."""
+        api.delete_user_pool(deploy_id)
+
+
 def main():
     categories = {
         'task': TaskCommands,
         'deployment': DeploymentCommands,
+        'userpool': UserPoolCommands,
     }
     cliutils.run(sys.argv, categories)
 
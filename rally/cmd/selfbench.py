@@ -0,0 +1,127 @@
+# Copyright 2013: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+""" Benchmarks the overhead of Rally itself and tracks it across versions.
+
+Every run appends a JSON line with the Rally version and the metrics to the
+results file, and is compared with the last run of another version found
+there.
+"""
+
+from __future__ import print_function
+
+import json
+import os
+import sys
+import time
+
+from oslo.config import cfg
+import prettytable
+
+from rally.benchmark import selfbench
+from rally.openstack.common.gettextutils import _
+from rally.openstack.common import log as logging
+from rally import version
+
+
+selfbench_opts = [
+    cfg.IntOpt('iterations',
+               default=1000,
+               help='Number of iterations of every benchmark run'),
+    cfg.IntOpt('active_users',
+               default=10,
+               help='Number of active users of every benchmark run'),
+    cfg.IntOpt('duration',
+               default=10,
+               help='Number of seconds the duration mode runs last'),
+    cfg.FloatOpt('rps',
+                 default=200,
+                 help='Number of iterations started per second by the rps '
+                      'and periodic mode runs'),
+    cfg.StrOpt('results_file',
+               default='rally-selfbench.json',
+               help='File the results are appended to and compared with'),
+]
+
+CONF = cfg.CONF
+CONF.register_cli_opts(selfbench_opts, group='selfbench')
+
+
+def load_results(path):
+    """Returns the stored runs, oldest first."""
+    if not os.path.exists(path):
+        return []
+    with open(path) as results_file:
+        return [json.loads(line) for line in results_file if line.strip()]
+
+
+def store_result(path, result):
+    with open(path, "a") as results_file:
+        results_file.write(json.dumps(result) + "\n")
+
+
+def _baseline(runs, current_version):
+    """Returns the last stored run of another version, or the last one."""
+    for run in reversed(runs):
+        if run["version"] != current_version:
+            return run
+    return runs[-1] if runs else None
+
+
+def _format(value):
+    return "n/a" if value is None else "%.4f" % value
+
+
+def print_comparison(baseline, result):
+    headers = ["metric", baseline["version"] if baseline else "",
+               result["version"], "change"]
+    table = prettytable.PrettyTable(headers)
+    table.align["metric"] = "l"
+    regressions = 0
+    for name, old, new, change, regressed in selfbench.compare(
+            baseline["metrics"] if baseline else {}, result["metrics"]):
+        if change is None:
+            change_text = ""
+        else:
+            change_text = "%+.1f%%%s" % (change * 100,
+                                         " !" if regressed else "")
+        regressions += regressed
+        table.add_row([name, _format(old), _format(new), change_text])
+    print(table)
+    if regressions:
+        print(_("%d metrics got worse (marked with !).") % regressions)
+
+
+def main():
+    cfg.CONF(sys.argv[1:], project='rally',
+             version=version.version_string())
+    logging.setup('rally')
+
+    conf = CONF.selfbench
+    with selfbench.SelfBenchmark(iterations=conf.iterations,
+                                 active_users=conf.active_users,
+                                 duration=conf.duration,
+                                 rps=conf.rps) as bench:
+        metrics = bench.run()
+
+    result = {"version": version.version_string(), "time": time.time(),
+              "metrics": metrics}
+    baseline = _baseline(load_results(conf.results_file), result["version"])
+    store_result(conf.results_file, result)
+    print_comparison(baseline, result)
+
+
+if __name__ == '__main__':
+    main()
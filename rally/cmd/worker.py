@@ -0,0 +1,146 @@
+# Copyright 2013: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+""" Worker daemon that runs the queued tasks. """
+
+import multiprocessing
+import os
+import socket
+import sys
+import time
+
+from oslo.config import cfg
+
+from rally import consts
+from rally import db
+from rally import exceptions
+from rally import objects
+from rally.openstack.common.gettextutils import _
+from rally.openstack.common import log as logging
+from rally.orchestrator import api
+from rally import version
+
+
+LOG = logging.getLogger(__name__)
+
+
+worker_opts = [
+    cfg.IntOpt('tasks',
+               default=1,
+               help='Number of queued tasks a worker runs at the same time'),
+    cfg.IntOpt('max_tasks_per_deployment',
+               default=1,
+               help='Maximum number of queued tasks of a deployment run at '
+                    'the same time, by all the workers together'),
+    cfg.IntOpt('poll_interval',
+               default=5,
+               help='Number of seconds between two checks of the queue by '
+                    'a worker that has room for more tasks'),
+]
+
+CONF = cfg.CONF
+CONF.register_opts(worker_opts, group='worker')
+
+DONE_STATUSES = [consts.TaskStatus.FINISHED, consts.TaskStatus.FAILED,
+                 consts.TaskStatus.ABORTED]
+
+
+def _run_task(task_uuid):
+    """Runs a claimed task, in a process of its own."""
+    try:
+        api.run_queued_task(task_uuid)
+    except Exception:
+        LOG.exception(_("Task %s failed.") % task_uuid)
+        # NOTE(hughsaunders): A task that failed before its benchmarks
+        #                     started would otherwise stay claimed forever.
+        task = objects.Task.get(task_uuid)
+        if task.get_status() == consts.TaskStatus.INIT:
+            task.update_status(consts.TaskStatus.FAILED)
+        sys.exit(1)
+
+
+def _fail_unfinished(task_uuid):
+    """Marks the task of a child that is over as FAILED if it is not done.
+
+    A child that got killed or crashed leaves its task in the status it
+    was in, which would keep counting as running for its deployment.
+    """
+    unfinished = [status for status in consts.TaskStatus
+                  if status not in DONE_STATUSES]
+    try:
+        task = objects.Task.get(task_uuid)
+        task.update_status(consts.TaskStatus.FAILED,
+                           allowed_statuses=unfinished)
+    except (exceptions.TaskNotFound, exceptions.TaskInvalidStatus):
+        return
+    LOG.warning(_("Task %s was not done by its process, marked it as "
+                  "failed.") % task_uuid)
+
+
+class Worker(object):
+    """Claims the queued tasks and runs every one in a child process."""
+
+    def __init__(self, name=None):
+        self.name = name or "%s:%d" % (socket.gethostname(), os.getpid())
+        self.processes = {}
+
+    def _reap(self):
+        for task_uuid, process in self.processes.items():
+            if not process.is_alive():
+                process.join()
+                LOG.info(_("Task %(uuid)s is over, exit code %(code)s.") %
+                         {"uuid": task_uuid, "code": process.exitcode})
+                del self.processes[task_uuid]
+                _fail_unfinished(task_uuid)
+
+    def poll(self):
+        """Starts the queued tasks the worker has room for.
+
+        :returns: Number of the tasks started
+        """
+        self._reap()
+        started = 0
+        while len(self.processes) < CONF.worker.tasks:
+            task = objects.Task.claim(self.name,
+                                      CONF.worker.max_tasks_per_deployment)
+            if task is None:
+                break
+            LOG.info(_("Starting task %s.") % task['uuid'])
+            # NOTE(hughsaunders): The child must not share the DB
+            #                     connections of this process.
+            db.db_cleanup()
+            process = multiprocessing.Process(target=_run_task,
+                                              args=(task['uuid'],))
+            process.start()
+            self.processes[task['uuid']] = process
+            started += 1
+        return started
+
+    def serve(self):
+        LOG.info(_("Worker %s is waiting for tasks.") % self.name)
+        while True:
+            self.poll()
+            time.sleep(CONF.worker.poll_interval)
+
+
+def main():
+    cfg.CONF(sys.argv[1:], project='rally',
+             version=version.version_string())
+    logging.setup('rally')
+    Worker().serve()
+
+
+if __name__ == '__main__':
+    main()
@@ -29,6 +29,8 @@ class _TaskStatus(utils.ImmutableMixin, utils.EnumMixin):
     CLEANUP = 'cleanup'
     FINISHED = 'finished'
     FAILED = 'failed'
+    ABORTING = 'aborting'
+    ABORTED = 'aborted'
 
     TEST_TOOL_PATCHING_OPENSTACK = 'test_tool->patching_openstack'
     TEST_TOOL_VERIFY_OPENSTACK = 'test_tool->verify_openstack'
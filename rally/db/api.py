@@ -94,6 +94,37 @@ def task_update(uuid, values):
     return IMPL.task_update(uuid, values)
 
 
+def task_update_status(uuid, status, allowed_statuses):
+    """Update the status of a task if it is in one of the allowed statuses.
+
+    The check and the update are done in one transaction.
+
+    :param uuid: UUID of the task.
+    :param status: New status of the task.
+    :param allowed_statuses: List of the statuses the task may be in.
+    :raises: :class:`rally.exceptions.TaskNotFound` if the task does not
+             exist.
+    :raises: :class:`rally.exceptions.TaskInvalidStatus` if the status
+             of the task is not one of the allowed ones.
+    """
+    return IMPL.task_update_status(uuid, status, allowed_statuses)
+
+
+def task_claim(worker, max_per_deployment):
+    """Assign the oldest queued task that can be run to a worker.
+
+    A queued task can be run if fewer than max_per_deployment tasks of
+    its deployment are being run by workers. The check and the
+    assignment are done in one transaction.
+
+    :param worker: Name of the worker.
+    :param max_per_deployment: Maximum number of tasks of a deployment
+                               run by the workers at the same time.
+    :returns: The claimed task, None if there is none to claim.
+    """
+    return IMPL.task_claim(worker, max_per_deployment)
+
+
 def task_list(status=None):
     """Get a list of tasks.
 
@@ -109,24 +140,29 @@ def task_delete(uuid, status=None):
     """Delete a task.
 
     This method removes the task by the uuid, but if the status
-    argument is specified, then the task is removed only when these
-    statuses are equal otherwise an exception is raised.
+    argument is specified, then the task is removed only when its
+    status is the given one (or one of the given list of statuses)
+    otherwise an exception is raised.
 
     :param uuid: UUID of the task.
+    :param status: A status or a list of statuses.
     :raises: :class:`rally.exceptions.Task` if the task does not exist.
     :raises: :class:`rally.exceptions.TaskInvalidStatus` if the status
-             of the task does not equal to the status argument.
+             of the task is not one of those of the status argument.
     """
     return IMPL.task_delete(uuid, status=status)
 
 
-def task_result_get_all_by_uuid(task_uuid):
+def task_result_get_all_by_uuid(task_uuid, load_data=True):
     """Get list of task results.
 
     :param task_uuid: string with UUID of Task instance
+    :param load_data: if False, the (possibly huge) data column is not
+                      loaded from the DB and must not be accessed; the key
+                      and the progress are
     :returns: list instances of TaskResult
     """
-    return IMPL.task_result_get_all_by_uuid(task_uuid)
+    return IMPL.task_result_get_all_by_uuid(task_uuid, load_data=load_data)
 
 
 def task_result_create(task_uuid, key, data):
@@ -134,6 +170,85 @@ def task_result_create(task_uuid, key, data):
     return IMPL.task_result_create(task_uuid, key, data)
 
 
+def task_result_update_progress(result_id, progress):
+    """Replace the progress report of a task result.
+
+    :param result_id: ID of the task result record
+    :param progress: dict with the rolling metrics of the running benchmark
+    :raises: :class:`rally.exceptions.TaskResultNotFound` if the task
+             result does not exist.
+    """
+    return IMPL.task_result_update_progress(result_id, progress)
+
+
+def task_result_update_data(result_id, values):
+    """Add or replace keys of the data of a task result.
+
+    :param result_id: ID of the task result record
+    :param values: dict with the keys to set; the iteration results go
+                   to task_iteration_create_many() instead
+    :raises: :class:`rally.exceptions.TaskResultNotFound` if the task
+             result does not exist.
+    :returns: the updated task result
+    """
+    return IMPL.task_result_update_data(result_id, values)
+
+
+def task_iteration_create_many(task_uuid, result_id, iterations):
+    """Bulk insert per-iteration records of a task result.
+
+    :param task_uuid: UUID of the task
+    :param result_id: ID of the task result the iterations belong to
+    :param iterations: list of dicts with iteration, duration, idle_time,
+                       error, error_type, concurrency and raw keys; raw is
+                       the iteration result, or None if it is not kept
+    """
+    return IMPL.task_iteration_create_many(task_uuid, result_id, iterations)
+
+
+def task_iteration_drop_raw(result_id, iterations):
+    """Forget the iteration results of iterations of a task result.
+
+    :param result_id: ID of the task result
+    :param iterations: list of the indexes of the iterations
+    """
+    return IMPL.task_iteration_drop_raw(result_id, iterations)
+
+
+def task_iteration_get_raw(result_id):
+    """Get the kept iteration results of a task result.
+
+    :param result_id: ID of the task result
+    :returns: list of the iteration results, in the order of the iterations
+    """
+    return IMPL.task_iteration_get_raw(result_id)
+
+
+def task_iteration_stats(task_uuid):
+    """Aggregate the iterations of each task result on the DB side.
+
+    The min/avg/max durations are computed only over successful iterations.
+
+    :param task_uuid: UUID of the task
+    :returns: a dict mapping task result IDs to dicts with iterations,
+              errors, min, avg and max keys
+    """
+    return IMPL.task_iteration_stats(task_uuid)
+
+
+def task_iteration_stats_by_concurrency(task_uuid):
+    """Aggregate the iterations of each task result per concurrency level.
+
+    Only the iterations tagged with a concurrency level (i.e. the ones
+    produced by step-load runs) are taken into account.
+
+    :param task_uuid: UUID of the task
+    :returns: a dict mapping task result IDs to dicts that map concurrency
+              levels to dicts with iterations, errors, min, avg and max keys
+    """
+    return IMPL.task_iteration_stats_by_concurrency(task_uuid)
+
+
 def deployment_create(values):
     """Create a deployment from the values dictionary.
 
@@ -204,6 +319,46 @@ def resource_get_all(deployment_uuid, provider_name=None, type=None):
                                  type=type)
 
 
+def resource_update(id, values):
+    """Update a resource by values.
+
+    :param id: ID of a resource
+    :param values: a dict with data on the resource
+    :raises: :class:`rally.exceptions.ResourceNotFound` if the resource
+             does not exist.
+    :returns: a dict with updated data on the resource
+    """
+    return IMPL.resource_update(id, values)
+
+
+def resource_lease(id, lessee):
+    """Lease a resource, unless something else has leased it.
+
+    The lease is taken by a single conditional UPDATE, so that two lessees
+    can never hold the same resource.
+
+    :param id: ID of a resource
+    :param lessee: who leases the resource, e.g. the UUID of a task; it may
+                   lease the resource again
+    :raises: :class:`rally.exceptions.ResourceIsLeased` if something else
+             has leased the resource,
+             :class:`rally.exceptions.ResourceNotFound` if the resource
+             does not exist.
+    :returns: a dict with data on the resource
+    """
+    return IMPL.resource_lease(id, lessee)
+
+
+def resource_release(id, lessee=None):
+    """Release the lease of a resource.
+
+    :param id: ID of a resource
+    :param lessee: if given, the lease is released only if it is the one of
+                   the lessee; otherwise it is released whoever holds it
+    """
+    return IMPL.resource_release(id, lessee=lessee)
+
+
 def resource_delete(id):
     """Delete a resource.
 
@@ -20,6 +20,7 @@ import sys
 
 import sqlalchemy as sa
 
+from rally import consts
 from rally.db.sqlalchemy import models
 from rally import exceptions
 from rally.openstack.common.db.sqlalchemy import session as db_session
@@ -108,6 +109,47 @@ def task_update(uuid, values):
     return task
 
 
+def task_update_status(uuid, status, allowed_statuses):
+    session = db_session.get_session()
+    with session.begin():
+        base_query = model_query(models.Task, session=session).\
+                        filter_by(uuid=uuid)
+        query = base_query.filter(models.Task.status.in_(allowed_statuses))
+        count = query.update({'status': status}, synchronize_session=False)
+        if not count:
+            task = base_query.first()
+            if task:
+                raise exceptions.TaskInvalidStatus(
+                                    uuid=uuid,
+                                    require=', '.join(allowed_statuses),
+                                    actual=task.status)
+            raise exceptions.TaskNotFound(uuid=uuid)
+
+
+def task_claim(worker, max_per_deployment):
+    done = [consts.TaskStatus.FINISHED, consts.TaskStatus.FAILED,
+            consts.TaskStatus.ABORTED]
+    session = db_session.get_session()
+    with session.begin():
+        # NOTE(hughsaunders): The queued tasks are locked, so that the
+        #                     workers claim them one at a time.
+        queued = model_query(models.Task, session=session).\
+                    filter_by(queued=True, worker=None,
+                              status=consts.TaskStatus.INIT).\
+                    order_by(models.Task.id).\
+                    with_lockmode('update').\
+                    all()
+        for task in queued:
+            running = model_query(models.Task, session=session).\
+                        filter_by(deployment_uuid=task.deployment_uuid).\
+                        filter(~models.Task.status.in_(done)).\
+                        filter(models.Task.worker.isnot(None))
+            if running.count() < max_per_deployment:
+                task.update({'worker': worker})
+                return task
+    return None
+
+
 def task_list(status=None):
     query = model_query(models.Task)
     if status is not None:
@@ -116,21 +158,27 @@ def task_list(status=None):
 
 
 def task_delete(uuid, status=None):
+    if isinstance(status, basestring):
+        status = [status]
     session = db_session.get_session()
     with session.begin():
         query = base_query = model_query(models.Task).filter_by(uuid=uuid)
         if status is not None:
-            query = base_query.filter_by(status=status)
+            query = base_query.filter(models.Task.status.in_(status))
         count = query.delete(synchronize_session=False)
         if not count:
             if status is not None:
                 task = base_query.first()
                 if task:
-                    raise exceptions.TaskInvalidStatus(uuid=uuid,
-                                                       require=status,
-                                                       actual=task.status)
+                    raise exceptions.TaskInvalidStatus(
+                                        uuid=uuid, require=', '.join(status),
+                                        actual=task.status)
             raise exceptions.TaskNotFound(uuid=uuid)
 
+        model_query(models.TaskIteration).\
+            filter_by(task_uuid=uuid).\
+            delete(synchronize_session=False)
+
         model_query(models.TaskResult).\
             filter_by(task_uuid=uuid).\
             delete(synchronize_session=False)
@@ -143,10 +191,109 @@ def task_result_create(task_uuid, key, data):
     return result
 
 
-def task_result_get_all_by_uuid(uuid):
-    return model_query(models.TaskResult).\
-                filter_by(task_uuid=uuid).\
-                all()
+def task_result_update_data(result_id, values):
+    session = db_session.get_session()
+    with session.begin():
+        result = model_query(models.TaskResult, session=session).\
+                    filter_by(id=result_id).\
+                    first()
+        if not result:
+            raise exceptions.TaskResultNotFound(id=result_id)
+        data = dict(result.data)
+        data.update(values)
+        result.data = data
+    return result
+
+
+def task_result_update_progress(result_id, progress):
+    session = db_session.get_session()
+    with session.begin():
+        count = model_query(models.TaskResult, session=session).\
+            filter_by(id=result_id).\
+            update({'progress': progress}, synchronize_session=False)
+        if not count:
+            raise exceptions.TaskResultNotFound(id=result_id)
+
+
+def task_result_get_all_by_uuid(uuid, load_data=True):
+    query = model_query(models.TaskResult).filter_by(task_uuid=uuid)
+    if not load_data:
+        query = query.options(sa.orm.defer('data'))
+    return query.all()
+
+
+def task_iteration_create_many(task_uuid, result_id, iterations):
+    if not iterations:
+        return
+    rows = [dict(iteration, task_uuid=task_uuid, result_id=result_id)
+            for iteration in iterations]
+    session = db_session.get_session()
+    with session.begin():
+        # A single INSERT with many parameter sets is sent to the DB
+        # driver as one executemany() call.
+        session.execute(models.TaskIteration.__table__.insert(), rows)
+
+
+def task_iteration_drop_raw(result_id, iterations):
+    if not iterations:
+        return
+    iteration = models.TaskIteration
+    session = db_session.get_session()
+    with session.begin():
+        model_query(iteration, session=session).\
+            filter_by(result_id=result_id).\
+            filter(iteration.iteration.in_(iterations)).\
+            update({'raw': None}, synchronize_session=False)
+
+
+def task_iteration_get_raw(result_id):
+    iteration = models.TaskIteration
+    query = model_query(iteration).\
+        with_entities(iteration.raw).\
+        filter_by(result_id=result_id).\
+        filter(iteration.raw.isnot(None)).\
+        order_by(iteration.iteration)
+    return [row[0] for row in query.all()]
+
+
+def _task_iteration_stats_query(task_uuid, *group_by):
+    iteration = models.TaskIteration
+    succeeded = sa.case([(sa.not_(iteration.error), iteration.duration)])
+    columns = group_by + (sa.func.count(iteration.id),
+                          sa.func.count(succeeded),
+                          sa.func.min(succeeded),
+                          sa.func.avg(succeeded),
+                          sa.func.max(succeeded))
+    return model_query(iteration).\
+        with_entities(*columns).\
+        filter_by(task_uuid=task_uuid).\
+        group_by(*group_by)
+
+
+def _task_iteration_stats_row(total, ok, min_, avg, max_):
+    return {"iterations": total, "errors": total - ok,
+            "min": min_, "avg": avg, "max": max_}
+
+
+def task_iteration_stats(task_uuid):
+    iteration = models.TaskIteration
+    query = _task_iteration_stats_query(task_uuid, iteration.result_id)
+    stats = {}
+    for row in query.all():
+        stats[row[0]] = _task_iteration_stats_row(*row[1:])
+    return stats
+
+
+def task_iteration_stats_by_concurrency(task_uuid):
+    iteration = models.TaskIteration
+    query = _task_iteration_stats_query(task_uuid, iteration.result_id,
+                                        iteration.concurrency)
+    query = query.filter(iteration.concurrency.isnot(None))
+    stats = {}
+    for row in query.all():
+        stats.setdefault(row[0], {})[row[1]] = \
+            _task_iteration_stats_row(*row[2:])
+    return stats
 
 
 def _deployment_get(uuid, session=None):
@@ -218,6 +365,46 @@ def resource_get_all(deployment_uuid, provider_name=None, type=None):
     return query.all()
 
 
+def resource_update(id, values):
+    session = db_session.get_session()
+    values.pop('id', None)
+    with session.begin():
+        resource = model_query(models.Resource, session=session).\
+                    filter_by(id=id).\
+                    first()
+        if not resource:
+            raise exceptions.ResourceNotFound(id=id)
+        resource.update(values)
+    return resource
+
+
+def resource_lease(id, lessee):
+    resource = models.Resource
+    session = db_session.get_session()
+    with session.begin():
+        base_query = model_query(resource, session=session).filter_by(id=id)
+        count = base_query.\
+            filter(sa.or_(resource.leased_by.is_(None),
+                          resource.leased_by == lessee)).\
+            update({'leased_by': lessee}, synchronize_session=False)
+        if not count:
+            current = base_query.first()
+            if current:
+                raise exceptions.ResourceIsLeased(id=id,
+                                                  lessee=current.leased_by)
+            raise exceptions.ResourceNotFound(id=id)
+        return base_query.first()
+
+
+def resource_release(id, lessee=None):
+    session = db_session.get_session()
+    with session.begin():
+        query = model_query(models.Resource, session=session).filter_by(id=id)
+        if lessee is not None:
+            query = query.filter_by(leased_by=lessee)
+        query.update({'leased_by': None}, synchronize_session=False)
+
+
 def resource_delete(id):
     count = model_query(models.Resource).\
                 filter_by(id=id).\
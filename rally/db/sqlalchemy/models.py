@@ -107,6 +107,10 @@ class Resource(BASE, RallyBase):
         nullable=False,
     )
 
+    # NOTE(hughsaunders): A column of its own, so that a resource is leased
+    #                     by a single conditional UPDATE.
+    leased_by = sa.Column(sa.String(36), nullable=True)
+
     deployment_uuid = sa.Column(
         sa.String(36),
         sa.ForeignKey(Deployment.uuid),
@@ -135,6 +139,17 @@ class Task(BASE, RallyBase):
     failed = sa.Column(sa.Boolean, default=False, nullable=False)
     verification_log = sa.Column(sa.Text, default='', nullable=True)
 
+    # NOTE(hughsaunders): Queued tasks keep their config until a worker
+    #                     claims them, the worker column then names it.
+    queued = sa.Column(sa.Boolean, default=False, nullable=False)
+    config = sa.Column(
+        sa_types.MutableDict.as_mutable(sa_types.JSONEncodedDict),
+        default={},
+        nullable=False,
+    )
+    use_user_pool = sa.Column(sa.Boolean, default=False, nullable=False)
+    worker = sa.Column(sa.String(255), nullable=True)
+
     deployment_uuid = sa.Column(
         sa.String(36),
         sa.ForeignKey(Deployment.uuid),
@@ -158,6 +173,9 @@ class TaskResult(BASE, RallyBase):
                     nullable=False)
     data = sa.Column(sa_types.MutableDict.as_mutable(sa_types.JSONEncodedDict),
                      nullable=False)
+    # NOTE(hughsaunders): Kept apart from the data, so that the status of a
+    #                     running task can be shown without loading it.
+    progress = sa.Column(sa_types.JSONEncodedDict, nullable=True)
 
     task_uuid = sa.Column(sa.String(36), sa.ForeignKey('tasks.uuid'))
     task = sa.orm.relationship(Task,
@@ -166,6 +184,30 @@ class TaskResult(BASE, RallyBase):
                                primaryjoin='TaskResult.task_uuid == Task.uuid')
 
 
+class TaskIteration(BASE, RallyBase):
+    """Represents one iteration of a benchmark scenario."""
+    __tablename__ = "task_iterations"
+    __table_args__ = (
+        sa.Index('task_iteration_task_uuid', 'task_uuid'),
+        sa.Index('task_iteration_result_id', 'result_id'),
+    )
+
+    id = sa.Column(sa.Integer, primary_key=True, autoincrement=True)
+    task_uuid = sa.Column(sa.String(36), sa.ForeignKey('tasks.uuid'),
+                          nullable=False)
+    result_id = sa.Column(sa.Integer, sa.ForeignKey('task_results.id'),
+                          nullable=False)
+    iteration = sa.Column(sa.Integer, nullable=False)
+    duration = sa.Column(sa.Float, nullable=True)
+    idle_time = sa.Column(sa.Float, nullable=True)
+    error = sa.Column(sa.Boolean, default=False, nullable=False)
+    error_type = sa.Column(sa.String(255), nullable=True)
+    concurrency = sa.Column(sa.Integer, nullable=True)
+    # NOTE(hughsaunders): The iteration result as the runner returned it,
+    #                     kept only while it is in the raw sample.
+    raw = sa.Column(sa_types.JSONEncodedDict, nullable=True)
+
+
 def create_db():
     BASE.metadata.create_all(session.get_engine())
 
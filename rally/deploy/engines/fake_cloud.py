@@ -0,0 +1,59 @@
+# Copyright 2013: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from rally.deploy import engine
+from rally import fakecloud
+
+
+class FakeCloud(engine.EngineFactory):
+    """FakeCloud deploys an in-process fake of OpenStack.
+
+       Benchmarking the fake cloud measures the overhead of Rally itself:
+       the calls to the cloud get no network, only the latency and the
+       failures set in the deploy config (see rally.fakecloud.FakeCloud):
+
+       {
+           'name': 'FakeCloud',
+           'latency': {'distribution': 'normal', 'mean': 0.05,
+                       'stddev': 0.01},
+           'failure_rate': 0.001,
+           'build_time': 2,
+           'calls': {
+               'nova.servers.create': {'failure_rate': 0.01}
+           }
+       }
+    """
+
+    CONFIG_SCHEMA = {
+        'type': 'object',
+        'properties': dict(fakecloud.CONFIG_SCHEMA['properties'],
+                           name={'type': 'string'}),
+        'additionalProperties': False,
+    }
+
+    def deploy(self):
+        config = dict(self.config)
+        config.pop('name', None)
+        return {
+            'identity': {
+                'uri': fakecloud.make_uri(self.deployment['uuid'], config),
+                'admin_username': 'admin',
+                'admin_password': 'admin',
+                'admin_tenant_name': 'admin',
+            },
+        }
+
+    def cleanup(self):
+        pass
@@ -110,6 +110,11 @@ class NoSuchScenario(NotFoundException):
     msg_fmt = _("There is no benchmark scenario with name `%(name)s`.")
 
 
+class AmbiguousScenario(RallyException):
+    msg_fmt = _("There are several benchmark scenario classes with name "
+                "`%(name)s`: %(classes)s.")
+
+
 class NoSuchConfigField(NotFoundException):
     msg_fmt = _("There is no field in the task config with name `%(name)s`.")
 
@@ -118,10 +123,27 @@ class TaskNotFound(NotFoundException):
     msg_fmt = _("Task with uuid=%(uuid)s not found.")
 
 
+class TaskResultNotFound(NotFoundException):
+    msg_fmt = _("Task result with id=%(id)s not found.")
+
+
 class DeploymentNotFound(NotFoundException):
     msg_fmt = _("Deployment with uuid=%(uuid)s not found.")
 
 
+class UserPoolNotFound(NotFoundException):
+    msg_fmt = _("Deployment with uuid=%(uuid)s has no user pool.")
+
+
+class UserPoolExists(RallyException):
+    msg_fmt = _("Deployment with uuid=%(uuid)s already has a user pool.")
+
+
+class UserPoolIsBusy(RallyException):
+    msg_fmt = _("User pool of the deployment with uuid=%(uuid)s is leased "
+                "by the task %(task)s.")
+
+
 class DeploymentIsBusy(RallyException):
     msg_fmt = _("There are allocated resources for the deployment with "
                 "uuid=%(uuid)s.")
@@ -131,10 +153,18 @@ class ResourceNotFound(NotFoundException):
     msg_fmt = _("Resource with id=%(id)s not found.")
 
 
+class ResourceIsLeased(RallyException):
+    msg_fmt = _("Resource with id=%(id)s is leased by %(lessee)s.")
+
+
 class TimeoutException(RallyException):
     msg_fmt = _("Timeout exceeded.")
 
 
+class IterationTimeout(TimeoutException):
+    msg_fmt = _("The iteration was stopped after %(timeout)s seconds.")
+
+
 class GetResourceFailure(RallyException):
     msg_fmt = _("Failed to get the resource due to invalid status:"
                 "`%(status)s`")
@@ -149,5 +179,21 @@ class TaskInvalidStatus(RallyException):
                 "required.")
 
 
+class RunAborted(RallyException):
+    msg_fmt = _("The benchmark run has been aborted.")
+
+
+class BenchmarkSetupFailure(RallyException):
+    msg_fmt = _("Unable to set up the benchmark: %(message)s")
+
+
 class ChecksumMismatch(RallyException):
     msg_fmt = _("Checksum mismatch for image: %(url)s")
+
+
+class WorkerFailure(RallyException):
+    msg_fmt = _("Call to %(func)s failed in a worker: %(message)s")
+
+
+class AgentFailure(RallyException):
+    msg_fmt = _("Load generator agent on %(host)s failed: %(message)s")
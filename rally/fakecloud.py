@@ -0,0 +1,531 @@
+# Copyright 2013: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""In-process fake of an OpenStack cloud.
+
+The fake cloud answers the client calls the benchmarks make without any
+network, after a latency drawn from a configurable distribution and with a
+configurable failure rate, so that benchmarking it measures the overhead of
+Rally itself. It is deployed by the FakeCloud engine, whose endpoint has a
+fake:// URI that carries the config of the cloud; osclients.Clients returns
+the fake clients for such URIs.
+
+The state of a fake cloud lives in the process that uses it: the resources
+created by the iterations in the worker processes are only seen there.
+"""
+
+import datetime
+import json
+import math
+import random
+import threading
+import time
+import urllib
+import urlparse
+import uuid
+
+from novaclient import exceptions
+
+from rally.openstack.common.gettextutils import _
+from rally.openstack.common import timeutils
+
+
+# NOTE(hughsaunders): Also known to osclients as FAKE_SCHEME, so that it
+#                     does not import this module for the real clouds.
+SCHEME = "fake"
+
+TASK_STATE = "OS-EXT-STS:task_state"
+
+DISTRIBUTIONS = {
+    "constant": lambda spec: spec["value"],
+    "uniform": lambda spec: random.uniform(spec["min"], spec["max"]),
+    "normal": lambda spec: random.gauss(spec["mean"], spec["stddev"]),
+    "exponential": lambda spec: random.expovariate(1.0 / spec["mean"]),
+    "lognormal": lambda spec: random.lognormvariate(math.log(spec["median"]),
+                                                    spec["sigma"]),
+}
+
+LATENCY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "distribution": {"enum": sorted(DISTRIBUTIONS)},
+        "value": {"type": "number", "minimum": 0},
+        "min": {"type": "number", "minimum": 0},
+        "max": {"type": "number", "minimum": 0},
+        "mean": {"type": "number", "minimum": 0},
+        "stddev": {"type": "number", "minimum": 0},
+        "median": {"type": "number", "exclusiveMinimum": True, "minimum": 0},
+        "sigma": {"type": "number", "minimum": 0},
+    },
+    "required": ["distribution"],
+}
+
+CALL_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "latency": LATENCY_SCHEMA,
+        "failure_rate": {"type": "number", "minimum": 0, "maximum": 1},
+    },
+    "additionalProperties": False,
+}
+
+CONFIG_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "latency": LATENCY_SCHEMA,
+        "failure_rate": {"type": "number", "minimum": 0, "maximum": 1},
+        "build_time": {"type": "number", "minimum": 0},
+        "calls": {"type": "object", "additionalProperties": CALL_SCHEMA},
+    },
+    "additionalProperties": False,
+}
+
+
+_clouds = {}
+_clouds_lock = threading.Lock()
+
+
+def sample_latency(spec):
+    """Returns a latency in seconds drawn from the given distribution.
+
+    :param spec: Dict with the "distribution" name and its parameters,
+                 e.g. {"distribution": "normal", "mean": 0.1,
+                 "stddev": 0.02}; no latency if None
+    """
+    if not spec:
+        return 0
+    return max(0, DISTRIBUTIONS[spec["distribution"]](spec))
+
+
+def make_uri(name, config):
+    """Returns the keystone URI of a fake cloud with the given config."""
+    return "%s://%s/?%s" % (SCHEME, name,
+                            urllib.urlencode({"config": json.dumps(config)}))
+
+
+def is_fake(uri):
+    return urlparse.urlparse(uri).scheme == SCHEME
+
+
+def get_cloud(uri):
+    """Returns the fake cloud of the URI, the same one for the process."""
+    with _clouds_lock:
+        if uri not in _clouds:
+            query = urlparse.parse_qs(urlparse.urlparse(uri).query)
+            config = json.loads(query.get("config", ["{}"])[0])
+            _clouds[uri] = FakeCloud(**config)
+        return _clouds[uri]
+
+
+def _isotime(at):
+    return timeutils.isotime(datetime.datetime.utcfromtimestamp(at),
+                             subsecond=True)
+
+
+class FakeResource(object):
+
+    def __init__(self, manager, name=None, **attrs):
+        self.manager = manager
+        self.id = str(uuid.uuid4())
+        self.name = name or self.id
+        self.status = manager.status
+        self.updated = _isotime(time.time())
+        self._pending = None
+        setattr(self, TASK_STATE, None)
+        for key, value in attrs.items():
+            setattr(self, key, value)
+
+    def delete(self):
+        self.manager.delete(self)
+
+
+class FakeServer(FakeResource):
+
+    def reboot(self, reboot_type="SOFT"):
+        self.manager.action(self, "reboot")
+
+    def start(self):
+        self.manager.action(self, "start")
+
+    def stop(self):
+        self.manager.action(self, "stop")
+
+    def rescue(self):
+        self.manager.action(self, "rescue")
+
+    def unrescue(self):
+        self.manager.action(self, "unrescue")
+
+    def suspend(self):
+        self.manager.action(self, "suspend")
+
+    def resume(self):
+        self.manager.action(self, "resume")
+
+
+class FakeManager(object):
+    """Keeps the resources of one kind, e.g. the servers of a tenant.
+
+    Every call goes through FakeCloud.call() under the name of the manager
+    and the method, e.g. "nova.servers.create". Status transitions take the
+    build_time of the cloud and are applied when the resource is read.
+    """
+
+    resource_class = FakeResource
+    status = "ACTIVE"
+    # NOTE(hughsaunders): Deleted resources of the kinds with a deleted
+    #                     status stay listed, like glance images.
+    deleted_status = None
+
+    def __init__(self, cloud, name):
+        self.cloud = cloud
+        self.name = name
+        self.resources = {}
+
+    def _call(self, method):
+        self.cloud.call("%s.%s" % (self.name, method))
+
+    def _add(self, resource):
+        self.resources[resource.id] = resource
+        return resource
+
+    def _refresh(self, resource):
+        """Applies the pending transition of the resource if it is due.
+
+        :returns: The resource, None if it is gone
+        """
+        pending = resource._pending
+        if pending is None or pending[0] > time.time():
+            return resource
+        at, status = pending
+        resource._pending = None
+        if status is None:
+            self.resources.pop(resource.id, None)
+            return None
+        resource.status = status
+        resource.updated = _isotime(at)
+        setattr(resource, TASK_STATE, None)
+        return resource
+
+    def _transition(self, resource, task_state, final_status, status=None):
+        """Starts a transition of the resource to the final status.
+
+        :param task_state: Task state of the resource during the transition
+        :param final_status: Status the resource ends up in, None if it
+                             ends up deleted
+        :param status: Status of the resource during the transition, the
+                       current one if None
+        """
+        if status is not None:
+            resource.status = status
+        resource._pending = (time.time() + self.cloud.build_time,
+                             final_status)
+        if self.cloud.build_time > 0:
+            setattr(resource, TASK_STATE, task_state)
+            resource.updated = _isotime(time.time())
+        else:
+            self._refresh(resource)
+
+    def _get(self, resource_id):
+        resource = self.resources.get(resource_id)
+        if resource is None or self._refresh(resource) is None:
+            raise exceptions.NotFound(404, _("%(name)s %(id)s not found") %
+                                      {"name": self.name, "id": resource_id})
+        return resource
+
+    def create(self, name=None, **kwargs):
+        self._call("create")
+        return self._add(self.resource_class(self, name=name, **kwargs))
+
+    def get(self, resource_id):
+        self._call("get")
+        return self._get(getattr(resource_id, "id", resource_id))
+
+    def list(self, detailed=True, **filters):
+        self._call("list")
+        resources = [self._refresh(resource)
+                     for resource in self.resources.values()]
+        return [resource for resource in resources if resource is not None and
+                all(getattr(resource, key, None) == value
+                    for key, value in filters.items())]
+
+    def find(self, **kwargs):
+        for resource in self.list(**kwargs):
+            return resource
+        raise exceptions.NotFound(404, _("%s not found") % self.name)
+
+    def delete(self, resource):
+        self._call("delete")
+        resource = self._get(getattr(resource, "id", resource))
+        self._transition(resource, "deleting", self.deleted_status)
+
+
+class FakeServerManager(FakeManager):
+
+    resource_class = FakeServer
+
+    # NOTE(hughsaunders): Action: (status during, task state, final status)
+    ACTIONS = {
+        "reboot": ("REBOOT", "rebooting", "ACTIVE"),
+        "start": (None, "powering-on", "ACTIVE"),
+        "stop": (None, "powering-off", "SHUTOFF"),
+        "rescue": (None, "rescuing", "RESCUE"),
+        "unrescue": (None, "unrescuing", "ACTIVE"),
+        "suspend": (None, "suspending", "SUSPENDED"),
+        "resume": (None, "resuming", "ACTIVE"),
+    }
+
+    def __init__(self, cloud, name, images):
+        super(FakeServerManager, self).__init__(cloud, name)
+        self.images = images
+
+    def create(self, name, image, flavor, min_count=1, **kwargs):
+        self._call("create")
+        servers = [self._add(FakeServer(self, name=name, image=image,
+                                        flavor=flavor))
+                   for i in range(max(1, min_count))]
+        for server in servers:
+            self._transition(server, "spawning", "ACTIVE", status="BUILD")
+        return servers[0]
+
+    def action(self, server, action):
+        self._call(action)
+        server = self._get(server.id)
+        status, task_state, final_status = self.ACTIONS[action]
+        self._transition(server, task_state, final_status, status=status)
+
+    def create_image(self, server, name):
+        self._call("create_image")
+        self._get(server.id)
+        image = self.images._add(FakeResource(self.images, name=name,
+                                              owner=self.images.owner))
+        self.images._transition(image, "saving", "ACTIVE", status="SAVING")
+        return image.id
+
+    def add_floating_ip(self, server, address):
+        self._call("add_floating_ip")
+
+    def remove_floating_ip(self, server, address):
+        self._call("remove_floating_ip")
+
+
+class FakeImageManager(FakeManager):
+
+    deleted_status = "DELETED"
+
+    def __init__(self, cloud, name, owner):
+        super(FakeImageManager, self).__init__(cloud, name)
+        self.owner = owner
+
+    def create(self, name=None, **kwargs):
+        kwargs.setdefault("owner", self.owner)
+        return super(FakeImageManager, self).create(name, **kwargs)
+
+
+class FakeKeypairManager(FakeManager):
+
+    def create(self, name, public_key=None):
+        self._call("create")
+        if any(keypair.name == name for keypair in self.resources.values()):
+            raise exceptions.Conflict(409, _("Key pair %s already exists") %
+                                      name)
+        return self._add(FakeResource(self, name=name,
+                                      public_key=public_key or "fake-public",
+                                      private_key="fake-private"))
+
+
+class FakeSecurityGroupManager(FakeManager):
+
+    def __init__(self, cloud, name):
+        super(FakeSecurityGroupManager, self).__init__(cloud, name)
+        self._add(FakeResource(self, name="default", description="",
+                               rules=[]))
+
+    def create(self, name, description=""):
+        self._call("create")
+        return self._add(FakeResource(self, name=name,
+                                      description=description, rules=[]))
+
+
+class FakeSecurityGroupRuleManager(FakeManager):
+
+    def __init__(self, cloud, name, groups):
+        super(FakeSecurityGroupRuleManager, self).__init__(cloud, name)
+        self.groups = groups
+
+    def create(self, parent_group_id, ip_protocol=None, from_port=None,
+               to_port=None, cidr=None, group_id=None):
+        self._call("create")
+        rule = {"ip_protocol": ip_protocol, "from_port": from_port,
+                "to_port": to_port, "ip_range": {"cidr": cidr}}
+        self.groups._get(parent_group_id).rules.append(rule)
+        return self._add(FakeResource(self, parent_group_id=parent_group_id,
+                                      **rule))
+
+
+class FakeVolumeManager(FakeManager):
+
+    status = "available"
+
+
+class FakeUserManager(FakeManager):
+
+    def create(self, name, password=None, email=None, tenant_id=None,
+               enabled=True):
+        self._call("create")
+        return self._add(FakeResource(self, name=name, email=email,
+                                      tenantId=tenant_id, enabled=enabled))
+
+
+class FakeServiceCatalog(object):
+
+    def get_endpoints(self):
+        return {"image": [{"publicURL": "%s://image" % SCHEME}]}
+
+
+class FakeKeystoneClient(object):
+
+    def __init__(self, cloud, project):
+        self.cloud = cloud
+        self.tenants = cloud.tenants
+        self.users = cloud.users
+        self.roles = cloud.roles
+        self.services = cloud.services
+        self.project_id = project.id
+        self.auth_token = str(uuid.uuid4())
+        self.auth_ref = None
+        self.service_catalog = FakeServiceCatalog()
+
+    def authenticate(self):
+        self.cloud.call("keystone.authenticate")
+        return True
+
+
+class FakeNovaClient(object):
+
+    def __init__(self, cloud, images):
+        self.images = images
+        self.servers = FakeServerManager(cloud, "nova.servers", images)
+        self.keypairs = FakeKeypairManager(cloud, "nova.keypairs")
+        self.security_groups = FakeSecurityGroupManager(
+                                            cloud, "nova.security_groups")
+        self.security_group_rules = FakeSecurityGroupRuleManager(
+                    cloud, "nova.security_group_rules", self.security_groups)
+        self.networks = FakeManager(cloud, "nova.networks")
+        self.floating_ips = FakeManager(cloud, "nova.floating_ips")
+        self.flavors = FakeManager(cloud, "nova.flavors")
+
+
+class FakeGlanceClient(object):
+
+    def __init__(self, images):
+        self.images = images
+
+
+class FakeCinderClient(object):
+
+    def __init__(self, cloud):
+        self.volumes = FakeVolumeManager(cloud, "cinder.volumes")
+        self.volume_types = FakeManager(cloud, "cinder.volume_types")
+        self.transfers = FakeManager(cloud, "cinder.transfers")
+        self.volume_snapshots = FakeVolumeManager(cloud,
+                                                  "cinder.volume_snapshots")
+        self.backups = FakeVolumeManager(cloud, "cinder.backups")
+
+
+class FakeProject(object):
+    """The resources of one tenant of the fake cloud."""
+
+    def __init__(self, cloud, name):
+        self.id = str(uuid.uuid4())
+        self.name = name
+        images = FakeImageManager(cloud, "glance.images", self.id)
+        self.nova = FakeNovaClient(cloud, images)
+        self.glance = FakeGlanceClient(images)
+        self.cinder = FakeCinderClient(cloud)
+
+
+class FakeCloud(object):
+    """A fake OpenStack cloud, see the module docstring."""
+
+    def __init__(self, latency=None, failure_rate=0, build_time=0,
+                 calls=None):
+        """FakeCloud constructor.
+
+        :param latency: Distribution of the latency of every call, see
+                        sample_latency()
+        :param failure_rate: Probability of a call to fail with an error
+                             500 after its latency
+        :param build_time: Seconds the status transitions of servers and
+                           images take, e.g. from BUILD to ACTIVE
+        :param calls: Dict that maps names of calls ("nova.servers.create"),
+                      managers ("nova.servers") or services ("nova") to
+                      dicts with their own "latency" and "failure_rate";
+                      the most specific name wins
+        """
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.build_time = build_time
+        self.calls = calls or {}
+        self.tenants = FakeManager(self, "keystone.tenants")
+        self.users = FakeUserManager(self, "keystone.users")
+        self.roles = FakeManager(self, "keystone.roles")
+        self.services = FakeManager(self, "keystone.services")
+        self._projects = {}
+        self._call_configs = {}
+        self._lock = threading.Lock()
+
+    def _call_config(self, name):
+        if name not in self._call_configs:
+            config = {"latency": self.latency,
+                      "failure_rate": self.failure_rate}
+            parts = name.split(".")
+            for i in range(1, len(parts) + 1):
+                config.update(self.calls.get(".".join(parts[:i]), {}))
+            self._call_configs[name] = config
+        return self._call_configs[name]
+
+    def call(self, name):
+        """Simulates the latency and the failures of a call to the cloud.
+
+        :raises: novaclient.exceptions.ClientException if the call fails
+        """
+        config = self._call_config(name)
+        latency = sample_latency(config["latency"])
+        if latency:
+            time.sleep(latency)
+        if random.random() < config["failure_rate"]:
+            raise exceptions.ClientException(500, _("Fake failure of %s") %
+                                             name)
+
+    def project(self, tenant_name):
+        with self._lock:
+            if tenant_name not in self._projects:
+                self._projects[tenant_name] = FakeProject(self, tenant_name)
+            return self._projects[tenant_name]
+
+    def get_client(self, service, username, password, tenant_name,
+                   auth_url):
+        """Returns a fake client of the service ("nova" etc.) for the user.
+
+        Any credentials are accepted; the clients of the users of one
+        tenant share its resources.
+        """
+        project = self.project(tenant_name)
+        if service == "keystone":
+            client = FakeKeystoneClient(self, project)
+            client.authenticate()
+            return client
+        return getattr(project, service)
@@ -78,5 +78,17 @@ class Deployment(object):
     def delete_resource(resource_id):
         db.resource_delete(resource_id)
 
+    @staticmethod
+    def update_resource(resource_id, info):
+        return db.resource_update(resource_id, {'info': info})
+
+    @staticmethod
+    def lease_resource(resource_id, lessee):
+        return db.resource_lease(resource_id, lessee)
+
+    @staticmethod
+    def release_resource(resource_id, lessee=None):
+        db.resource_release(resource_id, lessee=lessee)
+
     def delete(self):
         db.deployment_delete(self.deployment['uuid'])
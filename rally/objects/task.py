@@ -16,6 +16,19 @@
 from rally import db
 
 
+def _iteration_record(index, result, keep_raw=True):
+    error = result.get('error')
+    return {
+        'iteration': index,
+        'duration': result.get('time'),
+        'idle_time': result.get('idle_time'),
+        'error': bool(error),
+        'error_type': error[0][:255] if error else None,
+        'concurrency': result.get('concurrency'),
+        'raw': result if keep_raw else None,
+    }
+
+
 class Task(object):
     """Represents a task object."""
 
@@ -32,6 +45,15 @@ class Task(object):
     def get(uuid):
         return Task(db.task_get(uuid))
 
+    @staticmethod
+    def claim(worker, max_per_deployment):
+        """Assigns the oldest queued task that can be run to a worker.
+
+        :returns: The Task, None if there is none to claim
+        """
+        task = db.task_claim(worker, max_per_deployment)
+        return Task(task) if task else None
+
     @staticmethod
     def delete_by_uuid(uuid, status=None):
         db.task_delete(uuid, status=status)
@@ -39,8 +61,21 @@ class Task(object):
     def _update(self, values):
         self.task = db.task_update(self.task['uuid'], values)
 
-    def update_status(self, status):
-        self._update({'status': status})
+    def update_status(self, status, allowed_statuses=None):
+        """Updates the status of the task.
+
+        :param allowed_statuses: If given, the status is only updated if the
+                                 task is in one of them, otherwise
+                                 TaskInvalidStatus is raised
+        """
+        if allowed_statuses is None:
+            self._update({'status': status})
+        else:
+            db.task_update_status(self.task['uuid'], status, allowed_statuses)
+
+    def get_status(self):
+        """Returns the status of the task as it is now in the DB."""
+        return db.task_get(self.task['uuid'])['status']
 
     def update_verification_log(self, log):
         self._update({'verification_log': log})
@@ -48,8 +83,43 @@ class Task(object):
     def set_failed(self):
         self._update({'failed': True})
 
+    def set_queued(self):
+        self._update({'queued': True})
+
     def append_results(self, key, value):
-        db.task_result_create(self.task['uuid'], key, value)
+        return db.task_result_create(self.task['uuid'], key, value)
+
+    def extend_results(self, result_id, raw, first_iteration=0,
+                       sampled=None, unsampled=None):
+        """Stores more iterations of a benchmark result.
+
+        :param result_id: ID of the result
+        :param raw: List of the new iteration results
+        :param first_iteration: Index of the first of the new iterations
+        :param sampled: If given, the indexes of the new iterations whose
+                        results are kept in the raw data of the result,
+                        otherwise all of them are kept; the iteration
+                        records are created all the same
+        :param unsampled: Indexes of the iterations stored before whose
+                          results leave the raw data
+        """
+        iterations = [_iteration_record(first_iteration + i, result,
+                                        sampled is None or
+                                        first_iteration + i in sampled)
+                      for i, result in enumerate(raw)]
+        db.task_iteration_create_many(self.task['uuid'], result_id,
+                                      iterations)
+        if unsampled:
+            db.task_iteration_drop_raw(result_id, unsampled)
+
+    def update_result_data(self, result_id, values):
+        return db.task_result_update_data(result_id, values)
+
+    def update_result_progress(self, result_id, progress):
+        db.task_result_update_progress(result_id, progress)
+
+    def get_results(self):
+        return db.task_result_get_all_by_uuid(self.task['uuid'])
 
     def delete(self, status=None):
         db.task_delete(self.task['uuid'], status=status)
@@ -15,8 +15,11 @@
 
 
 from rally.benchmark import engine
+from rally.benchmark import runner
+from rally.benchmark import userpool
 from rally import consts
 from rally import deploy
+from rally import exceptions
 from rally import objects
 
 
@@ -65,7 +68,7 @@ def recreate_deploy(deploy_uuid):
         deployment.update_endpoint(endpoint)
 
 
-def start_task(deploy_uuid, config):
+def start_task(deploy_uuid, config, use_user_pool=False):
     """Start a task.
 
     Taks is a list of benchmarks that will be called one by one, results of
@@ -73,22 +76,164 @@ def start_task(deploy_uuid, config):
 
     :param deploy_uuid: UUID of the deployment
     :param config: a dict with a task configuration
+    :param use_user_pool: if True, the benchmarks are run as the users of
+                          the user pool of the deployment instead of
+                          temporary ones
     """
     deployment = objects.Deployment.get(deploy_uuid)
     task = objects.Task(deployment_uuid=deploy_uuid)
+    _run_task(deployment, task, config, use_user_pool)
 
-    tester = engine.TestEngine(config, task)
-    deployer = deploy.EngineFactory.get_engine(deployment['config']['name'],
-                                               deployment)
-    endpoint = deployment['endpoint']
-    with deployer:
-        with tester.bind(endpoint):
-            tester.run()
+
+def queue_task(deploy_uuid, config, use_user_pool=False):
+    """Queue a task, to be run by a worker (see rally.cmd.worker).
+
+    The config is validated first, so that an invalid one is reported
+    right away rather than by a failed task later.
+
+    :param deploy_uuid: UUID of the deployment
+    :param config: a dict with a task configuration
+    :param use_user_pool: if True, the benchmarks are run as the users of
+                          the user pool of the deployment instead of
+                          temporary ones
+    :raises: :class:`rally.exceptions.InvalidConfigException` or
+             :class:`rally.exceptions.NoSuchScenario` if the config is
+             invalid; the task is then marked as FAILED and not queued
+    :returns: UUID of the task
+    """
+    objects.Deployment.get(deploy_uuid)
+    # NOTE(hughsaunders): The task is queued once it has been validated,
+    #                     so that no worker claims it before.
+    task = objects.Task(deployment_uuid=deploy_uuid, config=config,
+                        use_user_pool=use_user_pool)
+    try:
+        engine.TestEngine(config, task)
+    except Exception:
+        task.update_status(consts.TaskStatus.FAILED)
+        raise
+    task.set_queued()
+    return task['uuid']
+
+
+def run_queued_task(task_uuid):
+    """Run a queued task that has been claimed by a worker.
+
+    Nothing is done if the task has been aborted since it was claimed.
+
+    :param task_uuid: The UUID of the task.
+    """
+    task = objects.Task.get(task_uuid)
+    if task['status'] != consts.TaskStatus.INIT:
+        return
+    deployment = objects.Deployment.get(task['deployment_uuid'])
+    _run_task(deployment, task, task['config'], task['use_user_pool'])
+
+
+def _run_task(deployment, task, config, use_user_pool):
+    user_pool = None
+    if use_user_pool:
+        user_pool = userpool.UserPool.get(deployment)
+        try:
+            user_pool.lease(task['uuid'])
+        except Exception:
+            task.update_status(consts.TaskStatus.FAILED)
+            raise
+
+    try:
+        tester = engine.TestEngine(config, task,
+                                   users=user_pool and user_pool.endpoints)
+        deployer = deploy.EngineFactory.get_engine(
+                                deployment['config']['name'], deployment)
+        endpoint = deployment['endpoint']
+        with deployer:
+            with tester.bind(endpoint):
+                tester.run()
+    finally:
+        if user_pool:
+            user_pool.release(task['uuid'])
+
+
+def create_user_pool(deploy_uuid, tenants, users_per_tenant):
+    """Create the tenants and users of the user pool of a deployment.
+
+    :param deploy_uuid: UUID of the deployment
+    """
+    deployment = objects.Deployment.get(deploy_uuid)
+    userpool.UserPool.create(deployment, tenants, users_per_tenant)
+
+
+def check_user_pool(deploy_uuid):
+    """Check that all the users of the user pool of a deployment work.
+
+    :param deploy_uuid: UUID of the deployment
+    :returns: list of the names of the users that cannot authenticate
+    """
+    deployment = objects.Deployment.get(deploy_uuid)
+    return userpool.UserPool.get(deployment).check()
+
+
+def release_user_pool(deploy_uuid):
+    """Release the user pool of a deployment whoever has leased it.
+
+    :param deploy_uuid: UUID of the deployment
+    """
+    deployment = objects.Deployment.get(deploy_uuid)
+    userpool.UserPool.get(deployment).release()
+
+
+def delete_user_pool(deploy_uuid):
+    """Delete the user pool of a deployment with its tenants and users.
+
+    :param deploy_uuid: UUID of the deployment
+    """
+    deployment = objects.Deployment.get(deploy_uuid)
+    userpool.UserPool.get(deployment).delete()
+
+
+def cleanup_task(task_uuid):
+    """Delete the resources left in the cloud by the benchmarks of a task.
+
+    Only the benchmarks that were interrupted before their own cleanup was
+    over are cleaned up; their temporary tenants and users get deleted too.
+
+    :param task_uuid: The UUID of the task.
+    """
+    task = objects.Task.get(task_uuid)
+    deployment = objects.Deployment.get(task['deployment_uuid'])
+    for result in task.get_results():
+        leftovers = result['data'].get('leftovers')
+        if leftovers:
+            durations = runner.cleanup_leftovers(
+                                deployment['endpoint']['identity'], leftovers)
+            task.update_result_data(result['id'],
+                                    {'cleanup_durations': durations,
+                                     'leftovers': None})
 
 
 def abort_task(task_uuid):
-    """Abort running task."""
-    raise NotImplementedError()
+    """Abort running or queued task.
+
+    A running task is marked as ABORTING; its runner notices it within
+    benchmark.abort_poll_interval seconds, stops starting iterations, lets
+    the running ones finish, cleans up and marks the task as ABORTED.
+    A queued task that has not started yet is marked as ABORTED at once.
+
+    :param task_uuid: The UUID of the task.
+    :raises: :class:`rally.exceptions.TaskInvalidStatus` when the task is
+             neither queued nor running its benchmarks
+    """
+    task = objects.Task.get(task_uuid)
+    if task['queued'] and task['status'] == consts.TaskStatus.INIT:
+        try:
+            task.update_status(consts.TaskStatus.ABORTED,
+                               allowed_statuses=[consts.TaskStatus.INIT])
+            return
+        except exceptions.TaskInvalidStatus:
+            # NOTE(hughsaunders): A worker has just started the task.
+            pass
+    benchmarking = consts.TaskStatus.TEST_TOOL_BENCHMARKING
+    task.update_status(consts.TaskStatus.ABORTING,
+                       allowed_statuses=[benchmarking])
 
 
 def delete_task(task_uuid, force=False):
@@ -98,8 +243,9 @@ def delete_task(task_uuid, force=False):
     :param force: If set to True, then delete the task despite to the
                   status.
     :raises: :class:`rally.exceptions.TaskInvalidStatus` when the
-             status of the task is not FINISHED and the force argument
-             if not True
+             status of the task is neither FINISHED nor ABORTED and the
+             force argument if not True
     """
-    status = None if force else consts.TaskStatus.FINISHED
+    status = None if force else [consts.TaskStatus.FINISHED,
+                                 consts.TaskStatus.ABORTED]
     objects.Task.delete_by_uuid(task_uuid, status=status)
@@ -20,6 +20,14 @@ import glanceclient as glance
 from keystoneclient.v2_0 import client as keystone
 from novaclient import client as nova
 
+from rally.openstack.common import importutils
+
+
+# NOTE(hughsaunders): Scheme of the endpoints of the FakeCloud engine, see
+#                     rally.fakecloud; that module is only imported for
+#                     such endpoints.
+FAKE_SCHEME = "fake"
+
 
 class Clients(object):
     """This class simplify and unify work with openstack python clients."""
@@ -28,12 +36,26 @@ class Clients(object):
         self.kw = {'username': username, 'password': password,
                    'tenant_name': tenant_name, 'auth_url': auth_url}
         self.cache = {}
+        # NOTE(hughsaunders): Endpoints of the FakeCloud engine get the
+        #                     clients of an in-process fake cloud.
+        self.fake_cloud = None
+        if urlparse.urlparse(auth_url).scheme == FAKE_SCHEME:
+            fakecloud = importutils.import_module("rally.fakecloud")
+            self.fake_cloud = fakecloud.get_cloud(auth_url)
+
+    def _get_fake_client(self, service):
+        client = self.fake_cloud.get_client(service, **self.kw)
+        self.cache[service] = client
+        return client
 
     def get_keystone_client(self):
         """Return keystone client."""
         if "keystone" in self.cache:
             return self.cache["keystone"]
 
+        if self.fake_cloud is not None:
+            return self._get_fake_client("keystone")
+
         new_kw = {"endpoint": self._change_port(self.kw["auth_url"], "35357")}
         kw = dict(self.kw.items() + new_kw.items())
         client = keystone.Client(**kw)
@@ -47,6 +69,9 @@ class Clients(object):
         if "nova" in self.cache:
             return self.cache["nova"]
 
+        if self.fake_cloud is not None:
+            return self._get_fake_client("nova")
+
         client = nova.Client(version,
                              self.kw['username'],
                              self.kw['password'],
@@ -62,6 +87,9 @@ class Clients(object):
         if "glance" in self.cache:
             return self.cache["glance"]
 
+        if self.fake_cloud is not None:
+            return self._get_fake_client("glance")
+
         kc = self.get_keystone_client()
         endpoint = kc.service_catalog.get_endpoints()['image'][0]
         client = glance.Client(version,
@@ -76,6 +104,9 @@ class Clients(object):
         if "cinder" in self.cache:
             return self.cache["cinder"]
 
+        if self.fake_cloud is not None:
+            return self._get_fake_client("cinder")
+
         client = cinder.Client(version,
                                self.kw['username'],
                                self.kw['password'],
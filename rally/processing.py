@@ -18,6 +18,7 @@ import itertools
 from rally import db
 from rally import exceptions
 from rally.openstack.common import importutils
+from rally import stats
 
 plt = importutils.try_import("matplotlib.pyplot")
 ticker = importutils.try_import("matplotlib.ticker")
@@ -36,10 +37,11 @@ def aggregated_plot(task_id, aggregated_field):
                              on. This can be e.g. "active_users", "times" etc.
     """
 
-    task = db.task_get_detailed(task_id)
+    results = db.task_result_get_all_by_uuid(task_id, load_data=False)
+    iteration_stats = db.task_iteration_stats(task_id)
 
-    task["results"].sort(key=lambda res: res["key"]["name"])
-    results_by_benchmark = itertools.groupby(task["results"],
+    results.sort(key=lambda res: res["key"]["name"])
+    results_by_benchmark = itertools.groupby(results,
                                              lambda res: res["key"]["name"])
     for benchmark_name, data in results_by_benchmark:
         data_dict = {}
@@ -48,46 +50,105 @@ def aggregated_plot(task_id, aggregated_field):
             if aggregated_field not in result["key"]["kw"]["config"]:
                 raise exceptions.NoSuchConfigField(name=aggregated_field)
 
-            raw = result["data"]["raw"]
-            times = map(lambda x: x["time"],
-                        filter(lambda r: not r["error"], raw))
+            result_stats = iteration_stats.get(result["id"])
+            if not result_stats or result_stats["min"] is None:
+                continue
 
             aggr_field_val = result["key"]["kw"]["config"][aggregated_field]
 
-            data_dict[aggr_field_val] = {"min": min(times),
-                                         "avg": sum(times) / len(times),
-                                         "max": max(times)}
+            data_dict[aggr_field_val] = {"min": result_stats["min"],
+                                         "avg": result_stats["avg"],
+                                         "max": result_stats["max"]}
 
-        aggr_field_vals = sorted(data_dict.keys())
-        mins = [data_dict[x]["min"] for x in aggr_field_vals]
-        avgs = [data_dict[x]["avg"] for x in aggr_field_vals]
-        maxes = [data_dict[x]["max"] for x in aggr_field_vals]
+        if not data_dict:
+            continue
 
-        axes = plt.subplot(111)
+        _plot_min_avg_max("Benchmark results: %s" % benchmark_name,
+                          aggregated_field, data_dict)
 
-        plt.plot(aggr_field_vals, maxes, "r-", label="max", linewidth=2)
-        plt.plot(aggr_field_vals, avgs, "b-", label="avg", linewidth=2)
-        plt.plot(aggr_field_vals, mins, "g-", label="min", linewidth=2)
 
-        title = "Benchmark results: %s" % benchmark_name
-        plt.title(title)
-        fig = plt.gcf()
-        fig.canvas.set_window_title(title)
+def concurrency_plot(task_id, aggregated_field=None):
+    """Draws the benchmark runtimes against the number of active users.
 
-        plt.xlabel(aggregated_field)
-        axes.set_xlim(0, max(aggr_field_vals) + 1)
-        x_axis = axes.get_xaxis()
-        x_axis.set_major_locator(ticker.MaxNLocator(integer=True))
+    Works on step-load ("steps" execution) runs, where every iteration is
+    tagged with the concurrency level it was run at, so the whole latency
+    curve comes from a single benchmark run. One figure is drawn for each
+    such run.
 
-        plt.ylabel("Time (sec)")
-        axes.set_ylim(min(mins) - 2, max(maxes) + 2)
+    :param task_id: ID of the task to draw the plot for
+    :param aggregated_field: Unused, the data is always aggregated on the
+                             concurrency level of the iterations
+    """
+
+    results = db.task_result_get_all_by_uuid(task_id, load_data=False)
+    iteration_stats = db.task_iteration_stats_by_concurrency(task_id)
+
+    results.sort(key=lambda res: (res["key"]["name"], res["key"]["pos"]))
+    for result in results:
+        data_dict = dict((concurrency, level_stats)
+                         for concurrency, level_stats
+                         in iteration_stats.get(result["id"], {}).items()
+                         if level_stats["min"] is not None)
+        if not data_dict:
+            continue
+
+        _plot_min_avg_max("Benchmark results: %s (%s)" %
+                          (result["key"]["name"], result["key"]["pos"]),
+                          "active_users", data_dict)
+
+
+def atomic_actions_stats(raw):
+    """Computes the statistics of the atomic actions of benchmark iterations.
+
+    :param raw: List of the iteration results
+
+    :returns: List of (action name, stats) pairs, in the order the actions
+              first appear in; stats is the result of stats.compute() on
+              the action durations
+    """
+    durations = {}
+    names = []
+    for result in raw:
+        for action in result.get("atomic_actions") or []:
+            if action["action"] not in durations:
+                names.append(action["action"])
+                durations[action["action"]] = []
+            durations[action["action"]].append(action["duration"])
+
+    return [(name, stats.compute(durations[name])) for name in names]
+
+
+def _plot_min_avg_max(title, xlabel, data_dict):
+    x_vals = sorted(data_dict.keys())
+    mins = [data_dict[x]["min"] for x in x_vals]
+    avgs = [data_dict[x]["avg"] for x in x_vals]
+    maxes = [data_dict[x]["max"] for x in x_vals]
+
+    axes = plt.subplot(111)
+
+    plt.plot(x_vals, maxes, "r-", label="max", linewidth=2)
+    plt.plot(x_vals, avgs, "b-", label="avg", linewidth=2)
+    plt.plot(x_vals, mins, "g-", label="min", linewidth=2)
+
+    plt.title(title)
+    fig = plt.gcf()
+    fig.canvas.set_window_title(title)
+
+    plt.xlabel(xlabel)
+    axes.set_xlim(0, max(x_vals) + 1)
+    x_axis = axes.get_xaxis()
+    x_axis.set_major_locator(ticker.MaxNLocator(integer=True))
+
+    plt.ylabel("Time (sec)")
+    axes.set_ylim(min(mins) - 2, max(maxes) + 2)
 
-        plt.legend(loc="upper right")
+    plt.legend(loc="upper right")
 
-        plt.show()
+    plt.show()
 
 
 # NOTE(msdubov): A mapping from plot names to plotting functions is used in CLI
 PLOTS = {
-    "aggregated": aggregated_plot
+    "aggregated": aggregated_plot,
+    "concurrency": concurrency_plot,
 }
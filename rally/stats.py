@@ -0,0 +1,291 @@
+# Copyright 2013: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import collections
+import math
+import time
+
+from rally.openstack.common.gettextutils import _
+from rally.openstack.common import importutils
+
+numpy = importutils.try_import("numpy")
+
+
+PERCENTILES = [0.5, 0.9, 0.95, 0.99, 0.999]
+
+
+def percentile_key(percent):
+    """Returns the key of a percentile in the stats, e.g. "p99.9"."""
+    return "p%g" % (percent * 100)
+
+
+def _percentile(sorted_values, percent):
+    k = (len(sorted_values) - 1) * percent
+    lower = int(k)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return (sorted_values[lower] +
+            (sorted_values[upper] - sorted_values[lower]) * (k - lower))
+
+
+def compute(values):
+    """Computes the statistics of a list of values, e.g. iteration times.
+
+    Uses NumPy if it is installed. The percentiles are interpolated
+    linearly between the closest values.
+
+    :param values: List of numbers
+
+    :returns: Dict with the "count", "min", "max", "avg", "stddev" and
+              the PERCENTILES (under the percentile_key() keys) of the
+              values, None if there are no values
+    """
+    if not values:
+        return None
+
+    if numpy is not None:
+        array = numpy.array(values, dtype=float)
+        result = {"count": array.size, "min": array.min(),
+                  "max": array.max(), "avg": array.mean(),
+                  "stddev": array.std()}
+        percentiles = numpy.percentile(array, [p * 100 for p in PERCENTILES])
+    else:
+        values = sorted(values)
+        count = len(values)
+        avg = float(sum(values)) / count
+        result = {"count": count, "min": values[0], "max": values[-1],
+                  "avg": avg,
+                  "stddev": math.sqrt(sum((value - avg) ** 2
+                                          for value in values) / count)}
+        percentiles = [_percentile(values, p) for p in PERCENTILES]
+
+    for percent, value in zip(PERCENTILES, percentiles):
+        result[percentile_key(percent)] = value
+    return dict((key, int(value) if key == "count" else float(value))
+                for key, value in result.items())
+
+
+def histogram(values, bins=10):
+    """Splits the range of the values into bins of equal width.
+
+    :param values: Non-empty list of numbers
+    :param bins: Number of bins
+
+    :returns: List of {"from": <left edge>, "to": <right edge>,
+              "count": <number of values>} dicts; the last bin includes
+              its right edge
+    """
+    if numpy is not None:
+        counts, edges = numpy.histogram(values, bins=bins)
+        return [{"from": float(edges[i]), "to": float(edges[i + 1]),
+                 "count": int(counts[i])} for i in range(bins)]
+
+    return _bin_counts([(value, 1) for value in values], min(values),
+                       max(values), bins)
+
+
+def _bin_counts(counted_values, low, high, bins):
+    """Counts (value, count) pairs in bins of equal width from low to high,
+    see histogram().
+    """
+    if low == high:
+        low, high = low - 0.5, high + 0.5
+    width = float(high - low) / bins
+    counts = [0] * bins
+    for value, count in counted_values:
+        counts[min(int((value - low) / width), bins - 1)] += count
+    return [{"from": low + i * width, "to": low + (i + 1) * width,
+             "count": counts[i]} for i in range(bins)]
+
+
+class Histogram(object):
+    """Mergeable histogram of values with a bounded relative error.
+
+    The values are counted in logarithmic buckets, so the memory used does
+    not grow with the number of values while every percentile is known to
+    within the given precision of its value. Histograms can be filled as
+    the results come, merged (e.g. those of several benchmark runs) and
+    stored as JSON.
+
+    Values that are not positive are counted in a bucket of their own,
+    whose value is 0.
+    """
+
+    def __init__(self, precision=0.01):
+        """Histogram constructor.
+
+        :param precision: Maximum relative error of the percentiles
+        """
+        self.precision = precision
+        self._log_base = math.log(1 + 2 * precision)
+        self.buckets = {}
+        self.zeros = 0
+        self.count = 0
+        self.total = 0.0
+        self.total_squares = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        if value > 0:
+            index = int(math.floor(math.log(value) / self._log_base))
+            self.buckets[index] = self.buckets.get(index, 0) + 1
+        else:
+            self.zeros += 1
+        self.count += 1
+        self.total += value
+        self.total_squares += value * value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        """Adds the values counted by another histogram to this one."""
+        if other.precision != self.precision:
+            raise ValueError(_("Histograms of different precision cannot "
+                               "be merged"))
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.zeros += other.zeros
+        self.count += other.count
+        self.total += other.total
+        self.total_squares += other.total_squares
+        for value in (other.min, other.max):
+            if value is not None:
+                self.min = value if self.min is None else min(self.min, value)
+                self.max = value if self.max is None else max(self.max, value)
+
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def stddev(self):
+        if not self.count:
+            return None
+        mean = self.mean()
+        return math.sqrt(max(0, self.total_squares / self.count - mean * mean))
+
+    def percentile(self, percent):
+        """Returns the smallest value that percent of the values do not
+        exceed, to within the precision.
+        """
+        if not self.count:
+            return None
+        rank = max(1, int(math.ceil(percent * self.count)))
+        seen = self.zeros
+        if seen >= rank:
+            return max(self.min, 0)
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return self._value(index)
+        return self.max
+
+    def _value(self, index):
+        """Returns the value that stands for the values of a bucket."""
+        value = math.exp(index * self._log_base) * (1 + self.precision)
+        return min(max(value, self.min), self.max)
+
+    def bins(self, bins=10):
+        """Splits the range of the values into bins of equal width, like
+        histogram() does.
+
+        Every value is counted in the bin of the value that stands for its
+        bucket, so a value within the precision of an edge may be counted
+        in the next bin.
+
+        :returns: List of {"from", "to", "count"} dicts, None if there are
+                  no values
+        """
+        if not self.count:
+            return None
+        counted_values = [(self._value(index), count)
+                          for index, count in self.buckets.items()]
+        if self.zeros:
+            counted_values.append((max(self.min, 0), self.zeros))
+        return _bin_counts(counted_values, self.min, self.max, bins)
+
+    def stats(self):
+        """Returns the statistics of the values, like compute() does."""
+        if not self.count:
+            return None
+        result = {"count": self.count, "min": self.min, "max": self.max,
+                  "avg": self.mean(), "stddev": self.stddev()}
+        for percent in PERCENTILES:
+            result[percentile_key(percent)] = self.percentile(percent)
+        return result
+
+    def to_dict(self):
+        return {"precision": self.precision,
+                "buckets": dict((str(index), count)
+                                for index, count in self.buckets.items()),
+                "zeros": self.zeros, "count": self.count,
+                "total": self.total, "total_squares": self.total_squares,
+                "min": self.min, "max": self.max}
+
+    @classmethod
+    def from_dict(cls, data):
+        hist = cls(data["precision"])
+        hist.buckets = dict((int(index), count)
+                            for index, count in data["buckets"].items())
+        for key in ("zeros", "count", "total", "total_squares", "min",
+                    "max"):
+            setattr(hist, key, data[key])
+        return hist
+
+
+class RollingWindow(object):
+    """Rolling metrics of the iterations finished in the last seconds.
+
+    Adding an iteration only appends to a queue and drops the iterations
+    that have left the window, so it can be done for every result; the
+    percentiles are computed when a snapshot is taken.
+    """
+
+    def __init__(self, seconds=60):
+        self.seconds = seconds
+        self.started = None
+        self.errors = 0
+        self._entries = collections.deque()
+
+    def add(self, value, error=False, now=None):
+        """Adds the time of an iteration finished now."""
+        now = time.time() if now is None else now
+        if self.started is None:
+            self.started = now
+        self._entries.append((now, value, error))
+        if error:
+            self.errors += 1
+        self._expire(now)
+
+    def _expire(self, now):
+        while self._entries and self._entries[0][0] < now - self.seconds:
+            if self._entries.popleft()[2]:
+                self.errors -= 1
+
+    def snapshot(self, now=None):
+        """Returns the metrics of the window.
+
+        :returns: Dict with the "window" length in seconds, the number of
+                  "iterations" in it, their "throughput" per second, their
+                  "error_rate" and the stats (see compute()) of the
+                  "times" of the successful ones
+        """
+        now = time.time() if now is None else now
+        self._expire(now)
+        count = len(self._entries)
+        span = min(self.seconds, now - self.started) if count else 0
+        return {"window": self.seconds, "iterations": count,
+                "throughput": float(count) / span if span > 0 else None,
+                "error_rate": float(self.errors) / count if count else None,
+                "times": compute([value for t, value, error in self._entries
+                                  if not error])}
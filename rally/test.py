@@ -14,6 +14,8 @@
 #    under the License.
 
 
+from oslo.config import cfg
+
 from rally import db
 from rally.openstack.common.fixture import config
 from rally.openstack.common import test
@@ -31,7 +33,15 @@ class DatabaseFixture(config.Config):
 
 class TestCase(test.BaseTestCase):
     """Test case base class for all unit tests."""
-    pass
+
+    def setUp(self):
+        super(TestCase, self).setUp()
+        # NOTE(hughsaunders): Tests must not write a scenario manifest into
+        #                     the home directory.
+        cfg.CONF.import_opt('scenario_manifest', 'rally.benchmark.base',
+                            group='benchmark')
+        self.useFixture(config.Config()).config(scenario_manifest='',
+                                                group='benchmark')
 
 
 class DBTestCase(TestCase):
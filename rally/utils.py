@@ -85,6 +85,19 @@ class Timer(object):
         return self.finish - self.start
 
 
+class LazyModule(object):
+    """Stands for a module that is imported on the first attribute access."""
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importutils.import_module(self._name)
+        return getattr(self._module, attr)
+
+
 def itersubclasses(cls, _seen=None):
     """Generator over all subclasses of a given class in depth first order."""
 
@@ -109,20 +122,33 @@ def try_append_module(name, modules):
         modules[name] = importutils.import_module(name)
 
 
-def import_modules_from_package(package):
-    """Import modules from package and append into sys.modules
+def find_modules_in_package(package):
+    """Finds the modules of a package and of its subpackages.
 
     :param: package - Full package name. For example: rally.deploy.engines
+
+    :returns: Dict that maps the full names of the modules to their paths
     """
     path = [os.path.dirname(__file__), '..'] + package.split('.')
     path = os.path.join(*path)
+    modules = {}
     for root, dirs, files in os.walk(path):
         for filename in files:
             if filename.startswith('__') or not filename.endswith('.py'):
                 continue
             new_package = ".".join(root.split(os.sep)).split("....")[1]
             module_name = '%s.%s' % (new_package, filename[:-3])
-            try_append_module(module_name, sys.modules)
+            modules[module_name] = os.path.join(root, filename)
+    return modules
+
+
+def import_modules_from_package(package):
+    """Import modules from package and append into sys.modules
+
+    :param: package - Full package name. For example: rally.deploy.engines
+    """
+    for module_name in sorted(find_modules_in_package(package)):
+        try_append_module(module_name, sys.modules)
 
 
 def wait_for(resource, is_ready, update_resource=None, timeout=60,
@@ -0,0 +1,29 @@
+# Copyright 2013: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from rally.benchmark.scenarios.dummy import dummy
+from rally import test
+
+
+class DummyTestCase(test.TestCase):
+
+    @mock.patch("rally.benchmark.scenarios.dummy.dummy.Dummy.sleep_between")
+    def test_dummy(self, mock_sleep):
+        dummy.Dummy.dummy()
+        self.assertFalse(mock_sleep.called)
+        dummy.Dummy.dummy(sleep=0.5)
+        mock_sleep.assert_called_once_with(0.5, 0.5)
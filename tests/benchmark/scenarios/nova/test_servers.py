@@ -15,6 +15,7 @@
 
 import mock
 
+from rally.benchmark import base
 from rally.benchmark.scenarios.nova import servers
 from rally.benchmark import utils as butils
 from rally import exceptions as rally_exceptions
@@ -269,6 +270,25 @@ class NovaServersTestCase(test.TestCase):
     def test_boot_server_random_nic(self):
         self._verify_boot_server(nic=None, assert_nic=True)
 
+    @mock.patch(NOVA_SERVERS + "._generate_random_name")
+    @mock.patch(NOVA_SERVERS + "._boot_server")
+    def test_boot_server_networks_listed_once(self, mock_boot,
+                                              mock_random_name):
+        base.Scenario.reset_lookup_cache()
+        self.addCleanup(base.Scenario.reset_lookup_cache)
+        nova = fakes.FakeNovaClient()
+        nova.networks.create('net-1')
+        nova.networks.list = mock.MagicMock(wraps=nova.networks.list)
+        servers.NovaServers._clients = {"nova": nova}
+        mock_random_name.return_value = "random_name"
+
+        for i in range(3):
+            servers.NovaServers.boot_server("img", 0)
+
+        nova.networks.list.assert_called_once_with()
+        mock_boot.assert_called_with("random_name", "img", 0,
+                                     nics=[{'net-id': 'net-1'}])
+
     @mock.patch(NOVA_SERVERS + "._generate_random_name")
     @mock.patch(NOVA_SERVERS + "._delete_image")
     @mock.patch(NOVA_SERVERS + "._delete_server")
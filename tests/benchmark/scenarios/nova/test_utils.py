@@ -39,12 +39,12 @@ class NovaScenarioTestCase(test.TestCase):
                           butils.get_from_manager(),
                           server_manager.create('fails', '1', '2'))
 
-    @mock.patch("rally.benchmark.scenarios.nova.utils.time.sleep")
+    @mock.patch("rally.benchmark.scenarios.nova.utils.poller")
     @mock.patch("rally.utils")
     @mock.patch("rally.benchmark.utils.osclients")
     @mock.patch("rally.benchmark.utils.resource_is")
     def test_server_helper_methods(self, mock_ris, mock_osclients,
-                                   mock_rally_utils, mock_sleep):
+                                   mock_rally_utils, mock_poller):
 
         def _is_ready(resource):
             return resource.status == "ACTIVE"
@@ -69,25 +69,27 @@ class NovaScenarioTestCase(test.TestCase):
             create_openstack_clients(users_endpoints, temp_keys)[0]
         utils.utils = mock_rally_utils
         utils.bench_utils.get_from_manager = lambda: get_from_mgr
+        status_poller = mock_poller.get_poller.return_value
+        status_poller.wait.return_value = [fake_server]
+        status_poller.detection_delay = 0.5
+        utils.NovaScenario.idle_time = 0
 
-        utils.NovaScenario._boot_server("s1", "i1", 1)
+        self.assertEqual(fake_server,
+                         utils.NovaScenario._boot_server("s1", "i1", 1))
         utils.NovaScenario._create_image(fake_server)
         utils.NovaScenario._suspend_server(fake_server)
         utils.NovaScenario._delete_server(fake_server)
 
-        expected = [
-            mock.call.wait_for(fake_server, is_ready=_is_ready,
-                               update_resource=butils.get_from_manager(),
-                               check_interval=3, timeout=600),
+        self.assertEqual([mock.call(fsm)] * 3,
+                         mock_poller.get_poller.call_args_list)
+        self.assertEqual([
+            mock.call([fake_server], _is_ready, timeout=600),
+            mock.call([fake_server], _is_ready, timeout=600),
+            mock.call([fake_server], butils.is_none, timeout=600)
+        ], status_poller.wait.call_args_list)
+        self.assertEqual(1.5, utils.NovaScenario.idle_time)
+        self.assertEqual([
             mock.call.wait_for(fake_image, is_ready=_is_ready,
-                               update_resource=butils.get_from_manager(),
-                               check_interval=3, timeout=600),
-            mock.call.wait_for(fake_server, is_ready=_is_ready,
-                               update_resource=butils.get_from_manager(),
-                               check_interval=3, timeout=600),
-            mock.call.wait_for(fake_server, is_ready=butils.is_none,
                                update_resource=butils.get_from_manager(),
                                check_interval=3, timeout=600)
-        ]
-
-        self.assertEqual(expected, mock_rally_utils.mock_calls)
+        ], mock_rally_utils.mock_calls)
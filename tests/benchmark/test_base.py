@@ -13,10 +13,15 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import fixtures
+import json
 import mock
+import os
+import sys
 
 from rally.benchmark import base
 from rally import exceptions
+from rally.openstack.common.fixture import config
 from rally import test
 
 
@@ -43,11 +48,108 @@ class ScenarioTestCase(test.TestCase):
 
         for s in [Scenario1, Scenario2]:
             self.assertEqual(s, base.Scenario.get_by_name(s.__name__))
+            self.assertEqual(s, base.Scenario.get_by_name(
+                                        "%s.%s" % (__name__, s.__name__)))
 
     def test_get_by_name_not_found(self):
         self.assertRaises(exceptions.NoSuchScenario,
                           base.Scenario.get_by_name, "non existing scenario")
 
+    def test_get_by_name_same_name(self):
+
+        class SameNameScenario(base.Scenario):
+            pass
+
+        other = type("SameNameScenario", (base.Scenario,),
+                     {"__module__": "other_module"})
+        self.addCleanup(base._classes.pop, "other_module.SameNameScenario")
+        self.addCleanup(base._scenario_names.pop,
+                        "other_module.SameNameScenario")
+
+        self.assertIs(SameNameScenario, base._classes[
+                                    "%s.SameNameScenario" % __name__])
+        e = self.assertRaises(exceptions.AmbiguousScenario,
+                              base.Scenario.get_by_name, "SameNameScenario")
+        self.assertEqual("other_module.SameNameScenario, %s.SameNameScenario"
+                         % __name__, e.kwargs["classes"])
+        self.assertIs(other, base.Scenario.get_by_name(
+                                            "other_module.SameNameScenario"))
+
+    @mock.patch("rally.benchmark.base.get_manifest")
+    @mock.patch("rally.benchmark.base.utils.try_append_module")
+    def test_get_by_name_imports_module(self, mock_import, mock_manifest):
+        mock_manifest.return_value = {
+            "classes": {"lazy.LazyScenario": "lazy"}}
+        self.addCleanup(base._classes.pop, "lazy.LazyScenario")
+        self.addCleanup(base._scenario_names.pop, "lazy.LazyScenario")
+
+        def _import(name, modules):
+            modules[name] = mock.MagicMock()
+            self.addCleanup(modules.pop, name)
+            type("LazyScenario", (base.Scenario,), {"__module__": "lazy"})
+
+        mock_import.side_effect = _import
+        cls = base.Scenario.get_by_name("LazyScenario")
+        self.assertEqual("LazyScenario", cls.__name__)
+        mock_import.assert_called_once_with("lazy", sys.modules)
+        self.assertIs(cls, base.Scenario.get_by_name("LazyScenario"))
+        self.assertEqual(1, mock_import.call_count)
+
+    def test_list_benchmark_scenarios(self):
+
+        class ListedScenario(base.Scenario):
+
+            @classmethod
+            def do_it(cls):
+                pass
+
+        scenarios = base.Scenario.list_benchmark_scenarios()
+        self.assertIn("ListedScenario.do_it", scenarios)
+        self.assertIn("NovaServers.boot_server", scenarios)
+
+    def _use_manifest_file(self):
+        path = os.path.join(self.useFixture(fixtures.TempDir()).path,
+                            "manifest.json")
+        self.useFixture(config.Config()).config(scenario_manifest=path,
+                                                group="benchmark")
+        self.addCleanup(setattr, base, "_manifest", base._manifest)
+        base._manifest = None
+        return path
+
+    def test_get_manifest(self):
+        path = self._use_manifest_file()
+        manifest = base.get_manifest()
+        self.assertEqual(base.MANIFEST_VERSION, manifest["version"])
+        module_name = "rally.benchmark.scenarios.nova.servers"
+        self.assertEqual(module_name,
+                         manifest["classes"]["%s.NovaServers" % module_name])
+        self.assertIn("NovaServers.boot_server", manifest["scenarios"])
+        with open(path) as manifest_file:
+            self.assertEqual(manifest, json.load(manifest_file))
+
+        base._manifest = None
+        with mock.patch("rally.benchmark.base._build_manifest") as mock_build:
+            self.assertEqual(manifest, base.get_manifest())
+        self.assertFalse(mock_build.called)
+
+    def test_get_manifest_stale(self):
+        path = self._use_manifest_file()
+        with open(path, "w") as manifest_file:
+            json.dump({"version": base.MANIFEST_VERSION, "signature": {},
+                       "classes": {}, "scenarios": []}, manifest_file)
+        self.assertIn("NovaServers.boot_server",
+                      base.get_manifest()["scenarios"])
+
+    def test_get_manifest_old_version(self):
+        path = self._use_manifest_file()
+        signature = base.get_manifest()["signature"]
+        base._manifest = None
+        with open(path, "w") as manifest_file:
+            json.dump({"signature": signature, "classes": {},
+                       "scenarios": []}, manifest_file)
+        self.assertIn("NovaServers.boot_server",
+                      base.get_manifest()["scenarios"])
+
     def test_init(self):
         self.assertEqual({}, base.Scenario.init(None))
 
@@ -116,3 +218,65 @@ class ScenarioTestCase(test.TestCase):
         Scenario._admin_clients = clients
         self.assertEqual(nova_client, Scenario.admin_clients("nova"))
         self.assertEqual(glance_client, Scenario.admin_clients("glance"))
+
+    @mock.patch("rally.benchmark.base.time")
+    def test_cached_list(self, mock_time):
+        self.useFixture(config.Config()).config(lookup_cache_ttl=60,
+                                                group="benchmark")
+        nova = mock.MagicMock()
+        nova.networks.list.side_effect = lambda **kw: [object()]
+
+        class Scenario(base.Scenario):
+            pass
+
+        Scenario._clients = {"nova": nova}
+        base.Scenario.reset_lookup_cache()
+        mock_time.time.return_value = 100
+        networks = Scenario.cached_list("nova", "networks")
+        mock_time.time.return_value = 159
+        self.assertIs(networks, Scenario.cached_list("nova", "networks"))
+        self.assertIsNot(networks, Scenario.cached_list("nova", "networks",
+                                                        detailed=False))
+        mock_time.time.return_value = 160
+        self.assertIsNot(networks, Scenario.cached_list("nova", "networks"))
+        self.assertEqual([mock.call(), mock.call(detailed=False),
+                          mock.call()], nova.networks.list.mock_calls)
+
+        base.Scenario.reset_lookup_cache()
+        self.assertEqual({}, base.Scenario._lookup_cache)
+
+    @mock.patch("rally.benchmark.base.time")
+    def test_atomic_action_timer(self, mock_time):
+        mock_time.time.side_effect = [10, 20, 21, 22, 30, 31]
+
+        class Scenario(base.Scenario):
+
+            @classmethod
+            @base.atomic_action_timer("boot")
+            def boot(cls):
+                cls.idle_time += 2
+                return "server"
+
+            @classmethod
+            @base.atomic_action_timer("fail")
+            def fail(cls):
+                raise exceptions.TimeoutException()
+
+        Scenario.idle_time = 0
+        Scenario._atomic_actions = []
+        self.assertEqual("server", Scenario.boot())
+        self.assertRaises(exceptions.TimeoutException, Scenario.fail)
+        with base.AtomicAction(Scenario, "other"):
+            pass
+        self.assertEqual([{"action": "boot", "duration": 8},
+                          {"action": "other", "duration": 1}],
+                         Scenario.atomic_actions())
+
+    def test_atomic_actions_outside_iterations(self):
+
+        class Scenario(base.Scenario):
+            pass
+
+        with base.AtomicAction(Scenario, "action"):
+            pass
+        self.assertEqual([], Scenario.atomic_actions())
@@ -0,0 +1,99 @@
+# Copyright 2013: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the cleanup engine."""
+import mock
+
+from rally.benchmark import cleanup
+from rally import test
+from tests import fakes
+
+
+class CleanupEngineTestCase(test.TestCase):
+
+    def _clients(self):
+        cl = fakes.FakeClients()
+        return {"nova": cl.get_nova_client(),
+                "keystone": cl.get_keystone_client(),
+                "glance": cl.get_glance_client(),
+                "cinder": cl.get_cinder_client()}
+
+    def test_run(self):
+        clients = [self._clients() for i in range(3)]
+        for client in clients:
+            nova = client["nova"]
+            cinder = client["cinder"]
+            img = nova.images.create()
+            nova.servers.create("svr", img.uuid, 1)
+            nova.keypairs.create("keypair")
+            nova.security_groups.create("secgroup")
+            cinder.volumes.create("vol")
+            cinder.volume_snapshots.create("snap")
+
+        engine = cleanup.CleanupEngine(clients, concurrency=2, timeout=1)
+        durations = engine.run()
+
+        self.assertEqual(set(durations),
+                         set(["nova.servers", "nova.keypairs",
+                              "glance.images", "nova.security_groups",
+                              "cinder.volumes", "cinder.volume_snapshots"]))
+        for client in clients:
+            nova = client["nova"]
+            self.assertEqual([], nova.servers.list())
+            self.assertEqual([], nova.keypairs.list())
+            self.assertEqual(["default"],
+                             [sg.name for sg in nova.security_groups.list()])
+            self.assertEqual(["DELETED"],
+                             [image.status for image in nova.images.list()])
+            self.assertEqual([], client["cinder"].volumes.list())
+            self.assertEqual([], client["cinder"].volume_snapshots.list())
+
+    def test_run_keep_ssh_access(self):
+        client = self._clients()
+        nova = client["nova"]
+        for name in ["rally_ssh_key", "keypair"]:
+            nova.keypairs.create(name)
+        for name in ["rally_open", "secgroup"]:
+            nova.security_groups.create(name)
+
+        engine = cleanup.CleanupEngine([client], timeout=1,
+                                       keep_ssh_access=True)
+        engine.run()
+        self.assertEqual(["rally_ssh_key"],
+                         [kp.name for kp in nova.keypairs.list()])
+        self.assertEqual(["default", "rally_open"],
+                         sorted(sg.name for sg in nova.security_groups.list()))
+
+    def test_run_timeout(self):
+        client = self._clients()
+        client["cinder"].volumes.create("vol")
+        client["cinder"].volumes.delete = mock.MagicMock()
+
+        engine = cleanup.CleanupEngine([client], timeout=-1)
+        self.assertEqual({"cinder.volumes": None}, engine.run())
+        self.assertEqual(1, len(client["cinder"].volumes.list()))
+
+    def test_run_delete_fails(self):
+        client = self._clients()
+        client["nova"].keypairs.create("keypair")
+        client["nova"].keypairs.delete = mock.MagicMock(
+                                            side_effect=Exception("fails"))
+        client["nova"].servers.create("svr", "img", 1)
+
+        engine = cleanup.CleanupEngine([client], timeout=-1)
+        durations = engine.run()
+        self.assertIsNone(durations["nova.keypairs"])
+        self.assertIsNotNone(durations["nova.servers"])
+        self.assertEqual([], client["nova"].servers.list())
@@ -0,0 +1,222 @@
+# Copyright 2013: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the distributed benchmark runs."""
+import json
+import mock
+
+from rally.benchmark import distributed
+from rally.benchmark import sinks
+from rally import exceptions
+from rally.openstack.common.fixture import config
+from rally import test
+
+
+class FakeAgent(object):
+    """Replies with the results of one iteration at the agent's offset."""
+
+    offsets = {"host0": 100.0, "host1": -50.0}
+
+    def __init__(self, host):
+        self.host = host
+        self.offset = 0
+        self.sent = []
+        self.killed = None
+        self.aborted = False
+        self.replies = [{"ready": True}]
+
+    def measure_offset(self):
+        self.offset = self.offsets[self.host]
+        return self.offset
+
+    def send(self, message):
+        self.sent.append(message)
+        if message["command"] == "start":
+            self.replies.append({"results": [{"timestamp":
+                                              10.0 + self.offset,
+                                              "error": None}]})
+            self.replies.append({"done": {"iterations": 1, "errors": 0},
+                                 "info": {"iterations_per_second": 1.5}})
+
+    def receive(self):
+        return self.replies.pop(0)
+
+    def abort(self):
+        self.aborted = True
+
+    def close(self, kill=False):
+        self.killed = kill
+
+
+class FailingAgent(FakeAgent):
+
+    def receive(self):
+        message = super(FailingAgent, self).receive()
+        if "done" in message:
+            raise exceptions.AgentFailure(host=self.host, message="fails")
+        return message
+
+
+class DistributedTestCase(test.TestCase):
+
+    def setUp(self):
+        super(DistributedTestCase, self).setUp()
+        self.conf = self.useFixture(config.Config())
+        self.conf.config(agents=["host0", "host1"], group="benchmark")
+
+    def test_split_config_continuous(self):
+        configs = distributed.split_config("continuous",
+                                           {"times": 10, "active_users": 3,
+                                            "timeout": 5, "agents": 4}, 4)
+        self.assertEqual([{"times": 4, "active_users": 1, "timeout": 5},
+                          {"times": 3, "active_users": 1, "timeout": 5},
+                          {"times": 3, "active_users": 1, "timeout": 5}],
+                         configs)
+
+    def test_split_config_continuous_duration(self):
+        configs = distributed.split_config("continuous",
+                                           {"duration": 1, "active_users": 5,
+                                            "agents": 2}, 2)
+        self.assertEqual([{"duration": 1, "active_users": 3},
+                          {"duration": 1, "active_users": 2}], configs)
+
+    def test_split_config_rps(self):
+        configs = distributed.split_config("rps",
+                                           {"rps": 6, "times": 7,
+                                            "max_in_flight": 2,
+                                            "agents": 3}, 3)
+        self.assertEqual([{"rps": 2.0, "times": 3, "max_in_flight": 1},
+                          {"rps": 2.0, "times": 2, "max_in_flight": 1},
+                          {"rps": 2.0, "times": 2, "max_in_flight": 1}],
+                         configs)
+
+    def test_split_config_periodic(self):
+        self.assertRaises(exceptions.InvalidConfigException,
+                          distributed.split_config, "periodic",
+                          {"times": 2, "period": 1, "agents": 2}, 2)
+
+    @mock.patch("rally.benchmark.distributed.time")
+    @mock.patch("rally.benchmark.distributed.subprocess")
+    def test_agent_measure_offset(self, mock_subprocess, mock_time):
+        process = mock_subprocess.Popen.return_value
+        process.stdout.readline.side_effect = [json.dumps({"time": 111.0}),
+                                               json.dumps({"time": 120.5})]
+        mock_time.time.side_effect = [10.0, 12.0, 20.0, 20.5]
+        agent = distributed.Agent("user@host")
+        self.assertEqual(100.25, agent.measure_offset(samples=2))
+        self.assertEqual(["ssh", "-o", "BatchMode=yes", "user@host",
+                          "openstack-rally-agent"],
+                         mock_subprocess.Popen.call_args[0][0])
+
+    @mock.patch("rally.benchmark.distributed.subprocess")
+    def test_agent_receive_error(self, mock_subprocess):
+        process = mock_subprocess.Popen.return_value
+        process.stdout.readline.side_effect = [
+                json.dumps({"error": ["Exception", "fails", "trace"]}), ""]
+        agent = distributed.Agent("local")
+        self.assertRaises(exceptions.AgentFailure, agent.receive)
+        self.assertRaises(exceptions.AgentFailure, agent.receive)
+
+    @mock.patch("rally.benchmark.distributed.subprocess")
+    def test_agent_abort(self, mock_subprocess):
+        process = mock_subprocess.Popen.return_value
+        agent = distributed.Agent("local")
+        agent.abort()
+        process.stdin.write.assert_called_once_with(
+                json.dumps({"command": "abort"}) + "\n")
+        process.stdin.write.side_effect = IOError()
+        agent.abort()
+
+    @mock.patch("rally.benchmark.distributed.time")
+    @mock.patch("rally.benchmark.distributed.Agent", new=FakeAgent)
+    def test_run(self, mock_time):
+        mock_time.time.return_value = 1000.0
+        sink = sinks.ListSink()
+        kwargs = {"args": {"a": 1}, "execution": "rps",
+                  "config": {"rps": 4, "times": 4, "agents": 2}}
+        distributed.run({"uri": "uri"}, "Scenario.method", kwargs,
+                        {"run_id": "id"}, sink)
+        sink.close()
+
+        self.assertEqual([{"timestamp": 10.0, "error": None, "agent": 0},
+                          {"timestamp": 10.0, "error": None, "agent": 1}],
+                         sorted(sink.results, key=lambda r: r["agent"]))
+        self.assertEqual([{"host": "host0", "clock_offset": 100.0},
+                          {"host": "host1", "clock_offset": -50.0}],
+                         sink.info["agents"])
+        self.assertEqual(3.0, sink.info["iterations_per_second"])
+
+    @mock.patch("rally.benchmark.distributed.time")
+    def test_run_messages(self, mock_time):
+        mock_time.time.return_value = 1000.0
+        agents = []
+
+        def _agent(host):
+            agents.append(FakeAgent(host))
+            return agents[-1]
+
+        kwargs = {"execution": "rps",
+                  "config": {"rps": 4, "times": 4, "agents": 2}}
+        with mock.patch("rally.benchmark.distributed.Agent",
+                        side_effect=_agent):
+            distributed.run({"uri": "uri"}, "Scenario.method", kwargs,
+                            {"run_id": "id"}, sinks.ListSink())
+
+        self.assertEqual({"command": "prepare", "admin": {"uri": "uri"},
+                          "name": "Scenario.method",
+                          "kwargs": {"execution": "rps",
+                                     "config": {"rps": 2.0, "times": 2}},
+                          "env": {"run_id": "id"}}, agents[0].sent[0])
+        start_at = 1000.0 + distributed.START_DELAY
+        self.assertEqual({"command": "start", "start_at": start_at + 100.0},
+                         agents[0].sent[1])
+        self.assertEqual({"command": "start",
+                          "start_at": start_at + 0.25 - 50.0},
+                         agents[1].sent[1])
+        self.assertEqual([False, False], [a.killed for a in agents])
+
+    @mock.patch("rally.benchmark.distributed.time")
+    @mock.patch("rally.benchmark.distributed.Agent", new=FailingAgent)
+    def test_run_agent_fails(self, mock_time):
+        mock_time.time.return_value = 1000.0
+        sink = sinks.ListSink()
+        kwargs = {"config": {"times": 2, "active_users": 2, "agents": 2}}
+        self.assertRaises(exceptions.AgentFailure, distributed.run,
+                          {"uri": "uri"}, "Scenario.method", kwargs,
+                          {"run_id": "id"}, sink)
+        sink.close()
+        self.assertEqual(2, len(sink.results))
+
+    @mock.patch("rally.benchmark.distributed.time")
+    def test_run_abort(self, mock_time):
+        mock_time.time.return_value = 1000.0
+        agents = []
+        hooks = []
+
+        def _agent(host):
+            agents.append(FakeAgent(host))
+            return agents[-1]
+
+        kwargs = {"config": {"times": 2, "active_users": 2, "agents": 2}}
+        with mock.patch("rally.benchmark.distributed.Agent",
+                        side_effect=_agent):
+            distributed.run({"uri": "uri"}, "Scenario.method", kwargs,
+                            {"run_id": "id"}, sinks.ListSink(),
+                            on_abort=hooks.append)
+
+        self.assertEqual(1, len(hooks))
+        self.assertEqual([False, False], [a.aborted for a in agents])
+        hooks[0]()
+        self.assertEqual([True, True], [a.aborted for a in agents])
@@ -15,6 +15,7 @@
 
 """Tests for the Test engine."""
 
+import json
 import mock
 
 from rally.benchmark import engine
@@ -77,6 +78,65 @@ class TestEngineTestCase(test.TestCase):
                             'tenants': 3, 'users_per_tenant': 2}}
             ]
         }
+        self.valid_test_config_rps = {
+            'NovaServers.boot_and_delete_server': [
+                {'args': {'flavor_id': 1, 'image_id': 'img'},
+                 'execution': 'rps',
+                 'config': {'rps': 2.5, 'duration': 1, 'active_users': 5,
+                            'max_in_flight': 10, 'agents': 2,
+                            'tenants': 3, 'users_per_tenant': 2}}
+            ]
+        }
+        self.invalid_test_config_rps_without_rate = {
+            'NovaServers.boot_and_delete_server': [
+                {'args': {'flavor_id': 1, 'image_id': 'img'},
+                 'execution': 'rps',
+                 'config': {'times': 10,
+                            'tenants': 3, 'users_per_tenant': 2}}
+            ]
+        }
+        self.invalid_test_config_rate_without_rps = {
+            'NovaServers.boot_and_delete_server': [
+                {'args': {'flavor_id': 1, 'image_id': 'img'},
+                 'execution': 'continuous',
+                 'config': {'times': 10, 'rps': 2,
+                            'tenants': 3, 'users_per_tenant': 2}}
+            ]
+        }
+        self.valid_test_config_steps = {
+            'NovaServers.boot_and_delete_server': [
+                {'args': {'flavor_id': 1, 'image_id': 'img'},
+                 'execution': 'steps',
+                 'config': {'start_users': 1, 'step_users': 8,
+                            'active_users': 64, 'step_duration': 1,
+                            'tenants': 3, 'users_per_tenant': 2}}
+            ]
+        }
+        self.invalid_test_config_steps_without_duration = {
+            'NovaServers.boot_and_delete_server': [
+                {'args': {'flavor_id': 1, 'image_id': 'img'},
+                 'execution': 'steps',
+                 'config': {'active_users': 64,
+                            'tenants': 3, 'users_per_tenant': 2}}
+            ]
+        }
+        self.invalid_test_config_green_for_steps = {
+            'NovaServers.boot_and_delete_server': [
+                {'args': {'flavor_id': 1, 'image_id': 'img'},
+                 'execution': 'steps',
+                 'config': {'active_users': 64, 'step_duration': 1,
+                            'backend': 'green',
+                            'tenants': 3, 'users_per_tenant': 2}}
+            ]
+        }
+        self.invalid_test_config_agents_for_periodic = {
+            'NovaServers.boot_and_delete_server': [
+                {'args': {'flavor_id': 1, 'image_id': 'img'},
+                 'execution': 'periodic',
+                 'config': {'times': 10, 'period': 1, 'agents': 2,
+                            'tenants': 3, 'users_per_tenant': 2}}
+            ]
+        }
         self.valid_cloud_config = {
             'identity': {
                 'admin_username': 'admin',
@@ -97,6 +157,8 @@ class TestEngineTestCase(test.TestCase):
                               mock.MagicMock())
             engine.TestEngine(self.valid_test_config_continuous_duration,
                               mock.MagicMock())
+            engine.TestEngine(self.valid_test_config_rps, mock.MagicMock())
+            engine.TestEngine(self.valid_test_config_steps, mock.MagicMock())
         except Exception as e:
             self.fail("Unexpected exception in test config" +
                       "verification: %s" % str(e))
@@ -116,6 +178,26 @@ class TestEngineTestCase(test.TestCase):
                           engine.TestEngine,
                           self.invalid_test_config_bad_param_for_periodic,
                           mock.MagicMock())
+        self.assertRaises(exceptions.InvalidConfigException,
+                          engine.TestEngine,
+                          self.invalid_test_config_rps_without_rate,
+                          mock.MagicMock())
+        self.assertRaises(exceptions.InvalidConfigException,
+                          engine.TestEngine,
+                          self.invalid_test_config_rate_without_rps,
+                          mock.MagicMock())
+        self.assertRaises(exceptions.InvalidConfigException,
+                          engine.TestEngine,
+                          self.invalid_test_config_steps_without_duration,
+                          mock.MagicMock())
+        self.assertRaises(exceptions.InvalidConfigException,
+                          engine.TestEngine,
+                          self.invalid_test_config_agents_for_periodic,
+                          mock.MagicMock())
+        self.assertRaises(exceptions.InvalidConfigException,
+                          engine.TestEngine,
+                          self.invalid_test_config_green_for_steps,
+                          mock.MagicMock())
 
     def test_bind(self):
         tester = engine.TestEngine(self.valid_test_config_continuous_times,
@@ -153,7 +235,7 @@ class TestEngineTestCase(test.TestCase):
         s = consts.TaskStatus
         expected = [
             mock.call.update_status(s.TEST_TOOL_BENCHMARKING),
-            mock.call.append_results(benchmark_results, {'raw': {}}),
+            mock.call.append_results(benchmark_results, {}),
             mock.call.update_status(s.FINISHED)
         ]
         # NOTE(msdubov): Ignore task['uuid'] calls which are used for logging
@@ -175,12 +257,119 @@ class TestEngineTestCase(test.TestCase):
         except exceptions.TestException:
             pass
 
+        benchmark_name = 'NovaServers.boot_and_delete_server'
+        benchmark_results = {
+            'name': benchmark_name, 'pos': 0,
+            'kw': self.valid_test_config_continuous_times[benchmark_name][0],
+        }
+
         s = consts.TaskStatus
         expected = [
             mock.call.update_status(s.TEST_TOOL_BENCHMARKING),
+            mock.call.append_results(benchmark_results, {}),
             mock.call.update_status(s.FAILED)
         ]
         # NOTE(msdubov): Ignore task['uuid'] calls which are used for logging
         mock_calls = filter(lambda call: '__getitem__' not in call[0],
                             fake_task.mock_calls)
         self.assertEqual(mock_calls, expected)
+
+    @mock.patch("rally.benchmark.engine.sinks.TaskResultSink")
+    @mock.patch("rally.benchmark.engine.workers.WorkerPool")
+    @mock.patch("rally.benchmark.engine.runner")
+    def test_task_status_aborted(self, mock_runner, mock_pool, mock_sink):
+        scenario_runner = mock_runner.ScenarioRunner.return_value
+        scenario_runner.aborted.is_set.return_value = True
+        fake_task = mock.MagicMock()
+        tester = engine.TestEngine(self._parallel_config(None), fake_task)
+        with tester.bind(self.valid_cloud_config):
+            results = tester.run()
+
+        self.assertEqual(1, len(results))
+        self.assertEqual(1, scenario_runner.run.call_count)
+        fake_task.update_status.assert_called_with(
+                                            consts.TaskStatus.ABORTED)
+
+    def _parallel_config(self, groups):
+        run = self.valid_test_config_continuous_times[
+                                        'NovaServers.boot_and_delete_server']
+        return {'NovaServers.boot_and_delete_server': run,
+                'NovaServers.snapshot_server': run,
+                'NovaServers.boot_server': run,
+                'parallel_groups': groups}
+
+    def test_verify_parallel_groups(self):
+        tester = engine.TestEngine(
+                    self._parallel_config({'a': ['NovaServers.boot_server']}),
+                    mock.MagicMock())
+        self.assertNotIn('parallel_groups', tester.config)
+        self.assertEqual({'a': ['NovaServers.boot_server']},
+                         tester.parallel_groups)
+
+        for groups in [{'a': 'NovaServers.boot_server'},
+                       {'a': ['NovaServers.no_such_scenario']},
+                       {'a': ['NovaServers.boot_server'],
+                        'b': ['NovaServers.boot_server']}]:
+            self.assertRaises(exceptions.InvalidConfigException,
+                              engine.TestEngine,
+                              self._parallel_config(groups),
+                              mock.MagicMock())
+
+    def test_get_groups(self):
+        tester = engine.TestEngine(
+                    self._parallel_config({'a': ['NovaServers.boot_server'],
+                                           'b': []}),
+                    mock.MagicMock())
+        groups = tester._get_groups()
+        self.assertEqual(['a', engine.DEFAULT_GROUP], sorted(groups))
+        self.assertEqual(['NovaServers.boot_server'], groups['a'])
+        self.assertEqual(set(['NovaServers.boot_and_delete_server',
+                              'NovaServers.snapshot_server']),
+                         set(groups[engine.DEFAULT_GROUP]))
+
+    def test_split_users(self):
+        users = [{'username': '%s_%d' % (tenant, i), 'tenant_name': tenant}
+                 for tenant in ['t1', 't2', 't3'] for i in range(2)]
+        tester = engine.TestEngine(self._parallel_config({}),
+                                   mock.MagicMock(), users=users)
+        split = tester._split_users(['a', 'b'])
+        self.assertEqual(['t1_0', 't1_1', 't3_0', 't3_1'],
+                         [user['username'] for user in split['a']])
+        self.assertEqual(['t2_0', 't2_1'],
+                         [user['username'] for user in split['b']])
+
+        tester.users = None
+        self.assertEqual({'a': None, 'b': None},
+                         tester._split_users(['a', 'b']))
+
+    @mock.patch("rally.benchmark.engine.sinks.TaskResultSink")
+    @mock.patch("rally.benchmark.engine.workers.WorkerPool")
+    @mock.patch("rally.benchmark.engine.runner")
+    def test_run_parallel_groups(self, mock_runner, mock_pool, mock_sink):
+        mock_sink.side_effect = lambda task, key: mock.MagicMock(key=key)
+        mock_sink_calls = []
+
+        def _run(name, kwargs, sink):
+            mock_sink_calls.append(sink)
+
+        mock_runner.ScenarioRunner.return_value.run.side_effect = _run
+        mock_runner.ScenarioRunner.return_value.aborted.is_set.\
+            return_value = False
+        tester = engine.TestEngine(
+                    self._parallel_config({'a': ['NovaServers.boot_server']}),
+                    mock.MagicMock())
+        with tester.bind(self.valid_cloud_config):
+            results = tester.run()
+
+        self.assertEqual(3, len(results))
+        self.assertEqual(set(['a', engine.DEFAULT_GROUP]),
+                         set(json.loads(key)['group'] for key in results))
+        for call in mock_runner.ScenarioRunner.call_args_list:
+            self.assertEqual({'users': None, 'keystone_cleanup': False},
+                             call[1])
+        mock_runner.cleanup_keystone_resources.assert_called_once_with()
+        for sink in mock_sink_calls:
+            self.assertEqual(1, sink.set_info.call_count)
+            overlaps = sink.set_info.call_args[1]['overlaps']
+            self.assertTrue(all(overlap['group'] != sink.key['group']
+                                for overlap in overlaps))
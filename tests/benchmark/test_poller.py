@@ -0,0 +1,159 @@
+# Copyright 2013: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the batched status poller."""
+import mock
+
+from rally.benchmark import poller
+from rally.benchmark import utils
+from rally import exceptions
+from rally import test
+
+
+class FakeServer(object):
+
+    def __init__(self, id, status, task_state=None, updated=None):
+        self.id = id
+        self.status = status
+        setattr(self, poller.TASK_STATE, task_state)
+        if updated is not None:
+            self.updated = updated
+
+
+class FakeManager(object):
+    """Returns the next of the given server lists on every call."""
+
+    def __init__(self, *lists):
+        self.lists = list(lists)
+        self.calls = 0
+
+    def list(self, detailed=False):
+        self.calls += 1
+        return self.lists.pop(0)
+
+
+class StatusPollerTestCase(test.TestCase):
+
+    def setUp(self):
+        super(StatusPollerTestCase, self).setUp()
+        self.now = 1000.0
+        time_patcher = mock.patch("rally.benchmark.poller.time")
+        self.mock_time = time_patcher.start()
+        self.addCleanup(time_patcher.stop)
+        self.mock_time.time.side_effect = lambda: self.now
+        self.sleeps = []
+
+        def _sleep(seconds):
+            self.sleeps.append(seconds)
+            self.now += seconds
+
+        self.mock_time.sleep.side_effect = _sleep
+
+    def test_wait_batches_checks(self):
+        a, b = FakeServer("a", "BUILD"), FakeServer("b", "BUILD")
+        manager = FakeManager([a, b],
+                              [FakeServer("a", "ACTIVE"), b],
+                              [FakeServer("a", "ACTIVE"),
+                               FakeServer("b", "ACTIVE")])
+        p = poller.StatusPoller(manager)
+        servers = p.wait([b, a], utils.resource_is("ACTIVE"))
+        self.assertEqual(["b", "a"], [s.id for s in servers])
+        self.assertEqual(["ACTIVE", "ACTIVE"], [s.status for s in servers])
+        self.assertEqual(3, manager.calls)
+
+    def test_wait_adaptive_backoff(self):
+        build = FakeServer("a", "BUILD")
+        manager = FakeManager([build], [build], [build],
+                              [FakeServer("a", "BUILD", "spawning")],
+                              [FakeServer("a", "ACTIVE")])
+        p = poller.StatusPoller(manager, min_interval=1, max_interval=2,
+                                backoff=2)
+        p.wait([build], utils.resource_is("ACTIVE"))
+        self.assertEqual([2, 2, 2, 1], self.sleeps)
+
+    def test_wait_task_in_progress(self):
+        server = FakeServer("a", "ACTIVE")
+        manager = FakeManager([FakeServer("a", "ACTIVE", "rebooting")],
+                              [FakeServer("a", "ACTIVE")])
+        p = poller.StatusPoller(manager)
+        p.wait([server], utils.resource_is("ACTIVE"))
+        self.assertEqual(2, manager.calls)
+
+    def test_wait_deleted(self):
+        server = FakeServer("a", "ACTIVE")
+        manager = FakeManager([server], [])
+        p = poller.StatusPoller(manager)
+        self.assertEqual([None], p.wait([server], utils.is_none))
+
+    def test_wait_error_status(self):
+        server = FakeServer("a", "BUILD")
+        manager = FakeManager([FakeServer("a", "ERROR")])
+        p = poller.StatusPoller(manager)
+        self.assertRaises(exceptions.GetResourceFailure, p.wait, [server],
+                          utils.resource_is("ACTIVE"))
+
+    def test_wait_timeout(self):
+        server = FakeServer("a", "BUILD")
+        manager = FakeManager(*[[server]] * 10)
+        p = poller.StatusPoller(manager, min_interval=1, max_interval=1)
+        self.assertRaises(exceptions.TimeoutException, p.wait, [server],
+                          utils.resource_is("ACTIVE"), timeout=3)
+
+    def test_detection_delay_from_updated(self):
+        server = FakeServer("a", "BUILD")
+        # NOTE(hughsaunders): 1000.0 is 1970-01-01T00:16:40Z
+        manager = FakeManager([server],
+                              [FakeServer("a", "ACTIVE",
+                                          updated="1970-01-01T00:16:40Z")])
+        self.now = 999.0
+        p = poller.StatusPoller(manager, min_interval=2)
+        p.wait([server], utils.resource_is("ACTIVE"))
+        self.assertEqual(1000.0, p.ready_at)
+        self.assertEqual(1002.0, p.detected_at)
+        self.assertEqual(2.0, p.detection_delay)
+
+    def test_detection_delay_without_updated(self):
+        server = FakeServer("a", "BUILD")
+        manager = FakeManager([server], [FakeServer("a", "ACTIVE")])
+        p = poller.StatusPoller(manager, min_interval=2, backoff=1)
+        p.wait([server], utils.resource_is("ACTIVE"))
+        self.assertEqual(1.0, p.detection_delay)
+
+    def test_wait_shares_listing(self):
+        a, b = FakeServer("a", "BUILD"), FakeServer("b", "BUILD")
+        manager = FakeManager([FakeServer("a", "ACTIVE"),
+                               FakeServer("b", "ACTIVE")])
+        p = poller.StatusPoller(manager)
+        p._register(["a", "b"])
+        self.assertEqual(2, p.registered)
+        p.wait([a], utils.resource_is("ACTIVE"))
+        p.wait([b], utils.resource_is("ACTIVE"))
+        self.assertEqual(1, manager.calls)
+        self.assertEqual(2, p.registered)
+
+    def test_wait_unregisters(self):
+        server = FakeServer("a", "BUILD")
+        manager = FakeManager([FakeServer("a", "ERROR")])
+        p = poller.StatusPoller(manager)
+        self.assertRaises(exceptions.GetResourceFailure, p.wait, [server],
+                          utils.resource_is("ACTIVE"))
+        self.assertEqual(0, p.registered)
+
+    def test_get_poller(self):
+        manager, other = FakeManager(), FakeManager()
+        p = poller.get_poller(manager)
+        self.assertIs(p, poller.get_poller(manager))
+        self.assertIs(manager, p.manager)
+        self.assertIsNot(p, poller.get_poller(other))
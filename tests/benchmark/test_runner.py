@@ -16,8 +16,15 @@
 """Tests for utils."""
 import mock
 import multiprocessing
+import threading
+import time
 
+from rally.benchmark import base
 from rally.benchmark import runner
+from rally.benchmark import sinks
+from rally import consts
+from rally import exceptions
+from rally.openstack.common.fixture import config
 from rally import test
 from tests import fakes
 
@@ -33,8 +40,9 @@ class MockedPool(object):
     def join(self):
         pass
 
-    def apply_async(self, func, args=()):
+    def apply_async(self, func, args=(), callback=None):
         func(*args)
+        return mock.MagicMock()
 
 
 class ScenarioTestCase(test.TestCase):
@@ -44,14 +52,72 @@ class ScenarioTestCase(test.TestCase):
         admin_keys = ["admin_username", "admin_password",
                       "admin_tenant_name", "uri"]
         self.fake_kw = dict(zip(admin_keys, admin_keys))
+        runner.__run_id__ = None
+        runner.__admin_endpoint__ = None
+        runner.__admin_clients__ = {}
+        runner.__users_endpoints__ = []
+        runner.__assigned_users__ = []
+        runner.__ssh_ready_users__ = {}
 
-    def test_init_calls_register(self):
+    def _fake_clients(self, credentials, keys):
+        keystone = mock.MagicMock()
+        keystone.auth_ref.will_expire_soon.return_value = False
+        return {"keystone": keystone, "for": credentials}
+
+    def test_init_imports_no_scenarios(self):
         with mock.patch("rally.benchmark.utils.osclients") as mock_osclients:
             mock_osclients.Clients.return_value = fakes.FakeClients()
             with mock.patch("rally.benchmark.runner.base") as mock_base:
                 runner.ScenarioRunner(mock.MagicMock(), self.fake_kw)
-            self.assertEqual(mock_base.mock_calls,
-                             [mock.call.Scenario.register()])
+            self.assertEqual(mock_base.mock_calls, [])
+
+    @mock.patch("rally.benchmark.runner.utils._prepare_for_instance_ssh")
+    @mock.patch("rally.benchmark.runner.utils.create_openstack_client")
+    def test_load_run_environment(self, mock_create_client, mock_prepare):
+        mock_create_client.side_effect = self._fake_clients
+        users = [{"username": "u%d" % i, "password": "p",
+                  "tenant_name": "t", "uri": "uri"} for i in range(4)]
+        env = {"run_id": "run-1", "admin": self.fake_kw, "users": users,
+               "users_per_worker": 2, "ssh_key_pair": "key",
+               "context": {"some": "context"}}
+        runner.base.Scenario._lookup_cache[("key",)] = ("entry",)
+        runner._load_run_environment(env)
+        self.assertFalse(mock_create_client.called)
+        self.assertEqual(len(set(runner.__assigned_users__)), 2)
+        self.assertEqual(runner.__scenario_context__, {"some": "context"})
+        self.assertEqual({}, runner.base.Scenario._lookup_cache)
+
+        index = runner.__assigned_users__[0]
+        clients = runner._get_user_clients(index)
+        self.assertEqual(clients["for"], users[index])
+        self.assertIs(runner._get_user_clients(index), clients)
+        mock_prepare.assert_called_once_with([clients], "key")
+        admin_clients = runner._get_admin_clients()
+        self.assertEqual(admin_clients["for"], self.fake_kw)
+        self.assertEqual(mock_create_client.call_count, 2)
+
+        # NOTE(hughsaunders): The admin clients are kept for the next run.
+        runner._load_run_environment(dict(env, run_id="run-2",
+                                          users_per_worker=None))
+        self.assertEqual(runner.__openstack_clients__, [None] * 4)
+        self.assertEqual(runner.__assigned_users__, [])
+        self.assertIs(runner._get_admin_clients(), admin_clients)
+
+    @mock.patch("rally.benchmark.runner.utils._prepare_for_instance_ssh")
+    @mock.patch("rally.benchmark.runner.utils.create_openstack_client")
+    def test_get_user_clients_token_expires(self, mock_create_client,
+                                            mock_prepare):
+        mock_create_client.side_effect = self._fake_clients
+        runner._load_run_environment({"run_id": "run", "admin": self.fake_kw,
+                                      "users": [{"username": "u"}],
+                                      "ssh_key_pair": "key", "context": {}})
+        clients = runner._get_user_clients(0)
+        clients["keystone"].auth_ref.will_expire_soon.return_value = True
+        new_clients = runner._get_user_clients(0)
+        self.assertIsNot(new_clients, clients)
+        self.assertIs(runner._get_user_clients(0), new_clients)
+        clients["keystone"].auth_ref.will_expire_soon.assert_called_with(
+                                                runner.TOKEN_STALE_DURATION)
 
     def test_create_temp_tenants_and_users(self):
         with mock.patch("rally.benchmark.utils.osclients") as mock_osclients:
@@ -67,6 +133,21 @@ class ScenarioTestCase(test.TestCase):
             for endpoint in endpoints:
                 self.assertTrue(endpoint_keys.issubset(endpoint.keys()))
 
+    @mock.patch("rally.benchmark.utils.osclients")
+    def test_select_users(self, mock_osclients):
+        mock_osclients.Clients.return_value = fakes.FakeClients()
+        users = [{"username": "%s_%d" % (tenant, i), "tenant_name": tenant}
+                 for tenant in ["t1", "t2", "t3"] for i in range(3)]
+        srunner = runner.ScenarioRunner(mock.MagicMock(), self.fake_kw,
+                                        users=users)
+        self.assertEqual([u["username"] for u in srunner._select_users(2, 2)],
+                         ["t1_0", "t1_1", "t2_0", "t2_1"])
+        self.assertEqual(len(srunner._select_users(3, 3)), 9)
+        self.assertRaises(exceptions.BenchmarkSetupFailure,
+                          srunner._select_users, 4, 1)
+        self.assertRaises(exceptions.BenchmarkSetupFailure,
+                          srunner._select_users, 1, 4)
+
     def test_run_scenario(self):
         with mock.patch("rally.benchmark.utils.osclients") as mock_osclients:
             mock_osclients.Clients.return_value = fakes.FakeClients()
@@ -78,59 +159,73 @@ class ScenarioTestCase(test.TestCase):
                 duration = 0.01
 
                 mock_utils.Timer = fakes.FakeTimer
-                results = srunner._run_scenario(fakes.FakeScenario,
-                                                "do_it", {}, "continuous",
-                                                {"times": times,
-                                                 "active_users": active_users,
-                                                 "timeout": 2})
+                sink = srunner._run_scenario(fakes.FakeScenario,
+                                             "do_it", {}, "continuous",
+                                             {"times": times,
+                                              "active_users": active_users,
+                                              "timeout": 2},
+                                             sinks.ListSink())
+                sink.close()
                 expected = [{"time": 10, "idle_time": 0, "error": None,
-                             "scenario_output": None}
+                             "scenario_output": None, "atomic_actions": [],
+                             "timestamp": mock.ANY}
                             for i in range(times)]
-                self.assertEqual(results, expected)
+                self.assertEqual(sink.results, expected)
 
-                results = srunner._run_scenario(fakes.FakeScenario,
-                                                "do_it", {}, "continuous",
-                                                {"duration": duration,
-                                                 "active_users": active_users,
-                                                 "timeout": 2})
-                expected = [{"time": 10, "idle_time": 0, "error": None,
-                             "scenario_output": None}
-                            for i in range(active_users)]
-                self.assertEqual(results, expected)
+                sink = srunner._run_scenario(fakes.FakeScenario,
+                                             "do_it", {}, "continuous",
+                                             {"duration": duration,
+                                              "active_users": active_users,
+                                              "timeout": 2},
+                                             sinks.ListSink())
+                sink.close()
+                expected = {"time": 10, "idle_time": 0, "error": None,
+                            "scenario_output": None, "atomic_actions": [],
+                            "timestamp": mock.ANY}
+                self.assertTrue(sink.count >= active_users)
+                for result in sink.results:
+                    self.assertEqual(result, expected)
 
     @mock.patch("rally.benchmark.utils.osclients")
-    @mock.patch("multiprocessing.pool.IMapIterator.next")
-    @mock.patch("rally.benchmark.runner.time.time")
+    @mock.patch("rally.benchmark.workers.BoundedIMapIterator.next")
+    @mock.patch("rally.benchmark.runner.time")
     @mock.patch("rally.benchmark.utils._prepare_for_instance_ssh")
     def test_run_scenario_timeout(self, mock_prepare_for_instance_ssh,
                                   mock_time, mock_next, mock_osclients):
 
-        mock_time.side_effect = [1, 2, 3, 10]
+        # NOTE(hughsaunders): Only the clock of the runner is faked, the
+        #                     workers and the logging keep the real one.
+        mock_time.time.side_effect = [1.0, 2.0, 3.0, 10.0]
         mock_next.side_effect = multiprocessing.TimeoutError()
         mock_osclients.Clients.return_value = fakes.FakeClients()
         srunner = runner.ScenarioRunner(mock.MagicMock(), self.fake_kw)
         runner.__openstack_clients__ = ["client"]
         times = 4
         active_users = 2
-        results = srunner._run_scenario(fakes.FakeScenario,
-                                        "too_long", {}, "continuous",
-                                        {"times": times,
-                                         "active_users": active_users,
-                                         "timeout": 0.01})
-        self.assertEqual(len(results), times)
-        for r in results:
+        sink = srunner._run_scenario(fakes.FakeScenario,
+                                     "too_long", {}, "continuous",
+                                     {"times": times,
+                                      "active_users": active_users,
+                                      "timeout": 0.01},
+                                     sinks.ListSink())
+        sink.close()
+        self.assertEqual(len(sink.results), times)
+        for r in sink.results:
             self.assertEqual(r['time'], 0.01)
             self.assertEqual(r['error'][0],
                              str(multiprocessing.TimeoutError))
 
         duration = 0.1
-        results = srunner._run_scenario(fakes.FakeScenario,
-                                        "too_long", {}, "continuous",
-                                        {"duration": duration,
-                                         "active_users": active_users,
-                                         "timeout": 0.01})
-        self.assertEqual(len(results), active_users)
-        for r in results:
+        sink = srunner._run_scenario(fakes.FakeScenario,
+                                     "too_long", {}, "continuous",
+                                     {"duration": duration,
+                                      "active_users": active_users,
+                                      "timeout": 0.01},
+                                     sinks.ListSink())
+        sink.close()
+        self.assertEqual(len(sink.results), 2)
+        self.assertEqual(2 / 9.0, sink.info["iterations_per_second"])
+        for r in sink.results:
             self.assertEqual(r['time'], 0.01)
             self.assertEqual(r['error'][0],
                              str(multiprocessing.TimeoutError))
@@ -145,26 +240,31 @@ class ScenarioTestCase(test.TestCase):
             active_users = 2
             with mock.patch("rally.benchmark.runner.rutils") as mock_utils:
                 mock_utils.Timer = fakes.FakeTimer
-                results = srunner._run_scenario(fakes.FakeScenario,
-                                                "something_went_wrong", {},
-                                                "continuous",
-                                                {"times": times,
-                                                 "active_users": active_users,
-                                                 "timeout": 1})
-                self.assertEqual(len(results), times)
-                for r in results:
+                sink = srunner._run_scenario(fakes.FakeScenario,
+                                             "something_went_wrong", {},
+                                             "continuous",
+                                             {"times": times,
+                                              "active_users": active_users,
+                                              "timeout": 1},
+                                             sinks.ListSink())
+                sink.close()
+                self.assertEqual(len(sink.results), times)
+                self.assertEqual(sink.errors, times)
+                for r in sink.results:
                     self.assertEqual(r['time'], 10)
                     self.assertEqual(r['error'][:2],
                                      [str(Exception), "Something went wrong"])
 
-                results = srunner._run_scenario(fakes.FakeScenario,
-                                                "something_went_wrong", {},
-                                                "continuous",
-                                                {"duration": duration,
-                                                 "active_users": active_users,
-                                                 "timeout": 1})
-                self.assertEqual(len(results), active_users)
-                for r in results:
+                sink = srunner._run_scenario(fakes.FakeScenario,
+                                             "something_went_wrong", {},
+                                             "continuous",
+                                             {"duration": duration,
+                                              "active_users": active_users,
+                                              "timeout": 1},
+                                             sinks.ListSink())
+                sink.close()
+                self.assertTrue(len(sink.results) >= active_users)
+                for r in sink.results:
                     self.assertEqual(r['time'], 10)
                     self.assertEqual(r['error'][:2],
                                      [str(Exception), "Something went wrong"])
@@ -172,80 +272,540 @@ class ScenarioTestCase(test.TestCase):
     def test_run_scenario_exception_outside_test(self):
         pass
 
-    @mock.patch("rally.benchmark.runner.multiprocessing")
     @mock.patch("rally.benchmark.utils.osclients")
-    def test_run_scenario_continuously_for_times(self, mock_osclients,
-                                                 mock_multi):
+    def test_run_scenario_authentication_fails(self, mock_osclients):
         mock_osclients.Clients.return_value = fakes.FakeClients()
         srunner = runner.ScenarioRunner(mock.MagicMock(), self.fake_kw)
+        self.addCleanup(srunner.pool.close)
+        srunner.run_env = {"run_id": "run", "admin": self.fake_kw,
+                           "users": [dict(self.fake_kw, username="u",
+                                          password="p", tenant_name="t")],
+                           "ssh_key_pair": "key", "context": {}}
+        # NOTE(hughsaunders): Raised in the workers, which authenticate
+        #                     the users themselves.
+        mock_osclients.Clients.side_effect = Exception("Auth failed")
+        result = runner._run_scenario_loop((0, fakes.FakeScenario, "do_it",
+                                            {}, srunner.run_env))
+        self.assertEqual(result["error"][:2],
+                         [str(Exception), "Auth failed"])
+        self.assertEqual(0, result["time"])
+
+        sink = sinks.ListSink()
+        start = time.time()
+        srunner._run_scenario_continuously_for_times(fakes.FakeScenario,
+                                                     "do_it", {}, 2, 1, 2,
+                                                     sink)
+        sink.close()
+        self.assertTrue(time.time() - start < 2)
+        self.assertEqual(2, len(sink.results))
+        for r in sink.results:
+            self.assertEqual(r["error"][:2], [str(Exception), "Auth failed"])
+
+    def test_run_scenario_loop_timeout(self):
+
+        class SlowScenario(fakes.FakeScenario):
+
+            @classmethod
+            def do_it(cls, **kwargs):
+                time.sleep(5)
+
+        runner.__openstack_clients__ = ["client"]
+        runner.__iteration_timeout__ = 0.05
+        try:
+            result = runner._run_scenario_loop((0, SlowScenario, "do_it",
+                                                {}, None))
+        finally:
+            runner.__iteration_timeout__ = None
+        self.assertEqual(str(exceptions.IterationTimeout), result["error"][0])
+        self.assertTrue(result["time"] < 5)
+
+    @mock.patch("rally.benchmark.runner.signal")
+    def test_iteration_timeout_not_set(self, mock_signal):
+        with runner._iteration_timeout(None):
+            pass
+        self.assertFalse(mock_signal.signal.called)
+
+    def test_wait_timeout(self):
+        self.assertEqual(0.02, runner._wait_timeout(0.01))
+        self.assertEqual(60 + runner.TIMEOUT_GRACE, runner._wait_timeout(60))
+
+    @mock.patch("rally.benchmark.utils.osclients")
+    def test_run_scenario_continuously_for_times(self, mock_osclients):
+        mock_osclients.Clients.return_value = fakes.FakeClients()
+        mock_pool = mock.MagicMock()
+        mock_pool.imap.return_value.stop.return_value = True
+        srunner = runner.ScenarioRunner(mock.MagicMock(), self.fake_kw,
+                                        mock_pool)
         runner.__openstack_clients__ = ["client"]
         times = 3
         active_users = 4
         timeout = 5
-        mock_multi.Pool = mock.MagicMock()
+        mock_sink = mock.MagicMock()
         srunner._run_scenario_continuously_for_times(fakes.FakeScenario,
                                                      "do_it", {},
                                                      times, active_users,
-                                                     timeout)
+                                                     timeout, mock_sink)
         expect = [
-            mock.call(active_users),
-            mock.call().imap(
+            mock.call.imap(
                 runner._run_scenario_loop,
-                [(i, fakes.FakeScenario, "do_it", {})
-                    for i in xrange(times)]
+                [(i, fakes.FakeScenario, "do_it", {}, None)
+                    for i in xrange(times)],
+                active_users
             )
         ]
-        expect.extend([mock.call().imap().next(timeout) for i in range(times)])
-        expect.extend([
-            mock.call().close(),
-            mock.call().join()
-        ])
-        self.assertEqual(mock_multi.Pool.mock_calls, expect)
+        expect.extend([mock.call.imap().next(runner._wait_timeout(timeout))
+                       for i in range(times)])
+        expect.append(mock.call.imap().stop(timeout))
+        self.assertEqual(mock_pool.mock_calls, expect)
+        self.assertEqual(mock_sink.append.call_count, times)
 
     @mock.patch("rally.benchmark.utils.infinite_run_args")
-    @mock.patch("rally.benchmark.runner.multiprocessing")
     @mock.patch("rally.benchmark.utils.osclients")
     def test_run_scenario_continuously_for_duration(self, mock_osclients,
-                                                    mock_multi, mock_generate):
+                                                    mock_generate):
         mock_osclients.Clients.return_value = fakes.FakeClients()
-        srunner = runner.ScenarioRunner(mock.MagicMock(), self.fake_kw)
+        mock_pool = mock.MagicMock()
+        mock_pool.imap.return_value.stop.return_value = False
+        srunner = runner.ScenarioRunner(mock.MagicMock(), self.fake_kw,
+                                        mock_pool)
         runner.__openstack_clients__ = ["client"]
         duration = 0
         active_users = 4
         timeout = 5
-        mock_multi.Pool = mock.MagicMock()
         mock_generate.return_value = {}
         srunner._run_scenario_continuously_for_duration(fakes.FakeScenario,
                                                         "do_it", {}, duration,
-                                                        active_users, timeout)
+                                                        active_users, timeout,
+                                                        mock.MagicMock())
+        mock_generate.assert_called_once_with((fakes.FakeScenario, "do_it",
+                                               {}, None))
         expect = [
-            mock.call(active_users),
-            mock.call().imap(runner._run_scenario_loop, {}),
-            mock.call().terminate(),
-            mock.call().join()
+            mock.call.imap(runner._run_scenario_loop, {}, active_users),
+            mock.call.imap().stop(timeout),
+            mock.call.restart()
         ]
-        self.assertEqual(mock_multi.Pool.mock_calls, expect)
+        self.assertEqual(mock_pool.mock_calls, expect)
 
-    @mock.patch("rally.benchmark.runner._run_scenario_loop")
-    @mock.patch("rally.benchmark.runner.time.sleep")
     @mock.patch("rally.benchmark.utils.osclients")
-    def test_run_scenario_periodically(self, mock_osclients,
-                                       mock_sleep, mock_run_scenario_loop):
+    def test_run_scenario_periodically(self, mock_osclients):
         mock_osclients.Clients.return_value = fakes.FakeClients()
-        srunner = runner.ScenarioRunner(mock.MagicMock(), self.fake_kw)
+        mock_pool = mock.MagicMock()
+        mock_pool.apply_async.return_value.ready.return_value = False
+        srunner = runner.ScenarioRunner(mock.MagicMock(), self.fake_kw,
+                                        mock_pool)
+        srunner.aborted = mock.MagicMock()
+        srunner.aborted.wait.return_value = False
+        srunner.aborted.is_set.return_value = False
         runner.__openstack_clients__ = ["client"]
         times = 3
         period = 4
         timeout = 5
+        mock_sink = mock.MagicMock()
         srunner._run_scenario_periodically(fakes.FakeScenario, "do_it", {},
-                                           times, period, timeout)
+                                           times, period, timeout, mock_sink)
 
-        expected = [mock.call((i, fakes.FakeScenario, "do_it", {}))
+        expected = [mock.call(runner._run_scenario_loop,
+                              ((i, fakes.FakeScenario, "do_it", {}, None),))
                     for i in xrange(times)]
-        self.assertEqual(mock_run_scenario_loop.mock_calls, expected)
+        self.assertEqual(mock_pool.apply_async.call_args_list, expected)
+        async_result = mock_pool.apply_async.return_value
+        self.assertEqual(async_result.get.mock_calls,
+                         [mock.call(runner._wait_timeout(timeout))] * times)
+        # NOTE(hughsaunders): None of the launches has finished yet, so
+        #                     every next one needs one more worker.
+        self.assertEqual(mock_pool.resize.mock_calls,
+                         [mock.call(i + 1) for i in xrange(times)])
 
-        expected = [mock.call(period * 60) for i in xrange(times - 1)]
-        mock_sleep.has_calls(expected)
+        self.assertEqual(srunner.aborted.wait.mock_calls,
+                         [mock.call(period * 60) for i in xrange(times - 1)])
+        self.assertEqual(mock_sink.append.call_count, times)
+        self.assertFalse(mock_pool.restart.called)
+
+    @mock.patch("rally.benchmark.utils.osclients")
+    def test_run_scenario_continuously_for_times_aborted(self,
+                                                         mock_osclients):
+        mock_osclients.Clients.return_value = fakes.FakeClients()
+        self.useFixture(config.Config()).config(abort_timeout=7,
+                                                group="benchmark")
+        mock_pool = mock.MagicMock()
+        iter_result = mock_pool.imap.return_value
+        iter_result.next.side_effect = [{"time": 1}, exceptions.RunAborted()]
+        iter_result.drain.return_value = ([{"time": 2}], True)
+        srunner = runner.ScenarioRunner(mock.MagicMock(), self.fake_kw,
+                                        mock_pool)
+        srunner.aborted.set()
+        sink = sinks.ListSink()
+        srunner._run_scenario_continuously_for_times(fakes.FakeScenario,
+                                                     "do_it", {}, 10, 2, 5,
+                                                     sink)
+        sink.close()
+        iter_result.cancel.assert_called_once_with()
+        iter_result.drain.assert_called_once_with(7)
+        self.assertFalse(iter_result.stop.called)
+        self.assertFalse(mock_pool.restart.called)
+        self.assertEqual([{"time": 1}, {"time": 2}], sink.results)
+
+    @mock.patch("rally.benchmark.utils.osclients")
+    def test_run_scenario_continuously_for_times_worker_failure(
+                                                        self, mock_osclients):
+        mock_osclients.Clients.return_value = fakes.FakeClients()
+        mock_pool = mock.MagicMock()
+        iter_result = mock_pool.imap.return_value
+        error = ["ValueError", "Broken", "Traceback"]
+        iter_result.next.side_effect = [
+                    exceptions.WorkerFailure(func="f", message="Broken",
+                                             error=error),
+                    {"time": 1}]
+        srunner = runner.ScenarioRunner(mock.MagicMock(), self.fake_kw,
+                                        mock_pool)
+        sink = sinks.ListSink()
+        srunner._run_scenario_continuously_for_times(fakes.FakeScenario,
+                                                     "do_it", {}, 2, 2, 5,
+                                                     sink)
+        sink.close()
+        self.assertEqual([{"time": 0, "idle_time": 0, "error": error},
+                          {"time": 1}], sink.results)
+
+    @mock.patch("rally.benchmark.utils.osclients")
+    def test_run_scenario_at_rate_aborted(self, mock_osclients):
+        mock_osclients.Clients.return_value = fakes.FakeClients()
+        mock_pool = mock.MagicMock()
+        srunner = runner.ScenarioRunner(mock.MagicMock(), self.fake_kw,
+                                        mock_pool)
+        srunner.aborted.set()
+        sink = sinks.ListSink()
+        srunner._run_scenario_at_rate(fakes.FakeScenario, "do_it", {},
+                                      rps=10, times=5, concurrent=2,
+                                      max_in_flight=2, timeout=5, sink=sink)
+        sink.close()
+        self.assertFalse(mock_pool.apply_async.called)
+        self.assertFalse(mock_pool.restart.called)
+        self.assertEqual([], sink.results)
+
+    @mock.patch("rally.benchmark.utils.osclients")
+    def test_watch_abort(self, mock_osclients):
+        mock_osclients.Clients.return_value = fakes.FakeClients()
+        self.useFixture(config.Config()).config(abort_poll_interval=0,
+                                                group="benchmark")
+        task = mock.MagicMock()
+        task.get_status.side_effect = [
+                            consts.TaskStatus.TEST_TOOL_BENCHMARKING,
+                            Exception("DB is down"),
+                            consts.TaskStatus.ABORTING]
+        srunner = runner.ScenarioRunner(task, self.fake_kw, mock.MagicMock())
+        hook = mock.MagicMock()
+        srunner._on_abort(hook)
+        srunner._watch_abort(threading.Event())
+        self.assertTrue(srunner.aborted.is_set())
+        hook.assert_called_once_with()
+        self.assertEqual(3, task.get_status.call_count)
+
+        done = threading.Event()
+        done.set()
+        task.get_status.side_effect = None
+        task.get_status.return_value = consts.TaskStatus.FINISHED
+        srunner._watch_abort(done)
+        self.assertEqual(4, task.get_status.call_count)
+
+    @mock.patch("rally.benchmark.utils.osclients")
+    def test_abort_without_task(self, mock_osclients):
+        mock_osclients.Clients.return_value = fakes.FakeClients()
+        srunner = runner.ScenarioRunner(None, self.fake_kw, mock.MagicMock())
+        hook = mock.MagicMock()
+        srunner._on_abort(hook)
+        srunner.abort()
+        self.assertTrue(srunner.aborted.is_set())
+        hook.assert_called_once_with()
+
+    @mock.patch("rally.benchmark.utils.osclients")
+    def test_run_scenario_at_rate(self, mock_osclients):
+        mock_osclients.Clients.return_value = fakes.FakeClients()
+        srunner = runner.ScenarioRunner(mock.MagicMock(), self.fake_kw)
+        runner.__openstack_clients__ = ["client"]
+        sink = sinks.ListSink()
+        start = time.time()
+        srunner._run_scenario_at_rate(fakes.FakeScenario, "do_it", {},
+                                      rps=20, times=5, concurrent=2,
+                                      max_in_flight=2, timeout=2, sink=sink)
+        sink.close()
+        # NOTE(msdubov): The 5th iteration is scheduled at start + 4 / 20
+        self.assertTrue(time.time() - start >= 0.2)
+        self.assertEqual(len(sink.results), 5)
+        for result in sink.results:
+            self.assertIsNone(result["error"])
+            self.assertTrue(result["start_lag"] >= 0)
+
+    @mock.patch("rally.benchmark.runner.multiprocessing")
+    @mock.patch("rally.benchmark.runner.workers.WorkerPool")
+    @mock.patch("rally.benchmark.utils.osclients")
+    def test_run_scenario_in_green_threads(self, mock_osclients,
+                                           mock_worker_pool, mock_mp):
+        mock_osclients.Clients.return_value = fakes.FakeClients()
+        self.useFixture(config.Config()).config(green_processes=2,
+                                                group="benchmark")
+        mock_pool = mock.MagicMock()
+        mock_green_pool = mock_worker_pool.return_value
+        mock_green_pool.apply_async.return_value.get.return_value = 1
+        mock_results, mock_sender = mock.MagicMock(), mock.MagicMock()
+        mock_mp.Pipe.return_value = (mock_results, mock_sender)
+        mock_results.recv.side_effect = [{"a": 1}, {"a": 2}]
+        srunner = runner.ScenarioRunner(mock.MagicMock(), self.fake_kw,
+                                        mock_pool)
+        sink = sinks.ListSink()
+        srunner._run_scenario(fakes.FakeScenario, "do_it", {}, "continuous",
+                              {"times": 5, "active_users": 3, "timeout": 2,
+                               "backend": "green"}, sink)
+        sink.close()
+
+        self.assertFalse(mock_pool.apply_async.called)
+        mock_mp.Pipe.assert_called_once_with(duplex=False)
+        mock_worker_pool.assert_called_once_with(
+                2, runner._init_green_worker,
+                (mock_sender, mock_mp.Lock.return_value))
+        self.assertEqual(
+            [mock.call(runner._run_scenario_green,
+                       ((fakes.FakeScenario, "do_it", {}, None, 3, None, 2,
+                         2),)),
+             mock.call(runner._run_scenario_green,
+                       ((fakes.FakeScenario, "do_it", {}, None, 2, None, 1,
+                         2),))],
+            mock_green_pool.apply_async.call_args_list)
+        self.assertEqual([{"a": 1}, {"a": 2}], sink.results)
+        mock_green_pool.close.assert_called_once_with()
+        mock_results.close.assert_called_once_with()
+        mock_sender.close.assert_called_once_with()
+
+    @mock.patch("rally.benchmark.runner.multiprocessing")
+    @mock.patch("rally.benchmark.runner.workers.WorkerPool")
+    @mock.patch("rally.benchmark.utils.osclients")
+    def test_run_scenario_in_green_threads_aborted(self, mock_osclients,
+                                                   mock_worker_pool,
+                                                   mock_mp):
+        mock_osclients.Clients.return_value = fakes.FakeClients()
+        self.useFixture(config.Config()).config(green_processes=1,
+                                                abort_timeout=0,
+                                                group="benchmark")
+        mock_mp.cpu_count.return_value = 4
+        mock_results = mock.MagicMock()
+        mock_mp.Pipe.return_value = (mock_results, mock.MagicMock())
+        mock_green_pool = mock_worker_pool.return_value
+        mock_green_pool.apply_async.return_value.ready.return_value = False
+        srunner = runner.ScenarioRunner(mock.MagicMock(), self.fake_kw,
+                                        mock.MagicMock())
+        srunner.aborted.set()
+        sink = sinks.ListSink()
+        srunner._run_scenario_in_green_threads(fakes.FakeScenario, "do_it",
+                                               {}, 5, None, 3, 2, sink)
+        sink.close()
+
+        self.assertEqual([], sink.results)
+        self.assertFalse(mock_results.recv.called)
+        mock_green_pool.terminate.assert_called_once_with()
+
+    @mock.patch("rally.benchmark.runner.multiprocessing")
+    @mock.patch("rally.benchmark.runner.workers.WorkerPool")
+    @mock.patch("rally.benchmark.utils.osclients")
+    def test_run_scenario_in_green_threads_stalled(self, mock_osclients,
+                                                   mock_worker_pool,
+                                                   mock_mp):
+        mock_osclients.Clients.return_value = fakes.FakeClients()
+        self.useFixture(config.Config()).config(green_processes=1,
+                                                group="benchmark")
+        mock_mp.TimeoutError = multiprocessing.TimeoutError
+        mock_results = mock.MagicMock()
+        polls = []
+
+        def _poll(wait):
+            # NOTE(hughsaunders): The first result comes, then the worker
+            #                     hangs.
+            polls.append(wait)
+            if len(polls) == 1:
+                return True
+            time.sleep(wait)
+            return False
+
+        mock_results.poll.side_effect = _poll
+        mock_results.recv.return_value = {"a": 1}
+        mock_mp.Pipe.return_value = (mock_results, mock.MagicMock())
+        mock_green_pool = mock_worker_pool.return_value
+        mock_green_pool.apply_async.return_value.ready.return_value = False
+        srunner = runner.ScenarioRunner(mock.MagicMock(), self.fake_kw,
+                                        mock.MagicMock())
+        sink = sinks.ListSink()
+        srunner._run_scenario_in_green_threads(fakes.FakeScenario, "do_it",
+                                               {}, 3, None, 2, 0.01, sink)
+        sink.close()
+
+        self.assertEqual(3, len(sink.results))
+        self.assertEqual({"a": 1}, sink.results[0])
+        for r in sink.results[1:]:
+            self.assertEqual(str(multiprocessing.TimeoutError),
+                             r["error"][0])
+        mock_green_pool.terminate.assert_called_once_with()
+
+    @mock.patch("rally.benchmark.runner._run_scenario_loop")
+    def test_run_green_iteration_fails(self, mock_loop):
+        mock_loop.side_effect = Exception("Broken")
+        results, sender = multiprocessing.Pipe(duplex=False)
+        self.addCleanup(setattr, runner, "__green_results__", None)
+        runner.__green_results__ = (sender, threading.Lock())
+        free_classes = runner.eventlet.queue.LightQueue()
+        free_classes.put(fakes.FakeScenario)
+        runner._run_green_iteration(free_classes, 0, "do_it", {}, None, 1)
+        self.assertEqual([str(Exception), "Broken"],
+                         results.recv()["error"][:2])
+        self.assertEqual(1, free_classes.qsize())
+
+    @mock.patch("rally.benchmark.runner.eventlet.monkey_patch")
+    def test_init_green_worker(self, mock_monkey_patch):
+        self.addCleanup(setattr, runner, "__green_results__", None)
+        runner._init_green_worker("results", "lock")
+        self.assertEqual(("results", "lock"), runner.__green_results__)
+        mock_monkey_patch.assert_called_once_with()
+
+    def _run_scenario_green(self, args):
+        results, sender = multiprocessing.Pipe(duplex=False)
+        self.addCleanup(setattr, runner, "__green_results__", None)
+        runner.__green_results__ = (sender, threading.Lock())
+        count = runner._run_scenario_green(args)
+        received = [results.recv() for i in xrange(count)]
+        self.assertFalse(results.poll())
+        return received
+
+    @mock.patch("rally.benchmark.runner._green_scenario_classes",
+                wraps=runner._green_scenario_classes)
+    def test_run_scenario_green(self, mock_classes):
+        runner.__openstack_clients__ = ["client"]
+        classes = dict(base._classes)
+        results = self._run_scenario_green((fakes.FakeScenario, "do_it",
+                                            {}, None, 4, None, 2, 1))
+        self.assertEqual(4, len(results))
+        for result in results:
+            self.assertIsNone(result["error"])
+        mock_classes.assert_called_once_with(fakes.FakeScenario, 2)
+        self.assertEqual(classes, base._classes)
+
+        results = self._run_scenario_green((fakes.FakeScenario,
+                                            "something_went_wrong", {},
+                                            None, None, 0.0001, 2, 1))
+        self.assertTrue(len(results) > 0)
+        for result in results:
+            self.assertEqual(result["error"][1], "Something went wrong")
+
+    @mock.patch("rally.benchmark.utils.osclients")
+    def test_run_scenario_at_rate_timeout(self, mock_osclients):
+        mock_osclients.Clients.return_value = fakes.FakeClients()
+        mock_pool = mock.MagicMock()
+        srunner = runner.ScenarioRunner(mock.MagicMock(), self.fake_kw,
+                                        mock_pool)
+        sink = sinks.ListSink()
+        srunner._run_scenario_at_rate(fakes.FakeScenario, "do_it", {},
+                                      rps=1000, times=3, concurrent=2,
+                                      max_in_flight=2, timeout=0.01,
+                                      sink=sink)
+        sink.close()
+        self.assertEqual(len(sink.results), 3)
+        for r in sink.results:
+            self.assertEqual(r["error"][0], str(multiprocessing.TimeoutError))
+        # NOTE(hughsaunders): The workers never call back, the slots of the
+        #                     iterations timed out are released all the same.
+        self.assertEqual(3, mock_pool.apply_async.call_count)
+        mock_pool.resize.assert_called_once_with(2)
+        mock_pool.restart.assert_called_once_with()
+
+    @mock.patch("rally.benchmark.utils.osclients")
+    def test_run_scenario_at_rate_slower_than_timeout(self, mock_osclients):
+        mock_osclients.Clients.return_value = fakes.FakeClients()
+        mock_pool = mock.MagicMock()
+
+        def _apply_async(func, args, callback):
+            callback({"time": 0, "error": None, "timestamp": time.time()})
+
+        mock_pool.apply_async.side_effect = _apply_async
+        srunner = runner.ScenarioRunner(mock.MagicMock(), self.fake_kw,
+                                        mock_pool)
+        sink = sinks.ListSink()
+        # NOTE(hughsaunders): The iterations are dispatched 0.5 s apart,
+        #                     more than they are waited for.
+        srunner._run_scenario_at_rate(fakes.FakeScenario, "do_it", {},
+                                      rps=2, times=3, concurrent=1,
+                                      max_in_flight=1, timeout=0.1,
+                                      sink=sink)
+        sink.close()
+        self.assertEqual(3, len(sink.results))
+        for r in sink.results:
+            self.assertIsNone(r["error"])
+        self.assertEqual(3, mock_pool.apply_async.call_count)
+        self.assertFalse(mock_pool.restart.called)
+
+    @mock.patch("rally.benchmark.utils.osclients")
+    def test_run_scenario_stepwise(self, mock_osclients):
+        mock_osclients.Clients.return_value = fakes.FakeClients()
+        srunner = runner.ScenarioRunner(mock.MagicMock(), self.fake_kw)
+
+        def fake_run_for_duration(cls, method, args, duration, concurrent,
+                                  timeout, sink):
+            for i in range(concurrent):
+                sink.append({"time": 1, "error": None})
+
+        srunner._run_scenario_continuously_for_duration = mock.MagicMock(
+                                        side_effect=fake_run_for_duration)
+        sink = sinks.ListSink()
+        srunner._run_scenario_stepwise(fakes.FakeScenario, "do_it", {},
+                                       [1, 3], 0.5, 10, sink)
+        sink.close()
+        self.assertEqual([r["concurrency"] for r in sink.results],
+                         [1, 3, 3, 3])
+        self.assertEqual(
+            [c[0][3:6] for c in srunner.
+                _run_scenario_continuously_for_duration.call_args_list],
+            [(0.5, 1, 10), (0.5, 3, 10)])
+
+    @mock.patch("rally.benchmark.runner.base")
+    @mock.patch("rally.benchmark.utils.osclients")
+    def test_run_steps(self, mock_osclients, mock_base):
+        mock_osclients.Clients.return_value = fakes.FakeClients()
+        srunner = runner.ScenarioRunner(mock.MagicMock(), self.fake_kw)
+        srunner._run_scenario_stepwise = mock.MagicMock(return_value="result")
+        sink = sinks.ListSink()
+        FakeScenario = mock.MagicMock()
+
+        result = srunner._run_scenario(FakeScenario, "do_it", {}, "steps",
+                                       {"start_users": 2, "step_users": 4,
+                                        "active_users": 12,
+                                        "step_duration": 1}, sink)
+        self.assertEqual(result, "result")
+        srunner._run_scenario(FakeScenario, "do_it", {}, "steps",
+                              {"active_users": 3, "step_duration": 2,
+                               "timeout": 5}, sink)
+        self.assertEqual(srunner._run_scenario_stepwise.mock_calls, [
+            mock.call(FakeScenario, "do_it", {}, [2, 6, 10, 12], 1, 10000,
+                      sink),
+            mock.call(FakeScenario, "do_it", {}, [1, 2, 3], 2, 5, sink),
+        ])
+
+    @mock.patch("rally.benchmark.runner.base")
+    @mock.patch("rally.benchmark.utils.osclients")
+    def test_run_rps(self, mock_osclients, mock_base):
+        mock_osclients.Clients.return_value = fakes.FakeClients()
+        srunner = runner.ScenarioRunner(mock.MagicMock(), self.fake_kw)
+        srunner._run_scenario_at_rate = mock.MagicMock(return_value="result")
+        sink = sinks.ListSink()
+        FakeScenario = mock.MagicMock()
+
+        result = srunner._run_scenario(FakeScenario, "do_it", {"a": 1},
+                                       "rps", {"rps": 2, "duration": 1,
+                                               "active_users": 3,
+                                               "timeout": 1}, sink)
+        self.assertEqual(result, "result")
+        srunner._run_scenario(FakeScenario, "do_it", {"a": 1}, "rps",
+                              {"rps": 2, "times": 7, "max_in_flight": 5},
+                              sink)
+        self.assertEqual(srunner._run_scenario_at_rate.mock_calls, [
+            mock.call(FakeScenario, "do_it", {"a": 1}, 2, 120, 3, 3, 1, sink),
+            mock.call(FakeScenario, "do_it", {"a": 1}, 2, 7, 1, 5, 10000,
+                      sink),
+        ])
 
     @mock.patch("rally.benchmark.runner.base")
     @mock.patch("rally.benchmark.utils.osclients")
@@ -266,20 +826,22 @@ class ScenarioTestCase(test.TestCase):
         mock_base.Scenario.get_by_name = \
             mock.MagicMock(return_value=FakeScenario)
         mock_osclients.return_value = ["client"]
+        sink = sinks.ListSink()
         result = srunner._run_scenario(FakeScenario, "do_it", {"a": 1},
                                        "continuous", {"times": 2,
                                                       "active_users": 3,
-                                                      "timeout": 1})
+                                                      "timeout": 1}, sink)
         self.assertEqual(result, "result")
         srunner._run_scenario_continuously_for_times.assert_called_once_with(
-                                    FakeScenario, "do_it", {"a": 1}, 2, 3, 1)
+                            FakeScenario, "do_it", {"a": 1}, 2, 3, 1, sink)
         result = srunner._run_scenario(FakeScenario, "do_it", {"a": 1},
                                        "continuous", {"duration": 2,
                                                       "active_users": 3,
-                                                      "timeout": 1})
+                                                      "timeout": 1}, sink)
         self.assertEqual(result, "result")
         srunner._run_scenario_continuously_for_duration.\
-            assert_called_once_with(FakeScenario, "do_it", {"a": 1}, 2, 3, 1)
+            assert_called_once_with(FakeScenario, "do_it", {"a": 1}, 2, 3, 1,
+                                    sink)
 
     @mock.patch("rally.benchmark.runner.base")
     @mock.patch("rally.benchmark.utils.osclients")
@@ -298,17 +860,192 @@ class ScenarioTestCase(test.TestCase):
         mock_base.Scenario.get_by_name = \
             mock.MagicMock(return_value=FakeScenario)
         mock_osclients.return_value = ["client"]
+        sink = sinks.ListSink()
         result = srunner._run_scenario(FakeScenario, "do_it", {"a": 1},
                                        "periodic", {"times": 2, "period": 3,
-                                                    "timeout": 1})
+                                                    "timeout": 1}, sink)
         self.assertEqual(result, "result")
         srunner._run_scenario_periodically.assert_called_once_with(
-                                    FakeScenario, "do_it", {"a": 1}, 2, 3, 1)
+                            FakeScenario, "do_it", {"a": 1}, 2, 3, 1, sink)
 
-    @mock.patch("rally.benchmark.utils.create_openstack_clients")
+    @mock.patch("rally.benchmark.utils.generate_ssh_key_pair")
     @mock.patch("rally.benchmark.runner.base")
     @mock.patch("rally.benchmark.utils.osclients")
-    def test_run(self, mock_osclients, mock_base, mock_clients):
+    def test_run_with_users(self, mock_osclients, mock_base,
+                            mock_generate_key):
+        mock_osclients.Clients.return_value = fakes.FakeClients()
+        users = [{"username": "u", "tenant_name": "t", "ssh_key_pair": {}}]
+        srunner = runner.ScenarioRunner(mock.MagicMock(), self.fake_kw,
+                                        users=users)
+        leftovers = []
+
+        def _run_scenario(*args):
+            leftovers.append(sink.info["leftovers"])
+
+        sink = sinks.ListSink()
+        srunner._run_scenario = _run_scenario
+        srunner._cleanup_scenario = mock.MagicMock(
+                                        return_value={"nova.servers": 1.5})
+        srunner._create_temp_tenants_and_users = mock.MagicMock()
+        srunner._delete_temp_tenants_and_users = mock.MagicMock()
+
+        srunner.run("FakeScenario.do_it", {}, sink=sink)
+        self.assertEqual(srunner.run_env["users"], users)
+        self.assertFalse(srunner._create_temp_tenants_and_users.called)
+        self.assertFalse(srunner._delete_temp_tenants_and_users.called)
+        srunner._cleanup_scenario.assert_called_once_with()
+        self.assertEqual([{"endpoints": users, "tenants": [], "users": [],
+                           "keep_ssh_access": True}], leftovers)
+        self.assertEqual(set(sink.info), set(["teardown_duration",
+                                              "cleanup_durations",
+                                              "leftovers"]))
+        self.assertEqual({"nova.servers": 1.5},
+                         sink.info["cleanup_durations"])
+        self.assertIsNone(sink.info["leftovers"])
+
+    @mock.patch("rally.benchmark.runner.distributed")
+    @mock.patch("rally.benchmark.utils.generate_ssh_key_pair")
+    @mock.patch("rally.benchmark.runner.base")
+    @mock.patch("rally.benchmark.utils.osclients")
+    def test_run_distributed(self, mock_osclients, mock_base,
+                             mock_generate_key, mock_distributed):
+        mock_osclients.Clients.return_value = fakes.FakeClients()
+        users = [{"username": "u", "tenant_name": "t"}]
+        srunner = runner.ScenarioRunner(mock.MagicMock(), self.fake_kw,
+                                        users=users)
+        srunner._run_scenario = mock.MagicMock()
+        srunner._cleanup_scenario = mock.MagicMock(return_value={})
+
+        sink = sinks.ListSink()
+        kwargs = {"config": {"times": 4, "active_users": 2, "agents": 2}}
+        srunner.run("FakeScenario.do_it", kwargs, sink=sink)
+        mock_distributed.run.assert_called_once_with(
+                self.fake_kw, "FakeScenario.do_it", kwargs, srunner.run_env,
+                sink, on_abort=srunner._on_abort)
+        self.assertFalse(srunner._run_scenario.called)
+
+    @mock.patch("rally.benchmark.runner.base")
+    @mock.patch("rally.benchmark.utils.osclients")
+    def test_run_iterations(self, mock_osclients, mock_base):
+        mock_osclients.Clients.return_value = fakes.FakeClients()
+        srunner = runner.ScenarioRunner(None, self.fake_kw)
+        srunner._run_scenario = mock.MagicMock()
+        env = {"run_id": "distributed", "admin": self.fake_kw, "users": [],
+               "ssh_key_pair": None, "context": {"c": 1}}
+
+        sink = sinks.ListSink()
+        srunner.run_iterations("FakeScenario.do_it",
+                               {"args": {"a": 1}, "execution": "rps",
+                                "config": {"rps": 2.0}}, env, sink)
+        self.assertEqual(env, srunner.run_env)
+        self.assertEqual({"c": 1}, runner.__scenario_context__)
+        srunner._run_scenario.assert_called_once_with(
+                mock_base.Scenario.get_by_name.return_value, "do_it",
+                {"a": 1}, "rps", {"rps": 2.0}, sink)
+
+    @mock.patch("rally.benchmark.runner.cleanup_keystone_resources")
+    @mock.patch("rally.benchmark.runner._cleanup_users_resources")
+    @mock.patch("rally.benchmark.utils.osclients")
+    def test_cleanup_scenario(self, mock_osclients, mock_cleanup_users,
+                              mock_cleanup_keystone):
+        mock_osclients.Clients.return_value = fakes.FakeClients()
+        mock_cleanup_users.return_value = {"nova.servers": 1}
+        srunner = runner.ScenarioRunner(mock.MagicMock(), self.fake_kw,
+                                        keystone_cleanup=False)
+        srunner.run_env = {"users": ["user"]}
+
+        self.assertEqual({"nova.servers": 1}, srunner._cleanup_scenario())
+        mock_cleanup_users.assert_called_once_with(["user"],
+                                                   keep_ssh_access=False)
+        self.assertFalse(mock_cleanup_keystone.called)
+        srunner.keystone_cleanup = True
+        srunner._cleanup_scenario()
+        mock_cleanup_keystone.assert_called_once_with()
+
+        # NOTE(hughsaunders): A user pool without a key pair of its own
+        #                     gets the one of every run.
+        srunner.pool_users = [{"username": "u"}]
+        srunner._cleanup_scenario()
+        mock_cleanup_users.assert_called_with(["user"], keep_ssh_access=False)
+        srunner.pool_users = [{"username": "u", "ssh_key_pair": {}}]
+        srunner._cleanup_scenario()
+        mock_cleanup_users.assert_called_with(["user"], keep_ssh_access=True)
+
+    @mock.patch("rally.benchmark.runner.cleanup.CleanupEngine")
+    @mock.patch("rally.benchmark.runner.utils.delete_tenants_and_users")
+    @mock.patch("rally.benchmark.runner.utils.create_openstack_client")
+    def test_cleanup_leftovers(self, mock_create_client, mock_delete,
+                               mock_engine):
+        mock_create_client.side_effect = self._fake_clients
+        mock_engine.return_value.run.return_value = {"nova.servers": 1}
+        endpoints = [{"username": "u1"}, {"username": "u2"}]
+
+        durations = runner.cleanup_leftovers(
+                        self.fake_kw, {"endpoints": endpoints,
+                                       "tenants": ["t"], "users": ["u"]})
+        self.assertEqual({"nova.servers": 1}, durations)
+        self.assertFalse(mock_engine.call_args[1]["keep_ssh_access"])
+        clients = mock_engine.call_args[0][0]
+        self.assertEqual(endpoints, [c["for"] for c in clients])
+        admin_keystone = mock_delete.call_args[0][0]
+        mock_delete.assert_called_once_with(admin_keystone, ["t"], ["u"],
+                                            mock.ANY)
+        mock_create_client.assert_any_call(self.fake_kw, runner.ADMIN_KEYS)
+
+        mock_delete.reset_mock()
+        runner.cleanup_leftovers(self.fake_kw, {"endpoints": endpoints,
+                                                "tenants": [], "users": [],
+                                                "keep_ssh_access": True})
+        self.assertFalse(mock_delete.called)
+        self.assertTrue(mock_engine.call_args[1]["keep_ssh_access"])
+
+    @mock.patch("rally.benchmark.runner.utils._prepare_for_instance_ssh",
+                wraps=runner.utils._prepare_for_instance_ssh)
+    @mock.patch("rally.benchmark.utils.osclients")
+    def test_pool_users_keep_ssh_access(self, mock_osclients, mock_prepare):
+        fake_clients = fakes.FakeClients()
+        mock_osclients.Clients.return_value = fake_clients
+        nova = fake_clients.get_nova_client()
+        key_pair = {"private": "private", "public": "public"}
+        users = [{"username": "u", "password": "p", "tenant_name": "t",
+                  "uri": "uri", "ssh_key_pair": key_pair}]
+        srunner = runner.ScenarioRunner(mock.MagicMock(), self.fake_kw,
+                                        mock.MagicMock(), users=users,
+                                        keystone_cleanup=False)
+        mock_prepare.reset_mock()
+
+        for run_id in ["run-1", "run-2"]:
+            srunner.run_env = {"run_id": run_id, "admin": self.fake_kw,
+                               "users": users, "context": {},
+                               "ssh_key_pair": {"public": "run key"}}
+            runner._load_run_environment(srunner.run_env)
+            clients = runner._get_user_clients(0)
+            self.assertEqual(key_pair, clients["ssh_key_pair"])
+            srunner._cleanup_scenario()
+            self.assertEqual(["rally_ssh_key"],
+                             [kp.name for kp in nova.keypairs.list()])
+            self.assertEqual(["default", "rally_open"],
+                             sorted(sg.name for sg in
+                                    nova.security_groups.list()))
+        mock_prepare.assert_called_once_with([clients], key_pair)
+
+    @mock.patch("rally.benchmark.utils.create_tenants_and_users")
+    @mock.patch("rally.benchmark.utils.osclients")
+    def test_create_temp_users_keeps_pool_users(self, mock_osclients,
+                                                mock_create):
+        mock_osclients.Clients.return_value = fakes.FakeClients()
+        mock_create.return_value = (["t"], ["u"], [{"username": "u"}])
+        srunner = runner.ScenarioRunner(mock.MagicMock(), self.fake_kw)
+
+        endpoints = srunner._create_temp_tenants_and_users(1, 1)
+        self.assertEqual([{"username": "u"}], endpoints)
+        self.assertEqual((["t"], ["u"]), (srunner.tenants, srunner.users))
+        self.assertIsNone(srunner.pool_users)
+
+    @mock.patch("rally.benchmark.utils.generate_ssh_key_pair")
+    @mock.patch("rally.benchmark.runner.base")
+    @mock.patch("rally.benchmark.utils.osclients")
+    def test_run(self, mock_osclients, mock_base, mock_generate_key):
         FakeScenario = mock.MagicMock()
         FakeScenario.init = mock.MagicMock(return_value={})
 
@@ -321,8 +1058,9 @@ class ScenarioTestCase(test.TestCase):
 
         mock_base.Scenario.get_by_name = \
             mock.MagicMock(return_value=FakeScenario)
-        result = srunner.run("FakeScenario.do_it", {})
-        self.assertEqual(result, "result")
+        sink = sinks.ListSink()
+        result = srunner.run("FakeScenario.do_it", {}, sink=sink)
+        self.assertEqual(result, sink)
         srunner.run("FakeScenario.do_it",
                     {"args": {"a": 1}, "init": {"arg": 1},
                      "config": {"timeout": 1, "times": 2, "active_users": 3,
@@ -335,13 +1073,13 @@ class ScenarioTestCase(test.TestCase):
                                 "users_per_tenant": 2}})
 
         expected = [
-            mock.call(FakeScenario, "do_it", {}, "continuous", {}),
+            mock.call(FakeScenario, "do_it", {}, "continuous", {}, sink),
             mock.call(FakeScenario, "do_it", {"a": 1}, "continuous",
                       {"timeout": 1, "times": 2, "active_users": 3,
-                       "tenants": 5, "users_per_tenant": 2}),
+                       "tenants": 5, "users_per_tenant": 2}, mock.ANY),
             mock.call(FakeScenario, "do_it", {"a": 1}, "continuous",
                       {"timeout": 1, "duration": 40, "active_users": 3,
-                       "tenants": 5, "users_per_tenant": 2})
+                       "tenants": 5, "users_per_tenant": 2}, mock.ANY)
         ]
         self.assertEqual(srunner._run_scenario.mock_calls, expected)
 
@@ -360,13 +1098,16 @@ class ScenarioTestCase(test.TestCase):
         ]
         self.assertEqual(FakeScenario.mock_calls, expected)
 
+    @mock.patch("rally.benchmark.utils.generate_ssh_key_pair")
+    @mock.patch("rally.benchmark.utils.create_openstack_client")
     @mock.patch("rally.benchmark.utils.create_openstack_clients")
     @mock.patch("rally.benchmark.runner.base")
     @mock.patch("rally.benchmark.utils.osclients")
     @mock.patch("rally.benchmark.utils.delete_keystone_resources")
     @mock.patch("multiprocessing.Pool")
     def test_generic_cleanup(self, mock_pool, mock_del_keystone_res,
-                             mock_osclients, mock_base, mock_clients):
+                             mock_osclients, mock_base, mock_clients,
+                             mock_client, mock_generate_key):
         FakeScenario = mock.MagicMock()
         FakeScenario.init = mock.MagicMock(return_value={})
 
@@ -381,11 +1122,13 @@ class ScenarioTestCase(test.TestCase):
             )) for cl in mock_cms
         ]
         mock_clients.return_value = clients
+        mock_client.side_effect = lambda credentials, keys: \
+            clients[credentials["index"]]
 
         srunner = runner.ScenarioRunner(mock.MagicMock(), self.fake_kw)
         srunner._run_scenario = mock.MagicMock(return_value="result")
         srunner._create_temp_tenants_and_users = mock.MagicMock(
-                                                        return_value=[])
+                        return_value=[{"index": i} for i in range(3)])
         srunner._delete_temp_tenants_and_users = mock.MagicMock()
 
         mock_base.Scenario.get_by_name = \
@@ -425,7 +1168,8 @@ class ScenarioTestCase(test.TestCase):
             cinder = client["cinder"]
             _assert_purged(nova.servers, "servers")
             _assert_purged(nova.keypairs, "key pairs")
-            _assert_purged(nova.security_groups, "security groups")
+            self.assertEqual(["default"], [group.name for group in
+                                           nova.security_groups.list()])
             _assert_purged(nova.networks, "networks")
 
             _assert_purged(cinder.volumes, "volumes")
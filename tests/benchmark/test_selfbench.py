@@ -0,0 +1,117 @@
+# Copyright 2013: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the benchmarks of Rally itself."""
+
+import mock
+
+from rally.benchmark import selfbench
+from rally import test
+
+
+def _result(timestamp, duration=1.0):
+    return {"timestamp": timestamp, "time": duration, "idle_time": 0.0,
+            "error": None}
+
+
+class SelfBenchTestCase(test.TestCase):
+
+    def test_run_metrics_continuous(self):
+        results = [_result(0.0), _result(0.5), _result(1.5), _result(2.0)]
+        metrics = selfbench.run_metrics(results, "continuous",
+                                        {"times": 4, "active_users": 2})
+        self.assertEqual(4 / 3.0, metrics["iterations_per_second"])
+        self.assertEqual(0.5, metrics["overhead_seconds"])
+
+    def test_run_metrics_rps(self):
+        results = [_result(10.0, 0.1), _result(10.6, 0.1),
+                   _result(11.2, 0.1)]
+        metrics = selfbench.run_metrics(results, "rps", {"rps": 2,
+                                                         "times": 3})
+        self.assertAlmostEqual(0.1, metrics["overhead_seconds"])
+
+    def test_run_metrics_no_results(self):
+        self.assertEqual({"iterations_per_second": 0.0, "error_rate": None,
+                          "overhead_seconds": None},
+                         selfbench.run_metrics([], "continuous", {}))
+
+    def test_run_metrics_errors(self):
+        failed = dict(_result(0.5, 0.01), error=["Exception", "", ""])
+        timed_out = {"time": 1, "idle_time": 0, "error": ["Timeout", "", ""]}
+        results = [_result(0.0), failed, _result(1.0), timed_out]
+        metrics = selfbench.run_metrics(results, "continuous",
+                                        {"times": 4, "active_users": 2})
+        self.assertEqual(0.5, metrics["error_rate"])
+        self.assertEqual(1.0, metrics["iterations_per_second"])
+
+        metrics = selfbench.run_metrics([timed_out], "continuous", {})
+        self.assertEqual({"iterations_per_second": 0.0, "error_rate": 1.0,
+                          "overhead_seconds": None}, metrics)
+
+    def test_modes_periodic(self):
+        modes = dict((name, config) for name, execution, config
+                     in selfbench._modes(100, 10, 10, 200))
+        self.assertEqual(selfbench.MIN_PERIODIC_ITERATIONS,
+                         modes["periodic"]["times"])
+        modes = dict((name, config) for name, execution, config
+                     in selfbench._modes(5, 10, 10, 200))
+        self.assertEqual(5, modes["periodic"]["times"])
+
+    def test_compare(self):
+        rows = selfbench.compare({"a.iterations_per_second": 100.0,
+                                  "b.overhead_seconds": 0.01,
+                                  "c.seconds": 1.0, "e.error_rate": 0.1},
+                                 {"a.iterations_per_second": 80.0,
+                                  "b.overhead_seconds": 0.005,
+                                  "d.seconds": 1.0, "e.error_rate": 0.2})
+        self.assertEqual([("a.iterations_per_second", 100.0, 80.0, -0.2,
+                           True),
+                          ("b.overhead_seconds", 0.01, 0.005, -0.5, False),
+                          ("c.seconds", 1.0, None, None, False),
+                          ("d.seconds", None, 1.0, None, False),
+                          ("e.error_rate", 0.1, 0.2, 1.0, True)], rows)
+        self.assertEqual([("error_rate", 0.0, 0.5, None, True),
+                          ("iterations_per_second", 0.0, 5.0, None, False)],
+                         selfbench.compare({"error_rate": 0.0,
+                                            "iterations_per_second": 0.0},
+                                           {"error_rate": 0.5,
+                                            "iterations_per_second": 5.0}))
+
+    @mock.patch("rally.benchmark.selfbench.workers")
+    @mock.patch("rally.benchmark.selfbench.runner")
+    def test_run_modes(self, mock_runner, mock_workers):
+        sink = mock_runner.ScenarioRunner.return_value.run.return_value
+        sink.results = [_result(0.0), _result(1.0)]
+        bench = selfbench.SelfBenchmark(iterations=100, active_users=2)
+        bench.deployment = {"endpoint": {"identity": {"uri": "fake://c"}}}
+        bench.task = mock.MagicMock()
+
+        metrics = bench.run_modes()
+
+        pool = mock_workers.WorkerPool.return_value.__enter__.return_value
+        mock_runner.ScenarioRunner.assert_called_once_with(
+                bench.task, {"uri": "fake://c"}, pool=pool)
+        runs = len(selfbench.SCENARIOS) * 5
+        self.assertEqual(runs, len(mock_runner.ScenarioRunner.return_value
+                                   .run.mock_calls))
+        self.assertEqual(runs * 3, len(metrics))
+        self.assertEqual(1.0, metrics["runner.continuous.Dummy.dummy."
+                                      "iterations_per_second"])
+
+    @mock.patch("rally.benchmark.selfbench.subprocess")
+    def test_cli_startup(self, mock_subprocess):
+        metrics = selfbench.SelfBenchmark.cli_startup(runs=2)
+        self.assertEqual(2, mock_subprocess.check_call.call_count)
+        self.assertTrue(metrics["cli.startup.seconds"] >= 0)
@@ -0,0 +1,175 @@
+# Copyright 2013: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for result sinks."""
+
+import json
+import mock
+import os
+import shutil
+import tempfile
+
+from rally.benchmark import sinks
+from rally.openstack.common.fixture import config
+from rally import test
+
+
+class ListSinkTestCase(test.TestCase):
+
+    def test_append_and_flush(self):
+        sink = sinks.ListSink(batch_size=2)
+        sink.append({"time": 1, "error": None})
+        self.assertEqual(sink.results, [])
+        sink.append({"time": 2, "error": ["Exception", "", ""]})
+        self.assertEqual(len(sink.results), 2)
+        sink.append({"time": 3, "error": None})
+        sink.close()
+        self.assertEqual([r["time"] for r in sink.results], [1, 2, 3])
+        self.assertEqual(sink.summary(), {"iterations": 3, "errors": 1})
+        self.assertEqual(2, sink.stats()["count"])
+        self.assertEqual(3, sink.stats()["max"])
+
+    def test_context_manager_flushes_on_error(self):
+        sink = sinks.ListSink(batch_size=10)
+        try:
+            with sink:
+                sink.append({"time": 1, "error": None})
+                raise ValueError()
+        except ValueError:
+            pass
+        self.assertEqual(sink.results, [{"time": 1, "error": None}])
+
+    def test_set_info(self):
+        sink = sinks.ListSink()
+        sink.set_info(setup_duration=1)
+        sink.set_info(teardown_duration=2)
+        self.assertEqual(sink.info, {"setup_duration": 1,
+                                     "teardown_duration": 2})
+
+
+class TaggedSinkTestCase(test.TestCase):
+
+    def test_append(self):
+        sink = sinks.ListSink()
+        tagged = sinks.TaggedSink(sink, concurrency=4)
+        tagged.append({"time": 1, "error": None})
+        sink.close()
+        self.assertEqual(sink.results, [{"time": 1, "error": None,
+                                         "concurrency": 4}])
+
+    def test_set_info(self):
+        sink = sinks.ListSink()
+        sinks.TaggedSink(sink, concurrency=4).set_info(
+                                            iterations_per_second=2.0)
+        sinks.TaggedSink(sink, concurrency=8).set_info(
+                                            iterations_per_second=3.0)
+        self.assertEqual({"iterations_per_second_by_concurrency":
+                          {4: 2.0, 8: 3.0}}, sink.info)
+
+
+class TaskResultSinkTestCase(test.TestCase):
+
+    def setUp(self):
+        super(TaskResultSinkTestCase, self).setUp()
+        self.task = mock.MagicMock()
+        self.task.append_results.return_value = {"id": 42}
+        self.task.__getitem__.return_value = "fake_uuid"
+        self.key = {"name": "Fake.do_it", "pos": 0, "kw": {}}
+
+    def test_streams_batches_to_task(self):
+        sink = sinks.TaskResultSink(self.task, self.key, batch_size=2)
+        self.task.append_results.assert_called_once_with(self.key, {})
+        results = [{"time": i, "error": None} for i in range(5)]
+        for result in results:
+            sink.append(result)
+        sink.close()
+        self.assertEqual(self.task.extend_results.mock_calls,
+                         [mock.call(42, results[0:2], first_iteration=0),
+                          mock.call(42, results[2:4], first_iteration=2),
+                          mock.call(42, results[4:], first_iteration=4)])
+        histogram = self.task.update_result_data.call_args[0][1]["histogram"]
+        self.assertEqual(5, histogram["count"])
+
+    def test_raw_sample(self):
+        self.useFixture(config.Config()).config(raw_samples=2,
+                                                group="benchmark")
+        sink = sinks.TaskResultSink(self.task, self.key, batch_size=2)
+        results = [{"time": i, "error": None} for i in range(5)]
+        for result in results:
+            sink.append(result)
+        sink.close()
+        calls = self.task.extend_results.call_args_list
+        self.assertEqual(3, len(calls))
+        self.assertNotIn("sampled", calls[0][1])
+        self.assertEqual(2, len(sink.sample))
+        # Every iteration leaves the sample only once, after it got in
+        kept = set([0, 1])
+        for call in calls[1:]:
+            self.assertTrue(set(call[1]["unsampled"]) <= kept)
+            kept -= set(call[1]["unsampled"])
+            kept |= call[1]["sampled"]
+        self.assertEqual(set(sink.sample), kept)
+        histogram = self.task.update_result_data.call_args[0][1]["histogram"]
+        self.assertEqual(5, histogram["count"])
+
+    def test_set_info(self):
+        sink = sinks.TaskResultSink(self.task, self.key)
+        sink.set_info(setup_duration=1.5)
+        self.task.update_result_data.assert_called_once_with(
+                                            42, {"setup_duration": 1.5})
+
+    @mock.patch("rally.benchmark.sinks.sys")
+    @mock.patch("rally.benchmark.sinks.time")
+    def test_progress(self, mock_time, mock_sys):
+        self.useFixture(config.Config()).config(progress_interval=10,
+                                                progress_window=60,
+                                                group="benchmark")
+        mock_time.time.side_effect = [0, 5, 8, 12, 13, 30]
+        sink = sinks.TaskResultSink(self.task, self.key)
+        sink.append({"time": 1, "error": None})
+        sink.append({"time": 3, "error": None})
+        self.assertFalse(self.task.update_result_progress.called)
+        sink.append({"time": 2, "error": ["Exception", "", ""]})
+        sink.append({"time": 2, "error": None})
+
+        self.assertEqual(42, self.task.update_result_progress.call_args[0][0])
+        progress = self.task.update_result_progress.call_args[0][1]
+        self.assertEqual(12, progress["updated_at"])
+        self.assertEqual(3, progress["iterations"])
+        self.assertEqual(3, progress["iterations_total"])
+        self.assertEqual(1, progress["errors_total"])
+        self.assertEqual(3 / 7.0, progress["throughput"])
+        self.assertEqual(2, progress["times"]["p50"])
+        self.assertEqual(1, mock_sys.stdout.write.call_count)
+        self.assertIn("3 iterations, 1 failed",
+                      mock_sys.stdout.write.call_args[0][0])
+
+        sink.close()
+        progress = self.task.update_result_progress.call_args[0][1]
+        self.assertEqual(4, progress["iterations_total"])
+        self.assertEqual(progress, sink.info["progress"])
+        self.assertEqual(1, mock_sys.stdout.write.call_count)
+
+    def test_jsonl(self):
+        results_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, results_dir)
+        sink = sinks.TaskResultSink(self.task, self.key, batch_size=1,
+                                    results_dir=results_dir)
+        sink.append({"time": 1, "error": None})
+        sink.append({"time": 2, "error": None})
+        with open(os.path.join(results_dir, "fake_uuid.jsonl")) as f:
+            lines = [json.loads(line) for line in f]
+        self.assertEqual([l["result"]["time"] for l in lines], [1, 2])
+        self.assertEqual(lines[0]["name"], "Fake.do_it")
@@ -0,0 +1,124 @@
+# Copyright 2013: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the user pools."""
+import mock
+
+from rally.benchmark import userpool
+from rally import exceptions
+from rally import test
+
+
+class UserPoolTestCase(test.TestCase):
+
+    def setUp(self):
+        super(UserPoolTestCase, self).setUp()
+        self.deployment = mock.MagicMock()
+        self.deployment.__getitem__.side_effect = {
+            'uuid': 'fake_uuid',
+            'endpoint': {'identity': {'admin_username': 'admin',
+                                      'admin_password': 'pwd',
+                                      'admin_tenant_name': 'admin',
+                                      'uri': 'uri'}},
+        }.__getitem__
+        self.endpoints = [{'username': 'u%d' % i, 'password': 'password',
+                           'tenant_name': 't', 'uri': 'uri'}
+                          for i in range(3)]
+        self.resource = {'id': 42, 'info': {'tenants': ['t'],
+                                            'users': ['u0', 'u1', 'u2'],
+                                            'endpoints': self.endpoints},
+                         'leased_by': None}
+
+    @mock.patch('rally.benchmark.userpool.utils.generate_ssh_key_pair')
+    @mock.patch('rally.benchmark.userpool.osclients')
+    @mock.patch('rally.benchmark.userpool.utils.create_tenants_and_users')
+    def test_create(self, mock_create, mock_osclients, mock_generate_key):
+        self.deployment.get_resources.return_value = []
+        tenant = mock.MagicMock(id='t')
+        users = [mock.MagicMock(id='u%d' % i) for i in range(3)]
+        mock_create.return_value = ([tenant], users, self.endpoints)
+        mock_generate_key.return_value = {'private': 'a', 'public': 'b'}
+        self.resource['info']['ssh_key_pair'] = {'private': 'a',
+                                                 'public': 'b'}
+        self.deployment.add_resource.return_value = self.resource
+
+        pool = userpool.UserPool.create(self.deployment, 1, 3)
+        self.assertEqual([dict(endpoint, ssh_key_pair={'private': 'a',
+                                                       'public': 'b'})
+                          for endpoint in self.endpoints], pool.endpoints)
+        mock_create.assert_called_once_with(
+                mock_osclients.Clients.return_value.get_keystone_client(),
+                'rally_pool_fake_uuid', 1, 3, 'uri', 10)
+        mock_osclients.Clients.assert_called_once_with('admin', 'pwd',
+                                                       'admin', 'uri')
+        self.deployment.add_resource.assert_called_once_with(
+                'UserPool', type='users', info=self.resource['info'])
+
+    def test_create_exists(self):
+        self.deployment.get_resources.return_value = [self.resource]
+        self.assertRaises(exceptions.UserPoolExists,
+                          userpool.UserPool.create, self.deployment, 1, 1)
+
+    def test_get_not_found(self):
+        self.deployment.get_resources.return_value = []
+        self.assertRaises(exceptions.UserPoolNotFound,
+                          userpool.UserPool.get, self.deployment)
+
+    def test_lease(self):
+        self.deployment.get_resources.return_value = [self.resource]
+        self.deployment.lease_resource.return_value = dict(self.resource,
+                                                           leased_by='task1')
+        pool = userpool.UserPool.get(self.deployment)
+        pool.lease('task1')
+        self.assertEqual(pool.leased_by, 'task1')
+        self.deployment.lease_resource.assert_called_once_with(42, 'task1')
+        self.assertRaises(exceptions.UserPoolIsBusy, pool.delete)
+
+    def test_lease_busy(self):
+        self.deployment.lease_resource.side_effect = \
+            exceptions.ResourceIsLeased(id=42, lessee='task1')
+        pool = userpool.UserPool(self.deployment, self.resource)
+        e = self.assertRaises(exceptions.UserPoolIsBusy, pool.lease, 'task2')
+        self.assertEqual('task1', e.kwargs['task'])
+
+    def test_release(self):
+        pool = userpool.UserPool(self.deployment, self.resource)
+        pool.release('task1')
+        pool.release()
+        self.assertEqual(self.deployment.release_resource.mock_calls,
+                         [mock.call(42, lessee='task1'),
+                          mock.call(42, lessee=None)])
+
+    @mock.patch('rally.benchmark.userpool.osclients')
+    def test_check(self, mock_osclients):
+        def _clients(username, password, tenant_name, uri):
+            clients = mock.MagicMock()
+            if username == 'u1':
+                clients.get_keystone_client.side_effect = Exception()
+            return clients
+
+        mock_osclients.Clients.side_effect = _clients
+        pool = userpool.UserPool(self.deployment, self.resource)
+        self.assertEqual(pool.check(), ['u1'])
+
+    @mock.patch('rally.benchmark.userpool.osclients')
+    @mock.patch('rally.benchmark.userpool.utils.delete_tenants_and_users')
+    def test_delete(self, mock_delete, mock_osclients):
+        pool = userpool.UserPool(self.deployment, self.resource)
+        pool.delete()
+        mock_delete.assert_called_once_with(
+                mock_osclients.Clients.return_value.get_keystone_client(),
+                ['t'], ['u0', 'u1', 'u2'], 10)
+        self.deployment.delete_resource.assert_called_once_with(42)
@@ -0,0 +1,79 @@
+# Copyright 2013: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for benchmark utils."""
+import mock
+
+from rally.benchmark import utils
+from rally import exceptions
+from rally import test
+from tests import fakes
+
+
+class ProvisioningTestCase(test.TestCase):
+
+    def test_run_concurrently(self):
+
+        def _square(x):
+            if x == 3:
+                raise ValueError()
+            return x * x
+
+        results, errors = utils.run_concurrently(_square, range(6), "sq", 2)
+        self.assertEqual(results, [0, 1, 4, 16, 25])
+        self.assertEqual(len(errors), 1)
+        self.assertIsInstance(errors[0], ValueError)
+        self.assertEqual(utils.run_concurrently(_square, [], "sq", 2),
+                         ([], []))
+
+    def test_create_tenants_and_users(self):
+        keystone = fakes.FakeKeystoneClient()
+        tenants, users, endpoints = utils.create_tenants_and_users(
+                                            keystone, "prefix", 2, 3, "uri",
+                                            4)
+        self.assertEqual(len(tenants), 2)
+        self.assertEqual(len(users), 6)
+        self.assertEqual(len(endpoints), 6)
+        for endpoint in endpoints:
+            self.assertEqual(set(endpoint.keys()),
+                             set(["username", "password", "tenant_name",
+                                  "uri"]))
+
+    @mock.patch("rally.benchmark.utils.delete_tenants_and_users")
+    def test_create_tenants_and_users_rollback(self, mock_delete):
+        keystone = fakes.FakeKeystoneClient()
+        created = []
+
+        def _create(username, password, email, tenant_id):
+            if len(created) >= 2:
+                raise Exception("Quota exceeded")
+            created.append(mock.MagicMock())
+            return created[-1]
+
+        keystone.users.create = mock.MagicMock(side_effect=_create)
+        self.assertRaises(exceptions.BenchmarkSetupFailure,
+                          utils.create_tenants_and_users, keystone, "prefix",
+                          2, 3, "uri", 4)
+        tenants, users = mock_delete.call_args[0][1:3]
+        self.assertEqual(len(tenants), 2)
+        self.assertEqual(set(users), set(created))
+
+    def test_delete_tenants_and_users(self):
+        keystone = mock.MagicMock()
+        keystone.users.delete.side_effect = [None, Exception()]
+        utils.delete_tenants_and_users(keystone, ["t1"], ["u1", "u2"], 2)
+        self.assertEqual(sorted(keystone.users.delete.call_args_list),
+                         [mock.call("u1"), mock.call("u2")])
+        keystone.tenants.delete.assert_called_once_with("t1")
@@ -0,0 +1,154 @@
+# Copyright 2013: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the benchmark worker pool."""
+import mock
+import multiprocessing
+import os
+import time
+
+from rally.benchmark import workers
+from rally import exceptions
+from rally import test
+
+
+def _getpid(i):
+    return os.getpid()
+
+
+def _sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def _fail(i):
+    raise ValueError("Failed %d" % i)
+
+
+class WorkerPoolTestCase(test.TestCase):
+
+    @mock.patch("rally.benchmark.workers.multiprocessing.Pool")
+    def test_resize(self, mock_pool):
+        pool = workers.WorkerPool()
+        self.assertFalse(mock_pool.called)
+        pool.resize(2)
+        pool.resize(1)
+        pool.resize(2)
+        pool.resize(4)
+        self.assertEqual(mock_pool.call_args_list,
+                         [mock.call(2, None, ()), mock.call(4, None, ())])
+        self.assertEqual(pool.processes, 4)
+
+        pool.close()
+        self.assertEqual(mock_pool.return_value.join.call_count, 2)
+        self.assertEqual(pool.processes, 0)
+
+    @mock.patch("rally.benchmark.workers.multiprocessing.Pool")
+    def test_restart(self, mock_pool):
+        pool = workers.WorkerPool(3)
+        pool.restart()
+        mock_pool.return_value.terminate.assert_called_once_with()
+        self.assertEqual(mock_pool.call_args_list,
+                         [mock.call(3, None, ()), mock.call(3, None, ())])
+
+    @mock.patch("rally.benchmark.workers.multiprocessing.Pool")
+    def test_terminate(self, mock_pool):
+        initializer = mock.MagicMock()
+        pool = workers.WorkerPool(2, initializer, ("a",))
+        pool.resize(3)
+        pool.terminate()
+        self.assertEqual(mock_pool.call_args_list,
+                         [mock.call(2, initializer, ("a",)),
+                          mock.call(3, initializer, ("a",))])
+        self.assertEqual(mock_pool.return_value.terminate.call_count, 2)
+        self.assertEqual(pool.processes, 0)
+
+    def test_workers_are_reused(self):
+        pids = set()
+        with workers.WorkerPool() as pool:
+            for i in range(3):
+                iter_result = pool.imap(_getpid, range(4), 2)
+                pids.update(iter_result.next(1) for j in range(4))
+        self.assertTrue(len(pids) <= 2)
+        self.assertNotIn(os.getpid(), pids)
+
+
+class BoundedIMapIteratorTestCase(test.TestCase):
+
+    def test_bounded_concurrency(self):
+        pool = mock.MagicMock()
+        iter_result = workers.BoundedIMapIterator(pool, _sleep, range(5), 2)
+        self.assertEqual(pool.apply_async.call_count, 2)
+        self.assertEqual(iter_result.in_flight, 2)
+
+        iter_result._on_result((0, None))
+        self.assertEqual(pool.apply_async.call_count, 3)
+        self.assertEqual(iter_result.next(1), 0)
+
+        iter_result.stop(0)
+        iter_result._on_result((1, None))
+        self.assertEqual(pool.apply_async.call_count, 3)
+
+    def test_call_fails(self):
+        with workers.WorkerPool() as pool:
+            iter_result = pool.imap(_fail, range(3), 2)
+            for i in range(3):
+                e = self.assertRaises(exceptions.WorkerFailure,
+                                      iter_result.next, 1)
+                self.assertEqual(str(ValueError), e.kwargs["error"][0])
+            self.assertEqual(0, iter_result.in_flight)
+            self.assertTrue(iter_result.stop(0.01))
+
+    def test_drain_skips_failed_calls(self):
+        pool = mock.MagicMock()
+        iter_result = workers.BoundedIMapIterator(pool, _sleep, range(5), 2)
+        iter_result.cancel()
+        iter_result._on_result((None, ["ValueError", "", ""]))
+        iter_result._on_result((1, None))
+        self.assertEqual(([1], True), iter_result.drain(0.01))
+
+    def test_next_timeout(self):
+        iter_result = workers.BoundedIMapIterator(mock.MagicMock(), _sleep,
+                                                  [], 1)
+        self.assertRaises(multiprocessing.TimeoutError, iter_result.next,
+                          0.01)
+        self.assertTrue(iter_result.stop(0.01))
+
+    def test_stop_timeout(self):
+        with workers.WorkerPool() as pool:
+            iter_result = pool.imap(_sleep, [0, 5], 2)
+            self.assertEqual(iter_result.next(1), 0)
+            self.assertFalse(iter_result.stop(0.1))
+            pool.restart()
+
+    def test_cancel(self):
+        pool = mock.MagicMock()
+        iter_result = workers.BoundedIMapIterator(pool, _sleep, range(5), 2)
+        iter_result.cancel()
+        self.assertRaises(exceptions.RunAborted, iter_result.next, 1)
+        iter_result._on_result((0, None))
+        self.assertEqual(pool.apply_async.call_count, 2)
+        self.assertEqual(iter_result.next(1), 0)
+
+    def test_drain(self):
+        pool = mock.MagicMock()
+        iter_result = workers.BoundedIMapIterator(pool, _sleep, range(5), 2)
+        iter_result._on_result((0, None))
+        iter_result.cancel()
+        self.assertEqual(([0], False), iter_result.drain(0.01))
+        iter_result._on_result((1, None))
+        iter_result._on_result((2, None))
+        self.assertEqual(([1, 2], True), iter_result.drain(0.01))
+        self.assertEqual(pool.apply_async.call_count, 3)
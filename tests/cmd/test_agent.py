@@ -0,0 +1,105 @@
+# Copyright 2013: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+import mock
+import StringIO
+
+from rally.cmd import agent
+from rally import test
+
+
+class CmdAgentTestCase(test.TestCase):
+
+    def _serve(self, *requests):
+        infile = StringIO.StringIO("".join(json.dumps(request) + "\n"
+                                           for request in requests))
+        outfile = StringIO.StringIO()
+        agent.serve(infile, outfile)
+        return [json.loads(line) for line in outfile.getvalue().splitlines()]
+
+    @mock.patch('rally.cmd.agent.workers')
+    @mock.patch('rally.cmd.agent.time')
+    def test_serve_clock(self, mock_time, mock_workers):
+        mock_time.time.return_value = 42.0
+        self.assertEqual([{"time": 42.0}], self._serve({"command": "clock"}))
+
+    @mock.patch('rally.cmd.agent.workers')
+    @mock.patch('rally.cmd.agent.time')
+    @mock.patch('rally.cmd.agent.runner')
+    def test_serve_run(self, mock_runner, mock_time, mock_workers):
+        mock_time.time.return_value = 10.0
+
+        def _run_iterations(name, kwargs, env, sink):
+            sink.append({"time": 1, "error": None})
+            sink.close()
+            return sink
+
+        srunner = mock_runner.ScenarioRunner.return_value
+        srunner.run_iterations.side_effect = _run_iterations
+        replies = self._serve({"command": "prepare", "admin": {"uri": "u"},
+                               "name": "Scenario.method",
+                               "kwargs": {"config": {"times": 1}},
+                               "env": {"run_id": "id"}},
+                              {"command": "start", "start_at": 12.0})
+
+        self.assertEqual([{"ready": True},
+                          {"results": [{"time": 1, "error": None}]},
+                          {"done": {"iterations": 1, "errors": 0},
+                           "info": {}}], replies)
+        srunner.aborted.wait.assert_called_once_with(2.0)
+        pool = mock_workers.WorkerPool.return_value.__enter__.return_value
+        mock_runner.ScenarioRunner.assert_called_once_with(None, {"uri": "u"},
+                                                           pool=pool)
+        srunner.run_iterations.assert_called_once_with(
+                "Scenario.method", {"config": {"times": 1}}, {"run_id": "id"},
+                mock.ANY)
+
+    @mock.patch('rally.cmd.agent.workers')
+    @mock.patch('rally.cmd.agent.runner')
+    def test_serve_run_fails(self, mock_runner, mock_workers):
+        mock_runner.ScenarioRunner.side_effect = Exception("fails")
+        replies = self._serve({"command": "prepare", "admin": {"uri": "u"}})
+        self.assertEqual(1, len(replies))
+        self.assertEqual("fails", replies[0]["error"][1])
+
+    @mock.patch('rally.cmd.agent.workers')
+    @mock.patch('rally.cmd.agent.time')
+    @mock.patch('rally.cmd.agent.runner')
+    def test_serve_abort(self, mock_runner, mock_time, mock_workers):
+        mock_time.time.return_value = 10.0
+        srunner = mock_runner.ScenarioRunner.return_value
+        replies = self._serve({"command": "abort"},
+                              {"command": "prepare", "admin": {"uri": "u"},
+                               "name": "Scenario.method", "kwargs": {},
+                               "env": {"run_id": "id"}},
+                              {"command": "abort"})
+        self.assertEqual([{"ready": True}], replies)
+        srunner.abort.assert_called_once_with()
+
+    @mock.patch('rally.cmd.agent.workers')
+    @mock.patch('rally.cmd.agent.time')
+    @mock.patch('rally.cmd.agent.runner')
+    def test_serve_start_fails(self, mock_runner, mock_time, mock_workers):
+        mock_time.time.return_value = 10.0
+        srunner = mock_runner.ScenarioRunner.return_value
+        srunner.run_iterations.side_effect = Exception("fails")
+        replies = self._serve({"command": "prepare", "admin": {"uri": "u"},
+                               "name": "Scenario.method", "kwargs": {},
+                               "env": {"run_id": "id"}},
+                              {"command": "start", "start_at": 9.0})
+        self.assertEqual(2, len(replies))
+        self.assertEqual("fails", replies[1]["error"][1])
+        self.assertFalse(srunner.aborted.wait.called)
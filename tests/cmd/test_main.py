@@ -13,11 +13,20 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import json
 import mock
+import os
+import subprocess
+import sys
 import uuid
 
+import fixtures
+
 from rally.cmd import main
 from rally.openstack.common import test
+from rally import processing
+from rally import stats
+from rally import utils
 
 
 class TaskCommandsTestCase(test.BaseTestCase):
@@ -33,7 +42,28 @@ class TaskCommandsTestCase(test.BaseTestCase):
     def test_start(self, mock_api):
         deploy_id = str(uuid.uuid4())
         self.task.start(deploy_id, 'path_to_config.json')
-        mock_api.assert_called_once_with(deploy_id, {'some': 'json'})
+        mock_api.assert_called_once_with(deploy_id, {'some': 'json'},
+                                         use_user_pool=False)
+
+    @mock.patch('rally.cmd.main.api.start_task')
+    @mock.patch('rally.cmd.main.open',
+                mock.mock_open(read_data='{"some": "json"}'),
+                create=True)
+    def test_start_with_user_pool(self, mock_api):
+        deploy_id = str(uuid.uuid4())
+        self.task.start(deploy_id, 'path_to_config.json', user_pool=True)
+        mock_api.assert_called_once_with(deploy_id, {'some': 'json'},
+                                         use_user_pool=True)
+
+    @mock.patch('rally.cmd.main.api.queue_task')
+    @mock.patch('rally.cmd.main.open',
+                mock.mock_open(read_data='{"some": "json"}'),
+                create=True)
+    def test_start_queue(self, mock_api):
+        deploy_id = str(uuid.uuid4())
+        self.task.start(deploy_id, 'path_to_config.json', queue=True)
+        mock_api.assert_called_once_with(deploy_id, {'some': 'json'},
+                                         use_user_pool=False)
 
     def test_abort(self):
         test_uuid = str(uuid.uuid4())
@@ -47,8 +77,69 @@ class TaskCommandsTestCase(test.BaseTestCase):
         value = {'task_id': "task", "status": "status"}
         with mock.patch("rally.cmd.main.db") as mock_db:
             mock_db.task_get = mock.MagicMock(return_value=value)
+            mock_db.task_result_get_all_by_uuid.return_value = [
+                {"key": {"name": "fake_name", "pos": 0},
+                 "progress": {"updated_at": 0, "window": 60,
+                              "iterations": 10, "throughput": 0.5,
+                              "error_rate": 0.1,
+                              "times": {"p50": 1, "p90": 2, "p99": 3},
+                              "iterations_total": 100,
+                              "errors_total": 5}},
+                {"key": {"name": "fake_name", "pos": 1}, "progress": None}]
             self.task.status(test_uuid)
             mock_db.task_get.assert_called_once_with(test_uuid)
+            mock_db.task_result_get_all_by_uuid.assert_called_once_with(
+                                                    test_uuid, load_data=False)
+
+    @mock.patch('rally.cmd.main.db')
+    def test_detailed(self, mock_db):
+        test_uuid = str(uuid.uuid4())
+        value = {
+            'id': 'task',
+            'uuid': test_uuid,
+            'status': 'status',
+            'results': [{
+                'id': 1,
+                'key': {'name': 'fake_name', 'pos': 'fake_pos',
+                        'kw': 'fake_kw'},
+                'data': {},
+            }],
+        }
+        mock_db.task_get_detailed = mock.MagicMock(return_value=value)
+        mock_db.task_iteration_stats.return_value = {
+            1: {'iterations': 1, 'errors': 0, 'min': 1, 'avg': 1, 'max': 1}}
+        mock_db.task_iteration_get_raw.return_value = [
+            {'time': 1, 'error': None, 'scenario_output': None,
+             'atomic_actions': [{'action': 'nova.boot_server',
+                                 'duration': 0.5}]}]
+        self.task.detailed(test_uuid)
+        mock_db.task_get_detailed.assert_called_once_with(test_uuid)
+        mock_db.task_iteration_stats.assert_called_once_with(test_uuid)
+        mock_db.task_iteration_get_raw.assert_called_once_with(1)
+
+    @mock.patch('rally.cmd.main.db')
+    def test_detailed_histogram(self, mock_db):
+        hist = stats.Histogram()
+        for value in [1, 2, 3, 4]:
+            hist.add(value)
+        mock_db.task_get_detailed.return_value = {
+            'id': 'task', 'uuid': 'uuid', 'status': 'status',
+            'results': [{'id': 1, 'key': {'name': 'fake_name', 'pos': 0,
+                                          'kw': {}},
+                         'data': {'histogram': hist.to_dict()}}]}
+        mock_db.task_iteration_stats.return_value = {
+            1: {'iterations': 4, 'errors': 0, 'min': 1, 'avg': 2.5,
+                'max': 4}}
+        # NOTE(hughsaunders): The raw sample only kept one iteration.
+        mock_db.task_iteration_get_raw.return_value = [
+            {'time': 4, 'error': None, 'scenario_output': None,
+             'atomic_actions': []}]
+        with utils.StdOutCapture() as out:
+            self.task.detailed('uuid')
+        counts = [int(line.split('|')[1].split()[0])
+                  for line in out.getvalue().splitlines() if '|' in line
+                  and line.startswith('  ')]
+        self.assertEqual(4, sum(counts))
 
     def test_list(self):
         db_response = [
@@ -68,6 +159,12 @@ class TaskCommandsTestCase(test.BaseTestCase):
             mock_api.delete_task.assert_called_once_with(task_uuid,
                                                          force=force)
 
+    @mock.patch('rally.cmd.main.api.cleanup_task')
+    def test_cleanup(self, mock_cleanup):
+        task_uuid = str(uuid.uuid4())
+        self.task.cleanup(task_uuid)
+        mock_cleanup.assert_called_once_with(task_uuid)
+
     def test_plot(self):
         test_uuid = str(uuid.uuid4())
         mock_plot = mock.Mock()
@@ -76,6 +173,9 @@ class TaskCommandsTestCase(test.BaseTestCase):
             self.task.plot("aggregated", "concurrent", test_uuid)
         mock_plot.assert_called_once_with(test_uuid, "concurrent")
 
+    def test_plot_types(self):
+        self.assertEqual(sorted(processing.PLOTS), sorted(main.PLOT_TYPES))
+
 
 class DeploymentCommandsTestCase(test.BaseTestCase):
     def setUp(self):
@@ -101,3 +201,129 @@ class DeploymentCommandsTestCase(test.BaseTestCase):
         deploy_id = str(uuid.uuid4())
         self.deployment.destroy(deploy_id)
         mock_destroy.assert_called_once_with(deploy_id)
+
+
+class UserPoolCommandsTestCase(test.BaseTestCase):
+    def setUp(self):
+        super(UserPoolCommandsTestCase, self).setUp()
+        self.userpool = main.UserPoolCommands()
+        self.deploy_id = str(uuid.uuid4())
+
+    @mock.patch('rally.cmd.main.api.create_user_pool')
+    def test_create(self, mock_create):
+        self.userpool.create(self.deploy_id, 2, 5)
+        mock_create.assert_called_once_with(self.deploy_id, 2, 5)
+
+    @mock.patch('rally.cmd.main.api.check_user_pool')
+    def test_check(self, mock_check):
+        mock_check.return_value = []
+        self.assertIsNone(self.userpool.check(self.deploy_id))
+        mock_check.return_value = ['user']
+        self.assertEqual(self.userpool.check(self.deploy_id), 1)
+
+    @mock.patch('rally.cmd.main.db.resource_get_all')
+    def test_show(self, mock_get_all):
+        mock_get_all.return_value = [
+            {'info': {'endpoints': [{'tenant_name': 't', 'username': 'u'}]},
+             'leased_by': 'task'}]
+        self.userpool.show(self.deploy_id)
+        mock_get_all.assert_called_once_with(self.deploy_id,
+                                             provider_name='UserPool')
+
+    @mock.patch('rally.cmd.main.api.release_user_pool')
+    def test_release(self, mock_release):
+        self.userpool.release(self.deploy_id)
+        mock_release.assert_called_once_with(self.deploy_id)
+
+    @mock.patch('rally.cmd.main.api.delete_user_pool')
+    def test_delete(self, mock_delete):
+        self.userpool.delete(self.deploy_id)
+        mock_delete.assert_called_once_with(self.deploy_id)
+
+
+class StartupTestCase(test.BaseTestCase):
+    """Runs the rally command in child processes, as users do."""
+
+    # NOTE(hughsaunders): The start-up time of the commands is checked
+    #                     through what they import, not through a
+    #                     wall-clock budget that would depend on the host.
+    HEAVY_MODULES = ["rally.orchestrator.api", "rally.benchmark.engine",
+                     "rally.benchmark.scenarios", "rally.processing",
+                     "rally.stats", "novaclient", "glanceclient",
+                     "cinderclient", "keystoneclient", "jsonschema",
+                     "matplotlib", "numpy"]
+
+    SETUP_SCRIPT = """
+import sys
+from oslo.config import cfg
+from rally import db
+cfg.CONF(["--config-file", sys.argv[1]], project="rally")
+db.db_create()
+deployment = db.deployment_create({"name": "startup"})
+print(db.task_create({"deployment_uuid": deployment["uuid"]})["uuid"])
+"""
+
+    RALLY_SCRIPT = """
+import json
+import sys
+from rally.cmd import main
+output = sys.argv.pop(1)
+try:
+    main.main()
+except SystemExit:
+    pass
+with open(output, "w") as modules:
+    json.dump([name for name, module in sys.modules.items() if module],
+              modules)
+"""
+
+    def setUp(self):
+        super(StartupTestCase, self).setUp()
+        self.path = self.useFixture(fixtures.TempDir()).path
+        self.config_file = os.path.join(self.path, "rally.conf")
+        with open(self.config_file, "w") as config_file:
+            config_file.write("[database]\nconnection = sqlite:///%s\n"
+                              % os.path.join(self.path, "rally.sqlite"))
+        self.task_uuid = subprocess.check_output(
+            [sys.executable, "-c", self.SETUP_SCRIPT,
+             self.config_file]).strip()
+
+    def _rally_imports(self, *args):
+        """Runs rally with the given arguments, returns the modules loaded."""
+        output = os.path.join(self.path, "modules.json")
+        with open(os.devnull, "w") as devnull:
+            subprocess.check_call(
+                [sys.executable, "-c", self.RALLY_SCRIPT, output,
+                 "--config-file", self.config_file] + list(args),
+                stdout=devnull, stderr=devnull)
+        with open(output) as modules:
+            return json.load(modules)
+
+    def _heavy(self, modules):
+        return sorted(name for name in modules
+                      for heavy in self.HEAVY_MODULES
+                      if name == heavy or name.startswith(heavy + "."))
+
+    def test_no_heavy_imports(self):
+        modules = json.loads(subprocess.check_output(
+            [sys.executable, "-c", "import json, sys; "
+             "from rally.cmd import main; "
+             "print(json.dumps(sys.modules.keys()))"]))
+        self.assertEqual([], self._heavy(modules))
+
+    def test_help_imports(self):
+        modules = self._rally_imports("--help")
+        self.assertIn("rally.cmd.main", modules)
+        self.assertNotIn("prettytable", modules)
+        self.assertEqual([], self._heavy(modules))
+
+    def test_task_list_imports(self):
+        modules = self._rally_imports("task", "list")
+        self.assertIn("prettytable", modules)
+        self.assertEqual([], self._heavy(modules))
+
+    def test_task_status_imports(self):
+        modules = self._rally_imports("task", "status", "--task-id",
+                                      self.task_uuid)
+        self.assertIn("rally.db.sqlalchemy.api", modules)
+        self.assertEqual([], self._heavy(modules))
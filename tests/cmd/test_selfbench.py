@@ -0,0 +1,67 @@
+# Copyright 2013: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import json
+import mock
+import os
+import tempfile
+
+from rally.cmd import selfbench
+from rally.openstack.common.fixture import config
+from rally import test
+
+
+class CmdSelfBenchTestCase(test.TestCase):
+
+    def setUp(self):
+        super(CmdSelfBenchTestCase, self).setUp()
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+        self.addCleanup(os.remove, self.path)
+
+    def test_store_and_load_results(self):
+        selfbench.store_result(self.path, {"version": "1", "metrics": {}})
+        selfbench.store_result(self.path, {"version": "2", "metrics": {}})
+        self.assertEqual(["1", "2"], [run["version"] for run in
+                                      selfbench.load_results(self.path)])
+        self.assertEqual([], selfbench.load_results(self.path + ".none"))
+
+    def test_baseline(self):
+        runs = [{"version": "1"}, {"version": "2"}, {"version": "2"}]
+        self.assertEqual(runs[0], selfbench._baseline(runs, "2"))
+        self.assertEqual(runs[2], selfbench._baseline(runs, "3"))
+        self.assertIsNone(selfbench._baseline([], "2"))
+
+    @mock.patch("rally.cmd.selfbench.print_comparison")
+    @mock.patch("rally.cmd.selfbench.version")
+    @mock.patch("rally.cmd.selfbench.selfbench.SelfBenchmark")
+    @mock.patch("rally.cmd.selfbench.cfg")
+    @mock.patch("rally.cmd.selfbench.logging")
+    def test_main(self, mock_logging, mock_cfg, mock_bench, mock_version,
+                  mock_print):
+        mock_version.version_string.return_value = "2"
+        old = {"version": "1", "metrics": {"cli.startup.seconds": 1.0}}
+        selfbench.store_result(self.path, old)
+        bench = mock_bench.return_value.__enter__.return_value
+        bench.run.return_value = {"cli.startup.seconds": 2.0}
+
+        self.useFixture(config.Config()).config(results_file=self.path,
+                                                group="selfbench")
+        selfbench.main()
+
+        with open(self.path) as results_file:
+            stored = json.loads(results_file.readlines()[-1])
+        self.assertEqual({"cli.startup.seconds": 2.0}, stored["metrics"])
+        mock_print.assert_called_once_with(old, stored)
@@ -0,0 +1,92 @@
+# Copyright 2013: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+
+from rally.cmd import worker
+from rally import consts
+from rally import exceptions
+from rally.openstack.common.fixture import config
+from rally import test
+
+
+class CmdWorkerTestCase(test.TestCase):
+
+    def setUp(self):
+        super(CmdWorkerTestCase, self).setUp()
+        self.useFixture(config.Config()).config(tasks=2,
+                                                max_tasks_per_deployment=3,
+                                                group="worker")
+
+    @mock.patch('rally.cmd.worker.db')
+    @mock.patch('rally.cmd.worker.multiprocessing')
+    @mock.patch('rally.cmd.worker.objects')
+    def test_poll(self, mock_objects, mock_multiprocessing, mock_db):
+        mock_objects.Task.claim.side_effect = [{"uuid": "t1"},
+                                               {"uuid": "t2"}, None]
+        process = mock_multiprocessing.Process.return_value
+        process.is_alive.return_value = True
+        w = worker.Worker("w1")
+
+        self.assertEqual(2, w.poll())
+        self.assertEqual([mock.call("w1", 3), mock.call("w1", 3)],
+                         mock_objects.Task.claim.call_args_list)
+        self.assertEqual(
+            [mock.call(target=worker._run_task, args=("t1",)),
+             mock.call(target=worker._run_task, args=("t2",))],
+            mock_multiprocessing.Process.call_args_list)
+        self.assertEqual(2, mock_db.db_cleanup.call_count)
+
+        self.assertEqual(0, w.poll())
+        self.assertEqual(2, mock_objects.Task.claim.call_count)
+
+        process.is_alive.return_value = False
+        self.assertEqual(0, w.poll())
+        self.assertEqual({}, w.processes)
+        self.assertEqual(3, mock_objects.Task.claim.call_count)
+        self.assertEqual([mock.call("t1"), mock.call("t2")],
+                         sorted(mock_objects.Task.get.call_args_list))
+
+    @mock.patch('rally.cmd.worker.objects')
+    def test_fail_unfinished(self, mock_objects):
+        task = mock_objects.Task.get.return_value
+        worker._fail_unfinished("t1")
+        mock_objects.Task.get.assert_called_once_with("t1")
+        status, allowed = (task.update_status.call_args[0][0],
+                           task.update_status.call_args[1]["allowed_statuses"])
+        self.assertEqual(consts.TaskStatus.FAILED, status)
+        self.assertIn(consts.TaskStatus.TEST_TOOL_BENCHMARKING, allowed)
+        self.assertIn(consts.TaskStatus.INIT, allowed)
+        for done in worker.DONE_STATUSES:
+            self.assertNotIn(done, allowed)
+
+        task.update_status.side_effect = exceptions.TaskInvalidStatus(
+                        uuid="t1", require="init", actual="finished")
+        worker._fail_unfinished("t1")
+
+    @mock.patch('rally.cmd.worker.objects')
+    @mock.patch('rally.cmd.worker.api')
+    def test_run_task_fails(self, mock_api, mock_objects):
+        mock_api.run_queued_task.side_effect = Exception("fails")
+        task = mock_objects.Task.get.return_value
+        task.get_status.return_value = consts.TaskStatus.INIT
+        self.assertRaises(SystemExit, worker._run_task, "t1")
+        mock_api.run_queued_task.assert_called_once_with("t1")
+        task.update_status.assert_called_once_with(consts.TaskStatus.FAILED)
+
+        task.reset_mock()
+        task.get_status.return_value = consts.TaskStatus.ABORTED
+        self.assertRaises(SystemExit, worker._run_task, "t1")
+        self.assertFalse(task.update_status.called)
@@ -72,6 +72,37 @@ class TasksTestCase(test.DBTestCase):
             db_task = self._get_task(_uuid)
             self.assertEqual(db_task['status'], status)
 
+    def test_task_update_status(self):
+        INIT = consts.TaskStatus.INIT
+        ABORTING = consts.TaskStatus.ABORTING
+        _uuid = self._create_task({})['uuid']
+        db.task_update_status(_uuid, ABORTING, [INIT])
+        self.assertEqual(ABORTING, self._get_task(_uuid)['status'])
+        self.assertRaises(exceptions.TaskInvalidStatus,
+                          db.task_update_status, _uuid, INIT, [INIT])
+        self.assertEqual(ABORTING, self._get_task(_uuid)['status'])
+        self.assertRaises(exceptions.TaskNotFound, db.task_update_status,
+                          str(uuid.uuid4()), INIT, [INIT])
+
+    def test_task_claim(self):
+        other_deploy = db.deployment_create({})
+        self._create_task()
+        task1 = self._create_task({'queued': True})['uuid']
+        task2 = self._create_task({'queued': True})['uuid']
+        task3 = self._create_task({
+                        'queued': True,
+                        'deployment_uuid': other_deploy['uuid']})['uuid']
+
+        self.assertEqual(task1, db.task_claim('w1', 1)['uuid'])
+        self.assertEqual('w1', self._get_task(task1)['worker'])
+        # NOTE(hughsaunders): task2 has to wait for task1 to be over.
+        self.assertEqual(task3, db.task_claim('w2', 1)['uuid'])
+        self.assertIsNone(db.task_claim('w2', 1))
+
+        db.task_update(task1, {'status': consts.TaskStatus.FINISHED})
+        self.assertEqual(task2, db.task_claim('w2', 1)['uuid'])
+        self.assertIsNone(db.task_claim('w1', 2))
+
     def test_task_list_empty(self):
         self.assertEqual([], db.task_list())
 
@@ -129,6 +160,20 @@ class TasksTestCase(test.DBTestCase):
         self.assertRaises(exceptions.TaskNotFound, self._get_task, task1)
         self.assertEqual(task2, self._get_task(task2)['uuid'])
 
+    def test_task_delete_by_uuid_and_statuses(self):
+        task1 = self._create_task(values={
+            'status': consts.TaskStatus.ABORTED,
+        })['uuid']
+        task2 = self._create_task(values={
+            'status': consts.TaskStatus.INIT,
+        })['uuid']
+        statuses = [consts.TaskStatus.FINISHED, consts.TaskStatus.ABORTED]
+        db.task_delete(task1, status=statuses)
+        self.assertRaises(exceptions.TaskNotFound, self._get_task, task1)
+        e = self.assertRaises(exceptions.TaskInvalidStatus, db.task_delete,
+                              task2, status=statuses)
+        self.assertEqual('finished, aborted', e.kwargs['require'])
+
     def test_task_delete_by_uuid_and_status_invalid(self):
         task = self._create_task(values={
             'status': consts.TaskStatus.INIT,
@@ -157,6 +202,114 @@ class TasksTestCase(test.DBTestCase):
             self.assertEqual(res[0]['key'], data)
             self.assertEqual(res[0]['data'], data)
 
+    def test_task_result_update_data(self):
+        task_id = self._create_task()['uuid']
+        result = db.task_result_create(task_id, {'name': 'atata'},
+                                       {'raw': [{'time': 1}]})
+        db.task_result_update_data(result['id'], {'setup_duration': 2.5})
+        res = db.task_result_get_all_by_uuid(task_id)
+        self.assertEqual(res[0]['data'], {'raw': [{'time': 1}],
+                                          'setup_duration': 2.5})
+
+    def test_task_result_update_data_not_found(self):
+        self.assertRaises(exceptions.TaskResultNotFound,
+                          db.task_result_update_data, 42, {})
+
+    def test_task_result_get_all_by_uuid_without_data(self):
+        task_id = self._create_task()['uuid']
+        result = db.task_result_create(task_id, {'name': 'atata'},
+                                       {'raw': []})
+        db.task_result_update_progress(result['id'], {'iterations': 3})
+        res = db.task_result_get_all_by_uuid(task_id, load_data=False)
+        self.assertEqual(len(res), 1)
+        self.assertEqual(res[0]['key'], {'name': 'atata'})
+        self.assertEqual(res[0]['progress'], {'iterations': 3})
+
+    def test_task_result_update_progress_not_found(self):
+        self.assertRaises(exceptions.TaskResultNotFound,
+                          db.task_result_update_progress, 42, {})
+
+    def _create_iterations(self, task_id, result_id, durations, errors=0,
+                           concurrency=None):
+        iterations = [{'iteration': i, 'duration': d, 'idle_time': 0,
+                       'error': False, 'error_type': None,
+                       'concurrency': concurrency}
+                      for i, d in enumerate(durations)]
+        iterations += [{'iteration': len(durations) + i, 'duration': 100,
+                        'idle_time': 0, 'error': True,
+                        'error_type': 'Exception',
+                        'concurrency': concurrency}
+                       for i in range(errors)]
+        db.task_iteration_create_many(task_id, result_id, iterations)
+
+    def test_task_iteration_get_raw(self):
+        task_id = self._create_task()['uuid']
+        res1 = db.task_result_create(task_id, {'name': 'a'}, {})
+        res2 = db.task_result_create(task_id, {'name': 'b'}, {})
+        iterations = [{'iteration': i, 'duration': 1, 'idle_time': 0,
+                       'error': False, 'error_type': None,
+                       'concurrency': None, 'raw': {'time': i}}
+                      for i in (2, 0, 1)]
+        db.task_iteration_create_many(task_id, res1['id'], iterations)
+        db.task_iteration_create_many(task_id, res2['id'], [
+            dict(iterations[0], raw=None)])
+        self.assertEqual([{'time': 0}, {'time': 1}, {'time': 2}],
+                         db.task_iteration_get_raw(res1['id']))
+        self.assertEqual([], db.task_iteration_get_raw(res2['id']))
+
+        db.task_iteration_drop_raw(res1['id'], [0, 2])
+        self.assertEqual([{'time': 1}],
+                         db.task_iteration_get_raw(res1['id']))
+        self.assertEqual(3, db.task_iteration_stats(task_id)[res1['id']][
+                                                            'iterations'])
+
+    def test_task_iteration_stats(self):
+        task_id = self._create_task()['uuid']
+        res1 = db.task_result_create(task_id, {'name': 'a'}, {'raw': []})
+        res2 = db.task_result_create(task_id, {'name': 'b'}, {'raw': []})
+        self._create_iterations(task_id, res1['id'], [1.0, 2.0, 6.0],
+                                errors=2)
+        self._create_iterations(task_id, res2['id'], [], errors=1)
+
+        stats = db.task_iteration_stats(task_id)
+        self.assertEqual(stats[res1['id']], {'iterations': 5, 'errors': 2,
+                                             'min': 1.0, 'avg': 3.0,
+                                             'max': 6.0})
+        self.assertEqual(stats[res2['id']], {'iterations': 1, 'errors': 1,
+                                             'min': None, 'avg': None,
+                                             'max': None})
+
+    def test_task_iteration_stats_empty(self):
+        task_id = self._create_task()['uuid']
+        self.assertEqual(db.task_iteration_stats(task_id), {})
+
+    def test_task_iteration_stats_by_concurrency(self):
+        task_id = self._create_task()['uuid']
+        res1 = db.task_result_create(task_id, {'name': 'a'}, {'raw': []})
+        res2 = db.task_result_create(task_id, {'name': 'b'}, {'raw': []})
+        self._create_iterations(task_id, res1['id'], [1.0, 3.0],
+                                concurrency=1)
+        self._create_iterations(task_id, res1['id'], [4.0], errors=1,
+                                concurrency=2)
+        self._create_iterations(task_id, res2['id'], [1.0])
+
+        stats = db.task_iteration_stats_by_concurrency(task_id)
+        self.assertEqual(stats, {
+            res1['id']: {
+                1: {'iterations': 2, 'errors': 0,
+                    'min': 1.0, 'avg': 2.0, 'max': 3.0},
+                2: {'iterations': 2, 'errors': 1,
+                    'min': 4.0, 'avg': 4.0, 'max': 4.0},
+            },
+        })
+
+    def test_task_delete_with_iterations(self):
+        task_id = self._create_task()['uuid']
+        res = db.task_result_create(task_id, {'name': 'a'}, {'raw': []})
+        self._create_iterations(task_id, res['id'], [1.0])
+        db.task_delete(task_id)
+        self.assertEqual(db.task_iteration_stats(task_id), {})
+
     def test_task_get_detailed(self):
         task1 = self._create_task()
         key = {'name': 'atata'}
@@ -341,6 +494,41 @@ class ResourceTestCase(test.DBTestCase):
         self.assertRaises(exceptions.ResourceNotFound,
                           db.resource_delete, str(uuid.uuid4()))
 
+    def test_update(self):
+        deployment = db.deployment_create({})
+        res = db.resource_create({'deployment_uuid': deployment['uuid'],
+                                  'info': {'a': 1}})
+        db.resource_update(res['id'], {'info': {'a': 2}})
+        resources = db.resource_get_all(deployment['uuid'])
+        self.assertEqual(resources[0]['info'], {'a': 2})
+
+    def test_update_not_found(self):
+        self.assertRaises(exceptions.ResourceNotFound,
+                          db.resource_update, 42, {})
+
+    def test_lease_and_release(self):
+        deployment = db.deployment_create({})
+        res = db.resource_create({'deployment_uuid': deployment['uuid']})
+        self.assertEqual('task1', db.resource_lease(res['id'],
+                                                    'task1')['leased_by'])
+        db.resource_lease(res['id'], 'task1')
+        e = self.assertRaises(exceptions.ResourceIsLeased,
+                              db.resource_lease, res['id'], 'task2')
+        self.assertEqual('task1', e.kwargs['lessee'])
+
+        db.resource_release(res['id'], lessee='task2')
+        self.assertRaises(exceptions.ResourceIsLeased,
+                          db.resource_lease, res['id'], 'task2')
+        db.resource_release(res['id'], lessee='task1')
+        db.resource_lease(res['id'], 'task2')
+        db.resource_release(res['id'])
+        resources = db.resource_get_all(deployment['uuid'])
+        self.assertIsNone(resources[0]['leased_by'])
+
+    def test_lease_not_found(self):
+        self.assertRaises(exceptions.ResourceNotFound,
+                          db.resource_lease, 42, 'task')
+
     def test_get_all(self):
         deployment0 = db.deployment_create({})
         deployment1 = db.deployment_create({})
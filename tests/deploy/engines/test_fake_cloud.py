@@ -0,0 +1,55 @@
+# Copyright 2013: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Test the FakeCloud deploy engine."""
+
+import jsonschema
+
+from rally import deploy
+from rally.deploy.engines import fake_cloud
+from rally import fakecloud
+from rally import test
+
+
+class TestFakeCloudEngine(test.TestCase):
+    def setUp(self):
+        self.deployment = {
+            'uuid': 'fake_uuid',
+            'config': {
+                'name': 'FakeCloud',
+                'latency': {'distribution': 'constant', 'value': 0.01},
+                'failure_rate': 0.5,
+            },
+        }
+        super(TestFakeCloudEngine, self).setUp()
+
+    def test_fake_cloud_engine_is_in_factory(self):
+        engine = deploy.EngineFactory.get_engine('FakeCloud',
+                                                 self.deployment)
+        self.assertIsInstance(engine, fake_cloud.FakeCloud)
+
+    def test_init_invalid_config(self):
+        self.deployment['config']['latency'] = {'distribution': 'pareto'}
+        self.assertRaises(jsonschema.ValidationError,
+                          fake_cloud.FakeCloud, self.deployment)
+
+    def test_deploy(self):
+        endpoint = fake_cloud.FakeCloud(self.deployment).deploy()
+        uri = endpoint['identity']['uri']
+        self.assertTrue(fakecloud.is_fake(uri))
+        cloud = fakecloud.get_cloud(uri)
+        self.assertEqual({'distribution': 'constant', 'value': 0.01},
+                         cloud.latency)
+        self.assertEqual(0.5, cloud.failure_rate)
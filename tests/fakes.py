@@ -338,6 +338,7 @@ class FakeKeystoneClient(object):
         self.users = FakeUsersManager()
         self.project_id = 'abc123'
         self.auth_token = 'fake'
+        self.auth_ref = None
         self.service_catalog = FakeServiceCatalog()
 
     def authenticate(self):
@@ -144,6 +144,25 @@ class DeploymentTestCase(test.TestCase):
         objects.Deployment.delete_resource(42)
         mock_delete.assert_called_once_with(42)
 
+    @mock.patch('rally.objects.deploy.db.resource_update')
+    def test_update_resource(self, mock_update):
+        mock_update.return_value = self.resource
+        resource = objects.Deployment.update_resource(42, {'key': 'value'})
+        self.assertEqual(resource, self.resource)
+        mock_update.assert_called_once_with(42, {'info': {'key': 'value'}})
+
+    @mock.patch('rally.objects.deploy.db.resource_lease')
+    def test_lease_resource(self, mock_lease):
+        mock_lease.return_value = self.resource
+        resource = objects.Deployment.lease_resource(42, 'task')
+        self.assertEqual(resource, self.resource)
+        mock_lease.assert_called_once_with(42, 'task')
+
+    @mock.patch('rally.objects.deploy.db.resource_release')
+    def test_release_resource(self, mock_release):
+        objects.Deployment.release_resource(42, lessee='task')
+        mock_release.assert_called_once_with(42, lessee='task')
+
     @mock.patch('rally.objects.task.db.resource_get_all')
     def test_get_resources(self, mock_get_all):
         mock_get_all.return_value = [self.resource]
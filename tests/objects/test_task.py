@@ -53,6 +53,16 @@ class TaskTestCase(test.TestCase):
         mock_get.assert_called_once_with(self.task['uuid'])
         self.assertEqual(task['uuid'], self.task['uuid'])
 
+    @mock.patch('rally.objects.task.db.task_claim')
+    def test_claim(self, mock_claim):
+        mock_claim.return_value = self.task
+        task = objects.Task.claim('worker', 2)
+        mock_claim.assert_called_once_with('worker', 2)
+        self.assertEqual(task['uuid'], self.task['uuid'])
+
+        mock_claim.return_value = None
+        self.assertIsNone(objects.Task.claim('worker', 2))
+
     @mock.patch('rally.objects.task.db.task_delete')
     @mock.patch('rally.objects.task.db.task_create')
     def test_create_and_delete(self, mock_create, mock_delete):
@@ -103,6 +113,23 @@ class TaskTestCase(test.TestCase):
             {'status': consts.TaskStatus.FINISHED},
         )
 
+    @mock.patch('rally.objects.task.db.task_update_status')
+    def test_update_status_allowed(self, mock_update_status):
+        task = objects.Task(task=self.task)
+        task.update_status(consts.TaskStatus.ABORTING,
+                           allowed_statuses=[consts.TaskStatus.INIT])
+        mock_update_status.assert_called_once_with(
+            self.task['uuid'], consts.TaskStatus.ABORTING,
+            [consts.TaskStatus.INIT])
+
+    @mock.patch('rally.objects.task.db.task_get')
+    def test_get_status(self, mock_get):
+        mock_get.return_value = dict(self.task,
+                                     status=consts.TaskStatus.ABORTING)
+        task = objects.Task(task=self.task)
+        self.assertEqual(consts.TaskStatus.ABORTING, task.get_status())
+        mock_get.assert_called_once_with(self.task['uuid'])
+
     @mock.patch('rally.objects.task.db.task_update')
     def test_update_verification_log(self, mock_update):
         mock_update.return_value = self.task
@@ -120,6 +147,56 @@ class TaskTestCase(test.TestCase):
         mock_append_results.assert_called_once_with(self.task['uuid'],
                                                     'opt', 'val')
 
+    @mock.patch('rally.objects.task.db.task_iteration_drop_raw')
+    @mock.patch('rally.objects.task.db.task_iteration_create_many')
+    def test_extend_results(self, mock_iterations, mock_drop_raw):
+        task = objects.Task(task=self.task)
+        raw = [{'time': 1.5, 'idle_time': 0.5, 'error': None},
+               {'time': 2, 'idle_time': 0, 'concurrency': 4,
+                'error': ["<class 'Exception'>", 'msg', 'trace']}]
+        task.extend_results(42, raw, first_iteration=10)
+        mock_iterations.assert_called_once_with(self.task['uuid'], 42, [
+            {'iteration': 10, 'duration': 1.5, 'idle_time': 0.5,
+             'error': False, 'error_type': None, 'concurrency': None,
+             'raw': raw[0]},
+            {'iteration': 11, 'duration': 2, 'idle_time': 0,
+             'error': True, 'error_type': "<class 'Exception'>",
+             'concurrency': 4, 'raw': raw[1]},
+        ])
+        self.assertFalse(mock_drop_raw.called)
+
+    @mock.patch('rally.objects.task.db.task_iteration_drop_raw')
+    @mock.patch('rally.objects.task.db.task_iteration_create_many')
+    def test_extend_results_with_sample(self, mock_iterations,
+                                        mock_drop_raw):
+        task = objects.Task(task=self.task)
+        raw = [{'time': 1.5, 'idle_time': 0.5, 'error': None},
+               {'time': 2, 'idle_time': 0.5, 'error': None}]
+        task.extend_results(42, raw, first_iteration=10, sampled=set([11]),
+                            unsampled=[3])
+        iterations = mock_iterations.call_args[0][2]
+        self.assertEqual([None, raw[1]], [i['raw'] for i in iterations])
+        mock_drop_raw.assert_called_once_with(42, [3])
+
+    @mock.patch('rally.objects.task.db.task_result_update_data')
+    def test_update_result_data(self, mock_update_data):
+        task = objects.Task(task=self.task)
+        task.update_result_data(42, {'setup_duration': 1})
+        mock_update_data.assert_called_once_with(42, {'setup_duration': 1})
+
+    @mock.patch('rally.objects.task.db.task_result_update_progress')
+    def test_update_result_progress(self, mock_update_progress):
+        task = objects.Task(task=self.task)
+        task.update_result_progress(42, {'iterations': 1})
+        mock_update_progress.assert_called_once_with(42, {'iterations': 1})
+
+    @mock.patch('rally.objects.task.db.task_result_get_all_by_uuid')
+    def test_get_results(self, mock_get_results):
+        mock_get_results.return_value = ['result']
+        task = objects.Task(task=self.task)
+        self.assertEqual(['result'], task.get_results())
+        mock_get_results.assert_called_once_with(self.task['uuid'])
+
     @mock.patch('rally.objects.task.db.task_update')
     def test_set_failed(self, mock_update):
         mock_update.return_value = self.task
@@ -129,3 +206,13 @@ class TaskTestCase(test.TestCase):
             self.task['uuid'],
             {'failed': True},
         )
+
+    @mock.patch('rally.objects.task.db.task_update')
+    def test_set_queued(self, mock_update):
+        mock_update.return_value = self.task
+        task = objects.Task(task=self.task)
+        task.set_queued()
+        mock_update.assert_called_once_with(
+            self.task['uuid'],
+            {'queued': True},
+        )
@@ -20,6 +20,7 @@ import uuid
 
 from rally.benchmark import base
 from rally import consts
+from rally import exceptions
 from rally.orchestrator import api
 from rally import test
 
@@ -40,7 +41,7 @@ FAKE_DEPLOY_CONFIG = {
 
 
 FAKE_TASK_CONFIG = {
-    'FakeScenario.fake': [
+    'FakeTaskScenario.fake': [
         {
             'args': {},
             'execution': 'continuous',
@@ -56,7 +57,7 @@ FAKE_TASK_CONFIG = {
 }
 
 
-class FakeScenario(base.Scenario):
+class FakeTaskScenario(base.Scenario):
     @classmethod
     def fake(cls, context):
         pass
@@ -95,8 +96,7 @@ class APITestCase(test.TestCase):
         mock_task_update.return_value = self.task
         mock_deploy_get.return_value = self.deployment
 
-        mock_utils_runner.return_value = mock_runner = mock.Mock()
-        mock_runner.run.return_value = ['fake_result']
+        mock_utils_runner.return_value = mock.Mock()
 
         api.start_task(self.deploy_uuid, self.task_config)
 
@@ -123,24 +123,123 @@ class APITestCase(test.TestCase):
                         'users_per_tenant': 1,
                     }
                 },
-                'name': 'FakeScenario.fake',
+                'name': 'FakeTaskScenario.fake',
                 'pos': 0,
             },
-            {
-                'raw': ['fake_result'],
-            },
+            {},
         )
 
-    def test_abort_task(self):
-        self.assertRaises(NotImplementedError, api.abort_task,
-                          self.task_uuid)
+    @mock.patch('rally.objects.task.db.task_update_status')
+    @mock.patch('rally.objects.task.db.task_get')
+    def test_abort_task(self, mock_task_get, mock_update_status):
+        mock_task_get.return_value = dict(
+                        self.task, queued=True,
+                        status=consts.TaskStatus.TEST_TOOL_BENCHMARKING)
+        api.abort_task(self.task_uuid)
+        mock_update_status.assert_called_once_with(
+                        self.task_uuid, consts.TaskStatus.ABORTING,
+                        [consts.TaskStatus.TEST_TOOL_BENCHMARKING])
+
+    @mock.patch('rally.objects.task.db.task_update_status')
+    @mock.patch('rally.objects.task.db.task_get')
+    def test_abort_queued_task(self, mock_task_get, mock_update_status):
+        mock_task_get.return_value = dict(self.task, queued=True,
+                                          status=consts.TaskStatus.INIT)
+        api.abort_task(self.task_uuid)
+        mock_update_status.assert_called_once_with(
+                        self.task_uuid, consts.TaskStatus.ABORTED,
+                        [consts.TaskStatus.INIT])
+
+    @mock.patch('rally.objects.task.db.task_update_status')
+    @mock.patch('rally.objects.task.db.task_get')
+    def test_abort_queued_task_started(self, mock_task_get,
+                                       mock_update_status):
+        mock_task_get.return_value = dict(self.task, queued=True,
+                                          status=consts.TaskStatus.INIT)
+        mock_update_status.side_effect = [
+                exceptions.TaskInvalidStatus(uuid=self.task_uuid,
+                                             require="init",
+                                             actual="benchmarking"),
+                None]
+        api.abort_task(self.task_uuid)
+        self.assertEqual(
+                [mock.call(self.task_uuid, consts.TaskStatus.ABORTED,
+                           [consts.TaskStatus.INIT]),
+                 mock.call(self.task_uuid, consts.TaskStatus.ABORTING,
+                           [consts.TaskStatus.TEST_TOOL_BENCHMARKING])],
+                mock_update_status.call_args_list)
+
+    @mock.patch('rally.orchestrator.api.engine.TestEngine')
+    @mock.patch('rally.objects.task.db.task_update')
+    @mock.patch('rally.objects.deploy.db.deployment_get')
+    @mock.patch('rally.objects.task.db.task_create')
+    def test_queue_task(self, mock_task_create, mock_deploy_get,
+                        mock_task_update, mock_engine):
+        mock_task_create.return_value = self.task
+        mock_task_update.return_value = self.task
+        mock_deploy_get.return_value = self.deployment
+        task_uuid = api.queue_task(self.deploy_uuid, self.task_config)
+        self.assertEqual(self.task_uuid, task_uuid)
+        mock_deploy_get.assert_called_once_with(self.deploy_uuid)
+        mock_task_create.assert_called_once_with({
+            'deployment_uuid': self.deploy_uuid,
+            'config': self.task_config,
+            'use_user_pool': False,
+        })
+        self.assertEqual(self.task_config, mock_engine.call_args[0][0])
+        mock_task_update.assert_called_once_with(self.task_uuid,
+                                                 {'queued': True})
+
+    @mock.patch('rally.orchestrator.api.engine.TestEngine')
+    @mock.patch('rally.objects.task.db.task_update')
+    @mock.patch('rally.objects.deploy.db.deployment_get')
+    @mock.patch('rally.objects.task.db.task_create')
+    def test_queue_task_invalid(self, mock_task_create, mock_deploy_get,
+                                mock_task_update, mock_engine):
+        mock_task_create.return_value = self.task
+        mock_task_update.return_value = self.task
+        mock_deploy_get.return_value = self.deployment
+        mock_engine.side_effect = exceptions.InvalidConfigException(
+                                                        message="invalid")
+        self.assertRaises(exceptions.InvalidConfigException,
+                          api.queue_task, self.deploy_uuid, self.task_config)
+        mock_task_update.assert_called_once_with(
+                self.task_uuid, {'status': consts.TaskStatus.FAILED})
+
+    @mock.patch('rally.orchestrator.api.deploy.EngineFactory')
+    @mock.patch('rally.orchestrator.api.engine.TestEngine')
+    @mock.patch('rally.objects.deploy.db.deployment_get')
+    @mock.patch('rally.objects.task.db.task_get')
+    def test_run_queued_task(self, mock_task_get, mock_deploy_get,
+                             mock_engine, mock_factory):
+        mock_task_get.return_value = dict(self.task,
+                                          deployment_uuid=self.deploy_uuid,
+                                          config=self.task_config,
+                                          use_user_pool=False,
+                                          status=consts.TaskStatus.INIT)
+        mock_deploy_get.return_value = self.deployment
+        api.run_queued_task(self.task_uuid)
+        mock_deploy_get.assert_called_once_with(self.deploy_uuid)
+        self.assertEqual(self.task_config, mock_engine.call_args[0][0])
+        mock_engine.return_value.run.assert_called_once_with()
+
+    @mock.patch('rally.orchestrator.api.engine.TestEngine')
+    @mock.patch('rally.objects.deploy.db.deployment_get')
+    @mock.patch('rally.objects.task.db.task_get')
+    def test_run_queued_task_aborted(self, mock_task_get, mock_deploy_get,
+                                     mock_engine):
+        mock_task_get.return_value = dict(self.task,
+                                          status=consts.TaskStatus.ABORTED)
+        api.run_queued_task(self.task_uuid)
+        self.assertFalse(mock_deploy_get.called)
+        self.assertFalse(mock_engine.called)
 
     @mock.patch('rally.objects.task.db.task_delete')
     def test_delete_task(self, mock_delete):
         api.delete_task(self.task_uuid)
         mock_delete.assert_called_once_with(
             self.task_uuid,
-            status=consts.TaskStatus.FINISHED)
+            status=[consts.TaskStatus.FINISHED, consts.TaskStatus.ABORTED])
 
     @mock.patch('rally.objects.task.db.task_delete')
     def test_delete_task_force(self, mock_delete):
@@ -181,3 +280,64 @@ class APITestCase(test.TestCase):
         mock_update.assert_has_calls([
             mock.call(self.deploy_uuid, {'endpoint': self.endpoint}),
         ])
+
+    @mock.patch('rally.orchestrator.api.deploy.EngineFactory')
+    @mock.patch('rally.orchestrator.api.engine.TestEngine')
+    @mock.patch('rally.orchestrator.api.userpool.UserPool')
+    @mock.patch('rally.objects.deploy.db.deployment_get')
+    @mock.patch('rally.objects.task.db.task_create')
+    def test_start_task_with_user_pool(self, mock_task_create,
+                                       mock_deploy_get, mock_pool,
+                                       mock_engine, mock_factory):
+        mock_task_create.return_value = self.task
+        mock_deploy_get.return_value = self.deployment
+        pool = mock_pool.get.return_value
+        mock_engine.return_value.run.side_effect = \
+            exceptions.InvalidConfigException(message="fail")
+        self.assertRaises(exceptions.InvalidConfigException, api.start_task,
+                          self.deploy_uuid, self.task_config,
+                          use_user_pool=True)
+        pool.lease.assert_called_once_with(self.task_uuid)
+        mock_engine.assert_called_once_with(self.task_config, mock.ANY,
+                                            users=pool.endpoints)
+        pool.release.assert_called_once_with(self.task_uuid)
+
+    @mock.patch('rally.orchestrator.api.userpool.UserPool')
+    @mock.patch('rally.objects.deploy.db.deployment_get')
+    def test_user_pool(self, mock_deploy_get, mock_pool):
+        mock_deploy_get.return_value = self.deployment
+        api.create_user_pool(self.deploy_uuid, 2, 3)
+        mock_pool.create.assert_called_once_with(mock.ANY, 2, 3)
+        mock_pool.get.return_value.check.return_value = ['user']
+        self.assertEqual(api.check_user_pool(self.deploy_uuid), ['user'])
+        api.release_user_pool(self.deploy_uuid)
+        mock_pool.get.return_value.release.assert_called_once_with()
+        api.delete_user_pool(self.deploy_uuid)
+        mock_pool.get.return_value.delete.assert_called_once_with()
+
+    @mock.patch('rally.orchestrator.api.runner.cleanup_leftovers')
+    @mock.patch('rally.objects.task.db.task_result_update_data')
+    @mock.patch('rally.objects.task.db.task_result_get_all_by_uuid')
+    @mock.patch('rally.objects.deploy.db.deployment_get')
+    @mock.patch('rally.objects.task.db.task_get')
+    def test_cleanup_task(self, mock_task_get, mock_deploy_get,
+                          mock_results, mock_update_data, mock_cleanup):
+        mock_task_get.return_value = dict(self.task,
+                                          deployment_uuid=self.deploy_uuid)
+        mock_deploy_get.return_value = self.deployment
+        leftovers = {'endpoints': [{'username': 'u'}], 'tenants': ['t'],
+                     'users': ['u']}
+        mock_results.return_value = [
+            {'id': 1, 'data': {'raw': [], 'leftovers': None}},
+            {'id': 2, 'data': {'raw': [], 'leftovers': leftovers}},
+            {'id': 3, 'data': {'raw': []}},
+        ]
+        mock_cleanup.return_value = {'nova.servers': 1}
+
+        api.cleanup_task(self.task_uuid)
+        mock_results.assert_called_once_with(self.task_uuid)
+        mock_cleanup.assert_called_once_with(self.endpoint['identity'],
+                                             leftovers)
+        mock_update_data.assert_called_once_with(
+                    2, {'cleanup_durations': {'nova.servers': 1},
+                        'leftovers': None})
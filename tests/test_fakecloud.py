@@ -0,0 +1,128 @@
+# Copyright 2013: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the in-process fake cloud."""
+
+import mock
+from novaclient import exceptions
+
+from rally import fakecloud
+from rally import osclients
+from rally import test
+
+
+class FakeCloudTestCase(test.TestCase):
+
+    def _clients(self, config=None, tenant_name="tenant"):
+        uri = fakecloud.make_uri(self.id(), config or {})
+        return osclients.Clients("user", "pass", tenant_name, uri)
+
+    def test_sample_latency(self):
+        self.assertEqual(0, fakecloud.sample_latency(None))
+        self.assertEqual(0.5, fakecloud.sample_latency(
+                                {"distribution": "constant", "value": 0.5}))
+        self.assertEqual(0, fakecloud.sample_latency(
+                                {"distribution": "normal", "mean": -10,
+                                 "stddev": 0}))
+        value = fakecloud.sample_latency({"distribution": "uniform",
+                                          "min": 1, "max": 2})
+        self.assertTrue(1 <= value <= 2)
+
+    def test_is_fake(self):
+        self.assertTrue(fakecloud.is_fake(fakecloud.make_uri("c", {})))
+        self.assertFalse(fakecloud.is_fake("http://example.net:5000/v2.0/"))
+
+    def test_get_cloud(self):
+        uri = fakecloud.make_uri(self.id(), {"build_time": 3})
+        cloud = fakecloud.get_cloud(uri)
+        self.assertIs(cloud, fakecloud.get_cloud(uri))
+        self.assertEqual(3, cloud.build_time)
+
+    def test_clients_share_tenant(self):
+        clients = self._clients()
+        other = self._clients()
+        server = clients.get_nova_client().servers.create("s", "img", "fl")
+        self.assertEqual([server], other.get_nova_client().servers.list())
+        self.assertEqual([], self._clients(tenant_name="other")
+                                 .get_nova_client().servers.list())
+        self.assertIs(clients.get_nova_client().images,
+                      clients.get_glance_client().images)
+        self.assertTrue(clients.get_keystone_client().project_id)
+
+    def test_server_lifecycle(self):
+        servers = self._clients().get_nova_client().servers
+        server = servers.create("s", "img", "fl")
+        self.assertEqual("ACTIVE", server.status)
+        server.stop()
+        self.assertEqual("SHUTOFF", servers.get(server.id).status)
+        server.delete()
+        self.assertEqual([], servers.list())
+        self.assertRaises(exceptions.NotFound, servers.get, server.id)
+
+    @mock.patch("rally.fakecloud.time")
+    def test_server_build_time(self, mock_time):
+        mock_time.time.return_value = 100.0
+        servers = self._clients({"build_time": 5}).get_nova_client().servers
+        server = servers.create("s", "img", "fl")
+        self.assertEqual("BUILD", server.status)
+        self.assertEqual("spawning", getattr(server, fakecloud.TASK_STATE))
+        mock_time.time.return_value = 106.0
+        server = servers.list(detailed=True)[0]
+        self.assertEqual("ACTIVE", server.status)
+        self.assertIsNone(getattr(server, fakecloud.TASK_STATE))
+
+    def test_image_delete(self):
+        nova = self._clients().get_nova_client()
+        server = nova.servers.create("s", "img", "fl")
+        image = nova.images.get(nova.servers.create_image(server, "i"))
+        self.assertEqual("ACTIVE", image.status)
+        image.delete()
+        self.assertEqual("DELETED", nova.images.get(image.id).status)
+
+    def test_security_group_rules(self):
+        nova = self._clients().get_nova_client()
+        group = nova.security_groups.create("rally_open")
+        nova.security_group_rules.create(group.id, ip_protocol="tcp",
+                                         from_port=1, to_port=22,
+                                         cidr="0.0.0.0/0")
+        self.assertEqual([{"ip_protocol": "tcp", "from_port": 1,
+                           "to_port": 22, "ip_range": {"cidr": "0.0.0.0/0"}}],
+                         nova.security_groups.find(name="rally_open").rules)
+        self.assertEqual("default",
+                         nova.security_groups.find(name="default").name)
+
+    def test_keypair_conflict(self):
+        keypairs = self._clients().get_nova_client().keypairs
+        keypairs.create("key")
+        self.assertRaises(exceptions.Conflict, keypairs.create, "key")
+
+    @mock.patch("rally.fakecloud.time")
+    def test_call_latency(self, mock_time):
+        mock_time.time.return_value = 0
+        latency = {"distribution": "constant", "value": 0.1}
+        nova = self._clients({"calls": {"nova.servers": {
+                                        "latency": latency}}}
+                             ).get_nova_client()
+        nova.servers.list()
+        nova.keypairs.list()
+        mock_time.sleep.assert_called_once_with(0.1)
+
+    def test_call_failures(self):
+        config = {"failure_rate": 1,
+                  "calls": {"nova.servers.list": {"failure_rate": 0}}}
+        cloud = fakecloud.FakeCloud(**config)
+        cloud.call("nova.servers.list")
+        self.assertRaises(exceptions.ClientException, cloud.call,
+                          "nova.servers.create")
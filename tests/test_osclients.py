@@ -13,8 +13,12 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import json
 import mock
+import subprocess
+import sys
 
+from rally import fakecloud
 from rally import osclients
 from rally import test
 from tests import fakes
@@ -85,3 +89,23 @@ class OSClientsTestCase(test.TestCase):
                                                        auth_url=self.args[-1],
                                                        service_type='volume')
             self.assertEqual(self.clients.cache["cinder"], fake_cinder)
+
+    def test_fake_scheme(self):
+        self.assertEqual(fakecloud.SCHEME, osclients.FAKE_SCHEME)
+
+    def test_fake_cloud_not_imported(self):
+        modules = json.loads(subprocess.check_output(
+            [sys.executable, "-c", "import json, sys; "
+             "from rally import osclients; "
+             "osclients.Clients('u', 'p', 't', 'http://auth_url'); "
+             "print(json.dumps(sys.modules.keys()))"]))
+        self.assertNotIn("rally.fakecloud", modules)
+
+    def test_get_fake_clients(self):
+        clients = osclients.Clients("user", "pass", "tenant",
+                                    fakecloud.make_uri("cloud", {}))
+        nova = clients.get_nova_client()
+        self.assertIsInstance(nova, fakecloud.FakeNovaClient)
+        self.assertIs(nova, clients.cache["nova"])
+        self.assertIsInstance(clients.get_keystone_client(),
+                              fakecloud.FakeKeystoneClient)
@@ -24,60 +24,50 @@ class ProcessingTestCase(test.TestCase):
 
     def setUp(self):
         super(ProcessingTestCase, self).setUp()
-        self.fake_task = {
-            "results": [
-                {
-                    "data": {"raw": [{"error": None, "time": 10.5},
-                                     {"error": None, "time": 12.5}]},
-                    "key": {"name": "scenario_1",
-                            "kw": {"config": {"active_users": 1}}}
-                },
-                {
-                    "data": {"raw": [{"error": None, "time": 4.3}]},
-                    "key": {"name": "scenario_2",
-                            "kw": {"config": {"active_users": 1}}}
-                },
-                {
-                    "data": {"raw": [{"error": None, "time": 1.2},
-                                     {"error": None, "time": 3.4},
-                                     {"error": None, "time": 5.6}]},
-                    "key": {"name": "scenario_1",
-                            "kw": {"config": {"active_users": 2}}}
-                }
-            ],
-        }
+        self.fake_results = [
+            {"id": 1, "key": {"name": "scenario_1",
+                              "kw": {"config": {"active_users": 1}}}},
+            {"id": 2, "key": {"name": "scenario_2",
+                              "kw": {"config": {"active_users": 1}}}},
+            {"id": 3, "key": {"name": "scenario_1",
+                              "kw": {"config": {"active_users": 2}}}},
+        ]
         self.fake_task_aggregated_by_concurrency = {
             "scenario_1": {1: [10.5, 12.5], 2: [1.2, 3.4, 5.6]},
             "scenario_2": {1: [4.3]}
         }
-        self.fake_task_invalid_no_aggregated_field = {
-            "results": [
-                {
-                    "data": {"raw": [{"error": None, "time": 10.5},
-                                     {"error": None, "time": 12.5}]},
-                    "key": {"name": "scenario_1",
-                            "kw": {"config": {"active_users": 1}}}
-                },
-                {
-                    "data": {"raw": [{"error": None, "time": 4.3}]},
-                    "key": {"name": "scenario_2",
-                            "kw": {"config": {"times": 1}}}
-                }
-            ],
-        }
+        self.fake_stats = {}
+        for result in self.fake_results:
+            name = result["key"]["name"]
+            active_users = result["key"]["kw"]["config"]["active_users"]
+            times = self.fake_task_aggregated_by_concurrency[name][
+                                                                active_users]
+            self.fake_stats[result["id"]] = {
+                "iterations": len(times), "errors": 0, "min": min(times),
+                "avg": sum(times) / len(times), "max": max(times)}
+        self.fake_results_invalid_no_aggregated_field = [
+            {"id": 1, "key": {"name": "scenario_1",
+                              "kw": {"config": {"active_users": 1}}}},
+            {"id": 2, "key": {"name": "scenario_2",
+                              "kw": {"config": {"times": 1}}}},
+        ]
 
-    def test_aggregated_plot(self):
-        with mock.patch("rally.processing.db.task_get_detailed") as mock_task:
-            mock_task.return_value = self.fake_task_invalid_no_aggregated_field
-            with mock.patch("rally.processing.plt") as mock_plot:
-                with mock.patch("rally.processing.ticker"):
-                    self.assertRaises(exceptions.NoSuchConfigField,
-                                      processing.aggregated_plot,
-                                      "task", "active_users")
-            mock_task.return_value = self.fake_task
-            with mock.patch("rally.processing.plt") as mock_plot:
-                with mock.patch("rally.processing.ticker"):
-                    processing.aggregated_plot("task", "active_users")
+    @mock.patch("rally.processing.db.task_iteration_stats")
+    @mock.patch("rally.processing.db.task_result_get_all_by_uuid")
+    def test_aggregated_plot(self, mock_results, mock_stats):
+        mock_stats.return_value = self.fake_stats
+        mock_results.return_value = \
+            self.fake_results_invalid_no_aggregated_field
+        with mock.patch("rally.processing.plt") as mock_plot:
+            with mock.patch("rally.processing.ticker"):
+                self.assertRaises(exceptions.NoSuchConfigField,
+                                  processing.aggregated_plot,
+                                  "task", "active_users")
+        mock_results.return_value = self.fake_results
+        with mock.patch("rally.processing.plt") as mock_plot:
+            with mock.patch("rally.processing.ticker"):
+                processing.aggregated_plot("task", "active_users")
+        mock_results.assert_called_with("task", load_data=False)
 
         expected_plot_calls = []
         expected_show_calls = []
@@ -106,3 +96,43 @@ class ProcessingTestCase(test.TestCase):
 
         self.assertEqual(mock_plot.plot.mock_calls, expected_plot_calls)
         self.assertEqual(mock_plot.show.mock_calls, expected_show_calls)
+
+    @mock.patch("rally.processing.db.task_iteration_stats_by_concurrency")
+    @mock.patch("rally.processing.db.task_result_get_all_by_uuid")
+    def test_concurrency_plot(self, mock_results, mock_stats):
+        mock_results.return_value = [
+            {"id": 1, "key": {"name": "scenario_1", "pos": 0}},
+            {"id": 2, "key": {"name": "scenario_2", "pos": 0}},
+        ]
+        mock_stats.return_value = {
+            1: {1: {"min": 1.0, "avg": 2.0, "max": 3.0},
+                8: {"min": 2.0, "avg": 4.0, "max": 9.0},
+                16: {"min": None, "avg": None, "max": None}},
+        }
+        with mock.patch("rally.processing.plt") as mock_plot:
+            with mock.patch("rally.processing.ticker"):
+                processing.concurrency_plot("task")
+        mock_results.assert_called_once_with("task", load_data=False)
+        mock_stats.assert_called_once_with("task")
+        self.assertEqual(mock_plot.plot.mock_calls, [
+            mock.call([1, 8], [3.0, 9.0], "r-", label="max", linewidth=2),
+            mock.call([1, 8], [2.0, 4.0], "b-", label="avg", linewidth=2),
+            mock.call([1, 8], [1.0, 2.0], "g-", label="min", linewidth=2),
+        ])
+        mock_plot.title.assert_called_once_with(
+            "Benchmark results: scenario_1 (0)")
+        self.assertEqual(mock_plot.show.mock_calls, [mock.call()])
+
+    def test_atomic_actions_stats(self):
+        raw = [
+            {"atomic_actions": [{"action": "boot", "duration": 2.0},
+                                {"action": "delete", "duration": 1.0}]},
+            {"atomic_actions": [{"action": "boot", "duration": 4.0}]},
+            {"error": "timeout"},
+        ]
+        stats = processing.atomic_actions_stats(raw)
+        self.assertEqual(["boot", "delete"], [name for name, s in stats])
+        self.assertEqual(2, stats[0][1]["count"])
+        self.assertEqual(3.0, stats[0][1]["avg"])
+        self.assertEqual(1, stats[1][1]["count"])
+        self.assertEqual([], processing.atomic_actions_stats([{}]))
@@ -0,0 +1,140 @@
+# Copyright 2013: Mirantis Inc.
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import mock
+import random
+
+from rally import stats
+from rally import test
+
+
+class StatsTestCase(test.TestCase):
+
+    values = [4, 1, 3, 2, 5]
+
+    def _check_compute(self):
+        result = stats.compute(self.values)
+        self.assertEqual(5, result["count"])
+        self.assertEqual(1, result["min"])
+        self.assertEqual(5, result["max"])
+        self.assertEqual(3, result["avg"])
+        self.assertAlmostEqual(2 ** 0.5, result["stddev"])
+        self.assertEqual(3, result["p50"])
+        self.assertAlmostEqual(4.6, result["p90"])
+        self.assertAlmostEqual(4.996, result["p99.9"])
+        self.assertIsNone(stats.compute([]))
+
+    def _check_histogram(self):
+        self.assertEqual([{"from": 1.0, "to": 3.0, "count": 2},
+                          {"from": 3.0, "to": 5.0, "count": 3}],
+                         stats.histogram(self.values, bins=2))
+
+    def test_compute(self):
+        self._check_compute()
+
+    @mock.patch("rally.stats.numpy", new=None)
+    def test_compute_without_numpy(self):
+        self._check_compute()
+
+    def test_histogram(self):
+        self._check_histogram()
+
+    @mock.patch("rally.stats.numpy", new=None)
+    def test_histogram_without_numpy(self):
+        self._check_histogram()
+
+    def test_percentile_key(self):
+        self.assertEqual(["p50", "p90", "p95", "p99", "p99.9"],
+                         [stats.percentile_key(p) for p in stats.PERCENTILES])
+
+
+class HistogramTestCase(test.TestCase):
+
+    def test_stats(self):
+        values = [random.uniform(0.1, 10) for i in range(1000)]
+        hist = stats.Histogram(precision=0.01)
+        for value in values:
+            hist.add(value)
+        exact = stats.compute(values)
+        approx = hist.stats()
+
+        self.assertEqual(1000, approx["count"])
+        for key in ["min", "max", "avg", "stddev"]:
+            self.assertAlmostEqual(exact[key], approx[key])
+        for key in ["p50", "p90", "p99"]:
+            self.assertTrue(abs(exact[key] - approx[key]) <=
+                            0.02 * exact[key])
+
+    def test_zeros(self):
+        hist = stats.Histogram()
+        hist.add(0)
+        hist.add(-0.001)
+        hist.add(2)
+        self.assertEqual(0, hist.percentile(0.5))
+        self.assertEqual(2, hist.percentile(1))
+        self.assertIsNone(stats.Histogram().percentile(0.5))
+
+    @mock.patch("rally.stats.numpy", new=None)
+    def test_bins(self):
+        hist = stats.Histogram(precision=0.001)
+        for value in [0, 1.2, 1.7, 3.4, 5]:
+            hist.add(value)
+        self.assertEqual([{"from": 0, "to": 2.5, "count": 3},
+                          {"from": 2.5, "to": 5, "count": 2}],
+                         hist.bins(bins=2))
+        self.assertEqual(stats.histogram([0, 1.2, 1.7, 3.4, 5], bins=5),
+                         hist.bins(bins=5))
+        self.assertIsNone(stats.Histogram().bins())
+
+    def test_merge_and_dict(self):
+        first, second = stats.Histogram(), stats.Histogram()
+        for value in [1, 2, 3]:
+            first.add(value)
+        for value in [10, 20]:
+            second.add(value)
+        first.merge(second)
+        self.assertEqual(5, first.count)
+        self.assertEqual(1, first.min)
+        self.assertEqual(20, first.max)
+        self.assertEqual(7.2, first.mean())
+
+        restored = stats.Histogram.from_dict(first.to_dict())
+        self.assertEqual(first.stats(), restored.stats())
+        self.assertRaises(ValueError, first.merge,
+                          stats.Histogram(precision=0.1))
+
+
+class RollingWindowTestCase(test.TestCase):
+
+    def test_snapshot(self):
+        window = stats.RollingWindow(seconds=10)
+        self.assertEqual({"window": 10, "iterations": 0, "throughput": None,
+                          "error_rate": None, "times": None},
+                         window.snapshot(now=0))
+        window.add(1.0, now=100)
+        window.add(5.0, error=True, now=104)
+        window.add(3.0, now=105)
+        snapshot = window.snapshot(now=105)
+        self.assertEqual(3, snapshot["iterations"])
+        self.assertEqual(3 / 5.0, snapshot["throughput"])
+        self.assertEqual(1 / 3.0, snapshot["error_rate"])
+        self.assertEqual(2, snapshot["times"]["count"])
+
+        snapshot = window.snapshot(now=113.5)
+        self.assertEqual(2, snapshot["iterations"])
+        self.assertEqual(0.2, snapshot["throughput"])
+        self.assertEqual(0.5, snapshot["error_rate"])
+        self.assertEqual(0, window.snapshot(now=200)["iterations"])
+        self.assertEqual(0, window.errors)
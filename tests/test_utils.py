@@ -19,6 +19,7 @@ from __future__ import print_function
 
 import datetime
 import mock
+import os
 import sys
 import time
 
@@ -107,6 +108,17 @@ class TimerTestCase(test.TestCase):
         self.assertEqual(timer.error[0], type(Exception()))
 
 
+class LazyModuleTestCase(test.TestCase):
+
+    @mock.patch('rally.utils.importutils.import_module')
+    def test_lazy_module(self, mock_import):
+        module = utils.LazyModule('some.module')
+        self.assertFalse(mock_import.called)
+        self.assertEqual(mock_import.return_value.func, module.func)
+        self.assertEqual(mock_import.return_value.other, module.other)
+        mock_import.assert_called_once_with('some.module')
+
+
 class IterSubclassesTestCase(test.TestCase):
 
     def test_itersubclasses(self):
@@ -143,6 +155,15 @@ class ImportModulesTestCase(test.TestCase):
         self.assertTrue('tests.fixtures.import.package.a' in sys.modules)
         self.assertTrue('tests.fixtures.import.package.b' in sys.modules)
 
+    def test_find_modules_in_package(self):
+        modules = utils.find_modules_in_package(
+                                        'tests.fixtures.import.package')
+        self.assertEqual(['tests.fixtures.import.package.a',
+                          'tests.fixtures.import.package.b'],
+                         sorted(modules))
+        self.assertTrue(modules['tests.fixtures.import.package.a']
+                        .endswith(os.path.join('package', 'a.py')))
+
 
 class WaitForTestCase(test.TestCase):
 